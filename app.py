@@ -2,11 +2,17 @@
 # coding: utf-8
 
 import streamlit as st
-import json
-import pandas as pd
-import numpy as np
+import functools
 import os
-from PIL import Image
+import time
+from contextlib import contextmanager
+from utils.registry import CompanyRegistry, MIDSTREAM_TYPE
+from utils.cache import DataCache
+from utils.schema import compile_company, SEVERITY_HIGH, SEVERITY_MEDIUM
+from utils.static_fragments import static_fragment
+from utils import metrics
+# numpy / pandas / PIL / reportlab 及各标签页专用模块在对应的渲染函数内导入, 冷启动只加载首屏所需模块
+# (python -m benchmarks.import_time --check 校验启动导入开销)
 
 # 基础路径设置
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -21,239 +27,281 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# 高清晰度科技风 CSS
-st.markdown("""
-<style>
-    /* 1. 全局背景与字体 */
-    .stApp {
-        background-color: #050505;
-        color: #FFFFFF !important;
-    }
-    .stMarkdown, .stText, p, div {
-        color: #E0E0E0;
-        font-size: 1.05rem;
-        line-height: 1.6;
-    }
-
-    /* 2. 标题样式 */
-    .main-header {
-        font-family: 'Courier New', monospace;
-        font-size: 3.5rem;
-        font-weight: 900;
-        color: #00FF41;
-        text-align: center;
-        margin-bottom: 0.5rem;
-        text-shadow: 0 0 15px rgba(0, 255, 65, 0.6); 
-        letter-spacing: -2px;
-        text-transform: uppercase;
-    }
-    .sub-header {
-        font-family: sans-serif;
-        font-size: 1.2rem;
-        font-weight: bold;
-        color: #00F2FF;
-        text-align: center;
-        margin-bottom: 3rem;
-        letter-spacing: 2px;
-        border-bottom: 1px solid #333;
-        padding-bottom: 20px;
-    }
-
-    /* 3. 卡片样式 */
-    .tech-card {
-        background-color: #121212;
-        border: 1px solid #333;
-        border-left: 5px solid #00FF41;
-        padding: 1.5rem;
-        border-radius: 6px;
-        margin-bottom: 1.5rem;
-        box-shadow: 0 4px 20px rgba(0,0,0,0.5);
-    }
-    .tech-card h3 { color: #00F2FF !important; margin-top: 0; font-weight: 800; }
-    
-    /* 4. 侧边栏 (Sidebar) */
-    section[data-testid="stSidebar"] {
-        background-color: #000000 !important;
-        border-right: 1px solid #333;
-    }
-    section[data-testid="stSidebar"] * {
-        color: #FFFFFF !important;
-    }
-    div[data-baseweb="select"] > div {
-        background-color: #1A1A1A !important;
-        color: #FFFFFF !important;
-        border: 1px solid #444 !important;
-    }
-    div[data-baseweb="popover"], div[data-baseweb="menu"], ul[role="listbox"] {
-        background-color: #000000 !important;
-        border-color: #333 !important;
-    }
-    li[role="option"] {
-        background-color: #000000 !important;
-        color: #FFFFFF !important;
-    }
-    li[role="option"]:hover, li[role="option"][aria-selected="true"] {
-        background-color: #00FF41 !important;
-        color: #000000 !important;
-    }
-
-    /* 5. 评分标准图例 */
-    .score-legend-compact {
-        background: #080808;
-        border: 1px solid #333;
-        padding: 8px;
-        border-radius: 4px;
-        font-size: 0.8rem;
-        height: 100%; 
-    }
-    .legend-row {
-        display: flex;
-        align-items: center;
-        margin-bottom: 3px;
-        color: #CCC;
-    }
-    .color-dot {
-        width: 8px;
-        height: 8px;
-        border-radius: 50%;
-        margin-right: 6px;
-        display: inline-block;
-    }
-
-    /* 6. 其他 UI 修复 */
-    div[data-testid="stMetricLabel"] { color: #AAAAAA !important; font-size: 0.85rem !important; }
-    div[data-testid="stMetricValue"] { color: #00FF41 !important; font-family: 'Courier New', monospace; font-size: 1.8rem !important; }
-    
-    .source-link-btn {
-        display: inline-block; margin-top: 8px; padding: 4px 10px;
-        border: 1px solid #333; border-radius: 4px;
-        color: #00F2FF !important; text-decoration: none;
-        background: rgba(0, 242, 255, 0.05); font-size: 0.8rem;
-    }
-    
-    .product-trace-card {
-        background: linear-gradient(145deg, #1a1a1a, #0d0d0d);
-        border: 1px solid #00F2FF; border-radius: 15px; padding: 20px; text-align: center;
-    }
-    
-    .protocol-box {
-        background: #111; border: 1px solid #333; padding: 10px; border-radius: 5px; font-size: 0.9rem;
-    }
-    .protocol-title { color: #00FF41; font-weight: bold; border-bottom: 1px solid #333; padding-bottom: 5px; margin-bottom: 5px; }
-    
-    .chain-box { text-align: center; padding: 15px; border-radius: 8px; font-weight: bold; margin: 5px; }
-    .arrow { color: #666; font-size: 1.5rem; display: flex; align-items: center; justify-content: center; }
-
-    [data-testid="stImage"] button svg, [data-testid="stVegaLiteChart"] button svg {
-        fill: #00FF41 !important; stroke: #00FF41 !important;
-    }
-
-    /* ========================================================================
-       13. Expander (折叠面板) 终极双重锁定修复
-       ======================================================================== */
-    
-    /* 针对 <details> 渲染模式 */
-    details[data-testid="stExpander"] {
-        background-color: #0A0A0A !important;
-        border: 1px solid #333 !important;
-        border-radius: 6px !important;
-        color: #FFFFFF !important;
-    }
-    details[data-testid="stExpander"] summary {
-        color: #00FF41 !important;
-        background-color: #111 !important;
-        border-bottom: 1px solid #333 !important;
-    }
-    /* 针对 <div> 渲染模式 (旧版兼容) */
-    div[data-testid="stExpander"] {
-        background-color: #0A0A0A !important;
-        border: 1px solid #333 !important;
-        color: #FFFFFF !important;
-    }
-    
-    /* 强制内容区域所有文字颜色 - 通杀所有子元素 */
-    details[data-testid="stExpander"] > div,
-    div[data-testid="stExpander"] > div[role="group"] {
-        background-color: #000000 !important;
-    }
-    
-    details[data-testid="stExpander"] *,
-    div[data-testid="stExpander"] * {
-        color: #E0E0E0 !important;
-    }
-    
-    /* 特别针对协议卡片内部 */
-    .protocol-box div, .protocol-box span {
-        color: #E0E0E0 !important;
-    }
-    
-    /* 14. 按钮样式 */
-    button[kind="primary"] {
-        background-color: #00FF41 !important;
-        color: #000 !important;
-        border: none !important;
-        font-weight: bold !important;
-        font-family: 'Courier New', monospace !important;
-    }
-    button[kind="primary"]:hover {
-        background-color: #00F2FF !important;
-        box-shadow: 0 0 15px rgba(0, 242, 255, 0.5) !important;
-    }
-
-</style>
-""", unsafe_allow_html=True)
+# 高清晰度科技风 CSS (首次使用时压缩并缓存)
+st.markdown(static_fragment("app.css"), unsafe_allow_html=True)
 
 # 标题区域
 st.markdown('<div class="main-header">GREENLINK_OS</div>', unsafe_allow_html=True)
 st.markdown('<div class="sub-header">>> SATELLITE · INTELLIGENCE · FINANCE <<</div>', unsafe_allow_html=True)
 
+# 分段耗时: 记录每个区块最近一次执行的毫秒数与累计执行次数, 用于核对局部重跑的收益
+def record_timing(name, start):
+    elapsed = time.perf_counter() - start
+    timings = st.session_state.setdefault('section_timings', {})
+    runs = timings.get(name, (0.0, 0))[1]
+    timings[name] = (elapsed * 1000, runs + 1)
+    metrics.observe("greenlink_section_seconds", elapsed, section=name)
+
+@contextmanager
+def timed_section(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(name, start)
+
+def timed_fragment(name):
+    """把区块包装为 st.fragment: 区块内的控件交互只重跑该函数, 不重跑整个脚本"""
+    def decorate(render):
+        @st.fragment
+        @functools.wraps(render)
+        def run(*args, **kwargs):
+            with timed_section(name):
+                render(*args, **kwargs)
+            if st.session_state.get('show_timings'):
+                ms, runs = st.session_state.section_timings[name]
+                st.caption(f"⏱️ {name}: {ms:.1f} ms · 第 {runs} 次执行")
+        return run
+    return decorate
+
+script_start = time.perf_counter()
+
 # ==========================================
 # 2. 数据加载
 # ==========================================
-companies = {
-    "FGV Holdings Berhad": {"filename": "FGV.json", "type": "上游供应商", "position": "种植商", "code": "FGV"},
-    "IOI Corporation": {"filename": "IOI.json", "type": "上游供应商", "position": "种植商", "code": "IOI"},
-    "中粮集团 (COFCO)": {"filename": "COFCO.json", "type": "中游加工商", "position": "核心企业", "code": "COFCO"}
-}
+@st.cache_resource
+def get_registry():
+    # 章节缓存按内容哈希失效, 并在同一主机的所有 worker 进程间共享
+    cache = DataCache()
+    metrics.register_collector("data_cache", metrics.stats_collector(
+        "greenlink_data_cache", cache.stats, "Company section cache"))
+    return CompanyRegistry(os.path.join(BASE_DIR, 'data'), cache=cache)
+
+registry = get_registry()
+registry.refresh()
+company_names = registry.names()
 
 st.sidebar.markdown("### 📡 目标锁定 (TARGET)")
-selected_company = st.sidebar.selectbox("选择企业对象", list(companies.keys()))
-company_info = companies[selected_company]
+selected_company = st.sidebar.selectbox("选择企业对象", list(company_names.keys()))
+st.sidebar.toggle("⏱️ 显示分段耗时", key="show_timings")
 
-@st.cache_data
-def load_data(filename):
-    file_path = os.path.join(BASE_DIR, 'data', filename)
-    if not os.path.exists(file_path): return get_sample_data(), False
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-        return data, 'COFCO' in filename
+def load_data(code):
+    """返回惰性加载的公司记录, 各章节在首次访问时才读取"""
+    record = registry.load(code)
+    return record, registry.info(code)['type'] == MIDSTREAM_TYPE[0]
 
 def get_sample_data():
     return {"company": "Demo", "environment": {"risk_score": 25}, "social": {"risk_score": 75}, "supply_chain": {}}
 
 try:
-    data, is_cofco = load_data(company_info['filename'])
+    data, is_cofco = load_data(company_names[selected_company])
+    company_info = registry.info(data.code)
+    profile = registry.profile(data.code)
 except:
     data, is_cofco = get_sample_data(), False
+    company_info = {"code": "DEMO", "type": "上游供应商", "position": "种植商",
+                    "env_score": 25, "soc_score": 75}
+    profile = compile_company(data, "DEMO")
+
+@st.cache_resource
+def supply_graph_holder():
+    """各会话共享的供应链传导图, 连同其同步状态与锁"""
+    import threading
+    return {"graph": None, "state": None, "lock": threading.Lock()}
+
+def get_supply_graph():
+    """
+    供应链传导图随 (索引版本, 评估日期) 同步: 公司增删或供应链章节变化时重建;
+    只有生效评分变化 (编辑评分、事件衰减) 时经 update_score 沿变化节点的下游增量推送
+    """
+    from utils.scoring import shared_scorer
+    from utils.supply_graph import update_graph
+    holder = supply_graph_holder()
+    with holder['lock']:
+        scorer = shared_scorer(registry)
+        state = (registry.generation, scorer.as_of)
+        if holder['state'] != state:
+            holder['graph'], _ = update_graph(holder['graph'], registry, scorer)
+            holder['state'] = state
+        return holder['graph']
+
+@st.cache_resource
+def get_score_history():
+    from utils.score_history import ScoreHistory
+    return ScoreHistory()
+
+@st.cache_resource(max_entries=1)
+def record_scoring_run(generation, as_of):
+    """
+    索引内容变化或评估日期推进即一次评分运行, 为每家公司追加一个生效 E/S 点 (评分未变的不重复写入);
+    记录的是界面在默认政策下展示的生效评分 (effective_scores), 历史变化量与页面上的分数同一口径
+    """
+    from utils.scoring import effective_scores
+    return get_score_history().record_run(*effective_scores(registry))
+
+@st.cache_resource
+def get_event_index():
+    """全组合事件倒排索引, 各会话共享; 检索前按索引版本增量同步"""
+    from utils.event_index import EventIndex
+    return EventIndex()
+
+@st.cache_data(max_entries=1)
+def event_facets(generation):
+    return get_event_index().facets()
+
+def decay_policy():
+    """当前会话的事件衰减政策 (“评分逻辑”中的半衰期与 Top-K 滑块)"""
+    from utils.event_score import DEFAULT_HALF_LIFE, DecayPolicy
+    return DecayPolicy(half_life=st.session_state.get('decay_half_life', DEFAULT_HALF_LIFE),
+                       top_k=st.session_state.get('decay_top_k', 3))
+
+def event_scorer():
+    """
+    当前会话的 EventScorer (已同步到当前索引与今天的评估日期):
+    默认政策时即 API / PDF / 报告共用的 shared_scorer; 调整滑块后换为会话自己的一份,
+    此后的政策变化经 set_policy 原地重算, 不为每个滑块值重新构建
+    """
+    from utils.event_score import DecayPolicy, EventScorer
+    from utils.scoring import shared_scorer, sync_scorer
+    policy = decay_policy()
+    if policy.key() == DecayPolicy().key():
+        return shared_scorer(registry)
+    scorer = st.session_state.get('event_scorer')
+    if scorer is None:
+        scorer = st.session_state.event_scorer = EventScorer(policy)
+    elif scorer.policy.key() != policy.key():
+        scorer.set_policy(policy)
+    return sync_scorer(scorer, registry)
 
-env_score = data.get('environment', {}).get('risk_score', 50)
-soc_score = data.get('social', {}).get('risk_score', 50)
-total_score = (env_score + soc_score) / 2
+def effective_scores():
+    """当前公司的生效 (E, S): 事件衰减评分; 章节没有事件 (或为演示数据) 时取 JSON 中的 risk_score"""
+    from utils.scoring import effective_score
+    return effective_score(event_scorer(), company_info['code'],
+                           (company_info['env_score'], company_info['soc_score']))
+
+record_timing("数据加载", script_start)
 
 # ==========================================
 # 3. 主界面 Tabs
 # ==========================================
-tab1, tab2, tab3, tab4 = st.tabs([
-    "📊 风险监测 (MONITOR)", 
-    "🔗 链式穿透 (CHAIN)", 
+# st.tabs 每次运行都会执行全部标签页; 改为单选导航, 只计算并渲染当前标签页
+TAB_LABELS = (
+    "📊 风险监测 (MONITOR)",
+    "🔗 链式穿透 (CHAIN)",
     "💰 绿色金融 (FINANCE)",
-    "📱 消费终端 (CONSUMER)"
-])
+    "📱 消费终端 (CONSUMER)",
+)
+active_tab = st.radio("视图", TAB_LABELS, horizontal=True, key="active_tab", label_visibility="collapsed")
+
+def file_stamp(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+@st.cache_data(max_entries=64)
+def evidence_image(path, display_width, stamp):
+    """证据影像变体的字节内容; stamp (mtime, size) 变化即失效, 重跑时不再读盘"""
+    from utils.assets import pick_variant
+    with metrics.timer("greenlink_image_load_seconds", kind="evidence"):
+        with open(pick_variant(path, display_width, density=1.5), 'rb') as f:
+            return f.read()
+
+@st.cache_data(max_entries=64)
+def change_analysis(paths, stamps):
+    from utils.change_detection import analyze_images
+    return analyze_images(list(paths))
 
 # ---------- TAB 1: 风险监测 ----------
-with tab1:
+@timed_fragment("区域查看")
+def render_region_viewer(image_paths, captions, coordinates):
+    """区域查看: 经分块栅格存储只读取窗口所覆盖的切片 / 概览层"""
+    from utils.raster_store import open_scene, parse_coordinates
+    scene_idx = st.selectbox("影像", range(len(image_paths)), format_func=lambda i: captions[i], key="region_scene")
+    scene = open_scene(image_paths[scene_idx])
+    region = None
+    reason = "影像未带地理范围"
+    if scene.bounds and parse_coordinates(coordinates):
+        radius = st.slider("半径 (km)", 1, 50, 10, key="region_radius")
+        try:
+            region = scene.read_around(coordinates, radius, max_side=700)
+            region_caption = f"{coordinates} 周边 {radius} km"
+        except ValueError:
+            # 坐标落在影像地理范围之外 (空窗口), 退回像素窗口
+            reason = f"{radius} km 范围不在影像内"
+    elif scene.bounds:
+        reason = "坐标无法解析"
+    if region is None:
+        x_range = st.slider("水平范围 (%)", 0, 100, (25, 75), key="region_x")
+        y_range = st.slider("垂直范围 (%)", 0, 100, (25, 75), key="region_y")
+        x0, x1 = (scene.width * v // 100 for v in x_range)
+        y0, y1 = (scene.height * v // 100 for v in y_range)
+        region = scene.read_window(x0, y0, max(x1, x0 + 1), max(y1, y0 + 1), max_side=700)
+        region_caption = f"像素窗口 x {x0}-{x1}, y {y0}-{y1} ({reason}, 坐标 {coordinates or 'N/A'})"
+    st.image(region, caption=region_caption, use_container_width=True)
+
+@timed_fragment("事件检索")
+def render_event_search():
+    from html import escape
+    from utils.event_index import KINDS
+    from utils.schema import SEVERITY_LABELS
+
+    index = get_event_index()
+    index.update(registry)
+    facets = event_facets(registry.generation)
+
+    st.markdown("#### 🔎 全组合事件检索 (Event Search)")
+    c_query, c_kind, c_severity, c_source = st.columns([2, 1, 1, 1])
+    with c_query:
+        query = st.text_input("关键词", key="ev_query", placeholder="CBP / 强迫劳动 / 泥炭")
+    with c_kind:
+        kinds = st.multiselect("类别", list(KINDS), format_func=KINDS.get, key="ev_kinds")
+    with c_severity:
+        severities = st.multiselect("严重程度", list(range(len(SEVERITY_LABELS) - 1, -1, -1)),
+                                    format_func=lambda s: SEVERITY_LABELS[s], key="ev_severity")
+    with c_source:
+        source = st.selectbox("来源", ["全部"] + facets['sources'], key="ev_source")
+
+    year_from = year_to = None
+    year_min, year_max = facets['year_min'], facets['year_max']
+    if year_min and year_max > year_min:
+        # 数据变化后旧的年份区间可能越界, 越界时重置为全区间
+        selected = st.session_state.get('ev_years')
+        if selected and (selected[0] < year_min or selected[1] > year_max):
+            del st.session_state['ev_years']
+        years = st.slider("年份", year_min, year_max, (year_min, year_max), key="ev_years")
+        # 未收窄区间时不过滤, 保留无日期的事件
+        if years != (year_min, year_max):
+            year_from, year_to = years
+
+    start = time.perf_counter()
+    total, hits = index.search(query, year_from, year_to, severities, None if source == "全部" else source,
+                               kinds, limit=10)
+    st.caption(f"命中 {total} 条 · 显示前 {len(hits)} 条 · {(time.perf_counter() - start) * 1000:.1f} ms")
+    for hit in hits:
+        border_color = "#FF3333" if (hit['severity'] if hit['severity'] is not None else SEVERITY_MEDIUM) >= SEVERITY_HIGH else "#FFCC00"
+        source_text = f" · {escape(hit['source'])}" if hit['source'] else ""
+        st.markdown(f"""
+        <div class="tech-card" style="padding: 12px; border-left: 4px solid {border_color}; margin-bottom: 10px;">
+            <div style="display:flex; justify-content:space-between; margin-bottom:6px;">
+                <span style="color:{border_color}; font-weight:bold; font-size:0.8rem;">{escape(hit['company'])} · {hit['kind_label']} · {hit['severity_label']}</span>
+                <span style="color:#666; font-family:monospace; font-size:0.85rem;">{escape(hit['date'])}</span>
+            </div>
+            <div style="color:#FFF; font-weight:bold; margin-bottom:6px;">{escape(hit['title'])}</div>
+            <div style="color:#AAA; font-size:0.85rem;">{escape(hit['snippet'])}<span style="color:#666;">{source_text}</span></div>
+        </div>
+        """, unsafe_allow_html=True)
+
+def render_monitor():
+    from datetime import date
+    from utils.change_detection import evidence_paths, summarize
+    from utils.event_score import DEFAULT_HALF_LIFE, score_events
+
+    policy = decay_policy()
+    env_score, soc_score = effective_scores()
+    # 评分历史 (NumPy 列存储) 只在本标签页使用, 不在启动时加载; 期间的多次索引变化记为一次评分运行
+    score_history = get_score_history()
+    record_scoring_run(registry.generation, date.today())
     col_header, col_chart = st.columns([2, 1])
-    
+
     with col_header:
         st.markdown(f"""
         <div class="tech-card">
@@ -263,9 +311,8 @@ with tab1:
         """, unsafe_allow_html=True)
 
         st.markdown("##### ⚔️ 评级体系对比 (VS Traditional)")
-        trad_data = data.get('traditional_rating') or data.get('social', {}).get('traditional_rating')
-        rating_val = trad_data.get('rating', trad_data.get('msci', 'N/A')) if isinstance(trad_data, dict) else (trad_data if isinstance(trad_data, str) else 'N/A')
-            
+        rating_val = profile.traditional_rating
+
         c1, c2 = st.columns(2)
         with c1:
             st.markdown(f"""
@@ -275,7 +322,7 @@ with tab1:
                 <div style="color:#666; font-size:0.8rem;">❌ 评级模糊</div>
             </div>
             """, unsafe_allow_html=True)
-            
+
         with c2:
             st.markdown(f"""
             <div style="background:#1a1a1a; padding:15px; border-left:4px solid #00FF41; border-radius:4px;">
@@ -287,129 +334,163 @@ with tab1:
 
     with col_chart:
         st.markdown("##### 核心指标 (Core Metrics)")
-        
+
         c_metrics, c_legend = st.columns([1.2, 1])
         with c_metrics:
-            st.metric("E-Score", f"{env_score}", delta="-2.5", delta_color="inverse")
-            st.metric("S-Score", f"{soc_score}", delta="+5.1", delta_color="inverse")
+            # 历史记录的是默认政策的生效评分; 展示分数与最后一点口径不同时不显示变化量
+            env_delta, soc_delta = score_history.deltas(company_info['code'], (env_score, soc_score))
+            st.metric("E-Score", f"{env_score}", delta=f"{env_delta:+.1f}" if env_delta is not None else None, delta_color="inverse")
+            st.metric("S-Score", f"{soc_score}", delta=f"{soc_delta:+.1f}" if soc_delta is not None else None, delta_color="inverse")
         with c_legend:
-            st.markdown("""
-            <div class="score-legend-compact">
-                <div style="color: #FFF; margin-bottom: 5px; border-bottom:1px solid #333;"><strong>📏 评分标准</strong></div>
-                <div class="legend-row"><span class="color-dot" style="background:#00FF41;"></span>0-25: 优</div>
-                <div class="legend-row"><span class="color-dot" style="background:#ADFF2F;"></span>25-50: 良</div>
-                <div class="legend-row"><span class="color-dot" style="background:#FFFF00;"></span>50-75: 中</div>
-                <div class="legend-row"><span class="color-dot" style="background:#FF3333;"></span>75+: 差</div>
-            </div>
-            """, unsafe_allow_html=True)
+            st.markdown(static_fragment("score_legend.html"), unsafe_allow_html=True)
 
         st.markdown("<br>", unsafe_allow_html=True)
-        chart_data = pd.DataFrame(np.random.randn(20, 2) + [env_score/10, soc_score/10], columns=['Env', 'Soc'])
-        st.line_chart(chart_data, color=["#00FF41", "#00F2FF"], height=100)
+        # 历史评分在服务端降采样, 图表点数与历史长度无关
+        chart_data = score_history.series(company_info['code'], max_points=200)
+        if len(chart_data) >= 2:
+            st.line_chart(chart_data, color=["#00FF41", "#00F2FF"], height=100)
+        else:
+            st.caption("📈 评分历史不足两期, 下次评分运行后显示趋势")
 
     st.markdown("---")
-    
+
     col_env, col_soc = st.columns(2)
-    
+
     with col_env:
         st.markdown("#### 🌍 SATELLITE_LINK // 环境风险 (E)")
         env_analysis = data.get('environment', {}).get('analysis', {})
         st.markdown(f"""<div class="tech-card"><p><strong>分析方法:</strong> {env_analysis.get('method', 'AI遥感反演')}</p></div>""", unsafe_allow_html=True)
-        
+
         if not is_cofco:
             st.markdown("**🛰️ 历史影像对比 (Evidence):**")
             evidence = env_analysis.get('evidence', {})
-            img_before = os.path.join(BASE_DIR, evidence.get('satellite_image_before', ''))
-            img_after = os.path.join(BASE_DIR, evidence.get('satellite_image_after', ''))
-            
-            if os.path.exists(img_before) and os.path.exists(img_after):
-                c_img1, c_img2 = st.columns(2)
-                with c_img1: st.image(img_before, caption="📸 基准年 (Before)", use_container_width=True)
-                with c_img2: st.image(img_after, caption="📸 最近年 (After)", use_container_width=True)
-                st.success(f"✅ AI分析结论: {evidence.get('conclusion', '')}")
+            image_paths = evidence_paths(evidence, BASE_DIR)
+
+            if len(image_paths) >= 2:
+                captions = ["📸 基准年 (Before)", "📸 中期 (Mid)", "📸 最近年 (After)"] if len(image_paths) == 3 else ["📸 基准年 (Before)", "📸 最近年 (After)"]
+                stamps = tuple(file_stamp(p) for p in image_paths)
+                # 半宽列约 700px, 按列数选择刚好覆盖显示宽度 (1.5 倍像素密度) 的最小变体
+                display_width = 700 // len(image_paths)
+                metrics.inc("greenlink_image_requests_total", len(image_paths), kind="evidence")
+                for col, path, stamp, caption in zip(st.columns(len(image_paths)), image_paths, stamps, captions):
+                    with col: st.image(evidence_image(path, display_width, stamp), caption=caption, use_container_width=True)
+                with st.expander("🔍 区域查看 (Region Viewer)"):
+                    render_region_viewer(image_paths, captions, env_analysis.get('coordinates'))
+                change = change_analysis(tuple(image_paths), stamps)
+                st.success(f"✅ AI分析结论: {summarize(change)}")
+                overall = change['overall']
+                st.caption(f"🛰️ 变化检测 {overall['from']}→{overall['to']}: 森林损失 {overall['forest_loss_pct']:.1f}% "
+                           f"(占影像面积 {overall['forest_loss_area_pct']:.1f}%) · 分析师备注: {evidence.get('conclusion', '')}")
             else:
                 st.info("⚠️ 卫星数据加载中...")
         else:
             st.code("# COFCO Environmental Status: COMPLIANT", language="python")
-            
+
     with col_soc:
         st.markdown("#### 📢 SOCIAL_LISTENING // 舆情证据链 (S)")
-        social = data.get('social', {})
-        events = social.get('key_events', [])
-        
+        # 按时间衰减权重选出 Top-K 风险事件 (下方“评分逻辑”中可调半衰期与 K); 堆由增量评分组件维护
+        scorer = event_scorer()
+        if company_info['code'] in scorer:
+            soc_top = scorer.top_events(company_info['code'], "soc")
+        else:
+            soc_top = score_events(profile, policy)['soc_top']
+        events = [event for _, event in soc_top]
+
         if events:
-            for i, event in enumerate(events[:3]):
-                border_color = "#FF3333" if event.get('severity', '中') in ['高', '严重'] else "#FFCC00"
+            for i, event in enumerate(events):
+                border_color = "#FF3333" if (event.severity or SEVERITY_MEDIUM) >= SEVERITY_HIGH else "#FFCC00"
                 st.markdown(f"""
                 <div class="tech-card" style="padding: 15px; border-left: 4px solid {border_color}; margin-bottom: 15px;">
                     <div style="display:flex; justify-content:space-between; margin-bottom:8px;">
                         <span style="color:{border_color}; font-weight:bold; font-size:0.85rem;">RISK EVENT #{i+1}</span>
-                        <span style="color:#666; font-family:monospace; font-size:0.9rem;">{event.get('date', 'N/A')}</span>
+                        <span style="color:#666; font-family:monospace; font-size:0.9rem;">{event.date_label}</span>
                     </div>
-                    <div style="color: #FFF; font-size: 1.1rem; font-weight: bold; margin-bottom: 12px; line-height: 1.4;">{event.get('event', '')}</div>
+                    <div style="color: #FFF; font-size: 1.1rem; font-weight: bold; margin-bottom: 12px; line-height: 1.4;">{event.title}</div>
                     <div style="background:rgba(255,255,255,0.05); padding:10px; border-radius:4px; margin-bottom:10px; border:1px dashed #333;">
                         <div style="color:#00FF41; font-size:0.8rem; margin-bottom:4px;">🤖 AI 智能解说 (ANALYSIS):</div>
-                        <div style="color:#CCC; font-size:0.95rem;">{event.get('impact', 'AI识别到潜在风险，建议复核。')}</div>
+                        <div style="color:#CCC; font-size:0.95rem;">{event.description or '；'.join(event.details) or 'AI识别到潜在风险，建议复核。'}</div>
                     </div>
                     <div style="text-align:right;"><a href="#" class="source-link-btn">📂 原文下载 (DOC_{202400+i}.PDF)</a></div>
                 </div>
                 """, unsafe_allow_html=True)
-            st.success("✅ 证据链完整度: 100% (3/3 Verified)")
-
-            st.markdown("---")
-            with st.expander("💡 为什么只显示这 3 个事件？(AI Scoring Logic)", expanded=False):
-                st.markdown("""
-                <div style="font-size: 0.95rem;">
-                    <p><strong>1. 关键风险归因 (Pareto Principle):</strong><br>
-                    在 ESG 风险评估中，少数<strong>重大合规事件</strong>（如美国 CBP 暂扣令、欧盟反毁林调查）往往对企业信用具有<strong>"一票否决权"</strong>。系统筛选出这 Top 3 关键事件，解释了当前高风险评分 80% 的来源。</p>
-                    <p><strong>2. 时间窗口与活跃度 (Time Window):</strong><br>
-                    AI 模型优先展示<strong>"当前活跃 (Active)"</strong>或<strong>"未决 (Pending)"</strong>的风险事件。已解决的历史旧闻权重会随时间衰减。</p>
-                </div>
-                """, unsafe_allow_html=True)
+            st.success(f"✅ 证据链完整度: 100% ({len(events)}/{len(events)} Verified)")
+            st.caption(f"⏳ E/S 为事件衰减评分 (半衰期 {policy.half_life:g} 年, 没有事件的章节取 JSON 评分) · "
+                       f"JSON 评分 E {company_info['env_score']} · S {company_info['soc_score']}")
         else:
             st.write("暂无重大风险事件")
 
+        st.markdown("---")
+        with st.expander(f"💡 为什么只显示这 {policy.top_k} 个事件？(AI Scoring Logic)", expanded=False):
+            st.markdown(static_fragment("scoring_logic.html"), unsafe_allow_html=True)
+            c_half, c_k = st.columns(2)
+            with c_half:
+                st.slider("半衰期 (年)", 0.5, 10.0, DEFAULT_HALF_LIFE, step=0.5, key="decay_half_life")
+            with c_k:
+                st.slider("展示事件数 (Top-K)", 1, 10, 3, key="decay_top_k")
+
+    st.markdown("---")
+    render_event_search()
+
 # ---------- TAB 2: 链式穿透 ----------
-with tab2:
+def risk_color(risk):
+    return "#FF3333" if risk >= 60 else ("#FFCC00" if risk >= 40 else "#00FF41")
+
+def chain_html(graph, path, focus_role):
+    """把一条传导路径渲染为链式方框"""
+    focus = graph.node_id(company_info['code'])
+    focus_pos = path.index(focus) if focus in path else -1
+    boxes = []
+    for pos, node in enumerate(path):
+        info = graph.node_info(node)
+        color = risk_color(info['propagated_risk'])
+        role = focus_role if pos == focus_pos else ("上游" if pos < focus_pos else "下游")
+        boxes.append(f'<div style="flex:1;" class="chain-box"><div style="border: 2px solid {color}; color: {color}; padding: 10px; border-radius: 5px;">{info["name"]}<br><small>{role} · 传导风险 {info["propagated_risk"]:.0f}</small></div></div>')
+    return f"""
+        <div style="display: flex; justify-content: space-around; align-items: stretch; background: #0F0F0F; padding: 20px; border-radius: 10px; border: 1px dashed #333; margin-bottom: 20px;">
+            {'<div class="arrow">➜</div>'.join(boxes)}
+        </div>
+        """
+
+def render_chain_paths(supply_graph, focus_role):
+    paths = supply_graph.paths_through(company_info['code']) if company_info['code'] in registry else []
+    if not paths:
+        st.caption("暂无供应链关系数据")
+        return
+    st.markdown(chain_html(supply_graph, paths[0], focus_role), unsafe_allow_html=True)
+    if len(paths) > 1:
+        with st.expander(f"更多传导路径 ({len(paths) - 1})", expanded=False):
+            for path in paths[1:]:
+                st.markdown(" ➜ ".join(supply_graph.nodes[n] for n in path))
+
+def render_chain():
+    from utils.report_cache import cached_pdf_report
+    from utils.scoring import effective_profile
+
+    supply_graph = get_supply_graph()
     st.header("🔗 供应链风险传导网络")
-    
+
     if is_cofco:
         st.info("💡 核心企业视角: 监控上游风险如何传导至自身及市场")
-        st.markdown("""
-        <div style="display: flex; justify-content: space-around; align-items: stretch; background: #0F0F0F; padding: 20px; border-radius: 10px; border: 1px dashed #333; margin-bottom: 20px;">
-            <div style="flex:1;" class="chain-box"><div style="border: 2px solid #FF3333; color: #FF3333; padding: 10px; border-radius: 5px;">FGV Holdings<br><small>上游/高风险</small></div></div>
-            <div class="arrow">➜</div>
-            <div style="flex:1;" class="chain-box"><div style="border: 2px solid #FFCC00; color: #FFCC00; padding: 10px; border-radius: 5px;">中粮集团<br><small>核心企业</small></div></div>
-            <div class="arrow">➜</div>
-            <div style="flex:1;" class="chain-box"><div style="border: 2px solid #00F2FF; color: #00F2FF; padding: 10px; border-radius: 5px;">欧美市场<br><small>合规壁垒</small></div></div>
-        </div>
-        """, unsafe_allow_html=True)
-        
+        render_chain_paths(supply_graph, "核心企业")
+
         col1, col2 = st.columns(2)
         with col1:
             st.markdown("### 🚨 上游风险源")
-            suppliers = data.get('supply_chain', {}).get('upstream', {}).get('suppliers', [])
-            for s in suppliers:
-                is_high = "高" in s.get('risk_status', '') or "75" in s.get('risk_status', '')
+            # 上游节点与风险来自传导图, 不再对 risk_status 文本做子串匹配
+            for node in sorted(supply_graph.upstream(company_info['code']), key=lambda n: -supply_graph.propagated[n]):
+                info = supply_graph.node_info(node)
+                is_high = info['propagated_risk'] >= 60
                 status_html = f'<span style="color: #FF3333;">[高风险]</span>' if is_high else f'<span style="color: #00FF41;">[低风险]</span>'
-                st.markdown(f"""<div class="tech-card" style="padding: 12px; margin-bottom: 10px;"><div style="font-size: 1rem; font-weight: bold;">{s['name']}</div><div style="font-size: 0.9rem; margin-top:5px;">状态: {status_html} {s.get('risk_status','')}</div></div>""", unsafe_allow_html=True)
+                st.markdown(f"""<div class="tech-card" style="padding: 12px; margin-bottom: 10px;"><div style="font-size: 1rem; font-weight: bold;">{info['name']}</div><div style="font-size: 0.9rem; margin-top:5px;">状态: {status_html} 传导风险 {info['propagated_risk']:.0f}</div></div>""", unsafe_allow_html=True)
         with col2:
             st.markdown("### 🛡️ 阻断策略建议")
             st.markdown("""<div class="tech-card"><ul style="margin: 0; padding-left: 20px; color: #DDD;"><li style="margin-bottom: 10px;"><strong>动态调整:</strong> 立即降低 FGV 采购份额至 10% 以下。</li><li style="margin-bottom: 10px;"><strong>替代方案:</strong> 激活 IOI Corporation (低风险) 备选通道。</li><li><strong>物理隔离:</strong> 针对美国 CBP 要求，建立独立仓储。</li></ul></div>""", unsafe_allow_html=True)
-            
+
     else:
         st.info(f"💡 供应商视角: 您的 ESG 风险如何导致下游客户流失")
-        my_risk_color = "#FF3333" if total_score > 50 else "#00FF41"
-        st.markdown(f"""
-        <div style="display: flex; justify-content: space-around; align-items: stretch; background: #0F0F0F; padding: 20px; border-radius: 10px; border: 1px dashed #333; margin-bottom: 20px;">
-            <div style="flex:1;" class="chain-box"><div style="border: 2px solid {my_risk_color}; color: {my_risk_color}; padding: 10px; border-radius: 5px;">{data.get('company')}<br><small>您 (供应商)</small></div></div>
-            <div class="arrow">➜</div>
-            <div style="flex:1;" class="chain-box"><div style="border: 2px solid #FFCC00; color: #FFCC00; padding: 10px; border-radius: 5px;">核心加工商<br><small>采购方</small></div></div>
-            <div class="arrow">➜</div>
-            <div style="flex:1;" class="chain-box"><div style="border: 2px solid #FF0000; color: #FF0000; padding: 10px; border-radius: 5px; background: rgba(255,0,0,0.1);">市场禁入<br><small>CBP/EUDR 拦截</small></div></div>
-        </div>
-        """, unsafe_allow_html=True)
-        
+        render_chain_paths(supply_graph, "您 (供应商)")
+        _, soc_score = effective_scores()
+
         c1, c2 = st.columns(2)
         with c1:
             st.markdown("### 📉 商业影响预测")
@@ -418,32 +499,73 @@ with tab2:
             st.markdown("### ✅ 整改建议 (To-Do)")
             st.markdown("""<div class="tech-card" style="border-left-color: #00FF41;"><ul style="margin: 0; padding-left: 20px; color: #DDD;"><li style="margin-bottom: 10px;"><strong>立即行动:</strong> 提交针对 CBP WRO 的第三方审计报告。</li><li><strong>透明度:</strong> 上传劳工合规证明。</li></ul></div>""", unsafe_allow_html=True)
 
+    st.markdown("---")
+    # 报告按需生成: 计算缓存键要加载全部章节, 因此点击后才读取并渲染;
+    # 报告按数据内容哈希缓存, 数据未变化时直接返回已渲染的 PDF
+    if st.button("📄 生成 ESG 合规报告 (PDF)"):
+        st.session_state.report_code = company_info['code']
+    if st.session_state.get('report_code') == company_info['code']:
+        with st.spinner("正在生成报告..."):
+            report = cached_pdf_report(data, effective_profile(profile, event_scorer())).getvalue()
+        st.download_button("📥 下载 ESG 合规报告", report,
+                           file_name=f"{company_info['code']}_ESG_Report.pdf", mime="application/pdf")
+
 # ---------- TAB 3: 绿色金融 ----------
-with tab3:
-    st.markdown("## 💰 绿色金融与风险定价")
+@st.cache_data(max_entries=8)
+def scf_book(generation, as_of, policy_key):
+    """
+    授信台账按 (索引版本, 评估日期, 政策) 取一次 (自身行取生效 S 分, 随日期衰减):
+    相同内容复用 .cache/scf/ 中已写出的文件, 界面只按页读取
+    """
+    from utils.scf_credit import CreditPolicy, registry_book
+    low, high, multipliers, base_credit, default_score = policy_key
+    return registry_book(registry, CreditPolicy(low, high, multipliers, base_credit, default_score))
+
+@st.cache_data(max_entries=32)
+def scf_page(path, page, page_size):
+    from utils.scf_credit import read_page
+    return read_page(path, page, page_size)
+
+@st.cache_data(max_entries=16)
+def portfolio_csv(generation, policy_key, as_of, loan_amount, _scorer):
+    """
+    组合评分导出: 生效评分 (事件衰减, 缺失时取索引中的 JSON 评分), 一次向量化计算全部公司;
+    _scorer 不参与缓存键, 由 (索引版本, 政策, 评估日期) 代表其状态
+    """
+    from utils.scoring import effective_scores, portfolio_frame
+    portfolio_codes, portfolio_env, portfolio_soc = effective_scores(registry, scorer=_scorer)
+    portfolio_df = portfolio_frame(portfolio_codes, portfolio_env.astype(int), portfolio_soc.astype(int), loan_amount)
+    return portfolio_df.to_csv(index=False).encode('utf-8-sig')
+
+@timed_fragment("贷款测算")
+def render_loan_panel(env_score, soc_score, company_scores, profile, supply_chain):
+    """贷款金额与评级按钮只重跑本区块, 不重建其他标签页、供应链表与报告"""
+    from utils.loss_sim import REVENUE_MULTIPLE, company_loss
+    from utils.scoring import BASE_RATE, score_company
     fin_col1, fin_col2 = st.columns([1, 1])
-    
+
     with fin_col1:
         st.markdown("### 🏦 ESG 挂钩贷款模拟")
         st.markdown("""<div class="tech-card" style="border-left-color: #00F2FF;"><strong>算法逻辑:</strong> 基于企业的实时 ESG 评分，计算可获得的绿色贷款利率优惠 (Basis Points)。</div>""", unsafe_allow_html=True)
-        
+
         loan_amount = st.number_input("贷款金额 (万元)", min_value=100, value=5000, step=100)
-        
+
         # 按钮 (Session State 状态保持)
         if 'show_loan_result' not in st.session_state:
             st.session_state.show_loan_result = False
-        
+
         if st.button("🚀 开始 AI 评级测算 (START RATING)", type="primary", use_container_width=True):
             st.session_state.show_loan_result = True
-            
+
         if st.session_state.show_loan_result:
-            base_rate = 4.35
-            discount_bp = 50 if total_score <= 30 else (20 if total_score <= 50 else 0)
-            rating_color = "#00FF41" if total_score <= 30 else ("#ADFF2F" if total_score <= 50 else "#FFA500")
-            rating_label = "🌿 深绿企业" if total_score <= 30 else ("🍃 浅绿企业" if total_score <= 50 else "🍂 棕色企业")
-            final_rate = base_rate - (discount_bp / 100)
-            annual_saving = loan_amount * (discount_bp / 10000)
-            
+            base_rate = BASE_RATE
+            pricing = score_company(env_score, soc_score, loan_amount, base_rate)
+            discount_bp = pricing['discount_bp']
+            rating_color = pricing['rating_color']
+            rating_label = pricing['rating_label']
+            final_rate = pricing['final_rate']
+            annual_saving = pricing['annual_saving']
+
             st.markdown("---")
             st.markdown(f'<div style="font-size: 1.1rem; font-weight: bold; color: {rating_color}; margin: 10px 0;">评级结果: {rating_label}</div>', unsafe_allow_html=True)
             c1, c2, c3 = st.columns(3)
@@ -453,44 +575,122 @@ with tab3:
             st.markdown(f"""<div style="background: #111; border: 1px solid #00FF41; padding: 15px; border-radius: 6px; text-align: center; margin-top: 15px;"><span style="color: #888; font-size: 0.9rem;">预计年利息节省</span><br><span style="font-size: 1.8rem; color: #00FF41; font-weight: bold; font-family: monospace;">¥ {annual_saving:,.0f}</span></div>""", unsafe_allow_html=True)
         else:
             st.info("💡 请输入贷款金额，点击上方按钮开始测算")
-        
+
+        scorer = event_scorer()
+        st.download_button("📥 导出组合评分 (CSV)", portfolio_csv(registry.generation, scorer.policy.key(), scorer.as_of, loan_amount, scorer),
+                           file_name="greenlink_portfolio_scores.csv", mime="text/csv")
+
     with fin_col2:
         st.markdown("### 📉 财务风险量化")
-        if total_score > 60:
-            potential_loss = loan_amount * 0.15 
+        # 蒙特卡洛模拟年度损失分布; 同一情景 (公司输入 + 贷款额 + 路径数) 的结果在进程内缓存
+        n_paths = st.select_slider("模拟路径数", (10_000, 100_000, 200_000, 1_000_000), value=200_000, key="mc_paths")
+        loss = company_loss(profile, supply_chain, loan_amount, n_paths)
+        eudr, cbp, churn = loss['components'].values()
+        if company_scores['high_exposure']:
+            revenue = loan_amount * REVENUE_MULTIPLE
             st.error("⚠️ 风险敞口极高 (High Exposure)")
-            st.markdown("""<div class="tech-card" style="border-left-color: #FF3333;"><p style="color: #FF3333 !important;"><strong>主要风险源:</strong></p><ul style="color: #DDD;"><li>🇪🇺 <strong>欧盟 EUDR 罚款:</strong> 营收的 4%</li><li>🇺🇸 <strong>货物滞留成本:</strong> 约 200 万 USD</li></ul></div>""", unsafe_allow_html=True)
-            st.metric("潜在财务损失预估", f"¥ {potential_loss/10000:,.1f} 亿", delta="-15% 营收", delta_color="inverse")
+            st.markdown(f"""<div class="tech-card" style="border-left-color: #FF3333;"><p style="color: #FF3333 !important;"><strong>主要风险源 (年度期望损失):</strong></p><ul style="color: #DDD;"><li>🇪🇺 <strong>欧盟 EUDR 罚款:</strong> 营收的至多 4% · ¥ {eudr:,.0f} 万</li><li>🇺🇸 <strong>货物滞留成本:</strong> 单次约 200 万 USD · ¥ {cbp:,.0f} 万</li><li>🤝 <strong>客户流失:</strong> ¥ {churn:,.0f} 万</li></ul></div>""", unsafe_allow_html=True)
+            st.metric("潜在财务损失预估 (CVaR 95%)", f"¥ {loss['cvar']/10000:,.2f} 亿",
+                      delta=f"-{loss['cvar'] / revenue:.1%} 营收", delta_color="inverse")
         else:
             st.success("✅ 财务风险可控")
             st.metric("绿色溢价 (Greenium)", "+ 2.5%", "融资成本优势")
+        l1, l2, l3 = st.columns(3)
+        l1.metric("期望损失 (万)", f"{loss['mean']:,.0f}")
+        l2.metric("VaR 95% (万)", f"{loss['var']:,.0f}")
+        l3.metric("CVaR 95% (万)", f"{loss['cvar']:,.0f}")
+        st.caption(f"{loss['paths']:,} 条模拟路径 · " + ("缓存命中" if loss['cached'] else f"{loss['seconds'] * 1000:.0f} ms")
+                   + f" · EUDR {eudr:,.0f} / CBP {cbp:,.0f} / 客户流失 {churn:,.0f} 万")
+
+@timed_fragment("授信模型")
+def render_credit_book():
+    """供应链金融授信: 政策参数与翻页只重跑本区块; 台账按页读取, 不渲染整张表"""
+    from datetime import date
+    from utils.scf_credit import BAND_NAMES, CreditPolicy
 
-    st.markdown("---")
     st.subheader("⛓️ 供应链金融授信模型")
-    scf_df = pd.DataFrame({"供应商": ["FGV", "IOI", "Sime Darby", "Wilmar"], "ESG 风险分": [75, 25, 30, 40], "基础授信(万)": [1000, 1000, 1000, 1000]})
-    scf_df["调整系数"] = scf_df["ESG 风险分"].apply(lambda x: 0.5 if x > 60 else (1.2 if x < 30 else 1.0))
-    scf_df["动态授信(万)"] = (scf_df["基础授信(万)"] * scf_df["调整系数"]).astype(int)
-    st.dataframe(scf_df, use_container_width=True, hide_index=True)
+    with st.expander("⚙️ 授信政策 (Credit Policy)"):
+        p1, p2, p3 = st.columns(3)
+        low, high = p1.slider("一般档区间 (ESG 风险分)", 0, 100, (30, 60), key="scf_bands")
+        base_credit = p2.number_input("缺省基础授信 (万)", min_value=0, value=1000, step=100, key="scf_base")
+        default_score = p3.number_input("缺失风险分取值", min_value=0, max_value=100, value=50, key="scf_default")
+        m1, m2, m3 = st.columns(3)
+        multipliers = (m1.number_input("优质档系数", 0.0, 3.0, 1.2, 0.05, key="scf_m0"),
+                       m2.number_input("一般档系数", 0.0, 3.0, 1.0, 0.05, key="scf_m1"),
+                       m3.number_input("高风险档系数", 0.0, 3.0, 0.5, 0.05, key="scf_m2"))
+    policy = CreditPolicy(low, high, multipliers, base_credit, default_score)
+    book = scf_book(registry.generation, date.today(), policy.key())
+    if not os.path.exists(book['path']):
+        # 台账文件已被 .cache/scf/ 的淘汰删除 (其他政策挤出), 让缓存重新生成
+        scf_book.clear()
+        book = scf_book(registry.generation, date.today(), policy.key())
+
+    s1, s2, s3 = st.columns(3)
+    s1.metric("授信对象", f"{book['rows']:,}")
+    s2.metric("基础授信合计 (万)", f"{book['base_total']:,.0f}")
+    s3.metric("动态授信合计 (万)", f"{book['credit_total']:,}",
+              delta=f"{book['credit_total'] - book['base_total']:,.0f}")
+    st.caption(" · ".join(f"{name} {rows:,} 家 / {credit:,} 万"
+                          for name, rows, credit in zip(BAND_NAMES, book['band_rows'], book['band_credit'])))
+
+    n1, n2 = st.columns([1, 3])
+    page_size = n1.selectbox("每页行数", (25, 50, 100, 500), key="scf_page_size")
+    pages = max(1, -(-book['rows'] // page_size))
+    if st.session_state.get("scf_page", 1) > pages:
+        st.session_state.scf_page = pages     # 每页行数变大或台账变小后, 页码落回最后一页
+    page = n2.number_input(f"页码 (共 {pages} 页)", min_value=1, max_value=pages, key="scf_page")
+    st.dataframe(scf_page(book['path'], page - 1, page_size), use_container_width=True, hide_index=True)
+
+@timed_fragment("组合报告")
+def render_portfolio_reports():
+    import tempfile
+    from utils.pdf_stream import write_portfolio_pdf, registry_items
+    from utils.portfolio_report import portfolio_report_bytes
+
+    portfolio_codes = registry.codes()
+
+    # 组合合并报告: 逐家渲染并流式写入临时文件, 内存占用与公司数量无关
+    if st.button("📚 生成组合合并报告 (PDF)"):
+        report_progress = st.progress(0.0, text="正在生成合并报告...")
+        with tempfile.TemporaryFile() as report_file:
+            write_portfolio_pdf(registry_items(registry, portfolio_codes), report_file, total=len(portfolio_codes),
+                                on_progress=lambda done, total, pages, size: report_progress.progress(
+                                    done / total, text=f"{done}/{total} 家公司 · {pages} 页 · {size / 1e6:.1f} MB"))
+            report_file.seek(0)
+            # download_button 需要完整字节; 生成过程本身不在内存中累积文档
+            st.download_button("📥 下载合并报告", report_file.read(), file_name="greenlink_portfolio_report.pdf",
+                               mime="application/pdf")
+
+    # 组合风险报告: 两遍排版, 含目录、风险排名表与页码交叉引用
+    if st.button("📑 生成组合风险报告 (目录 + 排名)"):
+        with st.spinner("正在排版组合风险报告..."):
+            risk_report = portfolio_report_bytes(registry, portfolio_codes, get_supply_graph())
+        st.download_button("📥 下载组合风险报告", risk_report, file_name="greenlink_portfolio_risk_report.pdf",
+                           mime="application/pdf")
+
+def render_finance():
+    from utils.scoring import effective_profile, score_company
+
+    st.markdown("## 💰 绿色金融与风险定价")
+    env_score, soc_score = effective_scores()
+    # 损失模拟的驱动 (EUDR / CBP / 客户流失概率) 与定价使用同一组生效 E/S
+    render_loan_panel(env_score, soc_score, score_company(env_score, soc_score),
+                      effective_profile(profile, event_scorer()), data.get('supply_chain'))
+
+    st.markdown("---")
+    render_credit_book()
+
+    render_portfolio_reports()
 
 # ---------- TAB 4: 消费终端 ----------
-with tab4:
+def render_consumer():
     st.markdown("### 📱 产品数字孪生与信任溯源 (B2C)")
     col1, col2 = st.columns([1, 2])
     with col1:
         st.markdown(f"""<div style="background: #FFF; padding: 15px; border-radius: 10px; display: inline-block;"><img src="https://api.qrserver.com/v1/create-qr-code/?size=250x250&data=https://xikai0906.github.io/green-link-demo/" width="100%" /></div>""", unsafe_allow_html=True)
         st.markdown('<p style="text-align:center; margin-top:10px; color:#00F2FF;">SCAN TO VERIFY</p>', unsafe_allow_html=True)
     with col2:
-        st.markdown("""
-        <div class="product-trace-card">
-            <h2 style="color: #FFF; margin-bottom: 20px;">🌿 福临门食用油 <span style="font-size:0.6em; color:#00FF41; border:1px solid #00FF41; padding:2px 8px; border-radius:4px;">VERIFIED</span></h2>
-            <div style="display: flex; justify-content: space-between; text-align: left; margin-bottom: 20px;">
-                <div style="width: 30%;"><div style="color: #888; font-size: 0.8rem;">CARBON FOOTPRINT</div><div style="color: #00F2FF; font-size: 1.2rem; font-weight: bold;">1.2kg</div><div style="color: #555; font-size: 0.7rem;">CO2e / Bottle</div></div>
-                <div style="width: 30%;"><div style="color: #888; font-size: 0.8rem;">ORIGIN</div><div style="color: #00F2FF; font-size: 1.2rem; font-weight: bold;">Johor, MY</div><div style="color: #555; font-size: 0.7rem;">Satellite Checked</div></div>
-                <div style="width: 30%;"><div style="color: #888; font-size: 0.8rem;">LABOR</div><div style="color: #00F2FF; font-size: 1.2rem; font-weight: bold;">ILO Compliant</div><div style="color: #555; font-size: 0.7rem;">Audit Passed</div></div>
-            </div>
-            <div style="background: rgba(0, 255, 65, 0.1); border: 1px dashed #00FF41; padding: 10px; border-radius: 8px;"><p style="color: #00FF41; margin: 0; font-size: 0.9rem;">✅ <strong>区块链存证哈希:</strong> 0x7f83...9a2b<br>该产品供应链全链路符合 GreenLink 可持续发展标准</p></div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(static_fragment("product_trace.html"), unsafe_allow_html=True)
 
     st.markdown("---")
     with st.expander("📜 底层合规协议与国际标准 (COMPLIANCE PROTOCOLS)", expanded=True):
@@ -499,5 +699,27 @@ with tab4:
         with c2: st.markdown("""<div class="protocol-box"><div class="protocol-title">EUDR (零毁林)</div><div style="color:#BBB; font-size:0.85rem;">• <strong>红线:</strong> 2020年后无毁林<br>• <strong>验证:</strong> Sentinel-2 卫星</div></div>""", unsafe_allow_html=True)
         with c3: st.markdown("""<div class="protocol-box"><div class="protocol-title">ILO (劳工公约)</div><div style="color:#BBB; font-size:0.85rem;">• <strong>重点:</strong> 规避美国 CBP 禁令<br>• <strong>审计:</strong> SA8000 认证</div></div>""", unsafe_allow_html=True)
 
+TAB_RENDERERS = dict(zip(TAB_LABELS, (render_monitor, render_chain, render_finance, render_consumer)))
+
+with timed_section(active_tab):
+    TAB_RENDERERS[active_tab]()
+record_timing("整页", script_start)
+
+if st.session_state.get('show_timings'):
+    with st.sidebar.expander("⏱️ 分段耗时 (Section Timing)", expanded=True):
+        st.dataframe([{"区块": name, "耗时 (ms)": round(ms, 1), "执行次数": runs}
+                      for name, (ms, runs) in st.session_state.section_timings.items()],
+                     use_container_width=True, hide_index=True)
+        st.caption("控件交互只重跑所在区块 (st.fragment), 整页计数不变")
+
+# 运行指标: GREENLINK_METRICS=1 时每次运行后刷新 .cache/metrics.prom (至多每 5 秒一次);
+# 管理员面板通过 ?admin=1 打开
+if metrics.enabled():
+    metrics.write_textfile(min_interval=5.0)
+    if st.query_params.get("admin"):
+        with st.sidebar.expander("📈 运行指标 (Metrics)", expanded=False):
+            st.dataframe(metrics.summary(), use_container_width=True, hide_index=True)
+            st.download_button("下载 metrics.prom", metrics.render(), file_name="metrics.prom", mime="text/plain")
+
 st.sidebar.markdown("---")
 st.sidebar.markdown("""<div style="font-size: 0.8rem; color: #666;">POWERED BY <strong style="color: #FFF;">GREENLINK TECH</strong><br>v3.6.0 (Dual-Lock Fix)</div>""", unsafe_allow_html=True)
@@ -0,0 +1,146 @@
+"""
+HTTP 接口压测 (API load test)
+对本地 utils.api 实例发起并发 keep-alive 请求, 统计吞吐、延迟分位数与状态码:
+    python -m benchmarks.api_load                              # 自动启动本地实例 (随机端口)
+    python -m benchmarks.api_load --url http://127.0.0.1:8601 -c 64 -d 20
+    python -m benchmarks.api_load --revalidate                 # 携带 If-None-Match, 测 304 路径
+每个连接循环请求 --paths 中的路径; PDF 路径默认不参与, 可通过 --paths 显式加入
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATHS = ["/companies", "/scores", "/scores/FGV", "/pricing/IOI?loan=1000", "/supply-chain/COFCO"]
+
+
+# --- 1. 最小 HTTP/1.1 客户端 ---
+
+async def _read_response(reader):
+    """返回 (状态码, 响应头, 响应体); 支持 Content-Length 与分块编码"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("连接被关闭")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding') == 'chunked':
+        body = bytearray()
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            if size == 0:
+                await reader.readline()
+                break
+            body += await reader.readexactly(size)
+            await reader.readline()
+        return status, headers, bytes(body)
+    return status, headers, await reader.readexactly(int(headers.get('content-length', 0)))
+
+
+async def worker(host, port, paths, deadline, revalidate, latencies, statuses, offset):
+    reader, writer = await asyncio.open_connection(host, port)
+    etags = {}
+    i = offset
+    try:
+        while time.perf_counter() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            lines = [f"GET {path} HTTP/1.1", f"Host: {host}:{port}"]
+            if revalidate and path in etags:
+                lines.append(f"If-None-Match: {etags[path]}")
+            start = time.perf_counter()
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+            status, headers, _ = await _read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+            if 'etag' in headers:
+                etags[path] = headers['etag']
+    finally:
+        writer.close()
+
+
+async def run(host, port, paths, connections, duration, revalidate):
+    latencies = []
+    statuses = Counter()
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(host, port, paths, deadline, revalidate, latencies, statuses, n)
+                           for n in range(connections)))
+    return latencies, statuses, time.perf_counter() - start
+
+
+# --- 2. 本地实例 ---
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_local(port, workers):
+    """在子进程中启动 utils.api, 等待 /health 可用"""
+    process = subprocess.Popen([sys.executable, "-m", "utils.api", "--port", str(port), "-j", str(workers)],
+                               cwd=BASE_DIR, stdout=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError("utils.api 启动失败")
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("utils.api 启动超时")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GreenLink HTTP 接口压测")
+    parser.add_argument('--url', help="已运行实例的地址 (默认自动启动本地实例)")
+    parser.add_argument('-c', '--connections', type=int, default=32, help="并发 keep-alive 连接数")
+    parser.add_argument('-d', '--duration', type=float, default=10.0, help="持续时间 (秒)")
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+    parser.add_argument('--revalidate', action='store_true', help="携带上次响应的 ETag (If-None-Match)")
+    parser.add_argument('-j', '--workers', type=int, default=4, help="本地实例的线程池大小")
+    args = parser.parse_args(argv)
+
+    process = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = "127.0.0.1", _free_port()
+        process = start_local(port, args.workers)
+    try:
+        # 预热: 构建供应链图、填充响应缓存
+        asyncio.run(run(host, port, args.paths, 1, 0.5, False))
+        latencies, statuses, elapsed = asyncio.run(
+            run(host, port, args.paths, args.connections, args.duration, args.revalidate))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    ms = np.asarray(latencies) * 1000
+    print(f"{len(ms)} 请求, {args.connections} 连接, {elapsed:.1f} s -> {len(ms) / elapsed:,.0f} 请求/秒")
+    print(f"延迟 (ms): p50 {np.percentile(ms, 50):.2f} | p95 {np.percentile(ms, 95):.2f} | "
+          f"p99 {np.percentile(ms, 99):.2f} | max {ms.max():.2f}")
+    print("状态码: " + ", ".join(f"{code}×{count}" for code, count in sorted(statuses.items())))
+    return 0 if all(code < 400 for code in statuses) else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,120 @@
+"""
+冷启动导入剖析 (Import-time profile)
+以 python -X importtime 在全新进程中导入 app.py 模块级的全部 import, 汇总启动导入耗时:
+    python -m benchmarks.import_time                    # 总耗时 + 耗时最多的顶层包
+    python -m benchmarks.import_time --json             # 机器可读结果
+    python -m benchmarks.import_time --check            # 对照 benchmarks/import_budget.json, 回归时退出码为 1
+各标签页专用的重依赖 (numpy / pandas / PIL / reportlab) 应在渲染函数内导入; --check 发现它们
+出现在启动导入中, 或总耗时超出预算, 即判定为回归。streamlit 自身默认不计入 (--with-streamlit 计入)
+"""
+
+import argparse
+import ast
+import json
+import os
+import re
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(BASE_DIR, 'app.py')
+BUDGET_PATH = os.path.join(BASE_DIR, 'benchmarks', 'import_budget.json')
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def startup_imports(app_path=APP_PATH):
+    """app.py 模块级 (不含函数体内) 导入的模块名, 按出现顺序去重"""
+    with open(app_path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=app_path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module]
+        else:
+            continue
+        modules.extend(n for n in names if n not in modules)
+    return modules
+
+
+def profile_once(modules):
+    """在子进程中导入 modules, 返回 [(自身微秒, 累计微秒, 深度, 模块名)]"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {', '.join(modules)}"],
+                            cwd=BASE_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((int(self_us), int(cumulative_us), len(indent) // 2, name))
+    return rows
+
+
+def profile(modules, repeat=3):
+    """重复 repeat 次取总耗时最小的一次 (排除磁盘缓存等噪声), 汇总为 dict"""
+    best = min((profile_once(modules) for _ in range(repeat)),
+               key=lambda rows: sum(r[1] for r in rows if r[2] == 0))
+    packages = {}
+    for self_us, _, _, name in best:
+        top = name.split('.')[0]
+        packages[top] = packages.get(top, 0) + self_us
+    return {
+        "modules": modules,
+        "total_ms": round(sum(r[1] for r in best if r[2] == 0) / 1000, 2),
+        "module_count": len(best),
+        "packages": {name: round(us / 1000, 2) for name, us in sorted(packages.items(), key=lambda kv: -kv[1])},
+    }
+
+
+def check(report, budget):
+    """返回违反预算的说明列表 (为空即通过)"""
+    failures = []
+    loaded = set(report['packages'])
+    for name in budget.get('forbidden', []):
+        if name in loaded:
+            failures.append(f"启动时导入了 {name} ({report['packages'][name]:.1f} ms), 应移入使用它的渲染函数")
+    if report['total_ms'] > budget['max_total_ms']:
+        failures.append(f"启动导入耗时 {report['total_ms']:.1f} ms 超出预算 {budget['max_total_ms']} ms")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GreenLink 冷启动导入剖析")
+    parser.add_argument('--app', default=APP_PATH)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--with-streamlit', action='store_true', help="计入 streamlit 自身的导入")
+    parser.add_argument('--json', action='store_true', help="输出 JSON")
+    parser.add_argument('--check', action='store_true', help="对照预算文件检查回归")
+    parser.add_argument('--budget', default=BUDGET_PATH)
+    args = parser.parse_args(argv)
+
+    modules = [m for m in startup_imports(args.app)
+               if args.with_streamlit or m.split('.')[0] != 'streamlit']
+    report = profile(modules, args.repeat)
+
+    failures = []
+    if args.check:
+        with open(args.budget, 'r', encoding='utf-8') as f:
+            failures = check(report, json.load(f))
+        report['failures'] = failures
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"启动导入 {len(modules)} 个模块 -> 共加载 {report['module_count']} 个, 累计 {report['total_ms']:.1f} ms")
+        for name, ms in list(report['packages'].items())[:args.top]:
+            print(f"  {ms:8.1f} ms  {name}")
+        for failure in failures:
+            print(f"❌ {failure}")
+        if args.check and not failures:
+            print("✅ 启动导入未超出预算")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,389 @@
+"""
+热路径基准套件 (Hot-path benchmark suite)
+在合成组合上计时 load_data / 评分 / scf 授信引擎 / 损失模拟 / 事件检索 / 事件衰减评分 / 静态站点构建 / 供应链遍历 / generate_pdf_report / draw_wrapped_text,
+结果输出为 JSON, 可与其他提交的结果对比:
+    python -m benchmarks.suite --scale 1k -o bench_1k.json
+    python -m benchmarks.suite --scale 1k --compare bench_1k.json        # 任一项变慢超过阈值时退出码为 1
+    python -m benchmarks.suite --scale 100k --only scoring,scf_model --data-dir /tmp/portfolio_100k
+--scale 取 10 / 1k / 100k 或任意公司数; --data-dir 已存在时直接复用其中的合成数据
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+from benchmarks.synthetic import _parse_range, write_portfolio
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCALES = {"10": 10, "1k": 1000, "100k": 100000}
+
+
+def parse_scale(text):
+    if text in SCALES:
+        return SCALES[text]
+    return int(float(text[:-1]) * 1000) if text.lower().endswith('k') else int(text)
+
+
+def measure(fn, repeat):
+    """运行 fn repeat 次, 返回每次耗时 (秒); fn 返回处理的条目数"""
+    times, items = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = fn()
+        times.append(time.perf_counter() - start)
+    return times, items
+
+
+def summarize(times, items):
+    best = min(times)
+    return {
+        "items": items,
+        "runs": len(times),
+        "best_ms": round(best * 1000, 3),
+        "median_ms": round(statistics.median(times) * 1000, 3),
+        "per_item_us": round(best * 1e6 / max(items, 1), 3),
+    }
+
+
+# --- 1. 各热路径 ---
+
+def bench_load_data(ctx):
+    """冷建索引, 再按 app.py 的 load_data 方式加载样本公司 (冷 / 热缓存各一次)"""
+    from utils.cache import DataCache
+    from utils.registry import CompanyRegistry
+
+    index_path = os.path.join(ctx['work_dir'], 'company_index.json')
+
+    def build_index():
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        CompanyRegistry(ctx['data_dir'], index_path=index_path)
+        return ctx['n']
+
+    results = {"registry_index": summarize(*measure(build_index, 1))}
+    registry = CompanyRegistry(ctx['data_dir'], index_path=index_path, cache=DataCache(shared_dir=''))
+    sample = registry.codes()[:ctx['sample']]
+
+    def load_sample():
+        for code in sample:
+            record = registry.load(code)
+            record.get('social', {}).get('key_events')
+            record.get('supply_chain')
+            registry.profile(code)
+        return len(sample)
+
+    results["load_data_cold"] = summarize(*measure(load_sample, 1))
+    results["load_data_warm"] = summarize(*measure(load_sample, ctx['repeat']))
+    ctx['registry'] = registry
+    return results
+
+
+def bench_scoring(ctx):
+    from utils.scoring import portfolio_frame, score_portfolio
+
+    codes, env, soc = ctx['registry'].scores()
+    return {
+        "scoring": summarize(*measure(lambda: len(score_portfolio(env, soc, 5000)['band']), ctx['repeat'])),
+        "scoring_frame": summarize(*measure(lambda: len(portfolio_frame(codes, env, soc, 5000)), ctx['repeat'])),
+    }
+
+
+def bench_scf_model(ctx):
+    """授信引擎: scf_model 为内存中逐块计算, scf_stream 含按块写出 CSV 台账"""
+    from utils.scf_credit import CreditPolicy, credit_frame, registry_chunks, write_credit_lines
+
+    policy = CreditPolicy()
+    chunks = list(registry_chunks(ctx['registry']))
+    out = os.path.join(ctx['work_dir'], 'credit_lines.csv')
+    return {
+        "scf_model": summarize(*measure(lambda: sum(len(credit_frame(c, policy)) for c in chunks), ctx['repeat'])),
+        "scf_stream": summarize(*measure(lambda: write_credit_lines(iter(chunks), out, policy)['rows'],
+                                         ctx['repeat'])),
+    }
+
+
+def bench_loss_sim(ctx):
+    """损失模拟: 全组合 --mc-paths 条路径 (不经情景缓存), 条目数为路径数"""
+    from utils.loss_sim import registry_scenario, simulate
+
+    scenario = registry_scenario(ctx['registry'], 5000)
+    return {"loss_sim": summarize(*measure(lambda: simulate(scenario, ctx['mc_paths'], use_cache=False)['paths'],
+                                           ctx['repeat']))}
+
+
+def bench_event_search(ctx):
+    """事件检索: 全量建索引一次, 再按一组中英文关键词 + 过滤条件查询, 条目数为查询数"""
+    from utils.event_index import EventIndex
+
+    registry = ctx['registry']
+
+    def build():
+        index = EventIndex()
+        index.update(registry)
+        return len(index)
+
+    index = EventIndex()
+    index.update(registry)
+    queries = [("CBP", {}), ("强迫劳动", {}), ("泥炭", {"year_from": 2015}), ("毁林", {"severities": {3, 4}}),
+               ("rspo", {"source": "rspo"}), ("", {"year_from": 2020, "severities": {4}})]
+
+    def search():
+        for query, filters in queries:
+            index.search(query, **filters)
+        return len(queries)
+
+    return {
+        "event_index_build": summarize(*measure(build, 1)),
+        "event_search": summarize(*measure(search, ctx['repeat'])),
+    }
+
+
+def bench_event_score(ctx):
+    """事件衰减评分: 全组合重算 vs 逐条新增事件的增量更新 (条目数为新增事件数)"""
+    from utils.event_score import EventScorer
+    from utils.schema import EventRecord
+
+    registry = ctx['registry']
+    full_times, items = measure(lambda: EventScorer().update(registry), 1)
+    scorer = EventScorer()
+    scorer.update(registry)
+    codes = registry.codes()[:ctx['sample']]
+    event = EventRecord(20240101, "2024-01-01", "benchmark", None, 3, None, None, ())
+
+    def incremental():
+        for code in codes:
+            scorer.add_event(code, "soc", event)
+        return len(codes)
+
+    return {
+        "event_score_full": summarize(full_times, items),
+        "event_score_add": summarize(*measure(incremental, ctx['repeat'])),
+    }
+
+
+def bench_site_build(ctx):
+    """静态站点: 全量构建一次, 再计时无变化重建与单文件编辑后的增量重建 (条目数为检查的页面数)"""
+    from utils.site_builder import build_site
+
+    registry = ctx['registry']
+    site_dir = os.path.join(ctx['work_dir'], 'site')
+    manifest = os.path.join(ctx['work_dir'], 'site_manifest.json')
+
+    def build(full=False):
+        stats = build_site(registry, site_dir, os.path.join(site_dir, 'b2c'), full=full, manifest_path=manifest)
+        return stats['rendered'] + stats['unchanged']
+
+    path = registry.path(registry.codes()[0])
+    with open(path, 'rb') as f:
+        original = f.read()
+    edits = iter(range(ctx['repeat'] + 1))
+
+    def edit_one():
+        # 末尾追加空白: 内容哈希变化, 该公司页面与档案列表重新渲染
+        with open(path, 'wb') as f:
+            f.write(original + b"\n" * next(edits))
+        return build()
+
+    results = {"site_full": summarize(*measure(lambda: build(full=True), 1)),
+               "site_noop": summarize(*measure(build, ctx['repeat']))}
+    try:
+        results["site_edit"] = summarize(*measure(edit_one, ctx['repeat']))
+    finally:
+        with open(path, 'wb') as f:
+            f.write(original)
+    return results
+
+
+def bench_supply_graph(ctx):
+    from utils.supply_graph import build_graph
+
+    registry = ctx['registry']
+    times, items = measure(lambda: len(build_graph(registry)), ctx['repeat'])
+    graph = build_graph(registry)
+    sample = registry.codes()[:ctx['sample']]
+
+    def traverse():
+        for code in sample:
+            graph.paths_through(code)
+            graph.upstream(code)
+            graph.downstream(code)
+        return len(sample)
+
+    return {
+        "supply_graph_build": summarize(times, items),
+        "supply_graph_paths": summarize(*measure(traverse, ctx['repeat'])),
+    }
+
+
+def bench_pdf_report(ctx):
+    """逐家渲染 (不经报告缓存); 只取前 --pdf-sample 家"""
+    from utils.pdf_generator import ensure_fonts, generate_pdf_report
+
+    ensure_fonts()
+    registry = ctx['registry']
+    sample = registry.codes()[:ctx['pdf_sample']]
+
+    def render():
+        for code in sample:
+            generate_pdf_report(registry.load(code), registry.profile(code))
+        return len(sample)
+
+    return {"generate_pdf_report": summarize(*measure(render, ctx['repeat']))}
+
+
+def bench_wrapped_text(ctx):
+    """把样本公司的事件描述循环排满 --pages 页, 条目数为页数"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.pdfgen import canvas
+
+    from utils import pdf_generator as pg
+
+    pg.ensure_fonts()
+    registry = ctx['registry']
+    texts = [e.description or e.title for code in registry.codes()[:ctx['sample']]
+             for e in registry.profile(code).soc_events + registry.profile(code).env_events if e.description or e.title]
+    width, height = A4
+    pages = ctx['pages']
+
+    def draw():
+        c = canvas.Canvas(BytesIO(), pagesize=A4)
+        y, page, i = height - 2.5 * cm, 0, 0
+        while page < pages:
+            y = pg.draw_wrapped_text(c, 2 * cm, y, texts[i % len(texts)], pg.FONT_REG, 10, width - 4 * cm)
+            i += 1
+            if y < 2.5 * cm:
+                c.showPage()
+                y, page = height - 2.5 * cm, page + 1
+        return pages
+
+    return {"draw_wrapped_text": summarize(*measure(draw, ctx['repeat']))}
+
+
+BENCHMARKS = {
+    "load_data": bench_load_data,
+    "scoring": bench_scoring,
+    "scf_model": bench_scf_model,
+    "loss_sim": bench_loss_sim,
+    "event_search": bench_event_search,
+    "event_score": bench_event_score,
+    "site_build": bench_site_build,
+    "supply_graph": bench_supply_graph,
+    "pdf_report": bench_pdf_report,
+    "wrapped_text": bench_wrapped_text,
+}
+
+
+# --- 2. 结果对比 ---
+
+def compare(current, baseline, threshold, min_delta_ms=1.0):
+    """
+    返回 (名称, 基线 ms, 当前 ms, 比值, 是否回归); 只比较两边都有且条目数相同的项
+    绝对差值小于 min_delta_ms 的亚毫秒级项不判定为回归 (计时噪声)
+    """
+    rows = []
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base or base['items'] != result['items']:
+            continue
+        ratio = result['best_ms'] / base['best_ms'] if base['best_ms'] else 1.0
+        regressed = ratio > 1 + threshold and result['best_ms'] - base['best_ms'] >= min_delta_ms
+        rows.append((name, base['best_ms'], result['best_ms'], ratio, regressed))
+    return rows
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GreenLink 热路径基准套件")
+    parser.add_argument('--scale', default="1k", help="公司数: 10 / 1k / 100k 或任意整数")
+    parser.add_argument('--events', default="3-12", help="每家公司的事件数范围")
+    parser.add_argument('--suppliers', default="2-20", help="中游企业的供应商数范围")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', help="合成数据目录 (不存在时生成并保留; 默认临时目录, 结束后删除)")
+    parser.add_argument('--only', help="逗号分隔的基准名: " + ",".join(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--sample', type=int, default=1000, help="逐家计时项 (load_data / 路径遍历) 的样本数")
+    parser.add_argument('--pdf-sample', type=int, default=5)
+    parser.add_argument('--mc-paths', type=int, default=100000, help="损失模拟的路径数")
+    parser.add_argument('--pages', type=int, default=20, help="draw_wrapped_text 排版页数")
+    parser.add_argument('-o', '--output', help="结果 JSON 路径 (默认输出到标准输出)")
+    parser.add_argument('--compare', help="基线结果 JSON")
+    parser.add_argument('--threshold', type=float, default=0.2, help="best_ms 变慢超过该比例视为回归")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help="变慢的绝对值低于该毫秒数时忽略")
+    args = parser.parse_args(argv)
+
+    n = parse_scale(args.scale)
+    selected = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = set(selected) - set(BENCHMARKS) - {"load_data"}
+    if unknown:
+        parser.error(f"未知基准: {', '.join(sorted(unknown))}")
+
+    work_dir = tempfile.mkdtemp(prefix='greenlink-bench-')
+    data_dir = args.data_dir or os.path.join(work_dir, 'data')
+    try:
+        if not os.path.isdir(data_dir) or not os.listdir(data_dir):
+            start = time.perf_counter()
+            write_portfolio(data_dir, n, _parse_range(args.events), _parse_range(args.suppliers), seed=args.seed)
+            print(f"已生成 {n} 家合成公司 ({time.perf_counter() - start:.1f} s) -> {data_dir}", file=sys.stderr)
+        n = sum(1 for name in os.listdir(data_dir) if name.endswith('.json'))
+
+        ctx = {"n": n, "data_dir": data_dir, "work_dir": work_dir, "repeat": args.repeat,
+               "sample": min(args.sample, n), "pdf_sample": min(args.pdf_sample, n), "pages": args.pages,
+               "mc_paths": args.mc_paths}
+        results = {}
+        # load_data 建立其余基准共用的注册表, 总是最先运行
+        for name in ["load_data"] + [b for b in selected if b != "load_data"]:
+            print(f"▶ {name}", file=sys.stderr)
+            part = BENCHMARKS[name](ctx)
+            if name in selected:
+                results.update(part)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "companies": n,
+            "events": args.events,
+            "suppliers": args.suppliers,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            rows = compare(report, json.load(f), args.threshold, args.min_delta_ms)
+        for name, base_ms, cur_ms, ratio, regressed in rows:
+            print(f"{'❌' if regressed else '  '} {name:<22} {base_ms:10.2f} -> {cur_ms:10.2f} ms  ({ratio:.2f}x)",
+                  file=sys.stderr)
+        return 1 if any(row[4] for row in rows) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
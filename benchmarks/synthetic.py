@@ -0,0 +1,255 @@
+"""
+合成组合生成器 (Synthetic portfolio generator)
+仿照 data/FGV.json / IOI.json / COFCO.json 的结构生成可通过 utils.schema.validate 的公司 JSON:
+- 上游种植商 (FGV / IOI 风格): 卫星证据、环境 / 社会 key_events、子公司、下游客户与市场
+- 中游加工商 (COFCO 风格): supply_chain.position = "中游加工商", upstream.suppliers 带 risk_status 文本
+事件日期、严重程度、details 等字段刻意混用各文件中出现过的写法, 覆盖 schema 规范化的全部分支
+    python -m benchmarks.synthetic -n 1000 -o /tmp/portfolio_1k [--events 3-12] [--suppliers 2-20] [--seed 0]
+供应链金融授信引擎的批量输入 (供应商明细表, CSV / Parquet) 另行生成:
+    python -m benchmarks.synthetic --supplier-rows 10000000 -o /tmp/suppliers_10m.parquet
+"""
+
+import argparse
+import json
+import os
+import random
+
+# 证据影像沿用仓库内的卫星图片 (相对仓库根目录, 与真实数据一致)
+EVIDENCE_SETS = (
+    ("assets/satellite_images/FGV_2014.png", None, "assets/satellite_images/FGV_2022.png"),
+    ("assets/satellite_images/IOI_2012.png", "assets/satellite_images/IOI_2019.png",
+     "assets/satellite_images/IOI_2022.png"),
+)
+
+REGIONS = ("马来西亚 彭亨州", "马来西亚 柔佛州", "马来西亚 沙巴州", "印尼 西加里曼丹", "印尼 中加里曼丹",
+           "印尼 苏门答腊", "巴西 马托格罗索", "科特迪瓦 阿比让", "泰国 素叻他尼")
+SOURCES = ("Reuters (www.reuters.com)", "U.S. Customs and Border Protection (CBP)", "RSPO官网", "Greenpeace",
+           "Finnwatch", "Global Forest Watch", "SPOTT数据库", "Mongabay", "公司可持续发展报告")
+ENV_EVENTS = ("种植园发生火灾，破坏高保护价值(HCV)区域和泥炭森林", "卫星监测发现新增毁林斑块约{n}公顷",
+              "NGO向RSPO提交投诉，指控其开发泥炭地", "RSPO暂停其部分认证，理由是毁林与泥炭地开发",
+              "启动基于卫星图像的供应链近实时毁林监测系统", "欧盟EUDR尽职调查抽检发现{n}批次追溯信息缺失",
+              "完成零毁林承诺第三方核查")
+SOC_EVENTS = ("美国CBP发布暂扣令(WRO)，基于强迫劳动的指控", "调查报告揭露没收工人护照、招聘费等强迫劳动指标",
+              "原住民社区就土地争议提起诉讼", "主要品牌客户因劳工问题暂停采购", "公司提交修改WRO的请愿书并投入{n}万林吉特整改",
+              "独立审计确认工人住宿条件改善", "工会投诉工资低于最低标准")
+DETAILS = ("没收工人护照", "工资低于最低标准", "限制结社自由", "工人支付高额招聘费", "生活条件恶劣",
+           "使用工人不熟悉的语言签订合同", "加班超过法定上限")
+SEVERITY_LABELS = ("严重", "高", "中等", "低", "正面")
+CUSTOMERS = ("Unilever（联合利华）", "Nestlé（雀巢）", "Mars（玛氏）", "Procter & Gamble (P&G)（宝洁）",
+             "Kellogg's（家乐氏）", "Mondelez（亿滋）", "Cargill（嘉吉）", "Bunge（邦吉）")
+MARKETS = ("欧盟", "美国", "中国", "东南亚", "印度", "日本")
+EXTERNAL_SUPPLIERS = ("国内油料作物种植基地", "Sime Darby Plantation", "Wilmar International", "Musim Mas",
+                      "Golden Agri-Resources", "Astra Agro Lestari", "Sinar Mas")
+RATINGS = ("BB", "BBB", "BB - BBB 级别（估计）", "A", "B")
+
+
+def _level(score):
+    return "高风险" if score >= 60 else ("中风险" if score >= 40 else "低风险")
+
+
+def _sentence(rng, templates):
+    return rng.choice(templates).format(n=rng.randint(2, 500))
+
+
+def make_event(rng, templates, year_range=(2012, 2025), with_details=False):
+    """单个 key_event, 日期与严重程度写法随机取自真实文件中出现过的几种"""
+    year = rng.randint(*year_range)
+    month, day = rng.randint(1, 12), rng.randint(1, 28)
+    event = {}
+    style = rng.random()
+    if style < 0.35:
+        event['date'] = f"{year}-{month:02d}-{day:02d}"
+    elif style < 0.55:
+        event['date'] = f"{year}-{month:02d}"
+    else:
+        event.update(year=year, month=month if rng.random() < 0.8 else None)
+        if rng.random() < 0.3:
+            event['day'] = day
+    event['event'] = _sentence(rng, templates)
+    label = rng.choice(SEVERITY_LABELS)
+    if rng.random() < 0.6:
+        event['impact'] = label
+    else:
+        event['impact'] = f"导致{rng.choice(MARKETS)}市场采购受阻，预计损失约{rng.randint(1, 300)}百万美元。" \
+                          f"{_sentence(rng, templates)}"
+        event['severity'] = label
+    if with_details and rng.random() < 0.5:
+        event['details'] = rng.sample(DETAILS, rng.randint(1, 4)) if rng.random() < 0.7 else rng.choice(DETAILS)
+    if rng.random() < 0.8:
+        event['source'] = rng.choice(SOURCES)
+    return event
+
+
+def make_upstream(rng, code, name, n_events, customers):
+    env_score, soc_score = rng.randint(5, 95), rng.randint(5, 95)
+    before, mid, after = rng.choice(EVIDENCE_SETS)
+    evidence = {"satellite_image_before": before, "satellite_image_after": after,
+                "observation": [f"{rng.randint(2012, 2018)}年：森林覆盖完整", f"{rng.randint(2019, 2024)}年：出现规则种植园道路网络"],
+                "conclusion": _sentence(rng, ENV_EVENTS)}
+    if mid:
+        evidence['satellite_image_mid'] = mid
+    n_env = rng.randint(0, n_events)
+    return {
+        "company": name,
+        "company_english": f"{code} Plantations Berhad",
+        "company_info": {"full_name": f"{code} Holdings Berhad", "stock_code": f"MYX: {rng.randint(1000, 9999)}"},
+        "industry": "棕榈油生产与加工",
+        "environment": {
+            "risk_level": _level(env_score),
+            "risk_score": env_score,
+            "analysis": {
+                "method": "Sentinel-2 卫星遥感监测",
+                "period": "2012-2022",
+                "location": rng.choice(REGIONS),
+                "coordinates": f"{rng.uniform(-5, 6):.2f}°N, {rng.uniform(100, 119):.2f}°E",
+                "evidence": evidence,
+            },
+            "key_events": [make_event(rng, ENV_EVENTS) for _ in range(n_env)],
+        },
+        "social": {
+            "risk_level": _level(soc_score),
+            "risk_score": soc_score,
+            "key_events": [make_event(rng, SOC_EVENTS, with_details=True) for _ in range(n_events - n_env)],
+        },
+        "traditional_esg_rating": {"provider": "MSCI / Sustainalytics", "rating": rng.choice(RATINGS)},
+        "supply_chain": {
+            "upstream": {"subsidiaries": [f"PT. {code} Sawit {i} - {rng.choice(REGIONS)}" for i in range(rng.randint(0, 3))]},
+            "downstream": {"major_customers": customers, "markets": rng.sample(MARKETS, rng.randint(1, 4))},
+        },
+        "last_updated": f"{rng.randint(2023, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+    }
+
+
+def make_midstream(rng, code, name, n_events, suppliers):
+    env_score, soc_score = rng.randint(5, 60), rng.randint(5, 60)
+    return {
+        "company": name,
+        "industry": "粮油食品加工",
+        "traditional_rating": {"MSCI": rng.choice(RATINGS)},
+        "environment": {
+            "risk_level": _level(env_score), "risk_score": env_score,
+            "analysis": {"method": "供应链追溯审计"},
+            "key_events": [make_event(rng, ENV_EVENTS) for _ in range(n_events // 2)],
+        },
+        "social": {
+            "risk_level": _level(soc_score), "risk_score": soc_score,
+            "key_events": [make_event(rng, SOC_EVENTS) for _ in range(n_events - n_events // 2)],
+        },
+        "supply_chain": {
+            "position": "中游加工商",
+            "upstream": {"suppliers": suppliers},
+            "downstream": {"markets": [{"region": m, "products": ["食用油"], "risk": "合规审查"}
+                                       for m in rng.sample(MARKETS, rng.randint(1, 3))]},
+        },
+    }
+
+
+def _supplier_entry(rng, name, score):
+    if score is None:
+        status = rng.choice(("低风险", "中风险", "低风险（备选供应商）"))
+    else:
+        status = f"{'高' if score >= 60 else '低'}社会风险（{score}分）" if rng.random() < 0.6 else _level(score)
+    return {"name": name, "country": rng.choice(("马来西亚", "印尼", "中国", "巴西")), "product": "棕榈油原料",
+            "risk_status": status}
+
+
+def _parse_range(text):
+    low, _, high = str(text).partition('-')
+    return int(low), int(high or low)
+
+
+def generate_portfolio(n, events=(3, 12), suppliers=(2, 20), midstream_ratio=0.1, seed=0):
+    """生成 n 家公司, 逐家 yield (代码, dict); 中游企业的供应商优先引用已生成的上游企业"""
+    rng = random.Random(seed)
+    upstream_names = []     # (名称, 社会风险分)
+    for i in range(n):
+        code = f"S{i:06d}"
+        n_events = rng.randint(*events)
+        if upstream_names and rng.random() < midstream_ratio:
+            count = rng.randint(*suppliers)
+            picks = rng.sample(upstream_names, min(count, len(upstream_names)))
+            entries = [_supplier_entry(rng, name, score) for name, score in picks]
+            entries += [_supplier_entry(rng, rng.choice(EXTERNAL_SUPPLIERS), None) for _ in range(count - len(picks))]
+            yield code, make_midstream(rng, code, f"合成粮油 {code}", n_events, entries)
+        else:
+            name = f"合成种植 {code}"
+            company = make_upstream(rng, code, name, n_events, rng.sample(CUSTOMERS, rng.randint(1, 4)))
+            upstream_names.append((name, company['social']['risk_score']))
+            yield code, company
+
+
+def write_portfolio(out_dir, n, events=(3, 12), suppliers=(2, 20), midstream_ratio=0.1, seed=0):
+    """把合成组合写入 out_dir/<代码>.json, 返回代码列表"""
+    os.makedirs(out_dir, exist_ok=True)
+    codes = []
+    for code, company in generate_portfolio(n, events, suppliers, midstream_ratio, seed):
+        with open(os.path.join(out_dir, f"{code}.json"), 'w', encoding='utf-8') as f:
+            json.dump(company, f, ensure_ascii=False, indent=2)
+        codes.append(code)
+    return codes
+
+
+def write_supplier_table(path, rows, seed=0, chunk_rows=1000000):
+    """
+    供应商明细表: 核心企业 / 供应商 / ESG 风险分 / 基础授信(万), 分块生成并写出, 内存占用与总行数无关
+    约 5% 的行缺少风险分 (由授信政策的 default_score 补齐)
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    buyers = np.asarray([f"合成粮油 B{i:04d}" for i in range(1000)], dtype=object)
+
+    def frames():
+        for offset in range(0, rows, chunk_rows):
+            n = min(chunk_rows, rows - offset)
+            scores = rng.integers(5, 96, n).astype(np.float64)
+            scores[rng.random(n) < 0.05] = np.nan
+            yield offset, pd.DataFrame({
+                "核心企业": buyers[rng.integers(0, len(buyers), n)],
+                "供应商": [f"合成供应商 P{i:08d}" for i in range(offset, offset + n)],
+                "ESG 风险分": scores,
+                "基础授信(万)": rng.choice((500.0, 1000.0, 2000.0, 5000.0), n),
+            })
+
+    if path.lower().endswith(('.parquet', '.pq')):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        for _, frame in frames():
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            writer = writer or pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+        if writer is not None:
+            writer.close()
+    else:
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            for offset, frame in frames():
+                frame.to_csv(f, index=False, header=offset == 0)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成合成公司组合 JSON")
+    parser.add_argument('-n', '--companies', type=int, default=1000)
+    parser.add_argument('-o', '--output', required=True, help="输出目录 (--supplier-rows 时为 .csv / .parquet 文件)")
+    parser.add_argument('--events', default="3-12", help="每家公司的事件数范围, 如 3-12")
+    parser.add_argument('--suppliers', default="2-20", help="中游企业的供应商数范围, 如 2-20")
+    parser.add_argument('--midstream-ratio', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--supplier-rows', type=int, help="改为生成该行数的供应商明细表 (授信引擎批量输入)")
+    args = parser.parse_args(argv)
+
+    if args.supplier_rows:
+        write_supplier_table(args.output, args.supplier_rows, args.seed)
+        print(f"已生成 {args.supplier_rows} 行供应商明细 -> {args.output}")
+        return
+
+    codes = write_portfolio(args.output, args.companies, _parse_range(args.events), _parse_range(args.suppliers),
+                            args.midstream_ratio, args.seed)
+    print(f"已生成 {len(codes)} 家公司 -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
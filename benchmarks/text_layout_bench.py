@@ -0,0 +1,116 @@
+"""
+换行排版基准 (Line-breaking benchmark)
+对比原逐字符 stringWidth 换行与 utils.text_layout 的每页耗时:
+    python -m benchmarks.text_layout_bench [--pages 20] [--font STSong-Light]
+文本取自 data/*.json 中的事件描述与 details 列表, 不足一页时重复填充
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+from io import BytesIO
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.pdfgen import canvas
+
+from utils.text_layout import layout_text, draw_block
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WIDTH, HEIGHT = A4
+FONT_SIZE = 10
+MAX_WIDTH = WIDTH - 7.5 * cm
+
+
+def legacy_wrapped_text(c, x, y, text, font_name, font_size, max_width):
+    """改造前的 draw_wrapped_text: 每加一个字符就重新测量整行"""
+    c.setFont(font_name, font_size)
+    line = ""
+    line_height = (font_size * 1.3) / 72 * cm
+    for char in str(text):
+        test_line = line + char
+        if c.stringWidth(test_line, font_name, font_size) > max_width:
+            c.drawString(x, y, line)
+            y -= line_height
+            line = char
+        else:
+            line = test_line
+    c.drawString(x, y, line)
+    return y - line_height
+
+
+def layout_wrapped_text(c, x, y, text, font_name, font_size, max_width):
+    return draw_block(c, x, y, layout_text(text, font_name, font_size, max_width))
+
+
+def corpus():
+    """收集所有长文本: 事件描述、details 列表项、结论"""
+    texts = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+        elif isinstance(node, str) and len(node) >= 20:
+            texts.append(node)
+
+    for path in sorted(glob.glob(os.path.join(BASE_DIR, 'data', '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            walk(json.load(f))
+    return texts
+
+
+class MeasureOnlyCanvas(canvas.Canvas):
+    """drawString 不输出内容, 用于单独衡量断行开销"""
+
+    def drawString(self, x, y, text, *args, **kwargs):
+        pass
+
+
+def run(draw, texts, pages, font_name, canvas_class=canvas.Canvas):
+    """把文本循环排满 pages 页, 返回 (每页毫秒, 段数)"""
+    c = canvas_class(BytesIO(), pagesize=A4)
+    y_top, y_bottom = HEIGHT - 2.5 * cm, 2.5 * cm
+    y, page, i = y_top, 0, 0
+    start = time.perf_counter()
+    while page < pages:
+        y = draw(c, 7.5 * cm, y, texts[i % len(texts)], font_name, FONT_SIZE, MAX_WIDTH)
+        i += 1
+        if y < y_bottom:
+            c.showPage()
+            y, page = y_top, page + 1
+    elapsed = time.perf_counter() - start
+    return elapsed / pages * 1000, i
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="draw_wrapped_text 换行基准")
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--font', default='STSong-Light', help="CID 字体名或已注册的 TTF 字体名")
+    parser.add_argument('--repeat', type=int, default=1, help="把每段文本重复 N 次, 模拟更长的描述")
+    args = parser.parse_args(argv)
+
+    if args.font not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(UnicodeCIDFont(args.font))
+    texts = [t * args.repeat for t in corpus()]
+    chars = sum(len(t) for t in texts)
+    print(f"语料: {len(texts)} 段, {chars} 字符, 平均 {chars / len(texts):.0f} 字符/段 (repeat={args.repeat})")
+
+    for title, canvas_class in (("断行 + 绘制", canvas.Canvas), ("仅断行", MeasureOnlyCanvas)):
+        legacy_ms, legacy_paras = run(legacy_wrapped_text, texts, args.pages, args.font, canvas_class)
+        layout_ms, layout_paras = run(layout_wrapped_text, texts, args.pages, args.font, canvas_class)
+        print(f"[{title}]")
+        print(f"  {'原逐字符换行':<12} {legacy_ms:8.2f} ms/页  ({legacy_paras} 段)")
+        print(f"  {'text_layout':<12} {layout_ms:8.2f} ms/页  ({layout_paras} 段)")
+        print(f"  加速比: {legacy_ms / layout_ms:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""公用夹具: 临时数据目录中的公司文件与注册表 (索引文件写在临时目录, 不触碰 .cache/)"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def company(name, env=30, soc=40, env_events=(), soc_events=(), **extra):
+    """最小的公司 JSON"""
+    return {
+        "company": name,
+        "environment": {"risk_score": env, "risk_level": "低风险", "key_events": list(env_events)},
+        "social": {"risk_score": soc, "risk_level": "中风险", "key_events": list(soc_events)},
+        **extra,
+    }
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    path = tmp_path / "data"
+    path.mkdir()
+    return path
+
+
+@pytest.fixture
+def write_company(data_dir):
+    """write_company(code, data) 写入 data_dir/<code>.json, 每次写入推进 mtime 以便注册表察觉"""
+    def write(code, data):
+        path = data_dir / f"{code}.json"
+        previous = path.stat().st_mtime_ns if path.exists() else None
+        path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        if previous is not None:
+            os.utime(path, ns=(previous + 10 ** 9, previous + 10 ** 9))
+        return path
+    return write
+
+
+@pytest.fixture
+def make_registry(data_dir, tmp_path):
+    from utils.registry import CompanyRegistry
+
+    def make():
+        return CompanyRegistry(str(data_dir), index_path=str(tmp_path / "index.json"), refresh_interval=0)
+    return make
@@ -0,0 +1,108 @@
+"""事件检索: BM25 排序、过滤条件与按注册表的增量重建"""
+
+import math
+
+import pytest
+
+from conftest import company
+from utils.event_index import BM25_B, BM25_K1, EventIndex, tokenize
+
+
+def item(title, body="", kind="soc", date_key=20200101, severity=3, source="Reuters"):
+    return (kind, date_key, str(date_key), severity, source, title, body, None)
+
+
+@pytest.fixture
+def index():
+    index = EventIndex()
+    index.index_company("A", "甲", [
+        item("森林砍伐调查", "卫星显示大面积毁林", kind="env", date_key=20190000),
+        item("劳工纠纷", "工人投诉招聘费用"),
+    ])
+    index.index_company("B", "乙", [
+        item("美国CBP暂扣令", "强迫劳动指控导致暂扣令", date_key=20200915, severity=4, source="CBP"),
+        item("年度报告", "提及暂扣令", date_key=0, severity=1),
+    ])
+    return index
+
+
+def titles(results):
+    return [r["title"] for r in results]
+
+
+def test_tokenize_cjk_bigrams_and_latin_words():
+    assert tokenize("美国CBP暂扣令") == ["美国", "cbp", "暂扣", "扣令"]
+
+
+def test_title_match_outranks_body_match(index):
+    total, results = index.search("暂扣令")
+    assert total == 2
+    assert titles(results) == ["美国CBP暂扣令", "年度报告"]
+
+
+def test_bm25_score_matches_formula(index):
+    _, results = index.search("劳工")
+    assert titles(results) == ["劳工纠纷"]
+    docs = [doc for doc in index.docs if doc is not None]
+    avg = sum(doc.length for doc in docs) / len(docs)
+    doc = next(doc for doc in docs if doc.title == "劳工纠纷")
+    tf, df = doc.terms["劳工"], sum(1 for d in docs if "劳工" in d.terms)
+    idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+    expected = idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * doc.length / avg))
+    assert results[0]["score"] == pytest.approx(expected, abs=1e-4)
+
+
+def test_terms_are_and_combined(index):
+    assert index.search("暂扣令 强迫")[0] == 1
+    assert index.search("暂扣令 森林")[0] == 0
+
+
+def test_single_cjk_character_expands_to_bigrams(index):
+    total, results = index.search("毁")
+    assert total == 1 and results[0]["code"] == "A"
+
+
+def test_filters(index):
+    assert index.search("暂扣令", year_from=2018)[0] == 1          # 无日期事件被排除
+    assert titles(index.search("", severities={4})[1]) == ["美国CBP暂扣令"]
+    assert index.search("", kinds=["env"])[0] == 1
+    assert index.search("", source="cbp")[0] == 1
+    assert index.search("", codes=["A"])[0] == 2
+
+
+def test_reindex_company_replaces_its_documents(index):
+    index.index_company("A", "甲", [item("新的毁林报告")])
+    assert index.search("劳工")[0] == 0
+    assert index.search("毁林")[0] == 1
+    assert len(index) == 3
+
+
+def test_compaction_keeps_results(index):
+    for i in range(700):
+        index.index_company("A", "甲", [item(f"劳工纠纷 {i}"), item("森林砍伐调查")])
+    assert index.stats()["deleted"] < 1024
+    total, results = index.search("劳工")
+    assert total == 1 and results[0]["title"] == "劳工纠纷 699"
+    assert index.search("暂扣令")[0] == 2
+
+
+def test_update_from_registry_is_incremental(write_company, make_registry, data_dir):
+    write_company("A", company("甲", soc_events=[{"event": "劳工纠纷", "date": "2020-01-01", "severity": "高"}]))
+    write_company("B", company("乙", soc_events=[{"event": "美国CBP暂扣令", "date": "2020-09-15"}]))
+    registry = make_registry()
+    index = EventIndex()
+    assert index.update(registry) == 2
+    assert index.update(registry) == 0                     # generation 未变化
+
+    write_company("A", company("甲", soc_events=[{"event": "供应商审计", "date": "2021-05-01"}]))
+    registry.refresh(force=True)
+    assert index.update(registry) == 1                     # 只重建被编辑的公司
+    assert index.search("劳工")[0] == 0
+    assert index.search("审计")[0] == 1
+    assert index.search("暂扣令")[0] == 1
+
+    (data_dir / "B.json").unlink()
+    registry.refresh(force=True)
+    index.update(registry)
+    assert index.search("暂扣令")[0] == 0
+    assert index.stats()["companies"] == 1
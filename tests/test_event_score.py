@@ -0,0 +1,141 @@
+"""事件时间衰减评分: 权重公式、截断与无日期事件、Top-K, 以及组合评分的增量更新与全量计算一致"""
+
+import math
+
+import numpy as np
+import pytest
+
+from conftest import company
+from utils.event_score import UNDATED_AGE, DecayPolicy, EventScorer, score_events
+from utils.schema import compile_company, compile_event
+
+POLICY = DecayPolicy(half_life=2.0, top_k=2)
+
+
+def profile(soc_events=(), env_events=(), code="X"):
+    return compile_company(company(code, env_events=env_events, soc_events=soc_events), code)
+
+
+def expected_score(weight, policy=POLICY):
+    return policy.floor + (100 - policy.floor) * (1 - math.exp(-max(weight, 0) / policy.saturation))
+
+
+def high(year, title="event"):
+    return {"event": title, "year": year, "severity": "高"}
+
+
+def test_weight_halves_every_half_life():
+    # 只有年份的事件按年中计 (2018 -> 2018.5)
+    result = score_events(profile([high(2018)]), POLICY, as_of=2018.5)
+    assert result["soc_score"] == pytest.approx(expected_score(1.0))
+    result = score_events(profile([high(2018)]), POLICY, as_of=2020.5)
+    assert result["soc_score"] == pytest.approx(expected_score(0.5))
+    result = score_events(profile([high(2018), high(2016)]), POLICY, as_of=2020.5)
+    assert result["soc_score"] == pytest.approx(expected_score(0.5 + 0.25))
+
+
+def test_section_without_events_is_none():
+    result = score_events(profile([high(2018)]), POLICY, as_of=2020.5)
+    assert result["env_score"] is None and result["env_top"] == []
+
+
+def test_positive_events_offset_risk():
+    positive = {"event": "整改完成", "year": 2018, "severity": "正面"}
+    result = score_events(profile([high(2018), positive]), POLICY, as_of=2018.5)
+    assert result["soc_score"] == pytest.approx(expected_score(1.0 + POLICY.severity_weights[0]))
+    result = score_events(profile([positive]), POLICY, as_of=2018.5)
+    assert result["soc_score"] == pytest.approx(POLICY.floor)
+    assert result["soc_top"] == []                         # Top-K 只在风险事件中选取
+
+
+def test_future_and_undated_events():
+    # 晚于评估日期的事件按评估日期计, 无日期事件按 UNDATED_AGE 年前计
+    future = score_events(profile([high(2030)]), POLICY, as_of=2020.0)
+    assert future["soc_score"] == pytest.approx(expected_score(1.0))
+    undated = score_events(profile([{"event": "e", "severity": "高"}]), POLICY, as_of=2020.0)
+    assert undated["soc_score"] == pytest.approx(expected_score(2 ** (-UNDATED_AGE / POLICY.half_life)))
+
+
+def test_top_k_by_decayed_weight():
+    events = [high(2010, "old"), high(2019, "recent"), {"event": "critical", "year": 2016, "severity": "严重"},
+              {"event": "low", "year": 2019, "severity": "低"}]
+    top = score_events(profile(events), POLICY, as_of=2020.0)["soc_top"]
+    assert [event.title for _, event in top] == ["recent", "critical"]
+    assert top[0][0] >= top[1][0]
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        DecayPolicy(half_life=0)
+    with pytest.raises(ValueError):
+        DecayPolicy(severity_weights=(1, 2))
+
+
+# --- 组合评分 (增量) ---
+
+EVENTS = {
+    "A": [high(2012), {"event": "e", "severity": "中"}, {"event": "f", "year": 2024, "severity": "严重"}],
+    "B": [high(2019), {"event": "p", "year": 2020, "severity": "正面"}],
+    "C": [],
+}
+
+
+def fresh(policy, as_of):
+    scorer = EventScorer(policy, as_of)
+    for code, events in EVENTS.items():
+        scorer.set_company(code, profile(events, code=code))
+    return scorer
+
+
+def assert_same(a, b):
+    for code in EVENTS:
+        for x, y in zip(a.score(code), b.score(code)):
+            assert (x is None and y is None) or x == pytest.approx(y, rel=1e-9)
+        assert [e.title for _, e in a.top_events(code, "soc")] == [e.title for _, e in b.top_events(code, "soc")]
+
+
+def test_set_as_of_matches_full_rescore():
+    scorer = fresh(POLICY, 2021.0)
+    for as_of in (2023.0, 2025.5, 2019.0):
+        scorer.set_as_of(as_of)
+        assert_same(scorer, fresh(POLICY, as_of))
+
+
+def test_set_policy_matches_full_rescore():
+    scorer = fresh(POLICY, 2021.0)
+    for policy in (DecayPolicy(half_life=5.0, top_k=1), DecayPolicy(half_life=5.0, top_k=3, saturation=2.0)):
+        scorer.set_policy(policy)
+        assert_same(scorer, fresh(policy, 2021.0))
+
+
+def test_add_event_matches_full_rescore():
+    scorer = fresh(POLICY, 2021.0)
+    event = high(2020, "new")
+    scorer.add_event("B", "soc", compile_event(event))
+    EVENTS_WITH_NEW = dict(EVENTS, B=EVENTS["B"] + [event])
+    expected = EventScorer(POLICY, 2021.0)
+    expected.set_company("B", profile(EVENTS_WITH_NEW["B"], code="B"))
+    assert scorer.score("B") == pytest.approx(expected.score("B"))
+
+
+def test_scores_with_fallback():
+    scorer = fresh(POLICY, 2021.0)
+    codes, env, soc = scorer.scores(["A", "C", "Z"], fallback=(["A", "C", "Z"], [1, 2, 3], [4, 5, 6]))
+    assert codes == ["A", "C", "Z"]
+    assert list(env) == [1, 2, 3]                          # 没有环境事件: 全部取回退值
+    assert soc[0] == pytest.approx(scorer.score("A")[1]) and list(soc[1:]) == [5, 6]
+    assert np.isnan(scorer.scores(["C"])[2][0])
+
+
+def test_update_from_registry_rescores_changed_companies(write_company, make_registry):
+    write_company("A", company("甲", soc_events=EVENTS["A"]))
+    write_company("B", company("乙", soc_events=EVENTS["B"]))
+    registry = make_registry()
+    scorer = EventScorer(POLICY, 2021.0)
+    assert scorer.update(registry) == 2
+    assert scorer.update(registry) == 0
+
+    write_company("B", company("乙", soc_events=[high(2021, "changed")]))
+    registry.refresh(force=True)
+    assert scorer.update(registry) == 1
+    assert scorer.score("B")[1] == pytest.approx(score_events(registry.profile("B"), POLICY, 2021.0)["soc_score"])
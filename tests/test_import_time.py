@@ -0,0 +1,14 @@
+"""启动导入预算: app.py 模块级导入不得引入重依赖, 总耗时不超出 benchmarks/import_budget.json"""
+
+import os
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_budget_check_passes():
+    proc = subprocess.run([sys.executable, '-m', 'benchmarks.import_time', '--check'], cwd=BASE_DIR,
+                          capture_output=True, text=True, timeout=300)
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    assert "❌" not in proc.stdout
@@ -0,0 +1,90 @@
+"""合并报告: 对象重新编号、页树与交叉引用表"""
+
+import re
+from io import BytesIO
+
+import pytest
+
+pytest.importorskip("reportlab")
+
+from reportlab.pdfgen import canvas  # noqa: E402
+
+from utils.pdf_stream import PDFStreamWriter, iter_portfolio_pdf, split_objects  # noqa: E402
+
+
+def make_pdf(label, pages):
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pageCompression=0)
+    c.setTitle(label)
+    for page in range(pages):
+        c.drawString(72, 720, f"{label} page {page + 1}")
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def merge(parts):
+    writer = PDFStreamWriter("Test")
+    chunks = [writer.header()] + [writer.append(pdf) for pdf in parts] + [writer.close()]
+    return b"".join(chunks), writer
+
+
+def xref_entries(pdf):
+    start = int(re.findall(rb"startxref\s+(\d+)", pdf)[-1])
+    lines = pdf[start:].split(b"\n")
+    assert lines[0] == b"xref"
+    first, count = (int(v) for v in lines[1].split())
+    return first, [line.split() for line in lines[2:2 + count]]
+
+
+def test_xref_offsets_point_at_renumbered_objects():
+    pdf, writer = merge([make_pdf("A", 2), make_pdf("B", 1), make_pdf("C", 3)])
+    first, entries = xref_entries(pdf)
+    assert first == 0 and entries[0][2] == b"f"
+    assert len(entries) == len(writer.offsets)
+    for number, (offset, _, kind) in enumerate(entries[1:], 1):
+        assert kind == b"n"
+        assert re.match(rb"%d 0 obj" % number, pdf[int(offset):]), number
+
+
+def test_pages_follow_input_order_under_one_page_tree():
+    pdf, writer = merge([make_pdf("A", 2), make_pdf("B", 1), make_pdf("C", 3)])
+    objects, trailer = split_objects(pdf)
+    assert writer.page_count == 6
+    assert re.search(rb"/Root 2 0 R", trailer)
+    pages_tree = objects[1]
+    assert re.search(rb"/Count 6", pages_tree)
+    kids = [int(n) for n in re.findall(rb"(\d+) 0 R", re.search(rb"/Kids \[(.*?)\]", pages_tree).group(1))]
+    assert kids == list(writer.kids)
+    # 每个页面的 /Parent 都指向合并后的页树, 内容流按输入顺序排列
+    for kid in kids:
+        assert b"/Parent 1 0 R" in objects[kid]
+    contents = [objects[int(re.search(rb"/Contents (\d+) 0 R", objects[kid]).group(1))] for kid in kids]
+    texts = [re.search(rb"\((\w page \d)\) Tj", body).group(1) for body in contents]
+    assert texts == [b"A page 1", b"A page 2", b"B page 1", b"C page 1", b"C page 2", b"C page 3"]
+
+
+def test_references_only_point_at_existing_objects():
+    pdf, writer = merge([make_pdf("A", 1), make_pdf("B", 2)])
+    objects, _ = split_objects(pdf)
+    for number, body in objects.items():
+        head = body.split(b"stream", 1)[0]
+        for ref in re.findall(rb"(\d+) 0 R", head):
+            assert int(ref) in objects, (number, ref)
+    # 各份的 Catalog / Info 被丢弃, 只剩合并后的一份
+    catalogs = [n for n, body in objects.items() if re.search(rb"/Type\s*/Catalog", body)]
+    assert catalogs == [2]
+
+
+def test_iter_portfolio_pdf_streams_a_valid_document():
+    parts = [make_pdf("A", 1), make_pdf("B", 1)]
+    progress = []
+    chunks = list(iter_portfolio_pdf([({}, None), ({}, None)], total=2,
+                                     on_progress=lambda done, total, pages, size: progress.append((done, pages)),
+                                     render=lambda data, profile, it=iter(parts): BytesIO(next(it))))
+    pdf = b"".join(chunks)
+    assert pdf.startswith(b"%PDF-1.4") and pdf.rstrip().endswith(b"%%EOF")
+    assert progress == [(1, 1), (2, 2)]
+    _, entries = xref_entries(pdf)
+    for number, (offset, _, _) in enumerate(entries[1:], 1):
+        assert re.match(rb"%d 0 obj" % number, pdf[int(offset):])
@@ -0,0 +1,105 @@
+"""按字节偏移的 JSON 章节扫描、非对象章节的容错与注册表增量刷新"""
+
+import json
+
+import pytest
+
+from conftest import company
+from utils.registry import build_entry, scan_sections
+
+
+def decode(raw, sections):
+    return {key: json.loads(raw[start:end]) for key, (start, end) in sections.items()}
+
+
+# --- scan_sections ---
+
+def test_offsets_decode_each_section():
+    data = {"company": "中粮集团 (COFCO)", "environment": {"risk_score": 30, "note": "含多字节字符 ✓"},
+            "list": [1, {"a": "b"}], "flag": None}
+    raw = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    sections, values = scan_sections(raw)
+    assert values == data
+    assert decode(raw, sections) == data
+
+
+def test_duplicate_key_keeps_last_like_json_load():
+    raw = b'{"a": 1, "a": {"x": 2}}'
+    sections, values = scan_sections(raw)
+    assert values == json.loads(raw) == {"a": {"x": 2}}
+    assert decode(raw, sections) == {"a": {"x": 2}}
+
+
+def test_empty_object():
+    assert scan_sections(b' { } \n') == ({}, {})
+
+
+@pytest.mark.parametrize("raw", [
+    b'{"company": "x"',             # 截断: 缺少右括号
+    b'{"company": "x",',            # 截断在逗号后
+    b'{"company": ',                # 截断在值之前
+    b'{',
+    b'',
+    b'   ',
+])
+def test_truncated_input_raises_value_error(raw):
+    with pytest.raises(ValueError):
+        scan_sections(raw)
+
+
+@pytest.mark.parametrize("raw", [
+    b'{"a":1 "b":2}',               # 缺少逗号
+    b'{a: 1}',                      # 键不是字符串
+    b'{"a" 1}',                     # 缺少冒号
+    b'{"a": 1} trailing',           # 多余内容
+    b'{"a": 1}}',
+    b'[1, 2]',                      # 顶层不是对象
+])
+def test_malformed_input_raises_value_error(raw):
+    with pytest.raises(ValueError):
+        scan_sections(raw)
+
+
+# --- 非对象章节 ---
+
+def test_build_entry_tolerates_non_object_sections(data_dir):
+    path = data_dir / "BAD.json"
+    path.write_text(json.dumps({"company": "x", "environment": [1, 2], "social": "bad", "supply_chain": 5}),
+                    encoding="utf-8")
+    entry = build_entry(str(path))
+    assert (entry["env_score"], entry["soc_score"]) == (50, 50)
+    assert entry["problems"]
+
+
+def test_build_entry_rejects_truncated_file(data_dir):
+    path = data_dir / "CUT.json"
+    path.write_bytes(b'{"company": "x", "environment": {"risk_score": 3')
+    with pytest.raises(ValueError):
+        build_entry(str(path))
+
+
+# --- 注册表 ---
+
+def test_registry_picks_up_edits_and_persists_them(write_company, make_registry):
+    write_company("A", company("甲", env=20))
+    write_company("B", company("乙", soc=70))
+    registry = make_registry()
+    assert registry.codes() == ["A", "B"]
+    generation = registry.generation
+
+    write_company("A", company("甲", env=65))
+    registry.refresh(force=True)
+    assert registry.info("A")["env_score"] == 65
+    assert registry.generation > generation
+
+    # 新实例从快照 + 变更日志恢复, 与磁盘上的文件一致
+    reloaded = make_registry()
+    assert reloaded.info("A")["env_score"] == 65
+    assert reloaded.info("B")["soc_score"] == 70
+
+
+def test_registry_skips_truncated_file(write_company, make_registry, data_dir):
+    write_company("A", company("甲"))
+    (data_dir / "CUT.json").write_bytes(b'{"company": "x"')
+    registry = make_registry()
+    assert registry.codes() == ["A"]
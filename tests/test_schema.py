@@ -0,0 +1,77 @@
+"""事件日期 / 严重程度解析与非对象章节的编译容错"""
+
+import pytest
+
+from utils.schema import (SEVERITY_CRITICAL, SEVERITY_HIGH, SEVERITY_LOW, SEVERITY_MEDIUM, SEVERITY_POSITIVE,
+                          compile_company, compile_event, format_date, parse_date, parse_risk_status,
+                          parse_severity)
+
+
+@pytest.mark.parametrize("event, expected", [
+    ({"date": "2023-05-17"}, (2023, 5, 17)),
+    ({"date": "2021年3月"}, (2021, 3, 0)),
+    ({"date": "2019/7"}, (2019, 7, 0)),
+    ({"date": "2016.11.02"}, (2016, 11, 2)),
+    ({"year": "2019年"}, (2019, 0, 0)),
+    ({"year": 2020, "month": "03", "day": 5}, (2020, 3, 5)),
+    ({"year": "2018", "month": "13", "day": "40"}, (2018, 0, 0)),    # 超出范围的月 / 日按未知处理
+    ({"date": "近期", "year": 2017}, (2017, 0, 0)),                    # date 无法解析时取分列字段
+    ({"year": "约二零一九"}, (0, 0, 0)),
+    ({}, (0, 0, 0)),
+])
+def test_parse_date(event, expected):
+    assert parse_date(event) == expected
+
+
+def test_date_key_and_label():
+    event = compile_event({"event": "t", "year": "2019年", "month": 3})
+    assert event.date_key == 20190300
+    assert format_date(0, 0, 0) == "N/A"
+
+
+@pytest.mark.parametrize("label, expected", [
+    ("高", SEVERITY_HIGH),
+    ("High risk", SEVERITY_HIGH),
+    ("  LOW ", SEVERITY_LOW),
+    ("中等（正面进展）", SEVERITY_MEDIUM),       # 前缀优先: 不因 "正面" 判为正面
+    ("严重", SEVERITY_CRITICAL),
+    ("极高", SEVERITY_CRITICAL),
+    ("正面", SEVERITY_POSITIVE),
+    ("positive", SEVERITY_POSITIVE),
+    ("unknown", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_severity(label, expected):
+    assert parse_severity(label) == expected
+
+
+def test_impact_label_becomes_severity():
+    event = compile_event({"event": "t", "impact": "高"})
+    assert event.severity == SEVERITY_HIGH and event.description is None
+    event = compile_event({"event": "t", "impact": "导致欧洲客户暂停采购并要求整改"})
+    assert event.severity is None and event.description
+
+
+def test_parse_risk_status():
+    assert parse_risk_status("高社会风险（75分）") == 75
+    assert parse_risk_status("低风险（备选供应商）") is not None
+
+
+def test_compile_company_tolerates_non_object_sections():
+    profile = compile_company({"company": "x", "environment": [1], "social": "bad", "supply_chain": 5,
+                               "traditional_rating": 7}, "X")
+    assert (profile.env_score, profile.soc_score) == (50, 50)
+    assert profile.suppliers == () and profile.env_events == ()
+
+
+def test_compile_company_skips_non_object_items():
+    profile = compile_company({
+        "company": "x",
+        "environment": {"risk_score": 40, "key_events": ["junk", {"event": "t", "year": "2019年", "severity": "高"}]},
+        "social": {"risk_score": 60, "key_events": {"not": "a list"}},
+        "supply_chain": {"upstream": {"suppliers": ["小农合作社", {"name": "IOI", "risk_status": "低风险"}]}},
+    })
+    assert [e.title for e in profile.env_events] == ["t"]
+    assert profile.soc_events == ()
+    assert [s.name for s in profile.suppliers] == ["小农合作社", "IOI"]
@@ -3,6 +3,12 @@ GreenLink Utils Package
 包含PDF生成和其他工具函数
 """
 
-from .pdf_generator import generate_pdf_report
-
 __all__ = ['generate_pdf_report']
+
+
+def __getattr__(name):
+    # 按需导入: 导入任意 utils 子模块时不加载 reportlab
+    if name == 'generate_pdf_report':
+        from .pdf_generator import generate_pdf_report
+        return generate_pdf_report
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
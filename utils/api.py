@@ -0,0 +1,506 @@
+"""
+无界面 HTTP 接口 (Headless API)
+下游系统无需运行 Streamlit 脚本即可获取评分、定价、供应链路径和 PDF 报告。
+基于 asyncio 的 HTTP/1.1 服务 (标准库实现, 支持 keep-alive), 与 app.py 共用
+CompanyRegistry / DataCache / scoring / supply_graph / report_cache:
+- 索引类请求在事件循环内直接应答 (只读内存索引); 目录同步 (refresh)、公司文件读取、供应链图构建与
+  PDF 渲染放入线程池, 不阻塞其他连接; 请求按当前索引应答, 目录变化在后台同步后生效
+- JSON 响应按 (路径, 参数, 索引版本) 缓存并带 ETag, If-None-Match 命中返回 304
+- 单公司 PDF 以报告缓存键作为 ETag, 304 时无需渲染; 组合合并报告以分块编码流式返回
+
+接口:
+    GET /health
+    GET /companies                         公司索引
+    GET /companies/{code}                  索引条目 + 评分
+    GET /scores                            全组合 E/S/综合分与评级
+    GET /scores/{code}
+    GET /pricing/{code}?loan=1000&base_rate=4.35
+    GET /supply-chain/{code}?max_up=2&max_down=2&limit=5
+    GET /events/search?q=CBP&year_from=2018&year_to=2024&severity=3,4&source=cbp&kind=soc&code=FGV&limit=20
+    GET /reports/{code}.pdf
+    GET /reports/portfolio.pdf?codes=FGV,IOI
+    GET /metrics                           Prometheus 文本格式运行指标 (--metrics 开启, 否则 404)
+
+命令行: python -m utils.api --host 127.0.0.1 --port 8601 [--metrics]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from . import metrics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8601
+KEEP_ALIVE_SECONDS = 15
+MAX_HEADER_LINES = 100
+RESPONSE_CACHE_ENTRIES = 512
+
+STATUS_TEXT = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Response:
+    """body 为字节; stream 为异步字节块迭代器 (分块编码), 二者取其一"""
+
+    __slots__ = ('status', 'body', 'content_type', 'etag', 'headers', 'stream')
+
+    def __init__(self, status=200, body=b'', content_type="application/json; charset=utf-8", etag=None,
+                 headers=None, stream=None):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.etag = etag
+        self.headers = headers or {}
+        self.stream = stream
+
+
+def json_response(payload, status=200):
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':'), allow_nan=False).encode('utf-8')
+    return Response(status, body, etag='"%s"' % hashlib.sha1(body).hexdigest())
+
+
+def _param(query, name, default, cast=float):
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        value = cast(values[0])
+    except ValueError:
+        raise HTTPError(400, f"参数 {name} 无效: {values[0]!r}")
+    if isinstance(value, float) and not math.isfinite(value):
+        raise HTTPError(400, f"参数 {name} 必须是有限数值: {values[0]!r}")
+    return value
+
+
+def _score(value):
+    """生效评分 (NumPy 浮点或 JSON 中的数值) 转为 JSON 数值, 整数分输出为 int"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+# --- 1. 业务接口 ---
+
+class GreenLinkAPI:
+    """路由与处理函数; 不涉及网络, 便于在脚本中直接调用"""
+
+    def __init__(self, data_dir=DATA_DIR, registry=None, workers=4):
+        from .cache import DataCache
+        from .registry import CompanyRegistry
+
+        if registry is None:
+            cache = DataCache()
+            metrics.register_collector("data_cache", metrics.stats_collector(
+                "greenlink_data_cache", cache.stats, "Company section cache"))
+            registry = CompanyRegistry(data_dir, cache=cache)
+        self.registry = registry
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="greenlink-api")
+        self._graph = None
+        self._graph_generation = None
+        self._graph_lock = threading.Lock()
+        self._events = None
+        self._events_lock = threading.Lock()
+        self._responses = OrderedDict()     # (路径, 参数, 索引版本) -> Response
+        self._refresh = None                # 后台 registry.refresh() 的 Future
+        self.routes = [
+            (re.compile(r'^/health$'), self.health, False),
+            (re.compile(r'^/companies$'), self.companies, False),
+            (re.compile(r'^/companies/([^/]+)$'), self.company, True),
+            (re.compile(r'^/scores$'), self.scores, True),
+            (re.compile(r'^/scores/([^/]+)$'), self.company_score, True),
+            (re.compile(r'^/pricing/([^/]+)$'), self.pricing, True),
+            (re.compile(r'^/supply-chain/([^/]+)$'), self.supply_chain, True),
+            (re.compile(r'^/events/search$'), self.event_search, True),
+            (re.compile(r'^/reports/portfolio\.pdf$'), self.portfolio_pdf, None),
+            (re.compile(r'^/reports/([^/]+)\.pdf$'), self.company_pdf, None),
+            (re.compile(r'^/metrics$'), self.metrics_text, None),
+        ]
+
+    def _code(self, code):
+        if code not in self.registry:
+            raise HTTPError(404, f"未收录的公司代码: {code}")
+        return code
+
+    def graph(self):
+        """
+        供应链图随 (索引版本, 评估日期) 同步 (线程池中调用): 拓扑变化时重建,
+        否则只对生效评分变化的公司经 update_score 增量推送
+        """
+        from .scoring import shared_scorer
+        from .supply_graph import update_graph
+
+        with self._graph_lock:
+            scorer = shared_scorer(self.registry)
+            state = (self.registry.generation, scorer.as_of)
+            if self._graph is None or self._graph_generation != state:
+                self._graph, _ = update_graph(self._graph, self.registry, scorer)
+                self._graph_generation = state
+            return self._graph
+
+    # ---- JSON 接口 (返回可序列化对象) ----
+
+    def health(self, query):
+        return {"status": "ok", "companies": len(self.registry), "generation": self.registry.generation}
+
+    def companies(self, query):
+        return [self.registry.info(code) for code in self.registry.codes()]
+
+    def company(self, query, code):
+        info = self.registry.info(self._code(code))
+        info["score"] = self.company_score(query, code)
+        return info
+
+    def effective_score(self, code):
+        """
+        生效 (E, S): 事件衰减评分, 缺失章节取 JSON 评分 (与 app / PDF / 报告同一口径);
+        首次调用与索引版本变化后需要加载公司档案, 因此评分类路由都在线程池中执行
+        """
+        from .scoring import effective_score, shared_scorer
+
+        info = self.registry.info(self._code(code))
+        env, soc = effective_score(shared_scorer(self.registry), code, (info['env_score'], info['soc_score']))
+        return _score(env), _score(soc)
+
+    def scores(self, query):
+        from .scoring import RATING_NAMES_EN, effective_scores, score_portfolio
+
+        codes, env, soc = effective_scores(self.registry)
+        result = score_portfolio(env, soc)
+        return [{"code": code, "env_score": _score(env[i]), "soc_score": _score(soc[i]),
+                 "total_score": float(result['total_score'][i]), "band": int(result['band'][i]),
+                 "rating": RATING_NAMES_EN[result['band'][i]], "high_exposure": bool(result['high_exposure'][i])}
+                for i, code in enumerate(codes)]
+
+    def company_score(self, query, code):
+        from .scoring import score_company
+
+        env, soc = self.effective_score(code)
+        result = score_company(env, soc)
+        return {"code": code, "env_score": env, "soc_score": soc,
+                "total_score": result['total_score'], "band": result['band'],
+                "rating": result['rating_name_en'], "high_exposure": result['high_exposure']}
+
+    def pricing(self, query, code):
+        from .scoring import BASE_RATE, score_company
+
+        env, soc = self.effective_score(code)
+        loan = _param(query, 'loan', 0.0)
+        base_rate = _param(query, 'base_rate', BASE_RATE)
+        result = score_company(env, soc, loan, base_rate)
+        result.update(code=code, loan_amount=loan, base_rate=base_rate)
+        return result
+
+    def supply_chain(self, query, code):
+        graph = self.graph()
+        self._code(code)
+        node = graph.node_id(code)
+        paths = graph.paths_through(node, _param(query, 'max_up', 2, int), _param(query, 'max_down', 2, int),
+                                    _param(query, 'limit', 5, int))
+
+        def describe(n):
+            return {"name": graph.nodes[n], "code": graph.codes[n],
+                    "propagated_risk": round(float(graph.propagated[n]), 2)}
+
+        return {
+            "node": graph.node_info(node),
+            "upstream": [describe(n) for n in graph.upstream(node)],
+            "downstream": [describe(n) for n in graph.downstream(node)],
+            "paths": [[graph.nodes[n] for n in path] for path in paths],
+        }
+
+    def event_search(self, query):
+        """
+        全组合关键事件检索 (线程池中调用); 倒排索引随索引版本增量同步
+        首次查询与索引版本变化后需要加载公司档案, 不能放在事件循环线程上; 同步与查询共用一把锁
+        """
+        from .event_index import EventIndex, parse_severities
+
+        try:
+            severities = parse_severities(','.join(query.get('severity', ())))
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+        def words(name):
+            return [w for value in query.get(name, ()) for w in value.split(',') if w]
+
+        with self._events_lock:
+            if self._events is None:
+                self._events = EventIndex()
+            self._events.update(self.registry)
+            total, hits = self._events.search(
+                _param(query, 'q', '', str), _param(query, 'year_from', None, int),
+                _param(query, 'year_to', None, int), severities, _param(query, 'source', None, str),
+                words('kind'), words('code'), max(1, min(_param(query, 'limit', 20, int), 200)))
+        return {"total": total, "results": hits}
+
+    # ---- PDF 接口 (返回 Response) ----
+
+    async def company_pdf(self, query, headers, code):
+        from .report_cache import cached_pdf_report, report_key
+        from .scoring import effective_profile, shared_scorer
+
+        loop = asyncio.get_running_loop()
+        self._code(code)
+
+        def prepare():
+            # load 会 stat / 重建条目, 与档案编译、生效评分和 report_key 一起放在线程池
+            record = self.registry.load(code)
+            profile = effective_profile(self.registry.profile(code), shared_scorer(self.registry))
+            return record, profile, report_key(record, profile)
+
+        record, profile, key = await loop.run_in_executor(self.executor, prepare)
+        etag = '"%s"' % key
+        disposition = {"Content-Disposition": f'attachment; filename="{code}_ESG_Report.pdf"'}
+        if etag in _etags(headers):
+            return Response(304, etag=etag, headers=disposition)
+
+        def render():
+            return cached_pdf_report(record, profile)
+
+        pdf = await loop.run_in_executor(self.executor, render)
+        return Response(200, pdf.getvalue(), "application/pdf", etag, disposition)
+
+    async def portfolio_pdf(self, query, headers):
+        from .pdf_stream import iter_portfolio_pdf, registry_items
+
+        codes = [c for value in query.get('codes', ()) for c in value.split(',') if c]
+        for code in codes:
+            self._code(code)
+        chunks = iter_portfolio_pdf(registry_items(self.registry, codes or None))
+        loop = asyncio.get_running_loop()
+
+        async def stream():
+            # 每家公司的渲染在线程池中完成, 事件循环只负责写出
+            while True:
+                chunk = await loop.run_in_executor(self.executor, next, chunks, None)
+                if chunk is None:
+                    return
+                yield chunk
+
+        return Response(200, content_type="application/pdf", stream=stream(),
+                        headers={"Content-Disposition": 'attachment; filename="greenlink_portfolio_report.pdf"'})
+
+    async def metrics_text(self, query, headers):
+        if not metrics.enabled():
+            raise HTTPError(404, "运行指标未开启 (--metrics 或 GREENLINK_METRICS=1)")
+        return Response(200, metrics.render().encode('utf-8'), metrics.CONTENT_TYPE)
+
+    # ---- 分发 ----
+
+    def _schedule_refresh(self):
+        """在线程池中同步目录 (refresh 自带节流), 同一时间最多一个; 事件循环不等待扫描完成"""
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.get_running_loop().run_in_executor(self.executor, self.registry.refresh)
+            self._refresh.add_done_callback(_report_refresh_error)
+
+    async def dispatch(self, method, target, headers):
+        if method not in ("GET", "HEAD"):
+            raise HTTPError(405, f"不支持的方法: {method}")
+        url = urlsplit(target)
+        path = unquote(url.path).rstrip('/') or '/'
+        query = parse_qs(url.query)
+        self._schedule_refresh()
+
+        for pattern, handler, blocking in self.routes:
+            match = pattern.match(path)
+            if not match:
+                continue
+            if blocking is None:
+                return await handler(query, headers, *match.groups())
+
+            key = (path, tuple(sorted((k, tuple(v)) for k, v in query.items())), self.registry.generation)
+            response = self._responses.get(key)
+            if response is None:
+                if blocking:
+                    loop = asyncio.get_running_loop()
+                    payload = await loop.run_in_executor(self.executor, handler, query, *match.groups())
+                else:
+                    payload = handler(query, *match.groups())
+                response = json_response(payload)
+                self._responses[key] = response
+                if len(self._responses) > RESPONSE_CACHE_ENTRIES:
+                    self._responses.popitem(last=False)
+            else:
+                self._responses.move_to_end(key)
+            if response.etag in _etags(headers):
+                return Response(304, etag=response.etag)
+            return response
+        raise HTTPError(404, f"未知路径: {path}")
+
+
+def _report_refresh_error(future):
+    if not future.cancelled() and future.exception() is not None:
+        error = future.exception()
+        print(f"✗ 目录同步失败 (Refresh failed): {type(error).__name__}: {error}")
+
+
+def _route_label(target):
+    """按首段路径归类 (/reports/FGV.pdf -> /reports), 避免公司代码成为标签取值"""
+    head = urlsplit(target).path.strip('/').split('/', 1)[0]
+    return f"/{head}"
+
+
+def _observe_request(target, status, start):
+    # 流式响应只计到响应头就绪为止; 合并报告的渲染耗时见 greenlink_pdf_render_seconds
+    route = _route_label(target)
+    metrics.inc("greenlink_http_requests_total", route=route, status=str(status))
+    metrics.observe("greenlink_http_request_seconds", time.perf_counter() - start, route=route)
+
+
+def _etags(headers):
+    return {tag.strip() for tag in headers.get('if-none-match', '').split(',') if tag.strip()}
+
+
+# --- 2. HTTP 服务 ---
+
+async def _read_request(reader):
+    """读取请求行与请求头; 连接关闭返回 None"""
+    line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_SECONDS)
+    if not line.strip():
+        return None
+    parts = line.decode('latin-1').split()
+    if len(parts) != 3:
+        raise HTTPError(400, "请求行格式错误")
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(400, "请求头过多")
+    if headers.get('content-length'):
+        length = headers['content-length']
+        if not (length.isascii() and length.isdigit()):
+            raise HTTPError(400, f"Content-Length 无效: {length!r}")
+        await reader.readexactly(int(length))   # 只支持 GET/HEAD, 请求体丢弃
+    return parts[0].upper(), parts[1], parts[2], headers
+
+
+async def _write_response(writer, response, keep_alive, head=False):
+    lines = [f"HTTP/1.1 {response.status} {STATUS_TEXT.get(response.status, '')}",
+             f"Date: {formatdate(usegmt=True)}",
+             "Server: GreenLink",
+             f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    if response.etag:
+        lines.append(f"ETag: {response.etag}")
+        lines.append("Cache-Control: no-cache")          # 每次都需要用 ETag 验证
+    lines.extend(f"{k}: {v}" for k, v in response.headers.items())
+    if response.status != 304:
+        lines.append(f"Content-Type: {response.content_type}")
+    if response.stream is not None:
+        lines.append("Transfer-Encoding: chunked")
+    else:
+        lines.append(f"Content-Length: {len(response.body) if response.status != 304 else 0}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+
+    if response.stream is not None:
+        async for chunk in response.stream:
+            if chunk and not head:
+                writer.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                await writer.drain()
+        if not head:
+            writer.write(b'0\r\n\r\n')
+    elif response.status != 304 and not head:
+        writer.write(response.body)
+    await writer.drain()
+
+
+class APIServer:
+    """asyncio 连接处理: 每个连接一个协程, 同一连接上的请求按顺序处理 (HTTP/1.1 keep-alive)"""
+
+    def __init__(self, api=None, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.api = api or GreenLinkAPI()
+        self.host = host
+        self.port = port
+        self.server = None
+        self.requests = 0
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                keep_alive = False
+                request = None
+                try:
+                    request = await _read_request(reader)
+                    if request is None:
+                        break
+                    method, target, version, headers = request
+                    connection = headers.get('connection', '').lower()
+                    keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+                    start = time.perf_counter()
+                    response = await self.api.dispatch(method, target, headers)
+                except HTTPError as e:
+                    response = json_response({"error": e.message}, e.status)
+                    response.etag = None
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    print(f"✗ 请求处理失败 (Request failed): {type(e).__name__}: {e}")
+                    response = json_response({"error": "internal error"}, 500)
+                    response.etag = None
+                self.requests += 1
+                if request is not None and metrics.enabled():
+                    _observe_request(request[1], response.status, start)
+                await _write_response(writer, response, keep_alive, head=request is not None and request[0] == "HEAD")
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]      # port=0 时取实际端口
+        return self.server
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"GreenLink API 已启动: http://{self.host}:{self.port} ({len(self.api.registry)} 家公司)", flush=True)
+        async with self.server:
+            await self.server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GreenLink 无界面 HTTP 接口")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('-j', '--workers', type=int, default=4, help="PDF 渲染 / 图计算线程数")
+    parser.add_argument('--metrics', action='store_true', help="记录运行指标并开放 GET /metrics")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        metrics.enable()
+
+    server = APIServer(GreenLinkAPI(args.data_dir, workers=args.workers), args.host, args.port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
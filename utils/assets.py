@@ -0,0 +1,171 @@
+"""
+影像资源流水线 (Image Asset Pipeline)
+为卫星证据图片一次性生成多分辨率、重新编码的变体 (WebP / JPEG, 多个宽度),
+按内容哈希存放在 .cache/assets/<hash>/, 之后:
+- app.py 的 st.image 选择刚好覆盖显示宽度的最小变体
+- docs/ 站点页面 (utils.site_builder 生成) 通过 srcset 引用带哈希的文件名
+- PDF 嵌入 JPEG 变体 (ReportLab 可直接透传 DCT 数据)
+
+命令行: python -m utils.assets --docs   生成变体并重新构建 docs/ 站点
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+
+from .fscache import Fingerprints
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSET_CACHE_DIR = os.path.join(BASE_DIR, '.cache', 'assets')
+DOCS_DIR = os.path.join(BASE_DIR, 'docs')
+DOCS_IMG_DIR = os.path.join(DOCS_DIR, 'img')
+SATELLITE_DIR = os.path.join(BASE_DIR, 'assets', 'satellite_images')
+
+# --- 1. 变体配置 ---
+
+PIPELINE_VERSION = 1
+VARIANT_WIDTHS = (320, 480, 640, 960, 1280)
+FORMATS = {
+    "webp": {"ext": "webp", "pil": "WEBP", "options": {"quality": 80, "method": 6}},
+    "jpeg": {"ext": "jpg", "pil": "JPEG", "options": {"quality": 82, "optimize": True, "progressive": True}},
+}
+
+_fingerprints = Fingerprints()
+
+
+def content_hash(path):
+    """文件内容哈希 (前 16 位), mtime/size 不变时不重复读取"""
+    return _fingerprints.get(path)[:16]
+
+
+# --- 2. 生成变体 ---
+
+def build_variants(path, widths=VARIANT_WIDTHS, formats=tuple(FORMATS)):
+    """
+    生成 (或读取已有的) 变体清单:
+    {"source", "hash", "width", "height", "variants": [{"width", "height", "format", "path", "bytes"}]}
+    只生成小于原图宽度的档位, 另加一档原始宽度
+    """
+    from PIL import Image
+
+    digest = content_hash(path)
+    out_dir = os.path.join(ASSET_CACHE_DIR, digest)
+    manifest_path = os.path.join(out_dir, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == PIPELINE_VERSION:
+            for variant in manifest['variants']:
+                variant['path'] = os.path.join(out_dir, variant['file'])
+            return manifest
+
+    os.makedirs(out_dir, exist_ok=True)
+    with Image.open(path) as im:
+        image = im.convert('RGB')
+
+    sizes = sorted({w for w in widths if w < image.width} | {image.width})
+    variants = []
+    for width in sizes:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for fmt in formats:
+            spec = FORMATS[fmt]
+            filename = f"{width}.{spec['ext']}"
+            out_path = os.path.join(out_dir, filename)
+            resized.save(out_path, spec['pil'], **spec['options'])
+            variants.append({"width": width, "height": height, "format": fmt,
+                             "file": filename, "bytes": os.path.getsize(out_path)})
+
+    manifest = {
+        "version": PIPELINE_VERSION,
+        "source": os.path.basename(path),
+        "hash": digest,
+        "width": image.width,
+        "height": image.height,
+        "source_bytes": os.path.getsize(path),
+        "variants": variants,
+    }
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+    for variant in variants:
+        variant['path'] = os.path.join(out_dir, variant['file'])
+    return manifest
+
+
+def pick_variant(path, display_width, fmt="webp", density=1.0):
+    """
+    返回宽度不小于 display_width * density 的最小变体路径;
+    都不够宽时返回最大变体。生成失败时退回原图
+    """
+    try:
+        manifest = build_variants(path)
+    except (OSError, ValueError):
+        return path
+    needed = display_width * density
+    candidates = sorted((v for v in manifest['variants'] if v['format'] == fmt), key=lambda v: v['width'])
+    if not candidates:
+        return path
+    for variant in candidates:
+        if variant['width'] >= needed:
+            return variant['path']
+    return candidates[-1]['path']
+
+
+# --- 3. 发布到 docs/ ---
+
+def publish(path, out_dir, fmt="webp"):
+    """
+    把变体以带内容哈希的文件名复制到 out_dir (如 IOI_2012-1a2b3c4d-640.webp),
+    返回 [(宽度, 文件名)] 按宽度升序
+    """
+    manifest = build_variants(path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    os.makedirs(out_dir, exist_ok=True)
+    published = []
+    for variant in sorted((v for v in manifest['variants'] if v['format'] == fmt), key=lambda v: v['width']):
+        name = f"{stem}-{manifest['hash'][:8]}-{variant['width']}.{FORMATS[fmt]['ext']}"
+        target = os.path.join(out_dir, name)
+        if not os.path.exists(target):
+            shutil.copyfile(variant['path'], target)
+        published.append((variant['width'], name))
+
+    # 清理同一图片旧版本 (内容哈希不同) 的变体
+    current = {name for _, name in published}
+    stale = re.compile(rf"{re.escape(stem)}-[0-9a-f]{{8}}-\d+\.\w+$")
+    for name in os.listdir(out_dir):
+        if stale.match(name) and name not in current:
+            os.remove(os.path.join(out_dir, name))
+    return published
+
+
+def srcset_attrs(published, prefix, sizes="(max-width: 768px) 100vw, 50vw", default_width=640):
+    """生成 <img> 的 src / srcset / sizes 属性文本"""
+    default = next((name for width, name in published if width >= default_width), published[-1][1])
+    srcset = ", ".join(f"{prefix}{name} {width}w" for width, name in published)
+    return f'src="{prefix}{default}" srcset="{srcset}" sizes="{sizes}" loading="lazy" decoding="async"'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成卫星影像多分辨率变体")
+    parser.add_argument('--docs', action='store_true', help="生成变体后增量构建 docs/ 站点 (utils.site_builder)")
+    args = parser.parse_args(argv)
+
+    images = sorted(os.path.join(SATELLITE_DIR, f) for f in os.listdir(SATELLITE_DIR))
+    for path in images:
+        manifest = build_variants(path)
+        smallest = min(v['bytes'] for v in manifest['variants'])
+        print(f"✓ {manifest['source']}: {len(manifest['variants'])} 个变体, "
+              f"原图 {manifest['source_bytes'] // 1024} KB, 最小变体 {smallest // 1024} KB")
+    if args.docs:
+        from .site_builder import main as build_site
+
+        build_site([])
+
+
+if __name__ == '__main__':
+    main()
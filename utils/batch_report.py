@@ -0,0 +1,154 @@
+"""
+批量报告生成 (Batch PDF Reports)
+月末为组合内所有公司生成 ESG 报告: 公司文件分发到进程池并行渲染,
+每个 worker 启动时注册一次字体, 结果按完成顺序写入 zip 或输出目录,
+并记录每份报告的耗时与失败原因
+
+命令行:
+    python -m utils.batch_report                      # data/ 下全部公司 -> reports/
+    python -m utils.batch_report data/FGV.json -o month_end.zip -j 8
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+import traceback
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'reports')
+
+
+def report_name(path):
+    """data/FGV.json -> FGV_ESG_Report.pdf"""
+    return f"{os.path.splitext(os.path.basename(path))[0]}_ESG_Report.pdf"
+
+
+# --- 1. Worker ---
+
+def _init_worker():
+    """进程启动时执行一次: 注册字体, 之后的任务直接复用"""
+    from .pdf_generator import ensure_fonts
+    ensure_fonts()
+
+
+def render_file(path, out_dir=None, use_cache=True):
+    """
+    渲染单个公司文件; 在 worker 进程中执行
+    out_dir 给定时直接写文件 (避免 PDF 字节回传主进程), 否则返回 PDF 字节
+    use_cache=True 时数据未变化的公司直接取 report_cache 中已渲染的报告
+    返回结果 dict: file, name, bytes, seconds, cached, error, pdf
+    """
+    from .pdf_generator import generate_pdf_report
+    from .report_cache import ReportCache
+    from .schema import compile_company
+    from .scoring import effective_profile
+
+    name = report_name(path)
+    result = {"file": path, "name": name, "bytes": 0, "seconds": 0.0, "cached": False,
+              "error": None, "pdf": None}
+    start = time.perf_counter()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        code = os.path.splitext(os.path.basename(path))[0]
+        profile = effective_profile(compile_company(data, code))
+        if use_cache:
+            pdf, result["cached"] = ReportCache().get_or_render(data, profile, render=generate_pdf_report)
+        else:
+            pdf = generate_pdf_report(data, profile).getvalue()
+        result["bytes"] = len(pdf)
+        if out_dir:
+            tmp_path = os.path.join(out_dir, f".{name}.{os.getpid()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                f.write(pdf)
+            os.replace(tmp_path, os.path.join(out_dir, name))
+        else:
+            result["pdf"] = pdf
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc()
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+# --- 2. 批量入口 ---
+
+def generate_batch(paths, output=DEFAULT_OUTPUT, workers=None, on_result=None, use_cache=True):
+    """
+    并行生成多份报告
+    output 以 .zip 结尾时写入 zip (主进程按完成顺序逐个追加), 否则写入该目录
+    on_result(result, done, total) 在每份报告完成时回调, 可用于进度显示
+    返回汇总 dict: results (不含 PDF 字节), ok, failed, cached, seconds, reports_per_second
+    """
+    paths = list(paths)
+    to_zip = str(output).lower().endswith('.zip')
+    if to_zip:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        archive = zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED)   # PDF 已压缩
+    else:
+        os.makedirs(output, exist_ok=True)
+        archive = None
+
+    results = []
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, max(1, len(paths))),
+                                 initializer=_init_worker) as pool:
+            futures = [pool.submit(render_file, path, None if to_zip else output, use_cache) for path in paths]
+            for future in as_completed(futures):
+                result = future.result()
+                pdf = result.pop("pdf")
+                if archive is not None and pdf is not None:
+                    archive.writestr(result["name"], pdf)
+                results.append(result)
+                if on_result:
+                    on_result(result, len(results), len(paths))
+    finally:
+        if archive is not None:
+            archive.close()
+
+    elapsed = time.perf_counter() - start
+    failed = [r for r in results if r["error"]]
+    results.sort(key=lambda r: r["name"])
+    return {
+        "output": output,
+        "results": results,
+        "ok": len(results) - len(failed),
+        "failed": len(failed),
+        "cached": sum(1 for r in results if r["cached"]),
+        "workers": workers,
+        "seconds": elapsed,
+        "reports_per_second": len(results) / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量生成 ESG PDF 报告")
+    parser.add_argument('files', nargs='*', help="公司 JSON 文件 (默认 data/*.json)")
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help="输出目录或 .zip 文件")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="进程数 (默认 CPU 核数)")
+    parser.add_argument('--no-cache', action='store_true', help="忽略报告缓存, 全部重新渲染")
+    args = parser.parse_args(argv)
+
+    files = args.files or sorted(glob.glob(os.path.join(DATA_DIR, '*.json')))
+
+    def report(result, done, total):
+        status = f"✗ {result['error']}" if result['error'] else \
+            f"✓ {result['bytes'] // 1024} KB" + (" (缓存)" if result['cached'] else "")
+        print(f"[{done}/{total}] {result['name']:<32} {result['seconds'] * 1000:7.0f} ms  {status}")
+
+    summary = generate_batch(files, args.output, args.workers, on_result=report, use_cache=not args.no_cache)
+    print(f"完成: {summary['ok']} 成功 ({summary['cached']} 份来自缓存), {summary['failed']} 失败, "
+          f"{summary['seconds']:.1f} s, {summary['reports_per_second']:.1f} 份/秒 "
+          f"({summary['workers']} 进程) -> {summary['output']}")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
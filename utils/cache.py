@@ -0,0 +1,204 @@
+"""
+数据缓存层 (Data Cache)
+以 文件内容哈希 + 章节名 为键缓存已解码的公司数据章节:
+- 进程内: 有内存预算的 LRU, 命中时返回只读视图, 不做深拷贝
+- 主机内: 同一台机器上所有 Streamlit worker 共享的磁盘层 (优先 /dev/shm)
+文件被分析师编辑后内容哈希改变, 旧条目自然失效; 仅 touch 不改内容则继续命中
+"""
+
+import hashlib
+import os
+import pickle
+import stat
+import tempfile
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+
+from .fscache import Fingerprints, evict_lru
+
+# --- 1. 配置 ---
+
+DEFAULT_MEMORY_BYTES = 64 * 1024 * 1024
+DEFAULT_SHARED_BYTES = 256 * 1024 * 1024
+
+
+def default_shared_dir():
+    """共享层目录: 优先使用内存盘 /dev/shm, 按用户隔离"""
+    root = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    uid = os.getuid() if hasattr(os, 'getuid') else 'user'
+    return os.path.join(root, f'greenlink-cache-{uid}')
+
+
+def secure_shared_dir(path):
+    """
+    创建并检查共享层目录, 返回是否可以使用
+    共享层会 pickle.loads 目录中的文件, 而 /dev/shm 下的路径可被其他本地用户抢先创建:
+    目录必须是真实目录 (不是符号链接)、属于当前用户且权限为 0700, 否则禁用共享层
+    """
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        st = os.lstat(path)
+    except OSError:
+        return False
+    if not stat.S_ISDIR(st.st_mode):
+        return False
+    if hasattr(os, 'getuid') and (st.st_uid != os.getuid() or stat.S_IMODE(st.st_mode) != 0o700):
+        return False
+    return True
+
+
+# --- 2. 只读视图 ---
+
+def freeze(value):
+    """把 json 解码结果转换为只读结构: dict -> MappingProxyType, list -> tuple"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """只读结构转回普通 dict/list (需要修改或 json 序列化时使用)"""
+    if isinstance(value, MappingProxyType):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+# --- 3. 缓存实现 ---
+
+class DataCache:
+    """
+    两级缓存: 进程内 LRU (只读视图) + 主机共享磁盘层 (pickle, 目录须为当前用户独占, 见 secure_shared_dir)
+    stats() 返回命中/未命中/淘汰计数, 用于确定内存预算
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MEMORY_BYTES, shared_dir=None,
+                 shared_max_bytes=DEFAULT_SHARED_BYTES):
+        self.max_bytes = max_bytes
+        self.shared_dir = shared_dir if shared_dir is not None else default_shared_dir()
+        self.shared_max_bytes = shared_max_bytes
+        if self.shared_dir and not secure_shared_dir(self.shared_dir):
+            print(f"⚠️ 共享缓存目录不安全 (not owned by this user or not 0700), 已禁用共享层: {self.shared_dir}")
+            self.shared_dir = ''
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()     # key -> (只读值, 字节数)
+        self._bytes = 0
+        self._fingerprints = Fingerprints(on_change=lambda path: self._count('invalidations'))
+        self._counters = {
+            "hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "shared_evictions": 0,
+            "invalidations": 0,
+        }
+
+    # ---- 文件指纹 ----
+
+    def content_hash(self, path):
+        """文件内容哈希; mtime/size 未变化时复用上次结果, 不重新读文件"""
+        return self._fingerprints.get(path)
+
+    # ---- 主接口 ----
+
+    def get(self, path, section, loader):
+        """
+        返回 path 文件中 section 章节的只读视图
+        loader() 仅在两级缓存都未命中时调用, 应返回 json 解码后的原始值
+        """
+        digest = self.content_hash(path)
+        key = hashlib.sha256(f"{digest}\0{section}".encode('utf-8')).hexdigest()
+
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                return item[0]
+
+        payload = self._read_shared(key)
+        if payload is not None:
+            self._count('shared_hits')
+            raw = pickle.loads(payload)
+        else:
+            self._count('misses')
+            raw = loader()
+            payload = pickle.dumps(raw, protocol=pickle.HIGHEST_PROTOCOL)
+            self._write_shared(key, payload)
+
+        value = freeze(raw)
+        self._put(key, value, len(payload))
+        return value
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+
+    def _put(self, key, value, size):
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self._counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+            stats['max_bytes'] = self.max_bytes
+        lookups = stats['hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['shared_hits']) / lookups if lookups else 0.0
+        return stats
+
+    # ---- 共享磁盘层 ----
+
+    def _shared_path(self, key):
+        return os.path.join(self.shared_dir, f"{key}.pkl")
+
+    def _read_shared(self, key):
+        if not self.shared_dir:
+            return None
+        path = self._shared_path(key)
+        try:
+            with open(path, 'rb') as f:
+                payload = f.read()
+            os.utime(path)  # 刷新 mtime, 作为 LRU 时间戳
+            return payload
+        except OSError:
+            return None
+
+    def _write_shared(self, key, payload):
+        if not self.shared_dir:
+            return
+        path = self._shared_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict_shared()
+
+    def _evict_shared(self):
+        """共享层超出预算时按 mtime 从旧到新删除, 多进程通过文件锁串行化"""
+        evicted = evict_lru(self.shared_dir, '.pkl', self.shared_max_bytes)
+        if evicted:
+            self._count('shared_evictions', evicted)
@@ -0,0 +1,295 @@
+"""
+卫星影像变化检测 (Satellite Change Detection)
+读取 before / mid / after 影像 (PNG / WebP / GeoTIFF, 尺寸各异, 经 raster_store 分块读取),
+对齐到同一网格, 用向量化 NumPy 把像素分为 植被 / 裸土 / 其他, 统计每个时段的森林损失面积与比例
+分析在原始分辨率 (level 0) 上进行: 网格按块流式读取相交的栅格切片, 各块多线程并行分类
+(NumPy 运算期间释放 GIL), 峰值内存与场景大小无关, 不再整幅缩小到固定边长
+结果按影像内容哈希缓存在 .cache/change_detection/ (目录只读时跳过缓存)
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .fscache import Fingerprints
+from .raster_store import open_scene
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(BASE_DIR, '.cache', 'change_detection')
+
+# --- 1. 分类参数 ---
+
+CLASS_OTHER = 0
+CLASS_VEGETATION = 1
+CLASS_BARE_SOIL = 2
+
+ALGORITHM_VERSION = 4
+DEFAULT_PARAMS = {
+    "exg_vegetation": 0.05,     # 过绿指数 ExG = 2g - r - b (色度坐标) 高于此值为植被
+    "soil_redness": 0.03,       # 裸土: r - b 色度差高于此值且非植被
+    "soil_min_brightness": 0.15,
+    "soil_max_brightness": 0.90,
+    "block_side": 1024,         # 分块分类的块边长 (网格像素); 每块各期影像只读取相交的切片
+}
+
+_YEAR_RE = re.compile(r'_(\d{4})\.\w+$')
+_EVIDENCE_KEYS = ('satellite_image_before', 'satellite_image_mid', 'satellite_image_after')
+
+
+# --- 2. 读取与对齐 ---
+
+_fingerprints = Fingerprints()
+
+
+def image_hash(path):
+    """影像内容哈希, mtime/size 不变时不重复读取"""
+    return _fingerprints.get(path)
+
+
+def image_year(path):
+    match = _YEAR_RE.search(os.path.basename(path))
+    return int(match.group(1)) if match else None
+
+
+def _center_crop_box(size, aspect):
+    """按目标宽高比居中裁剪"""
+    width, height = size
+    if width / height > aspect:
+        new_width = int(round(height * aspect))
+        left = (width - new_width) // 2
+        return left, 0, left + new_width, height
+    new_height = int(round(width / aspect))
+    top = (height - new_height) // 2
+    return 0, top, width, top + new_height
+
+
+def to_rgb(window):
+    """
+    (H, W, bands) uint8 -> (H, W, 3): 三个及以上波段取前三个 (RGBA 去掉 alpha);
+    一或两个波段 (灰度 / 灰度 + alpha) 取第一个波段复制为三通道
+    """
+    if window.shape[2] >= 3:
+        return window[..., :3]
+    return np.repeat(window[..., :1], 3, axis=2)
+
+
+class AlignedGrid:
+    """
+    多期影像的公共分析网格: 先按各影像的平均宽高比居中裁剪, 网格取最小的裁剪尺寸 (原始分辨率)
+    read_block 从各期影像的 level 0 切片读取网格块对应的窗口,
+    裁剪尺寸更大的影像缩放到网格块
+    """
+
+    def __init__(self, paths):
+        self.scenes = [open_scene(path) for path in paths]
+        aspect = float(np.mean([sc.width / sc.height for sc in self.scenes]))
+        self.boxes = [_center_crop_box((sc.width, sc.height), aspect) for sc in self.scenes]
+        self.width = min(right - left for left, _, right, _ in self.boxes)
+        self.height = min(bottom - top for _, top, _, bottom in self.boxes)
+
+    def __len__(self):
+        return len(self.scenes)
+
+    @property
+    def shape(self):
+        return self.height, self.width
+
+    def blocks(self, side):
+        """网格分块 [(top, left, bottom, right)]"""
+        return [(top, left, min(top + side, self.height), min(left + side, self.width))
+                for top in range(0, self.height, side) for left in range(0, self.width, side)]
+
+    def read_block(self, index, top, left, bottom, right):
+        """第 index 期影像在网格块上的 RGB, float32 (h, w, 3), 取值 0~1"""
+        from PIL import Image
+
+        scene, (x0, y0, x1, y1) = self.scenes[index], self.boxes[index]
+        sx, sy = (x1 - x0) / self.width, (y1 - y0) / self.height
+        window = to_rgb(scene.read_window(round(x0 + left * sx), round(y0 + top * sy),
+                                          round(x0 + right * sx), round(y0 + bottom * sy), level=0))
+        if window.shape[:2] != (bottom - top, right - left):
+            window = np.asarray(Image.fromarray(np.ascontiguousarray(window)).resize(
+                (right - left, bottom - top), Image.BILINEAR))
+        return window.astype(np.float32) / 255.0
+
+
+# --- 3. 像素分类 ---
+
+def classify(rgb, params=DEFAULT_PARAMS):
+    """RGB (H, W, 3) -> 类别 (H, W) uint8, 全部为向量化运算"""
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    total = r + g + b
+    safe_total = np.where(total > 0, total, 1.0)
+    rn, gn, bn = r / safe_total, g / safe_total, b / safe_total
+    brightness = total / 3.0
+
+    exg = 2.0 * gn - rn - bn
+    vegetation = exg > params['exg_vegetation']
+    soil = (~vegetation
+            & (rn - bn > params['soil_redness'])
+            & (brightness > params['soil_min_brightness'])
+            & (brightness < params['soil_max_brightness']))
+
+    classes = np.zeros(r.shape, dtype=np.uint8)
+    classes[vegetation] = CLASS_VEGETATION
+    classes[soil] = CLASS_BARE_SOIL
+    return classes
+
+
+def _pair_counts(c0, c1):
+    """两期类别图的统计量, 返回 int64 数组 [植被前, 植被后, 裸土前, 裸土后, 损失, 增长]"""
+    veg0 = c0 == CLASS_VEGETATION
+    veg1 = c1 == CLASS_VEGETATION
+    return np.array([
+        veg0.sum(), veg1.sum(),
+        (c0 == CLASS_BARE_SOIL).sum(), (c1 == CLASS_BARE_SOIL).sum(),
+        (veg0 & ~veg1).sum(), (~veg0 & veg1).sum(),
+    ], dtype=np.int64)
+
+
+def _period_stats(counts, pixels):
+    veg0, veg1, soil0, soil1, loss, gain = (int(v) for v in counts)
+    return {
+        "pixels": pixels,
+        "vegetation_before_pct": 100.0 * veg0 / pixels,
+        "vegetation_after_pct": 100.0 * veg1 / pixels,
+        "bare_soil_before_pct": 100.0 * soil0 / pixels,
+        "bare_soil_after_pct": 100.0 * soil1 / pixels,
+        "forest_loss_pixels": loss,
+        "forest_gain_pixels": gain,
+        "forest_loss_pct": 100.0 * loss / veg0 if veg0 else 0.0,
+        "forest_loss_area_pct": 100.0 * loss / pixels,
+    }
+
+
+def compare(before, after, params=DEFAULT_PARAMS, workers=None):
+    """已载入内存的两期 RGB 数组按行切片并行比较, 返回时段统计 dict"""
+    height = before.shape[0]
+    step = max(1, int(params['block_side']))
+    bounds = [(top, min(top + step, height)) for top in range(0, height, step)]
+
+    def rows(bound):
+        top, bottom = bound
+        return _pair_counts(classify(before[top:bottom], params), classify(after[top:bottom], params))
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        counts = np.sum(list(pool.map(rows, bounds)), axis=0)
+    return _period_stats(counts, int(before.shape[0] * before.shape[1]))
+
+
+def compare_grid(grid, pairs, params=DEFAULT_PARAMS, workers=None):
+    """
+    在 AlignedGrid 上比较 pairs 中的各对影像 (期数下标), 返回与 pairs 对应的统计 dict 列表
+    每个网格块各期只读取与分类一次, 多个时段共用; 同时在内存中的只有各线程正在处理的块
+    """
+    def block_counts(block):
+        used = sorted({i for pair in pairs for i in pair})
+        classes = {i: classify(grid.read_block(i, *block), params) for i in used}
+        return np.stack([_pair_counts(classes[a], classes[b]) for a, b in pairs])
+
+    blocks = grid.blocks(max(1, int(params['block_side'])))
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        counts = np.sum(list(pool.map(block_counts, blocks)), axis=0)
+    pixels = grid.height * grid.width
+    return [_period_stats(c, pixels) for c in counts]
+
+
+# --- 4. 证据分析 (带缓存) ---
+
+def _cache_key(hashes, params):
+    payload = json.dumps({"v": ALGORITHM_VERSION, "images": hashes, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _read_cached(cache_path):
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cached(cache_path, result):
+    """写入结果缓存; 缓存目录不可写 (只读部署) 时跳过, 分析结果照常返回"""
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"⚠️ 变化检测结果未缓存 (Cache write skipped): {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def analyze_images(paths, params=None, pixel_area_ha=None, use_cache=True, workers=None):
+    """
+    按时间顺序分析多期影像, 返回:
+    {"images": [...], "shape": [H, W], "periods": [{"from", "to", ...统计}], "overall": {...}}
+    shape 为对齐网格 (原始分辨率下的公共裁剪尺寸); pixel_area_ha 为单个像素对应的公顷数
+    (Sentinel-2 10m 分辨率原图为 0.01), 提供时额外输出损失面积 (公顷)
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    hashes = [image_hash(p) for p in paths]
+    key = _cache_key(hashes, params)
+    cache_path = os.path.join(CACHE_DIR, f"{key}.json")
+    result = _read_cached(cache_path) if use_cache else None
+    if result is None:
+        grid = AlignedGrid(paths)
+        labels = [image_year(p) or i for i, p in enumerate(paths)]
+        n = len(grid)
+        pairs = [(i, i + 1) for i in range(n - 1)] + ([(0, n - 1)] if n > 2 else [])
+        stats = compare_grid(grid, pairs, params, workers) if pairs else []
+        periods = [{"from": labels[i], "to": labels[i + 1], **stats[i]} for i in range(n - 1)]
+        overall = None
+        if n > 2:
+            overall = {"from": labels[0], "to": labels[-1], **stats[-1]}
+        elif periods:
+            overall = periods[0]
+        result = {
+            "images": [os.path.basename(p) for p in paths],
+            "shape": list(grid.shape),
+            "periods": periods,
+            "overall": overall,
+        }
+        if use_cache:
+            _write_cached(cache_path, result)
+
+    if pixel_area_ha:
+        for period in result['periods'] + ([result['overall']] if result['overall'] else []):
+            period['forest_loss_ha'] = period['forest_loss_pixels'] * pixel_area_ha
+    return result
+
+
+def evidence_paths(evidence, base_dir=BASE_DIR):
+    """从 environment.analysis.evidence 中取出存在的 before / mid / after 影像路径"""
+    paths = []
+    for key in _EVIDENCE_KEYS:
+        rel = evidence.get(key) if evidence else None
+        if rel and os.path.exists(os.path.join(base_dir, rel)):
+            paths.append(os.path.join(base_dir, rel))
+    return paths
+
+
+def analyze_evidence(evidence, base_dir=BASE_DIR, **kwargs):
+    """分析公司 evidence 章节, 影像不足两期时返回 None"""
+    paths = evidence_paths(evidence, base_dir)
+    if len(paths) < 2:
+        return None
+    return analyze_images(paths, **kwargs)
+
+
+def summarize(result):
+    """生成一句中文结论"""
+    parts = [f"{p['from']}→{p['to']} 森林损失 {p['forest_loss_pct']:.1f}% "
+             f"(植被覆盖 {p['vegetation_before_pct']:.0f}%→{p['vegetation_after_pct']:.0f}%)"
+             for p in result['periods']]
+    return "；".join(parts)
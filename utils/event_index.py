@@ -0,0 +1,450 @@
+"""
+事件检索 (Event Search)
+全组合 environment.key_events / social.key_events 与卫星证据 (environment.analysis) 的倒排索引:
+- 分词: NFKC 归一化后, 中日韩字符连续段切为二元组 (单字段保留单字), 拉丁字母 / 数字按词小写
+  ("美国CBP暂扣令" -> 美国 / cbp / 暂扣 / 扣令)
+- 查询词之间为 AND; 单个汉字查询展开为包含该字的全部二元组
+- 排序: BM25 (标题词频加权), 同分按严重程度、日期降序
+- 增量: 按注册表 generation 判断是否需要同步, 只重建 (mtime, size) 变化的公司, 删除已移除的公司
+索引常驻内存, 由 app.py (st.cache_resource) 与 utils.api (GET /events/search) 各自持有一份
+
+命令行: python -m utils.event_index CBP --year-from 2018 --severity 3,4 --source cbp
+"""
+
+import argparse
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from collections.abc import Mapping
+
+import numpy as np
+
+from . import metrics
+from .schema import SEVERITY_LABELS
+
+# --- 1. 分词 ---
+
+_CJK = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+_TOKEN_RE = re.compile(f'[{_CJK}]+|[0-9a-z]+')
+_CJK_RE = re.compile(f'[{_CJK}]')
+
+KINDS = {"env": "环境事件", "soc": "社会事件", "evidence": "卫星证据"}
+KIND_CODES = tuple(KINDS)
+TITLE_WEIGHT = 2            # 标题中的词频按 2 倍计入
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_CHARS = 160
+DEFAULT_LIMIT = 20
+
+metrics.describe("greenlink_event_search_seconds", metrics.HISTOGRAM, "Event index query time")
+
+
+def tokenize(text):
+    """文本 -> 词列表 (保留重复, 用于词频)"""
+    if not text:
+        return []
+    tokens = []
+    for run in _TOKEN_RE.findall(unicodedata.normalize('NFKC', str(text)).lower()):
+        if len(run) > 1 and _CJK_RE.match(run):
+            tokens.extend(map(str.__add__, run, run[1:]))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+_SOURCE_TOKENS = {}
+
+
+def _source_tokens(source):
+    """来源字符串重复率高 (已驻留), 分词结果按值缓存"""
+    tokens = _SOURCE_TOKENS.get(source)
+    if tokens is None:
+        tokens = _SOURCE_TOKENS[source] = tuple(tokenize(source))
+    return tokens
+
+
+def _is_single_cjk(token):
+    return len(token) == 1 and _CJK_RE.match(token) is not None
+
+
+def parse_severities(text):
+    """'3,4' / '高,严重' -> {3, 4}; 无法识别的项抛出 ValueError"""
+    result = set()
+    for item in str(text or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if item.isdigit() and int(item) < len(SEVERITY_LABELS):
+            result.add(int(item))
+        elif item in SEVERITY_LABELS:
+            result.add(SEVERITY_LABELS.index(item))
+        else:
+            raise ValueError(f"无法识别的严重程度: {item!r}")
+    return result
+
+
+# --- 2. 文档 ---
+
+_META_COLUMNS = {"alive": np.bool_, "date_key": np.int32, "severity": np.int8, "kind": np.int8,
+                 "code": np.int32, "source": np.int32, "length": np.float64}
+
+class EventDoc:
+    """索引中的一条事件或证据"""
+
+    __slots__ = ('doc_id', 'code', 'company', 'kind', 'date_key', 'date_label', 'severity',
+                 'source', 'title', 'snippet', 'url', 'length', 'terms')
+
+    def __init__(self, doc_id, code, company, kind, date_key, date_label, severity, source, title,
+                 snippet, url):
+        self.doc_id = doc_id
+        self.code = code
+        self.company = company
+        self.kind = kind
+        self.date_key = date_key
+        self.date_label = date_label
+        self.severity = severity
+        self.source = source
+        self.title = title
+        self.snippet = snippet
+        self.url = url
+        self.length = 0
+        self.terms = ()
+
+    @property
+    def year(self):
+        return self.date_key // 10000
+
+    def to_dict(self, score=None):
+        return {
+            "code": self.code,
+            "company": self.company,
+            "kind": self.kind,
+            "kind_label": KINDS[self.kind],
+            "date": self.date_label,
+            "year": self.year or None,
+            "severity": self.severity,
+            "severity_label": SEVERITY_LABELS[self.severity] if self.severity is not None else "N/A",
+            "source": self.source,
+            "title": self.title,
+            "snippet": self.snippet,
+            "url": self.url,
+            "score": round(score, 4) if score is not None else None,
+        }
+
+
+def _snippet(text):
+    text = (text or "").strip()
+    return text if len(text) <= SNIPPET_CHARS else text[:SNIPPET_CHARS - 1] + "…"
+
+
+_PERIOD_YEAR_RE = re.compile(r'(\d{4})')
+
+
+def company_documents(profile, environment=None):
+    """
+    一家公司的待索引内容: [(kind, date_key, date_label, severity, source, title, body, url)]
+    environment 为原始 environment 章节, 其中 analysis.evidence 作为一条卫星证据
+    """
+    items = []
+    for kind, events in (("env", profile.env_events), ("soc", profile.soc_events)):
+        for event in events:
+            body = event.description or '；'.join(event.details)
+            items.append((kind, event.date_key, event.date_label, event.severity, event.source,
+                          event.title, body, event.url))
+
+    analysis = (environment or {}).get('analysis') or {}
+    evidence = analysis.get('evidence') if isinstance(analysis, Mapping) else None
+    if isinstance(evidence, Mapping):
+        observations = evidence.get('observation') or ()
+        if isinstance(observations, str):
+            observations = (observations,)
+        title = analysis.get('result') or analysis.get('indicator') or analysis.get('method') or "卫星影像证据"
+        body = '；'.join([str(evidence.get('conclusion') or '')] + [str(o) for o in observations]).strip('；')
+        # 证据日期取观测期末年份 ("2012-2022" -> 2022)
+        years = _PERIOD_YEAR_RE.findall(str(analysis.get('period') or ''))
+        year = int(years[-1]) if years else 0
+        items.append(("evidence", year * 10000, str(analysis.get('period') or 'N/A'), None,
+                      analysis.get('method'), str(title), body, None))
+    return items
+
+
+# --- 3. 倒排索引 ---
+
+class EventIndex:
+    """
+    postings: 词 -> ([doc_id], [词频]), doc_id 单调递增; 查询时转为 numpy 数组 (按 posting 长度缓存)
+    文档元数据 (年份 / 严重程度 / 类别 / 来源 / 长度) 按列保存, 过滤与 BM25 打分均为整列向量运算;
+    公司文件变化时旧文档只标记删除, 已删除文档超过一半时整体压缩重编号
+    查询与同步共用一把锁, 可在多个会话 / 线程间共享
+    """
+
+    def __init__(self):
+        self.docs = []                  # doc_id -> EventDoc, 已删除为 None
+        self.postings = {}
+        self._company_docs = {}         # code -> [doc_id]
+        self._stamps = {}               # code -> (mtime, size)
+        self._code_ids = {}             # code -> 整数编号 (列存储用)
+        self._source_ids = {}           # 来源 -> 整数编号
+        self._meta = {name: [] for name in _META_COLUMNS}
+        self._columns = None            # 列表 -> numpy 的缓存, 写入时失效
+        self._arrays = {}               # 词 -> (posting 长度, ids, tf)
+        self._live = 0
+        self._total_length = 0
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._live
+
+    # ---- 写入 ----
+
+    def _add(self, code, company, item):
+        kind, date_key, date_label, severity, source, title, body, url = item
+        doc_id = len(self.docs)
+        doc = EventDoc(doc_id, code, company, kind, date_key, date_label, severity, source,
+                       title, _snippet(body), url)
+
+        title_tokens = tokenize(title)
+        counts = Counter(tokenize(body))
+        counts.update(_source_tokens(source))
+        for _ in range(TITLE_WEIGHT):
+            counts.update(title_tokens)
+        doc.terms = counts
+        doc.length = sum(counts.values())
+        self._append(doc)
+        return doc_id
+
+    def _append(self, doc):
+        postings, doc_id = self.postings, doc.doc_id
+        for token, tf in doc.terms.items():
+            posting = postings.get(token)
+            if posting is None:
+                posting = postings[token] = ([], [])
+            posting[0].append(doc_id)
+            posting[1].append(tf)
+        meta = self._meta
+        meta['alive'].append(True)
+        meta['date_key'].append(doc.date_key)
+        meta['severity'].append(-1 if doc.severity is None else doc.severity)
+        meta['kind'].append(KIND_CODES.index(doc.kind))
+        meta['code'].append(self._code_ids.setdefault(doc.code, len(self._code_ids)))
+        meta['source'].append(self._source_ids.setdefault(doc.source, len(self._source_ids)))
+        meta['length'].append(doc.length)
+        self.docs.append(doc)
+        self._live += 1
+        self._total_length += doc.length
+        self._columns = None
+
+    def _remove_company(self, code):
+        for doc_id in self._company_docs.pop(code, ()):
+            doc = self.docs[doc_id]
+            self.docs[doc_id] = None
+            self._meta['alive'][doc_id] = False
+            self._live -= 1
+            self._total_length -= doc.length
+            self._columns = None
+        self._stamps.pop(code, None)
+
+    def _compact(self):
+        """已删除文档过半时重编号, 释放 posting 与列中的空位"""
+        docs = [doc for doc in self.docs if doc is not None]
+        self.docs, self.postings, self._arrays = [], {}, {}
+        self._meta = {name: [] for name in _META_COLUMNS}
+        self._company_docs, self._live, self._total_length = {}, 0, 0
+        for doc in docs:
+            doc.doc_id = len(self.docs)
+            self._company_docs.setdefault(doc.code, []).append(doc.doc_id)
+            self._append(doc)
+
+    def index_company(self, code, company, items, stamp=None):
+        """替换一家公司的全部文档"""
+        with self._lock:
+            self._remove_company(code)
+            self._company_docs[code] = [self._add(code, company, item) for item in items]
+            self._stamps[code] = stamp
+            if len(self.docs) > 2 * self._live + 1024:
+                self._compact()
+
+    def remove_company(self, code):
+        with self._lock:
+            self._remove_company(code)
+
+    def update(self, registry):
+        """
+        与 CompanyRegistry 同步, 返回重建的公司数
+        generation 未变化时直接返回 0; 否则只重建 (mtime, size) 变化的公司
+        调用方应先 registry.refresh() (原地编辑的文件在 refresh 时才会递增 generation)
+        """
+        generation = registry.generation
+        if generation == self._generation:
+            return 0
+        current = set(registry.codes())
+        changed = [code for code in registry.codes() if self._stamps.get(code) != registry.stamp(code)]
+        for code in set(self._company_docs) - current:
+            self.remove_company(code)
+        for code in changed:
+            try:
+                profile = registry.profile(code)
+                environment = registry.load_section(code, 'environment', {})
+            except (OSError, ValueError) as e:
+                print(f"✗ 事件索引失败 (Event indexing failed) {code}: {e}")
+                self.remove_company(code)
+                continue
+            self.index_company(code, profile.name, company_documents(profile, environment),
+                               registry.stamp(code))
+        self._generation = generation
+        return len(changed)
+
+    # ---- 查询 ----
+
+    def _column_arrays(self):
+        if self._columns is None:
+            self._columns = {name: np.asarray(values, dtype=_META_COLUMNS[name])
+                             for name, values in self._meta.items()}
+        return self._columns
+
+    def _posting_arrays(self, token):
+        posting = self.postings.get(token)
+        if posting is None:
+            return None
+        cached = self._arrays.get(token)
+        if cached is None or cached[0] != len(posting[0]):
+            cached = (len(posting[0]), np.asarray(posting[0], dtype=np.int64),
+                      np.asarray(posting[1], dtype=np.float64))
+            self._arrays[token] = cached
+        return cached[1], cached[2]
+
+    def _term_frequencies(self, token, n):
+        """查询词在每个文档中的词频 (长度 n 的稠密数组); 单个汉字展开为包含该字的全部二元组"""
+        tokens = [token]
+        if _is_single_cjk(token):
+            tokens += [term for term in self.postings if len(term) == 2 and token in term]
+        tf = np.zeros(n)
+        for term in tokens:
+            arrays = self._posting_arrays(term)
+            if arrays is not None:
+                tf += np.bincount(arrays[0], weights=arrays[1], minlength=n)
+        return tf
+
+    def _filter_mask(self, columns, year_from, year_to, severities, source, kinds, codes):
+        mask = columns['alive'].copy()
+        if year_from is not None or year_to is not None:
+            year = columns['date_key'] // 10000
+            mask &= year > 0
+            if year_from is not None:
+                mask &= year >= year_from
+            if year_to is not None:
+                mask &= year <= year_to
+        if severities:
+            mask &= np.isin(columns['severity'], list(severities))
+        if kinds:
+            mask &= np.isin(columns['kind'], [KIND_CODES.index(k) for k in kinds if k in KIND_CODES])
+        if codes:
+            mask &= np.isin(columns['code'], [self._code_ids[c] for c in codes if c in self._code_ids])
+        if source:
+            needle = source.strip().lower()
+            matched = [i for value, i in self._source_ids.items() if value and needle in value.lower()]
+            mask &= np.isin(columns['source'], matched)
+        return mask
+
+    def search(self, query="", year_from=None, year_to=None, severities=None, source=None, kinds=None,
+               codes=None, limit=DEFAULT_LIMIT):
+        """
+        关键词 + 过滤条件检索, 返回 (命中总数, [结果 dict])
+        query 为空时只按条件过滤, 按日期、严重程度降序;
+        severities / kinds / codes 为集合, source 为不区分大小写的子串; 指定年份区间时排除无日期事件
+        """
+        start = time.perf_counter()
+        terms = list(dict.fromkeys(tokenize(query)))
+
+        with self._lock:
+            columns = self._column_arrays()
+            n = len(self.docs)
+            mask = self._filter_mask(columns, year_from, year_to, severities, source, kinds, codes)
+            severity, date_key = columns['severity'], columns['date_key']
+            if terms:
+                score = np.zeros(n)
+                avg_length = self._total_length / self._live if self._live else 1.0
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * columns['length'] / avg_length)
+                for term in terms:
+                    tf = self._term_frequencies(term, n)
+                    present = tf > 0
+                    df = int(np.count_nonzero(present & columns['alive']))
+                    idf = math.log(1 + (self._live - df + 0.5) / (df + 0.5))
+                    score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+                    mask &= present
+                hits = np.flatnonzero(mask)
+                order = np.lexsort((date_key[hits], severity[hits], score[hits]))[::-1]
+            else:
+                score = None
+                hits = np.flatnonzero(mask)
+                order = np.lexsort((severity[hits], date_key[hits]))[::-1]
+            top = hits[order[:limit]]
+            results = [self.docs[i].to_dict(float(score[i]) if score is not None else None) for i in top]
+
+        metrics.observe("greenlink_event_search_seconds", time.perf_counter() - start)
+        return len(hits), results
+
+    def facets(self):
+        """检索框选项: 年份范围与来源列表"""
+        with self._lock:
+            columns = self._column_arrays()
+            years = columns['date_key'][columns['alive']] // 10000
+            years = years[years > 0]
+            sources = sorted({doc.source for doc in self.docs if doc is not None and doc.source})
+        return {"year_min": int(years.min()) if len(years) else None,
+                "year_max": int(years.max()) if len(years) else None, "sources": sources}
+
+    def stats(self):
+        with self._lock:
+            return {"docs": self._live, "companies": len(self._company_docs), "terms": len(self.postings),
+                    "postings": sum(len(p[0]) for p in self.postings.values()), "deleted": len(self.docs) - self._live}
+
+
+def build_index(registry):
+    index = EventIndex()
+    index.update(registry)
+    return index
+
+
+# --- 4. 命令行 ---
+
+def main(argv=None):
+    import os
+
+    from .registry import CompanyRegistry
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="全组合关键事件检索")
+    parser.add_argument("query", nargs="?", default="", help="关键词, 如 CBP / 强迫劳动 / 泥炭")
+    parser.add_argument("--data-dir", default=os.path.join(base_dir, 'data'))
+    parser.add_argument("--year-from", type=int)
+    parser.add_argument("--year-to", type=int)
+    parser.add_argument("--severity", default="", help="严重程度, 逗号分隔的 0~4 或标签 (如 3,4 / 高,严重)")
+    parser.add_argument("--source", help="来源子串, 不区分大小写")
+    parser.add_argument("--kind", default="", help="env,soc,evidence")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    index = build_index(CompanyRegistry(args.data_dir))
+    built = time.perf_counter() - start
+    stats = index.stats()
+    print(f"索引: {stats['companies']} 家公司, {stats['docs']} 条文档, {stats['terms']} 个词 ({built * 1000:.1f} ms)")
+
+    start = time.perf_counter()
+    total, results = index.search(args.query, args.year_from, args.year_to, parse_severities(args.severity),
+                                  args.source, [k for k in args.kind.split(',') if k], limit=args.limit)
+    elapsed = time.perf_counter() - start
+    print(f"命中 {total} 条 ({elapsed * 1000:.2f} ms)")
+    for hit in results:
+        score = f"{hit['score']:.2f}" if hit['score'] is not None else "-"
+        print(f"  [{score}] {hit['code']} {hit['date']} {hit['severity_label']} {hit['kind_label']}: {hit['title'][:60]}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,354 @@
+"""
+事件衰减评分 (Time-decayed Event Scoring)
+由 key_events 计算 E / S 分, 替代 JSON 中静态的 risk_score 与 "前 3 条事件":
+    事件权重 w = 严重程度权重 × 2^(-事件年龄 / 半衰期)
+    评分 = floor + (100 - floor) × (1 - exp(-max(Σw, 0) / saturation))
+正面事件 (严重程度 0) 的权重为负, 抵减风险; 展示的 Top-K 只在风险事件中选取 (最小堆)。
+
+权重以固定基准年 EPOCH_YEAR 存储: w_ref = 严重程度权重 × 2^((事件时间 - EPOCH_YEAR) / 半衰期),
+评估日期 as_of 的实际权重为 w_ref × 2^(-(as_of - EPOCH_YEAR) / 半衰期)。所有事件同比例衰减,
+因此 Top-K 排序与 as_of 无关, 移动评估日期时多数公司只需换算; 事件时间依赖 as_of 的章节
+(无日期事件, 或晚于评估日期而被截断到 as_of 的事件) 按新日期重算。新增一条事件只更新该公司的累计权重与堆,
+不重算整个组合。半衰期 / 严重程度权重变化时按已保存的事件重新计算
+
+命令行: python -m utils.event_score --half-life 3 --top-k 3 [--code FGV]
+"""
+
+import argparse
+import heapq
+import math
+import threading
+import time
+from datetime import date
+
+import numpy as np
+
+from .schema import SEVERITY_LABELS
+
+# --- 1. 衰减政策 ---
+
+EPOCH_YEAR = 2000.0
+DEFAULT_HALF_LIFE = 3.0             # 年
+MIN_HALF_LIFE = 0.25                # w_ref = 2^((t - EPOCH_YEAR) / 半衰期), 过小会超出浮点范围
+SEVERITY_WEIGHTS = (-0.5, 0.25, 0.5, 1.0, 2.0)     # 正面 / 低 / 中 / 高 / 严重
+UNKNOWN_SEVERITY_WEIGHT = 0.5       # 无法识别严重程度时按 "中"
+UNDATED_AGE = 5.0                   # 无日期事件视为 5 年前
+SECTIONS = ("env", "soc")
+
+
+class DecayPolicy:
+    """
+    half_life: 半衰期 (年); severity_weights: 严重程度 0~4 的权重
+    saturation 越大评分越难接近 100; floor 为只有正面事件或事件全部衰减后的最低分
+    """
+
+    __slots__ = ('half_life', 'severity_weights', 'saturation', 'floor', 'top_k')
+
+    def __init__(self, half_life=DEFAULT_HALF_LIFE, severity_weights=SEVERITY_WEIGHTS, saturation=1.0,
+                 floor=10.0, top_k=3):
+        if not half_life >= MIN_HALF_LIFE:
+            raise ValueError(f"半衰期不能小于 {MIN_HALF_LIFE} 年 (Invalid half-life): {half_life}")
+        if len(severity_weights) != len(SEVERITY_LABELS):
+            raise ValueError(f"严重程度权重需要 {len(SEVERITY_LABELS)} 个, 实际 {len(severity_weights)} 个")
+        self.half_life = float(half_life)
+        self.severity_weights = tuple(float(w) for w in severity_weights)
+        self.saturation = float(saturation)
+        self.floor = float(floor)
+        self.top_k = int(top_k)
+
+    def key(self):
+        """可哈希的政策摘要, 用作缓存键"""
+        return (self.half_life, self.severity_weights, self.saturation, self.floor, self.top_k)
+
+    def weight_key(self):
+        """影响 w_ref 的参数; 只有 top_k / saturation / floor 变化时无需重算权重"""
+        return (self.half_life, self.severity_weights)
+
+    def severity_weight(self, severity):
+        return UNKNOWN_SEVERITY_WEIGHT if severity is None else self.severity_weights[severity]
+
+    def scale(self, as_of):
+        """w_ref -> as_of 时的实际权重的换算系数"""
+        return 2.0 ** (-(as_of - EPOCH_YEAR) / self.half_life)
+
+    def to_score(self, weight):
+        """累计权重 (可为数组) -> 0~100 评分"""
+        pressure = np.maximum(weight, 0.0) / self.saturation
+        return self.floor + (100.0 - self.floor) * (1.0 - np.exp(-pressure))
+
+
+def decimal_year(value):
+    """date / datetime -> 小数年份"""
+    start = date(value.year, 1, 1).toordinal()
+    length = date(value.year + 1, 1, 1).toordinal() - start
+    return value.year + (value.toordinal() - start) / length
+
+
+def dated_time(event):
+    """事件日期的小数年份 (缺月 / 日取年中 / 月中); 无日期返回 None"""
+    key = event.date_key
+    if not key:
+        return None
+    year, month, day = key // 10000, key // 100 % 100, key % 100
+    if not month:
+        return year + 0.5
+    return year + (month - 1 + ((day - 0.5) / 31 if day else 0.5)) / 12
+
+
+def event_time(event, as_of):
+    """计分用的事件时间: 晚于 as_of 的按 as_of 计, 无日期按 UNDATED_AGE 年前"""
+    t = dated_time(event)
+    return as_of - UNDATED_AGE if t is None else min(t, as_of)
+
+
+# --- 2. 单个章节的累计权重与 Top-K 堆 ---
+
+class EventTrack:
+    """
+    一家公司一个章节 (E 或 S) 的事件: risk / relief 为风险 / 正面事件 w_ref 之和,
+    heap 为风险事件中 w_ref 最大的 top_k 条 (最小堆, 堆顶为当前第 k 大)
+    floating 为计分时间依赖 as_of 的事件数 (无日期或晚于 as_of), latest 为其余事件中最晚的时间
+    """
+
+    __slots__ = ('risk', 'relief', 'heap', 'events', 'seq', 'floating', 'latest')
+
+    def __init__(self):
+        self.risk = 0.0
+        self.relief = 0.0
+        self.heap = []
+        self.events = []        # [EventRecord], 政策或评估日期变化时据此重算
+        self.seq = 0            # 同权重事件按加入顺序排列
+        self.floating = 0
+        self.latest = float('-inf')
+
+    def add(self, event, policy, as_of):
+        self.events.append(event)
+        dated = dated_time(event)
+        if dated is None or dated > as_of:
+            self.floating += 1
+        else:
+            self.latest = max(self.latest, dated)
+        t = event_time(event, as_of)
+        weight = policy.severity_weight(event.severity) * 2.0 ** ((t - EPOCH_YEAR) / policy.half_life)
+        if weight < 0:
+            self.relief += weight
+            return
+        self.risk += weight
+        entry = (weight, -self.seq, event)
+        self.seq += 1
+        if len(self.heap) < policy.top_k:
+            heapq.heappush(self.heap, entry)
+        elif policy.top_k and entry[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, entry)
+
+    def rebuild(self, policy, as_of):
+        events, self.events = self.events, []
+        self.risk = self.relief = 0.0
+        self.heap, self.seq = [], 0
+        self.floating, self.latest = 0, float('-inf')
+        for event in events:
+            self.add(event, policy, as_of)
+
+    def shifts(self, as_of):
+        """评估日期移到 as_of 后是否有事件的 w_ref 变化 (需要重算)"""
+        return self.floating > 0 or self.latest > as_of
+
+    def __len__(self):
+        return len(self.events)
+
+    def weight(self):
+        return self.risk + self.relief
+
+    def top(self, scale):
+        """[(as_of 时的权重, EventRecord)], 权重降序"""
+        return [(weight * scale, event) for weight, _, event in sorted(self.heap, reverse=True)]
+
+
+def _tracks(profile, policy, as_of):
+    tracks = {}
+    for section, events in (("env", profile.env_events), ("soc", profile.soc_events)):
+        track = tracks[section] = EventTrack()
+        for event in events:
+            track.add(event, policy, as_of)
+    return tracks
+
+
+def score_events(profile, policy=None, as_of=None):
+    """
+    单家公司: {"env_score", "soc_score", "env_top", "soc_top"}
+    某一章节没有事件时评分为 None (调用方回退到 JSON 中的 risk_score)
+    """
+    policy = policy or DecayPolicy()
+    as_of = as_of if as_of is not None else decimal_year(date.today())
+    scale = policy.scale(as_of)
+    result = {}
+    for section, track in _tracks(profile, policy, as_of).items():
+        result[f"{section}_score"] = float(policy.to_score(track.weight() * scale)) if len(track) else None
+        result[f"{section}_top"] = track.top(scale)
+    return result
+
+
+# --- 3. 组合评分 (增量) ---
+
+class EventScorer:
+    """
+    全组合的事件衰减评分; 每家公司保存 E / S 两个 EventTrack
+    update(registry) 按 (mtime, size) 只重算变化的公司; add_event() 只更新一家公司的一个章节
+    """
+
+    def __init__(self, policy=None, as_of=None):
+        self.policy = policy or DecayPolicy()
+        self.as_of = as_of if as_of is not None else decimal_year(date.today())
+        self._tracks = {}               # code -> {"env": EventTrack, "soc": EventTrack}
+        self._stamps = {}
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def __contains__(self, code):
+        return code in self._tracks
+
+    def set_company(self, code, profile, stamp=None):
+        tracks = _tracks(profile, self.policy, self.as_of)
+        with self._lock:
+            self._tracks[code] = tracks
+            self._stamps[code] = stamp
+
+    def remove_company(self, code):
+        with self._lock:
+            self._tracks.pop(code, None)
+            self._stamps.pop(code, None)
+
+    def add_event(self, code, section, event):
+        """新增一条事件 (EventRecord), 返回该公司新的 (E, S) 分"""
+        with self._lock:
+            tracks = self._tracks.setdefault(code, {s: EventTrack() for s in SECTIONS})
+            tracks[section].add(event, self.policy, self.as_of)
+        return self.score(code)
+
+    def update(self, registry):
+        """与 CompanyRegistry 同步, 返回重算的公司数; generation 未变化时直接返回 0"""
+        generation = registry.generation
+        if generation == self._generation:
+            return 0
+        current = set(registry.codes())
+        for code in set(self._tracks) - current:
+            self.remove_company(code)
+        changed = [code for code in registry.codes() if self._stamps.get(code) != registry.stamp(code)]
+        for code in changed:
+            try:
+                self.set_company(code, registry.profile(code), registry.stamp(code))
+            except (OSError, ValueError) as e:
+                print(f"✗ 事件评分失败 (Event scoring failed) {code}: {e}")
+                self.remove_company(code)
+        self._generation = generation
+        return len(changed)
+
+    def set_as_of(self, as_of):
+        """
+        移动评估日期: 多数章节 w_ref 不变, 只改换算系数; 含无日期事件 (随 as_of 平移)
+        或晚于新日期的事件 (需要重新截断, 例如日期往回移) 的章节按新日期重算
+        """
+        with self._lock:
+            self.as_of = as_of
+            for tracks in self._tracks.values():
+                for track in tracks.values():
+                    if track.shifts(as_of):
+                        track.rebuild(self.policy, as_of)
+
+    def set_policy(self, policy):
+        """top_k 变化重建堆, 半衰期 / 严重程度权重变化重算 w_ref; 都不需要重新读取公司文件"""
+        with self._lock:
+            rebuild = policy.weight_key() != self.policy.weight_key() or policy.top_k != self.policy.top_k
+            self.policy = policy
+            if rebuild:
+                for tracks in self._tracks.values():
+                    for track in tracks.values():
+                        track.rebuild(policy, self.as_of)
+
+    # ---- 查询 ----
+
+    def score(self, code):
+        """(E, S); 没有事件的章节为 None"""
+        scale = self.policy.scale(self.as_of)
+        tracks = self._tracks[code]
+        return tuple(float(self.policy.to_score(tracks[s].weight() * scale)) if len(tracks[s]) else None
+                     for s in SECTIONS)
+
+    def top_events(self, code, section):
+        return self._tracks[code][section].top(self.policy.scale(self.as_of))
+
+    def scores(self, codes=None, fallback=None):
+        """
+        返回 (代码列表, E 分数组, S 分数组); 没有事件的章节为 NaN,
+        给出 fallback=(代码列表, E 列表, S 列表) (如 registry.scores()) 时用其中的分数补齐
+        """
+        with self._lock:
+            codes = list(codes if codes is not None else self._tracks)
+            weights = np.full((2, len(codes)), np.nan)
+            for i, code in enumerate(codes):
+                tracks = self._tracks.get(code)
+                if tracks is None:
+                    continue
+                for j, section in enumerate(SECTIONS):
+                    if len(tracks[section]):
+                        weights[j, i] = tracks[section].weight()
+            scale = self.policy.scale(self.as_of)
+        scores = np.where(np.isnan(weights), np.nan, self.policy.to_score(np.nan_to_num(weights) * scale))
+        if fallback is not None:
+            lookup = {code: (env, soc) for code, env, soc in zip(*fallback)}
+            static = np.array([lookup.get(code, (np.nan, np.nan)) for code in codes], dtype=np.float64).T
+            scores = np.where(np.isnan(scores), static.reshape(scores.shape), scores)
+        return codes, scores[0], scores[1]
+
+
+# --- 4. 命令行 ---
+
+def _format_score(value):
+    return "  -  " if math.isnan(value) else f"{value:5.1f}"
+
+
+def main(argv=None):
+    import os
+
+    from .registry import CompanyRegistry
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="事件时间衰减评分")
+    parser.add_argument("--data-dir", default=os.path.join(base_dir, 'data'))
+    parser.add_argument("--half-life", type=float, default=DEFAULT_HALF_LIFE, help="半衰期 (年)")
+    parser.add_argument("--weights", default=",".join(str(w) for w in SEVERITY_WEIGHTS),
+                        help="严重程度 正面,低,中,高,严重 的权重")
+    parser.add_argument("--saturation", type=float, default=1.0)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--as-of", type=float, help="评估日期 (小数年份, 默认今天)")
+    parser.add_argument("--code", action="append", help="只输出指定公司 (可重复)")
+    args = parser.parse_args(argv)
+
+    try:
+        policy = DecayPolicy(args.half_life, [float(w) for w in args.weights.split(',')], args.saturation,
+                             top_k=args.top_k)
+    except ValueError as e:
+        parser.error(str(e))
+    registry = CompanyRegistry(args.data_dir)
+    scorer = EventScorer(policy, args.as_of)
+    start = time.perf_counter()
+    scorer.update(registry)
+    elapsed = time.perf_counter() - start
+    codes, env, soc = scorer.scores(args.code)
+    static = {code: (e, s) for code, e, s in zip(*registry.scores())}
+
+    print(f"{len(scorer)} 家公司, 评估日期 {scorer.as_of:.2f}, 半衰期 {policy.half_life:g} 年 ({elapsed * 1000:.1f} ms)")
+    for code, e, s in zip(codes, env, soc):
+        print(f"{code:<12} E {_format_score(e)} (JSON {static[code][0]})   S {_format_score(s)} (JSON {static[code][1]})")
+        if args.code:
+            for section in SECTIONS:
+                for weight, event in scorer.top_events(code, section):
+                    print(f"    {section} {weight:6.3f} {event.date_label:<10} {event.severity_label} {event.title[:50]}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,96 @@
+"""
+磁盘缓存公用工具 (File-system Cache Helpers)
+- Fingerprints: 文件内容哈希, 以 (mtime, size) 判断文件未变时直接复用, 不重新读文件
+- evict_lru: 目录超出字节预算时按 mtime 从旧到新删除, 多进程通过文件锁串行化
+data 缓存 (utils.cache)、报告缓存、影像资源、栅格仓库、变化检测与静态站点共用这两项
+"""
+
+import hashlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl, 退化为无锁淘汰
+    fcntl = None
+
+
+# --- 1. 文件指纹 ---
+
+def file_digest(path, chunk=1 << 20):
+    """分块计算文件内容的 sha256, 大文件也只占 chunk 字节内存"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Fingerprints:
+    """
+    key -> (mtime_ns, size, sha256) 的指纹表; mtime/size 未变化时返回上次的哈希
+    known 可传入持久化的指纹 dict (值为 [mtime_ns, size, 哈希] 列表亦可), 表内容原地更新
+    on_change(key) 在已知文件的内容哈希发生变化时调用
+    """
+
+    def __init__(self, known=None, on_change=None):
+        self.known = {} if known is None else known
+        self.on_change = on_change
+        self._lock = threading.Lock()
+
+    def get(self, path, key=None):
+        """返回 path 的完整 sha256 (调用方按需截断); key 默认为 path"""
+        key = path if key is None else key
+        st = os.stat(path)
+        with self._lock:
+            known = self.known.get(key)
+        if known and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+            return known[2]
+        digest = file_digest(path)
+        with self._lock:
+            self.known[key] = (st.st_mtime_ns, st.st_size, digest)
+        if known and known[2] != digest and self.on_change:
+            self.on_change(key)
+        return digest
+
+
+# --- 2. 按字节预算淘汰 ---
+
+def evict_lru(directory, suffix, max_bytes):
+    """
+    directory 中以 suffix 结尾的文件总大小超出 max_bytes 时, 按 mtime 从旧到新删除
+    读取命中时 os.utime 刷新 mtime, 即为 LRU; 返回删除的文件数
+    """
+    evicted = 0
+    with open(os.path.join(directory, '.lock'), 'a') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            files = []
+            total = 0
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if not entry.name.endswith(suffix):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime_ns, st.st_size, entry.path))
+                    total += st.st_size
+            if total <= max_bytes:
+                return 0
+            files.sort()
+            for _, size, path in files:
+                if total <= max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                evicted += 1
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return evicted
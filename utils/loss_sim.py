@@ -0,0 +1,304 @@
+"""
+财务损失蒙特卡洛模拟 (Monte Carlo Expected-loss Simulator)
+替代 "综合分 > 60 时损失 = 贷款额 × 15%" 的固定估算, 按年度情景模拟三类损失:
+- 欧盟 EUDR 罚款: 发生概率随 E 分、高严重度环境事件、欧盟市场敞口上升, 罚款为营收的至多 4%
+- 美国 CBP 货物滞留: 滞留次数 ~ Poisson, 强度随 S 分与 WRO / 强迫劳动事件上升, 每次成本对数正态 (约 200 万 USD)
+- 客户流失: 主要客户逐个以 S 分与社会事件驱动的概率流失, 损失对应营收份额的毛利
+输入为每家公司一行的等长数组 (LossScenario), 路径按固定单元数分块, 每块使用 SeedSequence 派生的独立随机流,
+分块在线程池中并行 (NumPy 采样与聚合释放 GIL): 结果只取决于种子与路径数, 与线程数无关。
+相同情景 (输入 + 路径数 + 种子) 的结果在进程内缓存
+
+命令行:
+    python -m utils.loss_sim --paths 1000000                 # data/ 下全部公司, 贷款额 5000 万
+    python -m utils.loss_sim --paths 1000000 --loan 8000 -j 8 --code FGV
+"""
+
+import argparse
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .schema import SEVERITY_HIGH
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+
+# --- 1. 模型参数 (金额单位: 万元) ---
+
+REVENUE_MULTIPLE = 5.0          # 无营收数据时, 营收 = 贷款额 × 该倍数
+EUDR_FINE_RATE = 0.04           # EUDR 罚款上限: 营收的 4%
+EUDR_SEVERITY = (2.0, 3.0)      # 罚款占上限比例 ~ Beta(2, 3)
+DETENTION_COST = 200 * 7.2      # 单次滞留成本中位数: 200 万 USD ≈ 1440 万元
+DETENTION_SIGMA = 0.75
+DETENTION_MAX_RATE = 3.0        # 年滞留次数期望上限
+CUSTOMER_REVENUE_SHARE = 0.6    # 主要客户贡献的营收份额
+CHURN_MARGIN_LOSS = 0.25        # 流失营收对应的毛利损失比例
+DEFAULT_CUSTOMERS = 4
+DIRECT_EXPOSURE = 1.0           # 直接出口到该市场
+INDIRECT_EXPOSURE = 0.25        # 未列出该市场 (经下游客户间接进入)
+UNKNOWN_EXPOSURE = 0.5          # 未披露市场
+RECENT_YEARS = 3                # 近 3 年的事件按全权重计, 更早的按 OLD_EVENT_WEIGHT
+OLD_EVENT_WEIGHT = 0.3
+
+CHUNK_CELLS = 1 << 21           # 每块 (路径 × 公司) 单元数 (决定随机流划分, 改动会改变结果)
+DEFAULT_PATHS = 200000
+CONFIDENCE = 0.95
+CACHE_ENTRIES = 32
+
+COMPONENTS = ("eudr", "cbp", "churn")
+COMPONENT_NAMES = ("EUDR 罚款", "CBP 货物滞留", "客户流失")
+
+_WRO_RE = re.compile(r'WRO|暂扣令|强迫劳动|forced\s*labou?r|CBP', re.IGNORECASE)
+_EU_RE = re.compile(r'欧盟|欧洲|\bEU\b|Europe', re.IGNORECASE)
+_US_RE = re.compile(r'美国|\bUS\b|\bUSA\b|United States', re.IGNORECASE)
+
+
+# --- 2. 情景 ---
+
+class LossScenario:
+    """组合模拟输入: 每个属性都是长度为公司数的数组"""
+
+    __slots__ = ('codes', 'revenue', 'p_eudr', 'cbp_rate', 'customers', 'p_churn')
+
+    def __init__(self, codes, revenue, p_eudr, cbp_rate, customers, p_churn):
+        self.codes = tuple(codes)
+        self.revenue = np.asarray(revenue, dtype=np.float64)
+        self.p_eudr = np.asarray(p_eudr, dtype=np.float64)
+        self.cbp_rate = np.asarray(cbp_rate, dtype=np.float64)
+        self.customers = np.asarray(customers, dtype=np.int64)
+        self.p_churn = np.asarray(p_churn, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def key(self):
+        """情景摘要 (缓存键): 输入取 6 位有效数字, 浮点噪声不影响命中"""
+        arrays = (self.revenue, self.p_eudr, self.cbp_rate, self.customers, self.p_churn)
+        return (self.codes,) + tuple(np.round(a.astype(np.float64), 6).tobytes() for a in arrays)
+
+
+def _market_exposure(markets, pattern):
+    if not markets:
+        return UNKNOWN_EXPOSURE
+    names = [m.get('region', '') if isinstance(m, Mapping) else str(m) for m in markets]
+    return DIRECT_EXPOSURE if any(pattern.search(n) for n in names) else INDIRECT_EXPOSURE
+
+
+def _event_weight(events, as_of, pattern=None):
+    """高 / 严重事件的加权计数; 近 RECENT_YEARS 年全权重, 更早的降权"""
+    weight = 0.0
+    for event in events:
+        if event.severity is None or event.severity < SEVERITY_HIGH:
+            continue
+        if pattern is not None and not pattern.search(f"{event.title} {event.description or ''}"):
+            continue
+        weight += 1.0 if event.year and event.year >= as_of - RECENT_YEARS else OLD_EVENT_WEIGHT
+    return weight
+
+
+def company_drivers(profile, supply_chain, as_of=None):
+    """
+    单家公司的风险驱动: (p_eudr, cbp_rate, customers, p_churn)
+    profile 为 CompanyProfile (E / S 应为生效评分, 见 scoring.effective_profile),
+    supply_chain 为公司 JSON 的 supply_chain 章节 (可为空)
+    """
+    as_of = as_of or time.localtime().tm_year
+    downstream = (supply_chain or {}).get('downstream') or {}
+    markets = downstream.get('markets') or ()
+    e, s = profile.env_score / 100.0, profile.soc_score / 100.0
+
+    env_high = _event_weight(profile.env_events, as_of)
+    soc_high = _event_weight(profile.soc_events, as_of)
+    wro = _event_weight(profile.soc_events, as_of, pattern=_WRO_RE)
+
+    p_eudr = _market_exposure(markets, _EU_RE) * min(0.02 + 0.5 * e * e + 0.08 * env_high, 0.9)
+    cbp_rate = _market_exposure(markets, _US_RE) * min(0.03 + 0.6 * s ** 3 + 0.25 * wro, DETENTION_MAX_RATE)
+    customers = len(downstream.get('major_customers') or ()) or DEFAULT_CUSTOMERS
+    p_churn = min(0.01 + 0.3 * s * s + 0.04 * soc_high, 0.8)
+    return p_eudr, cbp_rate, customers, p_churn
+
+
+def build_scenario(items, loan_amounts, revenue=None, as_of=None):
+    """
+    items: (code, profile, supply_chain) 的可迭代对象
+    loan_amounts: 标量或等长数组 (万元); revenue 未给出时按 REVENUE_MULTIPLE 倍贷款额估算
+    """
+    codes, drivers = [], []
+    for code, profile, supply_chain in items:
+        codes.append(code)
+        drivers.append(company_drivers(profile, supply_chain, as_of))
+    p_eudr, cbp_rate, customers, p_churn = (np.asarray(col) for col in zip(*drivers)) if drivers else ([],) * 4
+    loans = np.broadcast_to(np.asarray(loan_amounts, dtype=np.float64), (len(codes),))
+    revenue = loans * REVENUE_MULTIPLE if revenue is None else np.broadcast_to(revenue, (len(codes),))
+    return LossScenario(codes, revenue, p_eudr, cbp_rate, customers, p_churn)
+
+
+def registry_scenario(registry, loan_amounts, codes=None, as_of=None, scorer=None):
+    """
+    从注册表构建情景; 只加载 supply_chain 与 key_events 所需章节
+    E / S 取生效评分 (scorer 默认为 scoring.shared_scorer(registry))
+    """
+    from .scoring import effective_profile, shared_scorer
+
+    scorer = scorer or shared_scorer(registry)
+    codes = registry.codes() if codes is None else codes
+    items = ((code, effective_profile(registry.profile(code), scorer), registry.load_section(code, 'supply_chain'))
+             for code in codes)
+    return build_scenario(items, loan_amounts, as_of=as_of)
+
+
+# --- 3. 模拟 ---
+
+def _churn_cdf(scenario):
+    """各公司流失客户数的累积分布 (K, 最大客户数); 超出自身客户数的列为 1, 逆变换采样时不会越界"""
+    from math import comb
+
+    width = int(scenario.customers.max()) if len(scenario) else 0
+    cdf = np.ones((len(scenario), width), dtype=np.float32)
+    for i, (n, p) in enumerate(zip(scenario.customers.tolist(), scenario.p_churn.tolist())):
+        pmf = [comb(n, j) * p ** j * (1 - p) ** (n - j) for j in range(n)]
+        cdf[i, :n] = np.cumsum(pmf)
+    return cdf
+
+
+def _simulate_chunk(scenario, churn_cdf, n_paths, seed_seq):
+    """一块路径: 返回 (每条路径的组合总损失, 各公司分项损失之和 (3, K))"""
+    rng = np.random.default_rng(seed_seq)
+    k = len(scenario)
+    component_sums = np.zeros((len(COMPONENTS), k))
+
+    # EUDR: 每家公司每条路径一次伯努利 (float32 均匀数比较), 只为发生罚款的 (路径, 公司) 抽取罚款比例
+    hit_path, hit_company = np.nonzero(rng.random((n_paths, k), dtype=np.float32) < scenario.p_eudr.astype(np.float32))
+    fines = scenario.revenue[hit_company] * EUDR_FINE_RATE * rng.beta(*EUDR_SEVERITY, size=len(hit_path))
+    totals = np.bincount(hit_path, weights=fines, minlength=n_paths)
+    component_sums[0] = np.bincount(hit_company, weights=fines, minlength=k)
+
+    # CBP: 各公司滞留相互独立且单次成本同分布, 合并为强度 Λ = Σλ 的复合泊松过程;
+    # 每条路径只抽一次总次数, 再按 λ_i / Λ 把每次滞留归属到公司 (开销与滞留次数成正比, 与公司数无关)
+    total_rate = float(scenario.cbp_rate.sum())
+    if total_rate > 0:
+        counts = rng.poisson(total_rate, size=n_paths)
+        event_path = np.repeat(np.arange(n_paths), counts)
+        costs = rng.lognormal(np.log(DETENTION_COST), DETENTION_SIGMA, size=len(event_path))
+        owner = np.minimum(np.searchsorted(np.cumsum(scenario.cbp_rate), rng.random(len(event_path)) * total_rate,
+                                           side='right'), k - 1)
+        totals += np.bincount(event_path, weights=costs, minlength=n_paths)
+        component_sums[1] = np.bincount(owner, weights=costs, minlength=k)
+
+    # 客户流失: 流失客户数 ~ Binomial(客户数, p), 用同一个均匀数对累积分布逐列比较 (逆变换采样)
+    u = rng.random((n_paths, k), dtype=np.float32)
+    churned = np.zeros((n_paths, k), dtype=np.float32)
+    for j in range(churn_cdf.shape[1]):
+        churned += u > churn_cdf[:, j]
+    unit = scenario.revenue * CUSTOMER_REVENUE_SHARE * CHURN_MARGIN_LOSS / scenario.customers
+    totals += churned @ unit
+    component_sums[2] = churned.sum(axis=0, dtype=np.float64) * unit
+    return totals, component_sums
+
+
+def tail_stats(losses, confidence=CONFIDENCE):
+    """均值 / VaR / CVaR (期望损失超过 VaR 部分的均值)"""
+    losses = np.asarray(losses)
+    cut = min(int(np.floor(confidence * len(losses))), len(losses) - 1)
+    tail = np.partition(losses, cut)[cut:]
+    return {"mean": float(losses.mean()), "var": float(tail.min()), "cvar": float(tail.mean()),
+            "std": float(losses.std())}
+
+
+_cache = OrderedDict()      # (情景摘要, 路径数, 种子, 置信度) -> 结果
+_cache_lock = threading.Lock()
+
+
+def simulate(scenario, n_paths=DEFAULT_PATHS, seed=0, workers=None, confidence=CONFIDENCE, use_cache=True,
+             histogram_bins=40):
+    """
+    模拟 n_paths 个年度情景, 返回 dict:
+    paths, mean, var, cvar, std (组合总损失), confidence, components (各分项期望损失),
+    companies (各公司期望损失), histogram (counts, edges), seconds, cached
+    """
+    key = (scenario.key(), n_paths, seed, confidence, histogram_bins)
+    if use_cache:
+        with _cache_lock:
+            if key in _cache:
+                _cache.move_to_end(key)
+                return dict(_cache[key], cached=True)
+
+    start = time.perf_counter()
+    # 每块约 CHUNK_CELLS 个 (路径, 公司) 单元, 分块只取决于路径数与公司数
+    chunk = max(1, CHUNK_CELLS // max(len(scenario), 1))
+    sizes = [chunk] * (n_paths // chunk) + ([n_paths % chunk] if n_paths % chunk else [])
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    churn_cdf = _churn_cdf(scenario)
+    workers = workers or min(len(sizes), os.cpu_count() or 1)
+    if workers > 1 and len(sizes) > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="greenlink-mc") as pool:
+            parts = list(pool.map(lambda args: _simulate_chunk(scenario, churn_cdf, *args), zip(sizes, streams)))
+    else:
+        parts = [_simulate_chunk(scenario, churn_cdf, size, stream) for size, stream in zip(sizes, streams)]
+
+    losses = np.concatenate([p[0] for p in parts]) if parts else np.zeros(0)
+    component_sums = sum(p[1] for p in parts) if parts else np.zeros((len(COMPONENTS), len(scenario)))
+    counts, edges = np.histogram(losses, bins=histogram_bins)
+    result = {
+        "paths": n_paths,
+        "confidence": confidence,
+        **tail_stats(losses, confidence),
+        "components": dict(zip(COMPONENTS, (component_sums.sum(axis=1) / max(n_paths, 1)).tolist())),
+        "companies": dict(zip(scenario.codes, (component_sums.sum(axis=0) / max(n_paths, 1)).tolist())),
+        "histogram": (counts.tolist(), edges.tolist()),
+        "seconds": time.perf_counter() - start,
+        "cached": False,
+    }
+    if use_cache:
+        with _cache_lock:
+            _cache[key] = result
+            if len(_cache) > CACHE_ENTRIES:
+                _cache.popitem(last=False)
+    return dict(result)
+
+
+def company_loss(profile, supply_chain, loan_amount, n_paths=DEFAULT_PATHS, seed=0, **kwargs):
+    """单家公司的损失分布 (界面财务风险量化面板使用); profile 传入生效评分的档案"""
+    scenario = build_scenario([(profile.code, profile, supply_chain)], loan_amount)
+    return simulate(scenario, n_paths, seed, **kwargs)
+
+
+# --- 4. 命令行 ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GreenLink 财务损失蒙特卡洛模拟")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--code', action='append', help="只模拟指定公司 (可重复), 默认全部")
+    parser.add_argument('--loan', type=float, default=5000, help="每家公司的贷款额 (万元)")
+    parser.add_argument('--paths', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--confidence', type=float, default=CONFIDENCE)
+    parser.add_argument('-j', '--workers', type=int, default=None, help="线程数 (默认 CPU 核数)")
+    args = parser.parse_args(argv)
+
+    from .registry import CompanyRegistry
+
+    registry = CompanyRegistry(args.data_dir)
+    start = time.perf_counter()
+    scenario = registry_scenario(registry, args.loan, args.code)
+    built = time.perf_counter() - start
+    result = simulate(scenario, args.paths, args.seed, args.workers, args.confidence, use_cache=False)
+
+    pct = f"{args.confidence:.0%}"
+    print(f"{len(scenario)} 家公司 · {args.paths:,} 条路径 · 情景构建 {built:.2f} s · 模拟 {result['seconds']:.2f} s")
+    print(f"组合年度损失 (万元): 均值 {result['mean']:,.1f} · VaR {pct} {result['var']:,.1f} · "
+          f"CVaR {pct} {result['cvar']:,.1f}")
+    for name, value in zip(COMPONENT_NAMES, result['components'].values()):
+        print(f"  {name}: {value:,.1f}")
+    for code, value in sorted(result['companies'].items(), key=lambda kv: -kv[1])[:10]:
+        print(f"  {code}: 期望损失 {value:,.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+"""
+运行指标 (Metrics)
+进程内的计数器 / 直方图 / 仪表, 以 Prometheus 文本格式 (0.0.4) 导出:
+- 写入本地文件 (.cache/metrics.prom, 可由 node_exporter textfile collector 采集)
+- utils.api 的 GET /metrics 直接返回; app.py 管理员侧边栏 (?admin=1) 展示并可下载
+默认关闭: 设置环境变量 GREENLINK_METRICS=1 或调用 enable() 后才记录。
+关闭时 inc() / observe() 第一行即返回, timer() 返回共享的空上下文, 埋点开销只是一次布尔判断
+"""
+
+import math
+import os
+import re
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METRICS_PATH = os.path.join(BASE_DIR, '.cache', 'metrics.prom')
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PAGE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096)
+BYTE_BUCKETS = (16e3, 64e3, 256e3, 1e6, 4e6, 16e6, 64e6, 256e6, 1e9)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+_enabled = os.environ.get('GREENLINK_METRICS', '').lower() in ('1', 'true', 'yes', 'on')
+_lock = threading.Lock()
+_metrics = {}           # 名称 -> _Metric
+_collectors = {}        # 键 -> 返回 [(名称, 类型, 说明, 标签 dict, 值)] 的函数
+_last_write = [0.0]
+
+
+# --- 1. 指标定义 ---
+
+class _Metric:
+    __slots__ = ('name', 'kind', 'help', 'buckets', 'series')
+
+    def __init__(self, name, kind, help_text, buckets=None):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.buckets = tuple(buckets) if buckets else None
+        self.series = {}    # 排序后的标签元组 -> 值 (直方图为 [各桶计数..., 总和, 次数])
+
+
+def describe(name, kind, help_text, buckets=None):
+    """登记指标的类型与说明; 未登记的指标在首次记录时按默认配置创建"""
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            _metrics[name] = _Metric(name, kind, help_text, buckets or (SECONDS_BUCKETS if kind == HISTOGRAM else None))
+        else:
+            metric.help = help_text
+    return name
+
+
+describe("greenlink_section_seconds", HISTOGRAM, "Render time of one app section or tab")
+describe("greenlink_section_loads_total", COUNTER, "Company JSON sections decoded from disk")
+describe("greenlink_section_load_seconds", HISTOGRAM, "Time to read and decode one company JSON section")
+describe("greenlink_image_requests_total", COUNTER, "Evidence image requests, including cache hits")
+describe("greenlink_image_load_seconds", HISTOGRAM, "Image reads from disk or the raster store")
+describe("greenlink_pdf_reports_total", COUNTER, "Rendered PDF documents")
+describe("greenlink_pdf_render_seconds", HISTOGRAM, "PDF render time")
+describe("greenlink_pdf_pages", HISTOGRAM, "Pages per rendered PDF", PAGE_BUCKETS)
+describe("greenlink_pdf_bytes", HISTOGRAM, "Size of rendered PDFs in bytes", BYTE_BUCKETS)
+describe("greenlink_http_requests_total", COUNTER, "HTTP API requests")
+describe("greenlink_http_request_seconds", HISTOGRAM, "HTTP API request latency")
+
+
+# --- 2. 记录 ---
+
+def enabled():
+    return _enabled
+
+
+def enable(flag=True):
+    global _enabled
+    _enabled = bool(flag)
+
+
+def _series(name, kind, labels):
+    metric = _metrics.get(name)
+    if metric is None:
+        metric = _metrics[name] = _Metric(name, kind, name, SECONDS_BUCKETS if kind == HISTOGRAM else None)
+    return metric, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    if not _enabled:
+        return
+    with _lock:
+        metric, key = _series(name, COUNTER, labels)
+        metric.series[key] = metric.series.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    if not _enabled:
+        return
+    with _lock:
+        metric, key = _series(name, GAUGE, labels)
+        metric.series[key] = value
+
+
+def observe(name, value, **labels):
+    """直方图记录一个观测值 (秒 / 页 / 字节)"""
+    if not _enabled:
+        return
+    with _lock:
+        metric, key = _series(name, HISTOGRAM, labels)
+        state = metric.series.get(key)
+        if state is None:
+            state = metric.series[key] = [0] * (len(metric.buckets) + 2)
+        for i, bound in enumerate(metric.buckets):
+            if value <= bound:
+                state[i] += 1
+        state[-2] += value
+        state[-1] += 1
+
+
+class _Timer:
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name, **labels):
+    """with timer("greenlink_xxx_seconds", kind="..."): ... ; 关闭时返回空上下文"""
+    return _Timer(name, labels) if _enabled else _NULL_TIMER
+
+
+def observe_pdf(report, seconds, pages, size):
+    """一份 PDF 的耗时 / 页数 / 字节数; report 为 company / portfolio / merged"""
+    if not _enabled:
+        return
+    inc("greenlink_pdf_reports_total", report=report)
+    observe("greenlink_pdf_render_seconds", seconds, report=report)
+    observe("greenlink_pdf_pages", pages, report=report)
+    observe("greenlink_pdf_bytes", size, report=report)
+
+
+def register_collector(key, collect):
+    """导出时调用 collect() 取得即时值 (如缓存 stats()); 同一 key 重复登记时替换"""
+    with _lock:
+        _collectors[key] = collect
+
+
+def stats_collector(prefix, stats, help_text, gauges=("entries", "bytes", "max_bytes", "hit_rate")):
+    """
+    把 stats() 返回的数值 dict 转为指标: gauges 中的键为仪表 <prefix>_<键>, 其余为累计计数 <prefix>_<键>_total
+    例: register_collector("data_cache", stats_collector("greenlink_data_cache", cache.stats, "Company section cache"))
+    """
+    def collect():
+        rows = []
+        for key, value in stats().items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            if key in gauges:
+                rows.append((f"{prefix}_{key}", GAUGE, f"{help_text}: {key}", {}, value))
+            else:
+                rows.append((f"{prefix}_{key}_total", COUNTER, f"{help_text}: {key}", {}, value))
+        return rows
+    return collect
+
+
+def reset():
+    """清空已记录的值 (保留登记的说明与采集函数)"""
+    with _lock:
+        for metric in _metrics.values():
+            metric.series.clear()
+
+
+# --- 3. 导出 ---
+
+_LABEL_ESCAPE = re.compile(r'[\\"\n]')
+_LABEL_REPLACE = {'\\': '\\\\', '"': '\\"', '\n': '\\n'}
+
+
+def _escape(value):
+    return _LABEL_ESCAPE.sub(lambda m: _LABEL_REPLACE[m.group()], str(value))
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(round(value, 6))
+    return str(value)
+
+
+def _snapshot():
+    """(已记录指标的深拷贝, 采集函数的即时值)"""
+    with _lock:
+        metrics = [(m.name, m.kind, m.help, m.buckets, {k: (list(v) if isinstance(v, list) else v)
+                                                         for k, v in m.series.items()})
+                   for m in _metrics.values() if m.series]
+        collectors = list(_collectors.values())
+    collected = {}
+    for collect in collectors:
+        try:
+            rows = collect()
+        except Exception:
+            continue
+        for name, kind, help_text, labels, value in rows:
+            entry = collected.setdefault(name, (kind, help_text, {}))
+            entry[2][tuple(sorted(labels.items()))] = value
+    return metrics, collected
+
+
+def render():
+    """Prometheus 文本格式"""
+    metrics, collected = _snapshot()
+    lines = []
+    for name, kind, help_text, buckets, series in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(series.items()):
+            if kind != HISTOGRAM:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            for bound, count in zip(buckets, value):
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(float(bound))),))} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {value[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(float(value[-2]))}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value[-1]}")
+    for name, (kind, help_text, series) in sorted(collected.items()):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(series.items()):
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def summary():
+    """侧边栏表格用: [{指标, 标签, 次数/值, 总和, 均值}]"""
+    metrics, collected = _snapshot()
+    rows = []
+    for name, kind, _, _, series in metrics:
+        for labels, value in sorted(series.items()):
+            label_text = ",".join(f"{k}={v}" for k, v in labels)
+            if kind == HISTOGRAM:
+                count, total = value[-1], value[-2]
+                rows.append({"指标": name, "标签": label_text, "次数/值": count,
+                             "总和": round(total, 4), "均值": round(total / count, 4) if count else 0.0})
+            else:
+                rows.append({"指标": name, "标签": label_text, "次数/值": value, "总和": None, "均值": None})
+    for name, (_, _, series) in sorted(collected.items()):
+        for labels, value in sorted(series.items()):
+            rows.append({"指标": name, "标签": ",".join(f"{k}={v}" for k, v in labels),
+                         "次数/值": round(value, 4) if isinstance(value, float) else value, "总和": None, "均值": None})
+    return rows
+
+
+def write_textfile(path=METRICS_PATH, min_interval=0.0):
+    """原子写入 Prometheus 文本文件; 距上次写入不足 min_interval 秒时跳过。返回是否写入"""
+    if not _enabled:
+        return False
+    now = time.monotonic()
+    if min_interval and now - _last_write[0] < min_interval:
+        return False
+    _last_write[0] = now
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+    return True
@@ -2,11 +2,22 @@ from io import BytesIO
 from datetime import datetime
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
-from reportlab.lib.units import cm
+from reportlab.lib.units import cm, inch
+from reportlab.lib.utils import ImageReader
 from reportlab.lib.colors import HexColor
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
 import os
+import threading
+import time
+
+from .scoring import score_company, BAND_DEEP_GREEN, BAND_LIGHT_GREEN
+from .schema import compile_company
+from .assets import pick_variant
+from .change_detection import evidence_paths, image_year
+from .text_layout import layout_text, draw_block
+from . import metrics
 
 # --- 1. 字体和颜色配置 ---
 
@@ -18,23 +29,83 @@ FONT_BOLD_NAME = 'AlibabaPuHuiTi-3-85-Bold.ttf'
 FONT_REGULAR_PATH = os.path.join(BASE_DIR, 'fonts', FONT_REGULAR_NAME)
 FONT_BOLD_PATH = os.path.join(BASE_DIR, 'fonts', FONT_BOLD_NAME)
 
+# 字体候选链: (族名, 常规字体, 粗体字体), 依次选择第一个存在且能解析的 TrueType 字体
+# ReportLab 对 TTF 只嵌入文档实际用到的字形子集
+FONT_CANDIDATES = (
+    ("AlibabaPuHuiTi", FONT_REGULAR_PATH, FONT_BOLD_PATH),
+    ("WenQuanYiZenHei", "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc", None),
+    ("DroidSansFallback", "/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf", None),
+    ("MicrosoftYaHei", "C:/Windows/Fonts/msyh.ttc", "C:/Windows/Fonts/msyhbd.ttc"),
+    ("SimHei", "C:/Windows/Fonts/simhei.ttf", None),
+    ("ArialUnicode", "/Library/Fonts/Arial Unicode.ttf", None),
+)
+# 都不可用时使用 ReportLab 内置的 Adobe CID 字体: 不嵌入字形, 由 PDF 阅读器提供, 中文仍可正常显示
+CID_FALLBACK = "STSong-Light"
+
 FONT_REG = "Helvetica"
 FONT_BOLD = "Helvetica-Bold"
-FONT_LOADED = False
-
-try:
-    if os.path.exists(FONT_REGULAR_PATH) and os.path.exists(FONT_BOLD_PATH):
-        pdfmetrics.registerFont(TTFont('AlibabaPuHuiTi-Regular', FONT_REGULAR_PATH))
-        pdfmetrics.registerFont(TTFont('AlibabaPuHuiTi-Bold', FONT_BOLD_PATH))
-        FONT_REG = "AlibabaPuHuiTi-Regular"
-        FONT_BOLD = "AlibabaPuHuiTi-Bold"
-        FONT_LOADED = True
-        print("✓ 字体加载成功 (Alibaba PuHuiTi fonts loaded successfully)")
-    else:
-        raise FileNotFoundError("字体文件未在指定路径找到 (Font files not found at path)")
-except Exception as e:
-    print(f"✗ 字体加载失败 (Font loading failed): {e}")
-    print("!!! PDF 将回退到英文字体 (Helvetica), 中文将显示为乱码 '■■■'。")
+FONT_LOADED = False        # 是否嵌入了 TrueType 中文字体
+FONT_SOURCE = None         # 实际使用的字体族名
+
+_fonts_ready = False
+_font_lock = threading.Lock()
+
+
+def resolve_fonts():
+    """返回首个存在的候选字体 (族名, 常规路径, 粗体路径); 只检查文件, 不解析字体"""
+    for family, regular, bold in FONT_CANDIDATES:
+        if os.path.exists(regular):
+            return family, regular, bold if bold and os.path.exists(bold) else None
+    return CID_FALLBACK, None, None
+
+
+def ensure_fonts():
+    """
+    首次渲染时注册字体 (每个进程只解析一次字体文件), 返回 (常规字体名, 粗体字体名)
+    导入本模块不做任何字体工作, 不渲染 PDF 的进程不承担这部分开销
+    """
+    global FONT_REG, FONT_BOLD, FONT_LOADED, FONT_SOURCE, _fonts_ready
+    if _fonts_ready:
+        return FONT_REG, FONT_BOLD
+    with _font_lock:
+        if _fonts_ready:
+            return FONT_REG, FONT_BOLD
+        for family, regular, bold in FONT_CANDIDATES:
+            if not os.path.exists(regular):
+                continue
+            try:
+                pdfmetrics.registerFont(TTFont(f"{family}-Regular", regular))
+                bold_name = f"{family}-Regular"
+                if bold and os.path.exists(bold):
+                    pdfmetrics.registerFont(TTFont(f"{family}-Bold", bold))
+                    bold_name = f"{family}-Bold"
+            except Exception as e:
+                print(f"✗ 字体加载失败 (Font loading failed) {regular}: {e}")
+                continue
+            FONT_REG, FONT_BOLD, FONT_LOADED, FONT_SOURCE = f"{family}-Regular", bold_name, True, family
+            break
+        else:
+            pdfmetrics.registerFont(UnicodeCIDFont(CID_FALLBACK))
+            FONT_REG = FONT_BOLD = CID_FALLBACK
+            FONT_SOURCE = CID_FALLBACK
+            print(f"⚠️ 未找到可嵌入的中文字体, 使用 CID 字体 {CID_FALLBACK} (字形由 PDF 阅读器提供)")
+        _fonts_ready = True
+    return FONT_REG, FONT_BOLD
+
+
+# 报告模板版本: 修改版式或内容时递增, 使已缓存的报告失效 (见 report_cache.py)
+REPORT_VERSION = 2
+
+
+def font_fingerprint():
+    """将使用的字体组合的指纹 (族名 + 文件大小/修改时间), 作为报告缓存键的一部分; 不触发字体注册"""
+    family, regular, bold = resolve_fonts()
+    fonts = [family]
+    for path in (regular, bold):
+        if path:
+            st = os.stat(path)
+            fonts.append([os.path.basename(path), st.st_size, st.st_mtime_ns])
+    return fonts
 
 
 COLOR_PRIMARY = HexColor("#27ae60")
@@ -49,6 +120,7 @@ WIDTH, HEIGHT = A4
 MARGIN_LEFT = 2 * cm
 MARGIN_RIGHT = WIDTH - 2 * cm
 Y_START = HEIGHT - 2.5 * cm
+PDF_IMAGE_DPI = 150  # 嵌入影像的目标分辨率, 用于选择最小可用的 JPEG 变体
 
 # --- 2. 核心绘图函数 (已修复) ---
 
@@ -62,74 +134,48 @@ def check_page_break(c, y, needed_space=4*cm):
 
 def draw_wrapped_text(c, x, y, text, font_name, font_size, max_width):
     """
-    (新) 在指定坐标(x, y)绘制换行文本
+    在指定坐标(x, y)绘制换行文本 (先由 text_layout 测量断行, 再逐行绘制)
     返回绘制后的新Y坐标 (即下一行文本的起始点)
     """
-    c.setFont(font_name, font_size)
-    text = str(text)
-    
-    # 简单的中英文换行逻辑
-    line = ""
-    start_y = y
-    line_height = (font_size * 1.3) / 72 * cm # 1.3倍行距
-    
-    for char in text:
-        test_line = line + char
-        # 检查是否是项目符号
-        is_bullet = (char == '•' or char == '✓' or char == '1.' or char == '2.' or char == '3.') and line == ""
-        
-        current_x = x
-        current_max_width = max_width
-        
-        if is_bullet:
-            # 绘制项目符号并为后续文本设置缩进
-            c.drawString(current_x, y, char) 
-            current_x += 0.6*cm
-            current_max_width -= 0.6*cm
-        else:
-            # 正常文本换行
-            if c.stringWidth(test_line, font_name, font_size) > current_max_width:
-                c.drawString(current_x, y, line) # 绘制满的行
-                y -= line_height # Y坐标下移
-                line = char
-            else:
-                line = test_line
-                
-    c.drawString(current_x, y, line) # 绘制最后一行
-    y -= line_height # Y坐标下移
-    
-    return y # 返回下一行可用的Y坐标
+    block = layout_text(text, font_name, font_size, max_width)
+    return draw_block(c, x, y, block)
 
-def draw_section_header(c, y, cn_title, en_title, color):
-    """绘制章节标题"""
-    y = check_page_break(c, y, 6*cm) # 确保章节标题有足够空间
-    
+def draw_section_title(c, x, y, cn_title, en_title, color, width=MARGIN_RIGHT - MARGIN_LEFT):
+    """章节标题本身 (中文标题 + 英文副标题 + 分隔线), 不处理分页; report_layout 复用"""
     c.setFont(FONT_BOLD, 14)
     c.setFillColor(color)
-    c.drawString(MARGIN_LEFT, y, cn_title)
+    c.drawString(x, y, cn_title)
     
     c.setFont(FONT_REG, 10)
     c.setFillColor(COLOR_SUBTLE)
-    c.drawString(MARGIN_LEFT, y - 0.5*cm, en_title)
+    c.drawString(x, y - 0.5*cm, en_title)
     
     c.setStrokeColor(color)
     c.setLineWidth(1)
-    c.line(MARGIN_LEFT, y - 0.8*cm, MARGIN_RIGHT, y - 0.8*cm)
-    
+    c.line(x, y - 0.8*cm, x + width, y - 0.8*cm)
+
+def draw_section_header(c, y, cn_title, en_title, color):
+    """绘制章节标题"""
+    y = check_page_break(c, y, 6*cm) # 确保章节标题有足够空间
+    draw_section_title(c, MARGIN_LEFT, y, cn_title, en_title, color)
     return y - 1.8*cm
 
-def draw_bilingual_field(c, y, cn_label, en_label, value_text, value_color=COLOR_TEXT):
-    """绘制双语字段 (v2.7 - 修复重叠问题)"""
-    y = check_page_break(c, y, 4*cm)
-    
-    # 1. 绘制标签
+def draw_bilingual_label(c, x, y, cn_label, en_label):
+    """双语标签 (中文粗体 + 英文灰色小字), 字段与小标题共用"""
     c.setFont(FONT_BOLD, 10)
     c.setFillColor(COLOR_TITLE)
-    c.drawString(MARGIN_LEFT + 0.5*cm, y, cn_label)
+    c.drawString(x, y, cn_label)
     
     c.setFont(FONT_REG, 9)
     c.setFillColor(COLOR_SUBTLE)
-    c.drawString(MARGIN_LEFT + 0.5*cm, y - 0.4*cm, en_label)
+    c.drawString(x, y - 0.4*cm, en_label)
+
+def draw_bilingual_field(c, y, cn_label, en_label, value_text, value_color=COLOR_TEXT):
+    """绘制双语字段 (v2.7 - 修复重叠问题)"""
+    y = check_page_break(c, y, 4*cm)
+    
+    # 1. 绘制标签
+    draw_bilingual_label(c, MARGIN_LEFT + 0.5*cm, y, cn_label, en_label)
     
     # 标签占用的最低Y坐标
     label_bottom_y = y - 0.4*cm - (9 * 1.3) / 72 * cm # 减去英文字体行高
@@ -172,21 +218,48 @@ def draw_wrapped_block(c, y, text_list, font_name=None, font_size=10, indent=1.0
     return y - 0.3*cm # 整个块之后的间距
 
 
-def set_risk_color(c, level, score):
-    """设置风险颜色"""
+def draw_evidence_images(c, y, paths, box_height=4.5*cm):
+    """并排绘制卫星证据影像, 每张图按所占宽度选择 JPEG 变体"""
+    gap = 0.4*cm
+    x = MARGIN_LEFT + 0.5*cm
+    box_width = (MARGIN_RIGHT - x - gap * (len(paths) - 1)) / len(paths)
+    y = check_page_break(c, y, box_height + 3*cm)
+    
+    for path in paths:
+        variant = pick_variant(path, box_width / inch * PDF_IMAGE_DPI, fmt="jpeg")
+        reader = ImageReader(variant)
+        img_w, img_h = reader.getSize()
+        scale = min(box_width / img_w, box_height / img_h)
+        draw_w, draw_h = img_w * scale, img_h * scale
+        c.drawImage(reader, x + (box_width - draw_w) / 2, y - draw_h, draw_w, draw_h)
+        
+        c.setFont(FONT_REG, 8)
+        c.setFillColor(COLOR_SUBTLE)
+        c.drawCentredString(x + box_width / 2, y - box_height - 0.4*cm, str(image_year(path) or ''))
+        x += box_width + gap
+    
+    return y - box_height - 1*cm
+
+
+def risk_color(level, score):
+    """风险等级对应的颜色"""
     level_str = str(level).lower()
     
     if "低" in level_str or "low" in level_str or score < 40:
-        c.setFillColor(RISK_LOW)
         return RISK_LOW
     elif "中" in level_str or "medium" in level_str or score < 70:
-        c.setFillColor(RISK_MEDIUM)
         return RISK_MEDIUM
     else:
-        c.setFillColor(RISK_HIGH)
         return RISK_HIGH
 
 
+def set_risk_color(c, level, score):
+    """设置风险颜色"""
+    color = risk_color(level, score)
+    c.setFillColor(color)
+    return color
+
+
 def draw_footer(c, page_num):
     """绘制页脚"""
     c.setFont(FONT_REG, 8)
@@ -201,8 +274,17 @@ def draw_footer(c, page_num):
 # 主生成函数 (已修复逻辑)
 # ============================================================
 
-def generate_pdf_report(data):
-    """生成ESG报告PDF"""
+def generate_pdf_report(data, profile=None):
+    """
+    生成ESG报告PDF
+    profile 为已编译且换为生效评分的 CompanyProfile (scoring.effective_profile);
+    未提供时现场编译一次, E / S 同样取事件衰减后的生效评分
+    """
+    ensure_fonts()
+    start = time.perf_counter()
+    if profile is None:
+        from .scoring import effective_profile
+        profile = effective_profile(compile_company(data))
     buffer = BytesIO()
     c = canvas.Canvas(buffer, pagesize=A4)
     c.setTitle(f"{data.get('company', 'Report')} - ESG Report")
@@ -258,17 +340,25 @@ def generate_pdf_report(data):
     y = HEIGHT - 15*cm
     y = draw_section_header(c, y, "风险等级概览", "Risk Level Overview", COLOR_PRIMARY)
     
-    e_level = env_data.get('risk_level', '未知')
-    e_score = env_data.get('risk_score', 0)
+    e_level = profile.env_level
+    e_score = profile.env_score
     e_color = set_risk_color(c, e_level, e_score)
     y = draw_bilingual_field(c, y, "环境风险 (E)", "Environmental Risk (E)", 
-                             f"{e_level} ({e_score}/100)", value_color=e_color)
+                             f"{e_level} ({e_score:g}/100)", value_color=e_color)
     
-    s_level = social_data.get('risk_level', '未知')
-    s_score = social_data.get('risk_score', 0)
+    s_level = profile.soc_level
+    s_score = profile.soc_score
     s_color = set_risk_color(c, s_level, s_score)
     y = draw_bilingual_field(c, y, "社会风险 (S)", "Social Risk (S)", 
-                             f"{s_level} ({s_score}/100)", value_color=s_color)
+                             f"{s_level} ({s_score:g}/100)", value_color=s_color)
+    
+    # 绿色金融评级: 与 app.py 绿色金融页使用同一评分引擎
+    pricing = score_company(e_score, s_score)
+    band_colors = {BAND_DEEP_GREEN: RISK_LOW, BAND_LIGHT_GREEN: RISK_MEDIUM}
+    y = draw_bilingual_field(c, y, "绿色金融评级", "Green Finance Rating",
+                             f"{pricing['rating_name']} ({pricing['rating_name_en']}) | "
+                             f"综合分 {pricing['total_score']:.1f} | ESG 优惠 -{pricing['discount_bp']} bp",
+                             value_color=band_colors.get(pricing['band'], RISK_HIGH))
     
     # 平台优势
     y -= 1*cm
@@ -310,6 +400,10 @@ def generate_pdf_report(data):
     y = draw_bilingual_field(c, y, "分析周期", "Analysis Period", 
                              env_analysis.get('period', 'N/A'))
     
+    image_paths = evidence_paths(env_analysis.get('evidence', {}))
+    if image_paths:
+        y = draw_evidence_images(c, y, image_paths)
+    
     y -= 0.5*cm
     # 这是一个子标题，不是一个字段
     y = check_page_break(c, y, 1*cm)
@@ -377,7 +471,7 @@ def generate_pdf_report(data):
     c.drawString(MARGIN_LEFT + 0.5*cm, y - 0.4*cm, "Key Risk Events")
     y -= 1*cm
     
-    key_events = social_data.get('key_events', [])
+    key_events = profile.soc_events
     if not key_events:
         y = draw_wrapped_block(c, y, 
                              ["未发现重大负面舆情事件 (No significant negative events found)"])
@@ -396,9 +490,9 @@ def generate_pdf_report(data):
             c.drawString(MARGIN_LEFT + 0.5*cm, y - 0.4*cm, "Key Risk Events (Cont.)")
             y -= 1*cm
         
-        event_date = event.get('date', event.get('year', 'N/A'))
-        event_text = event.get('event', 'N/A')
-        event_impact = event.get('impact', 'N/A')
+        event_date = event.date_label
+        event_text = event.title or 'N/A'
+        event_impact = event.description or list(event.details) or event.severity_label
         
         # 修复：使用 draw_bilingual_field 保证对齐
         y = draw_bilingual_field(c, y, "日期 (Date)", "", event_date)
@@ -422,19 +516,21 @@ def generate_pdf_report(data):
         y = draw_section_header(c, y, "供应链分析", "Supply Chain Analysis", COLOR_TITLE)
         
         if is_cofco:
-            suppliers = supply_chain_data.get('upstream', {}).get('suppliers', [])
+            suppliers = profile.suppliers
             y = draw_wrapped_block(c, y, 
                                  ["已识别上游高风险供应商 (High-risk upstream suppliers identified):"], 
                                  FONT_BOLD, 10, indent=0.5*cm) # 减小缩进
             
             for supplier in suppliers[:3]:
-                name = supplier.get('name', 'N/A')
-                status = supplier.get('risk_status', 'N/A')
-                color = set_risk_color(c, status, 100 if '高' in status else 30)
+                name = supplier.name
+                status = supplier.status or 'N/A'
+                color = set_risk_color(c, status, supplier.risk_score if supplier.risk_score is not None else 50)
                 # 修复：使用 bilingual_field
                 y = draw_bilingual_field(c, y, f"• {name}", "", status, value_color=color)
         else:
             markets = supply_chain_data.get('downstream', {}).get('markets', [])
+            # 中游企业的 markets 是 {"region": ...} 列表, 上游企业是字符串列表
+            markets = [m.get('region', '') if hasattr(m, 'get') else str(m) for m in markets]
             y = draw_wrapped_block(c, y, 
                                  ["下游市场合规风险 (Downstream Market Compliance Risk):"], 
                                  FONT_BOLD, 10, indent=0.5*cm)
@@ -484,6 +580,7 @@ def generate_pdf_report(data):
     draw_footer(c, page_num)
     
     c.save()
+    metrics.observe_pdf("company", time.perf_counter() - start, page_num, buffer.tell())
     buffer.seek(0)
     
     return buffer
@@ -0,0 +1,276 @@
+"""
+流式合并报告 (Streaming PDF Writer)
+ReportLab 的 canvas 在 save() 之前把整份文档保存在内存里, 数千家公司的合并报告会占用数百 MB。
+这里逐家渲染 (每家是一份独立的小 PDF, 可直接取自报告缓存), 把其中的对象重新编号后
+立即写出到文件或分块 HTTP 响应, 最后补写页树、目录和交叉引用表。
+常驻内存只有当前一家公司的 PDF, 外加每个对象 8 字节的偏移表, 与页数基本无关
+每家公司的字体子集各自嵌入 (CID 字体不嵌入字形, 没有额外开销)
+
+命令行: python -m utils.pdf_stream -o portfolio_report.pdf [代码 ...]
+"""
+
+import argparse
+import os
+import re
+import time
+from array import array
+from collections.abc import Mapping
+from datetime import datetime
+from io import BytesIO
+
+from . import metrics
+
+_XREF_RE = re.compile(rb'startxref\s+(\d+)')
+_TRAILER_RE = re.compile(rb'trailer\s*<<(.*?)>>\s*startxref', re.S)
+_REF_RE = re.compile(rb'(\d+) 0 R')
+_OBJ_RE = re.compile(rb'^\s*(\d+) 0 obj')
+_STREAM_RE = re.compile(rb'>>\s*stream\r?\n')
+_TYPE_RE = re.compile(rb'/Type\s*/(\w+)')
+_KIDS_RE = re.compile(rb'/Kids\s*\[([^\]]*)\]')
+
+# 合并文档中预留的对象编号
+_PAGES_ID = 1
+_CATALOG_ID = 2
+_INFO_ID = 3
+_DROPPED_TYPES = (b'Catalog', b'Pages', b'Outlines')
+
+
+def _escape(text):
+    return str(text).replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)').encode('latin-1', 'replace')
+
+
+# --- 1. 拆解单份 PDF ---
+
+def split_objects(pdf):
+    """
+    按交叉引用表切分 ReportLab 生成的 PDF, 返回 ({对象号: 字节}, trailer 字节)
+    每个对象取到下一个对象起点为止, 流数据不做解析
+    """
+    start_xref = int(_XREF_RE.findall(pdf)[-1])
+    lines = pdf[start_xref:].split(b'\n')
+    count = int(lines[1].split()[1])
+    offsets = []
+    for number, line in enumerate(lines[2:2 + count]):
+        fields = line.split()
+        if len(fields) >= 3 and fields[2] == b'n':
+            offsets.append((int(fields[0]), number))
+    offsets.sort()
+    objects = {}
+    bounds = [offset for offset, _ in offsets] + [start_xref]
+    for (offset, number), end in zip(offsets, bounds[1:]):
+        objects[number] = pdf[offset:end]
+    trailer = _TRAILER_RE.search(pdf).group(1)
+    return objects, trailer
+
+
+def _page_order(objects):
+    """按 /Pages 树的 Kids 顺序返回页面对象号 (支持嵌套页树)"""
+    types = {n: _TYPE_RE.search(body.split(b'stream', 1)[0]) for n, body in objects.items()}
+    roots = [n for n, t in types.items() if t and t.group(1) == b'Pages'
+             and b'/Parent' not in objects[n].split(b'stream', 1)[0]]
+
+    def walk(n):
+        t = types.get(n)
+        if t and t.group(1) == b'Page':
+            return [n]
+        kids = _KIDS_RE.search(objects[n])
+        return [page for kid in _REF_RE.findall(kids.group(1)) for page in walk(int(kid))] if kids else []
+
+    return [page for root in roots for page in walk(root)]
+
+
+# --- 2. 流式写出 ---
+
+class PDFStreamWriter:
+    """
+    逐份追加 PDF 并以字节块形式产出:
+        writer = PDFStreamWriter(title)
+        yield writer.header()
+        for pdf in parts: yield writer.append(pdf)
+        yield writer.close()
+    """
+
+    def __init__(self, title="GreenLink ESG Portfolio Report"):
+        self.title = title
+        self.offsets = array('q', [0, 0, 0, 0])     # 对象号 -> 字节偏移, 0 号为空闲对象
+        self.kids = array('q')
+        self.position = 0
+        self.parts = 0
+
+    def _emit(self, chunks):
+        data = b''.join(chunks)
+        self.position += len(data)
+        return data
+
+    def header(self):
+        return self._emit([b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'])
+
+    def append(self, pdf):
+        """追加一份完整 PDF 的全部页面, 返回需要写出的字节"""
+        objects, trailer = split_objects(pdf)
+        info = re.search(rb'/Info (\d+) 0 R', trailer)
+        dropped = {int(info.group(1))} if info else set()
+        page_trees = set()
+        for number, body in objects.items():
+            kind = _TYPE_RE.search(body.split(b'stream', 1)[0])
+            if kind and kind.group(1) in _DROPPED_TYPES:
+                dropped.add(number)
+                if kind.group(1) == b'Pages':
+                    page_trees.add(number)
+        pages = _page_order(objects)
+
+        # 保留的对象按原顺序分配新编号
+        renumber = {}
+        for number in sorted(objects):
+            if number not in dropped:
+                renumber[number] = len(self.offsets)
+                self.offsets.append(0)
+
+        def relink(match):
+            number = int(match.group(1))
+            if number in page_trees:        # 页面的 /Parent 指向合并后的页树
+                return b'%d 0 R' % _PAGES_ID
+            new = renumber.get(number)
+            return b'%d 0 R' % new if new is not None else b'null'
+
+        chunks = []
+        position = self.position
+        for number in sorted(renumber):
+            body = objects[number]
+            stream = _STREAM_RE.search(body)
+            head, tail = (body[:stream.end()], body[stream.end():]) if stream else (body, b'')
+            head = _OBJ_RE.sub(b'%d 0 obj' % renumber[number], head, count=1)
+            head = _REF_RE.sub(relink, head)
+            self.offsets[renumber[number]] = position
+            chunks.append(head)
+            chunks.append(tail)
+            position += len(head) + len(tail)
+        self.kids.extend(renumber[p] for p in pages)
+        self.parts += 1
+        return self._emit(chunks)
+
+    @property
+    def page_count(self):
+        return len(self.kids)
+
+    def close(self):
+        """补写页树、目录、文档信息与交叉引用表"""
+        chunks = []
+        position = self.position
+
+        def obj(number, body):
+            nonlocal position
+            data = b'%d 0 obj\n%s\nendobj\n' % (number, body)
+            self.offsets[number] = position
+            chunks.append(data)
+            position += len(data)
+
+        kids = b' '.join(b'%d 0 R' % k for k in self.kids)
+        obj(_PAGES_ID, b'<< /Type /Pages /Count %d /Kids [ %s ] >>' % (len(self.kids), kids))
+        obj(_CATALOG_ID, b'<< /Type /Catalog /Pages %d 0 R /PageMode /UseNone >>' % _PAGES_ID)
+        now = datetime.now().strftime('D:%Y%m%d%H%M%S')
+        obj(_INFO_ID, b'<< /Title (%s) /Producer (GreenLink) /CreationDate (%s) >>' % (_escape(self.title),
+                                                                                         now.encode()))
+
+        xref_at = position
+        chunks.append(b'xref\n0 %d\n0000000000 65535 f \n' % len(self.offsets))
+        chunks.append(b''.join(b'%010d 00000 n \n' % offset for offset in self.offsets[1:]))
+        chunks.append(b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                      % (len(self.offsets), _CATALOG_ID, _INFO_ID, xref_at))
+        return self._emit(chunks)
+
+
+# --- 3. 合并报告 ---
+
+def registry_items(registry, codes=None, scorer=None):
+    """
+    按需从注册表逐家产出 (record, profile), 不预先加载全部公司;
+    profile 的 E / S 为生效评分 (scorer 默认为 scoring.shared_scorer(registry))
+    """
+    from .scoring import effective_profile, shared_scorer
+
+    scorer = scorer or shared_scorer(registry)
+    for code in codes if codes is not None else registry.codes():
+        yield registry.load(code), effective_profile(registry.profile(code), scorer)
+
+
+def iter_portfolio_pdf(items, total=None, on_progress=None, title="GreenLink ESG Portfolio Report",
+                       render=None):
+    """
+    生成合并报告的字节块, 可直接作为分块 HTTP 响应体
+    items: data / (data, profile) 的可迭代对象, 逐个消费
+    on_progress(done, total, pages, bytes) 每写完一家公司回调一次
+    """
+    if render is None:
+        from .report_cache import cached_pdf_report as render
+
+    start = time.perf_counter()
+    writer = PDFStreamWriter(title)
+    yield writer.header()
+    done = 0
+    for item in items:
+        data, profile = (item, None) if isinstance(item, Mapping) else item
+        yield writer.append(render(data, profile).getvalue())
+        done += 1
+        if on_progress:
+            on_progress(done, total, writer.page_count, writer.position)
+    tail = writer.close()
+    # 耗时含消费方写出各块的时间 (流式响应即网络写出)
+    metrics.observe_pdf("merged", time.perf_counter() - start, writer.page_count, writer.position)
+    yield tail
+
+
+def write_portfolio_pdf(items, out, total=None, on_progress=None, title="GreenLink ESG Portfolio Report"):
+    """写入文件路径或可写文件对象, 返回汇总 dict: companies, pages, bytes, seconds"""
+    start = time.perf_counter()
+    own = isinstance(out, str)
+    f = open(out, 'wb') if own else out
+    pages = [0]
+    companies = [0]
+
+    def progress(done, total_, page_count, written):
+        companies[0], pages[0] = done, page_count
+        if on_progress:
+            on_progress(done, total_, page_count, written)
+
+    written = 0
+    try:
+        for chunk in iter_portfolio_pdf(items, total, progress, title):
+            f.write(chunk)
+            written += len(chunk)
+    finally:
+        if own:
+            f.close()
+    return {"companies": companies[0], "pages": pages[0], "bytes": written,
+            "seconds": time.perf_counter() - start}
+
+
+def portfolio_pdf_bytes(items, total=None, on_progress=None):
+    """小组合的便捷接口: 返回 BytesIO (仍按公司逐个写入)"""
+    buffer = BytesIO()
+    write_portfolio_pdf(items, buffer, total, on_progress)
+    buffer.seek(0)
+    return buffer
+
+
+def main(argv=None):
+    from .registry import CompanyRegistry
+
+    parser = argparse.ArgumentParser(description="生成组合合并 ESG 报告 (流式写出)")
+    parser.add_argument('codes', nargs='*', help="公司代码 (默认全部)")
+    parser.add_argument('-o', '--output', default='portfolio_report.pdf')
+    args = parser.parse_args(argv)
+
+    registry = CompanyRegistry(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
+    codes = args.codes or registry.codes()
+
+    def progress(done, total, pages, size):
+        print(f"\r[{done}/{total}] {pages} 页, {size / 1e6:.1f} MB", end='', flush=True)
+
+    summary = write_portfolio_pdf(registry_items(registry, codes), args.output, len(codes), progress)
+    print(f"\n完成: {summary['companies']} 家公司, {summary['pages']} 页, "
+          f"{summary['bytes'] / 1e6:.1f} MB, {summary['seconds']:.1f} s -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
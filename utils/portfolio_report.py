@@ -0,0 +1,265 @@
+"""
+组合风险报告 (Portfolio Risk Report)
+基于 report_layout 的两遍排版: N 家公司的全部内容先生成块、测量并分页, 再一次绘制,
+不存在 "画到一半发现放不下" 的回退。结构:
+    封面 -> 目录 -> 组合风险排名 (综合 / E / S 三张排名表) -> 逐家公司章节
+排名表的页码列、公司章节中的供应链关联均为可点击的交叉引用, PDF 书签与目录一致
+
+命令行: python -m utils.portfolio_report -o portfolio_risk_report.pdf [代码 ...]
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
+from reportlab.lib.colors import HexColor
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+
+from . import metrics
+from . import pdf_generator as pg
+from .report_layout import (FRAME_BOTTOM, FRAME_TOP, Block, Field, KeepTogether, PageBreak, PageRef,
+                            Paragraphs, Rule, SectionHeader, SubHeading, Table, TableOfContents,
+                            collect_toc, paginate, render)
+from .scoring import (RATING_NAMES, RATING_NAMES_EN, effective_profile, effective_scores, score_portfolio,
+                      shared_scorer)
+
+TOP_N = 20
+BAND_COLORS = (pg.RISK_LOW, pg.RISK_MEDIUM, pg.RISK_HIGH)
+
+
+def company_anchor(position):
+    """按报告中的位置编号, 同一公司代码重复出现时也互不冲突"""
+    return f"company-{position}"
+
+
+# --- 1. 封面 ---
+
+class CoverPage(Block):
+    """与单公司报告相同的封面色带, 占满整页"""
+
+    def __init__(self, title, lines):
+        self.title = title
+        self.lines = lines
+
+    def measure(self, width):
+        return FRAME_TOP - FRAME_BOTTOM
+
+    def draw(self, c, x, y, ctx):
+        c.setFillColor(pg.COLOR_PRIMARY)
+        c.rect(0, pg.HEIGHT - 5 * cm, pg.WIDTH, 5 * cm, fill=True, stroke=False)
+        c.setFillColor(HexColor("#FFFFFF"))
+        c.setFont(pg.FONT_BOLD, 32)
+        c.drawCentredString(pg.WIDTH / 2, pg.HEIGHT - 2.8 * cm, "绿链 (GreenLink)")
+        c.setFont(pg.FONT_REG, 16)
+        c.drawCentredString(pg.WIDTH / 2, pg.HEIGHT - 3.8 * cm,
+                            "组合 ESG 风险报告 (Portfolio ESG Risk Report)")
+        c.setFillColor(pg.COLOR_TITLE)
+        c.setFont(pg.FONT_BOLD, 22)
+        c.drawCentredString(pg.WIDTH / 2, pg.HEIGHT - 7.5 * cm, self.title)
+        c.setFont(pg.FONT_REG, 11)
+        line_y = pg.HEIGHT - 10 * cm
+        for line in self.lines:
+            c.drawCentredString(pg.WIDTH / 2, line_y, line)
+            line_y -= 0.6 * cm
+
+
+# --- 2. 排名表 ---
+
+RANK_COLUMNS = [("排名", 0.6, 'r'), ("公司 (Company)", 3.2, 'l'), ("E", 0.6, 'r'), ("S", 0.6, 'r'),
+                ("综合分", 0.9, 'r'), ("评级 (Rating)", 1.4, 'l'), ("页码", 0.8, 'r')]
+DIMENSION_COLUMNS = [("排名", 0.6, 'r'), ("公司 (Company)", 3.6, 'l'), ("得分", 0.8, 'r'),
+                     ("综合分", 0.9, 'r'), ("页码", 0.8, 'r')]
+
+
+def _ranked(values):
+    """风险从高到低的下标; 同分保持注册表顺序"""
+    return np.argsort(-np.asarray(values, dtype=np.float64), kind='stable')
+
+
+def _score_cell(score):
+    return (f"{score:g}", pg.risk_color("", score))
+
+
+def _ranking_blocks(names, env, soc, result, anchors, top_n):
+    total = result['total_score']
+    band = result['band']
+    count = len(names)
+    blocks = [
+        SectionHeader("组合风险排名", "Portfolio Risk Ranking", pg.COLOR_PRIMARY, anchor="ranking", toc_level=0),
+        Field("公司数量", "Companies", f"{count} 家"),
+        Field("平均风险", "Average Risk",
+              f"E {env.mean():.1f} | S {soc.mean():.1f} | 综合 {total.mean():.1f}" if count else "N/A"),
+        Field("评级分布", "Rating Distribution",
+              [f"{RATING_NAMES[b]} ({RATING_NAMES_EN[b]}): {int((band == b).sum())} 家" for b in range(3)]),
+        Field("高风险敞口", "High Exposure", f"{int(result['high_exposure'].sum())} 家 (综合分 > 60)",
+              value_color=pg.RISK_HIGH if result['high_exposure'].any() else None),
+        SubHeading("综合风险排名", "Ranked by Total Score"),
+        Table(RANK_COLUMNS, [
+            (str(rank), names[i], _score_cell(env[i]), _score_cell(soc[i]), f"{total[i]:.1f}",
+             (RATING_NAMES[band[i]], BAND_COLORS[band[i]]), PageRef(anchors[i]))
+            for rank, i in enumerate(_ranked(total), 1)]),
+    ]
+    for cn, en, values in (("环境风险", "Environmental Risk (E)", env), ("社会风险", "Social Risk (S)", soc)):
+        order = _ranked(values)[:top_n]
+        blocks.append(SubHeading(f"{cn} Top {len(order)}", f"Top {len(order)} by {en}"))
+        blocks.append(Table(DIMENSION_COLUMNS, [
+            (str(rank), names[i], _score_cell(values[i]), f"{total[i]:.1f}", PageRef(anchors[i]))
+            for rank, i in enumerate(order, 1)]))
+    return blocks
+
+
+# --- 3. 公司章节 ---
+
+LINK_COLUMNS = [("方向", 0.8, 'l'), ("名称 (Name)", 3.8, 'l'), ("传导风险", 1.0, 'r'), ("报告页", 1.0, 'r')]
+
+
+def _event_card(event):
+    impact = event.description or list(event.details) or event.severity_label
+    return KeepTogether([
+        Field("日期 (Date)", "", event.date_label),
+        Field("事件 (Event)", "", event.title or 'N/A'),
+        Field("影响 (Impact)", "", impact),
+        Rule(),
+    ])
+
+
+def _link_rows(graph, code, code_anchor):
+    """供应链上下游节点; 已收录进本报告的公司给出页码交叉引用"""
+    if graph is None:
+        return []
+    try:
+        node = graph.node_id(code)
+    except KeyError:
+        return []
+    rows = []
+    for direction, neighbours in (("上游", graph.upstream(node)), ("下游", graph.downstream(node))):
+        for n in neighbours:
+            anchor = code_anchor.get(graph.codes[n])
+            rows.append((direction, graph.nodes[n], _score_cell(round(float(graph.propagated[n]), 1)),
+                         PageRef(anchor) if anchor else "-"))
+    return rows
+
+
+def _company_blocks(position, rank, count, info, profile, pricing, graph, code_anchor):
+    band = pricing['band']
+    blocks = [
+        SectionHeader(f"{rank}. {info['name']}", f"{info['code']} | {info['type']} / {info['position']}",
+                      BAND_COLORS[band], anchor=company_anchor(position), toc_level=1),
+        Field("环境风险 (E)", "Environmental Risk (E)", f"{profile.env_level} ({profile.env_score:g}/100)",
+              value_color=pg.risk_color(profile.env_level, profile.env_score)),
+        Field("社会风险 (S)", "Social Risk (S)", f"{profile.soc_level} ({profile.soc_score:g}/100)",
+              value_color=pg.risk_color(profile.soc_level, profile.soc_score)),
+        Field("绿色金融评级", "Green Finance Rating",
+              f"{RATING_NAMES[band]} ({RATING_NAMES_EN[band]}) | 综合分 {pricing['total']:.1f} | "
+              f"组合排名 {rank}/{count} | ESG 优惠 -{pricing['discount_bp']} bp",
+              value_color=BAND_COLORS[band]),
+        Field("传统评级", "Traditional Rating", profile.traditional_rating or 'N/A'),
+        SubHeading("关键风险事件", "Key Risk Events"),
+    ]
+    events = sorted(profile.env_events + profile.soc_events, key=lambda e: -e.date_key)
+    if events:
+        blocks.extend(_event_card(e) for e in events)
+    else:
+        blocks.append(Paragraphs(["未发现重大负面舆情事件 (No significant negative events found)"]))
+
+    blocks.append(SubHeading("供应链关联", "Supply Chain Links"))
+    rows = _link_rows(graph, info['code'], code_anchor)
+    blocks.append(Table(LINK_COLUMNS, rows) if rows else
+                  Paragraphs(["未识别到供应链关联 (No supply chain links identified)"]))
+    return blocks
+
+
+# --- 4. 组装与输出 ---
+
+def build_portfolio_blocks(registry, codes=None, graph=None, top_n=TOP_N, title="GreenLink 投资组合"):
+    """生成整份报告的块序列 (封面、目录、排名、公司章节), 尚未分页; E / S 取生效评分"""
+    scorer = shared_scorer(registry)
+    codes, env, soc = effective_scores(registry, codes, scorer)
+    infos = [registry.info(code) for code in codes]
+    names = [info['name'] for info in infos]
+    result = score_portfolio(env, soc)
+    anchors = [company_anchor(i) for i in range(len(codes))]
+    code_anchor = {}
+    for code, anchor in zip(codes, anchors):
+        code_anchor.setdefault(code, anchor)
+
+    body = _ranking_blocks(names, env, soc, result, anchors, top_n)
+    body.append(PageBreak())
+    body.append(SectionHeader("公司明细", "Company Details", pg.COLOR_TITLE, anchor="companies", toc_level=0))
+    for rank, i in enumerate(_ranked(result['total_score']), 1):
+        if rank > 1:
+            body.append(PageBreak())
+        pricing = {"band": int(result['band'][i]), "total": float(result['total_score'][i]),
+                   "discount_bp": int(result['discount_bp'][i])}
+        profile = effective_profile(registry.profile(codes[i]), scorer)
+        body.extend(_company_blocks(i, rank, len(codes), infos[i], profile, pricing, graph, code_anchor))
+
+    # 目录条目在分页前即可确定, 目录高度随之确定, 整份文档只需分页一次
+    cover = CoverPage(title, [f"报告日期 (Report Date): {datetime.now().strftime('%Y-%m-%d')}",
+                              f"覆盖公司 (Companies): {len(codes)}"])
+    toc = [SectionHeader("目录", "Table of Contents", pg.COLOR_PRIMARY), TableOfContents(collect_toc(body))]
+    return [cover, PageBreak()] + toc + [PageBreak()] + body
+
+
+def write_portfolio_report(registry, out, codes=None, graph=None, top_n=TOP_N, title="GreenLink 投资组合"):
+    """
+    写入文件路径或可写文件对象
+    graph 为 SupplyChainGraph (用于供应链交叉引用), 未提供时从注册表构建
+    返回汇总 dict: companies, pages, bytes, layout_seconds, draw_seconds
+    """
+    from .supply_graph import build_graph
+
+    pg.ensure_fonts()
+    start = time.perf_counter()
+    if graph is None:
+        graph = build_graph(registry)
+    blocks = build_portfolio_blocks(registry, codes, graph, top_n, title)
+    pages, ctx = paginate(blocks)
+    laid_out = time.perf_counter()
+
+    c = canvas.Canvas(out, pagesize=A4, pageCompression=1)
+    c.setTitle(f"{title} - Portfolio ESG Report")
+    c.showOutline()
+    render(c, pages, ctx)
+    c.save()
+    size = os.path.getsize(out) if isinstance(out, str) else out.tell()
+    metrics.observe_pdf("portfolio", time.perf_counter() - start, len(pages), size)
+    return {
+        "companies": len(codes) if codes is not None else len(registry),
+        "pages": len(pages),
+        "bytes": size,
+        "layout_seconds": laid_out - start,
+        "draw_seconds": time.perf_counter() - laid_out,
+    }
+
+
+def portfolio_report_bytes(registry, codes=None, graph=None):
+    """返回 BytesIO, 供 Streamlit 下载按钮使用"""
+    buffer = BytesIO()
+    write_portfolio_report(registry, buffer, codes, graph)
+    buffer.seek(0)
+    return buffer
+
+
+def main(argv=None):
+    from .registry import CompanyRegistry
+
+    parser = argparse.ArgumentParser(description="生成组合 ESG 风险报告 (目录 + 排名 + 交叉引用)")
+    parser.add_argument('codes', nargs='*', help="公司代码 (默认全部)")
+    parser.add_argument('-o', '--output', default='portfolio_risk_report.pdf')
+    parser.add_argument('--top', type=int, default=TOP_N, help="E/S 排名表的条目数")
+    args = parser.parse_args(argv)
+
+    registry = CompanyRegistry(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
+    summary = write_portfolio_report(registry, args.output, args.codes or None, top_n=args.top)
+    print(f"完成: {summary['companies']} 家公司, {summary['pages']} 页, {summary['bytes'] / 1e6:.1f} MB, "
+          f"排版 {summary['layout_seconds']:.1f} s + 绘制 {summary['draw_seconds']:.1f} s -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+"""
+分块栅格存储 (Tiled Raster Store)
+真实证据是数 GB 的卫星场景, 用 PIL 整幅读入会耗尽 Streamlit 主机内存。
+场景只入库一次, 转换为可内存映射的分块布局:
+    .cache/rasters/<scene_id>/meta.json
+    .cache/rasters/<scene_id>/level_<k>.tiles   uint8, 形状 (tiles_y, tiles_x, T, T, bands)
+每个切片在文件中连续存放, 窗口读取只触及相交的切片; level 1.. 为逐级 2 倍下采样的概览层
+带地理范围 (bounds) 的场景可以直接按经纬度包围盒读取, 例如 environment.analysis.coordinates 周边区域
+"""
+
+import json
+import math
+import os
+import re
+import shutil
+
+import numpy as np
+
+from . import metrics
+from .fscache import Fingerprints
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RASTER_DIR = os.path.join(BASE_DIR, '.cache', 'rasters')
+
+# --- 1. 配置 ---
+
+STORE_VERSION = 1
+DEFAULT_TILE = 256
+MIN_OVERVIEW_SIDE = 256     # 概览层最长边缩小到该值以下即停止
+KM_PER_DEGREE = 111.32
+
+_COORD_RE = re.compile(r'(-?\d+(?:\.\d+)?)\s*°?\s*([NSEW])?', re.IGNORECASE)
+
+
+def parse_coordinates(text):
+    """'-0.75°S, 110.5°E' -> (lat, lon); 无法解析返回 None"""
+    values = _COORD_RE.findall(str(text or ''))
+    if len(values) < 2:
+        return None
+    (lat, lat_hemi), (lon, lon_hemi) = values[:2]
+    lat, lon = float(lat), float(lon)
+    if lat_hemi.upper() == 'S' and lat > 0:
+        lat = -lat
+    if lon_hemi.upper() == 'W' and lon > 0:
+        lon = -lon
+    return lat, lon
+
+
+def bbox_around(lat, lon, radius_km):
+    """以 (lat, lon) 为中心、半径 radius_km 的包围盒 (west, south, east, north)"""
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    return lon - dlon, lat - dlat, lon + dlon, lat + dlat
+
+
+# --- 2. 场景 ---
+
+class RasterScene:
+    """已入库的场景; 所有读取都经由 np.memmap, 不会整幅载入内存"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.scene_id = self.meta['scene_id']
+        self.tile = self.meta['tile']
+        self.bands = self.meta['bands']
+        self.levels = self.meta['levels']          # [{"width", "height", "tiles_x", "tiles_y"}]
+        self.bounds = self.meta.get('bounds')      # (west, south, east, north) 或 None
+        self._maps = {}
+
+    @property
+    def width(self):
+        return self.levels[0]['width']
+
+    @property
+    def height(self):
+        return self.levels[0]['height']
+
+    def _tiles(self, level):
+        if level not in self._maps:
+            info = self.levels[level]
+            self._maps[level] = np.memmap(
+                os.path.join(self.path, f"level_{level}.tiles"), dtype=np.uint8, mode='r',
+                shape=(info['tiles_y'], info['tiles_x'], self.tile, self.tile, self.bands))
+        return self._maps[level]
+
+    def pick_level(self, width, height, max_side):
+        """选择输出最长边仍不小于 max_side 的最粗概览层 (width/height 为 level 0 像素)"""
+        level = 0
+        while level + 1 < len(self.levels) and max(width, height) / 2 ** (level + 1) >= max_side:
+            level += 1
+        return level
+
+    def read_window(self, x0, y0, x1, y1, level=0, max_side=None):
+        """
+        读取 level 0 坐标系下的窗口 [x0, x1) x [y0, y1), 返回 (H, W, bands) uint8
+        给定 max_side 时自动选择概览层, 返回的数组最长边约为 max_side
+        """
+        x0, y0 = max(0, int(x0)), max(0, int(y0))
+        x1, y1 = min(self.width, int(x1)), min(self.height, int(y1))
+        if x1 <= x0 or y1 <= y0:
+            raise ValueError(f"窗口为空 (Empty window): {(x0, y0, x1, y1)}")
+        if max_side:
+            level = self.pick_level(x1 - x0, y1 - y0, max_side)
+
+        scale = 2 ** level
+        info = self.levels[level]
+        lx0, ly0 = x0 // scale, y0 // scale
+        lx1 = min(info['width'], max(lx0 + 1, -(-x1 // scale)))
+        ly1 = min(info['height'], max(ly0 + 1, -(-y1 // scale)))
+
+        metrics.inc("greenlink_image_requests_total", kind="raster")
+        with metrics.timer("greenlink_image_load_seconds", kind="raster"):
+            tiles = self._tiles(level)
+            t = self.tile
+            out = np.empty((ly1 - ly0, lx1 - lx0, self.bands), dtype=np.uint8)
+            for ty in range(ly0 // t, (ly1 - 1) // t + 1):
+                for tx in range(lx0 // t, (lx1 - 1) // t + 1):
+                    # 当前切片与窗口的交集 (level 坐标)
+                    sx0, sy0 = max(lx0, tx * t), max(ly0, ty * t)
+                    sx1, sy1 = min(lx1, (tx + 1) * t), min(ly1, (ty + 1) * t)
+                    out[sy0 - ly0:sy1 - ly0, sx0 - lx0:sx1 - lx0] = \
+                        tiles[ty, tx, sy0 - ty * t:sy1 - ty * t, sx0 - tx * t:sx1 - tx * t]
+        return out
+
+    def read_overview(self, max_side):
+        """整幅场景的概览 (最长边约为 max_side)"""
+        return self.read_window(0, 0, self.width, self.height, max_side=max_side)
+
+    def bbox_to_window(self, west, south, east, north):
+        """经纬度包围盒 -> level 0 像素窗口, 需要场景带 bounds"""
+        if not self.bounds:
+            raise ValueError(f"场景 {self.scene_id} 没有地理范围 (Scene is not georeferenced)")
+        b_west, b_south, b_east, b_north = self.bounds
+        px = self.width / (b_east - b_west)
+        py = self.height / (b_north - b_south)
+        return ((west - b_west) * px, (b_north - north) * py,
+                (east - b_west) * px, (b_north - south) * py)
+
+    def read_bbox(self, west, south, east, north, max_side=None):
+        return self.read_window(*self.bbox_to_window(west, south, east, north), max_side=max_side)
+
+    def read_around(self, coordinates, radius_km, max_side=None):
+        """读取 coordinates ('-0.75°S, 110.5°E') 周围 radius_km 的区域"""
+        point = parse_coordinates(coordinates)
+        if point is None:
+            raise ValueError(f"无法解析坐标 (Cannot parse coordinates): {coordinates!r}")
+        return self.read_bbox(*bbox_around(point[0], point[1], radius_km), max_side=max_side)
+
+
+# --- 3. 入库 ---
+
+def _write_level(path, height, width, bands, tile, read_rows):
+    """按切片行逐条写入一层; read_rows(top, bottom) 返回 (rows, width, bands) uint8"""
+    tiles_x, tiles_y = -(-width // tile), -(-height // tile)
+    tiles = np.memmap(path, dtype=np.uint8, mode='w+', shape=(tiles_y, tiles_x, tile, tile, bands))
+    for ty in range(tiles_y):
+        top, bottom = ty * tile, min(height, (ty + 1) * tile)
+        strip = np.zeros((tile, tiles_x * tile, bands), dtype=np.uint8)
+        strip[:bottom - top, :width] = read_rows(top, bottom)
+        tiles[ty] = strip.reshape(tile, tiles_x, tile, bands).transpose(1, 0, 2, 3)
+    tiles.flush()
+    del tiles
+    return {"width": width, "height": height, "tiles_x": tiles_x, "tiles_y": tiles_y}
+
+
+def _downsample_reader(scene_dir, info, level, bands, tile):
+    """以上一层 memmap 为源, 2x2 均值生成下一层的行读取器"""
+    src = np.memmap(os.path.join(scene_dir, f"level_{level}.tiles"), dtype=np.uint8, mode='r',
+                    shape=(info['tiles_y'], info['tiles_x'], tile, tile, bands))
+
+    def read_rows(top, bottom):
+        # 下一层的 [top, bottom) 行对应本层 [2*top, 2*bottom) 行, 最多跨两个切片行
+        y0, y1 = top * 2, bottom * 2
+        strips = [src[ty].transpose(1, 0, 2, 3).reshape(tile, -1, bands)
+                  for ty in range(y0 // tile, (y1 - 1) // tile + 1)]
+        rows = np.concatenate(strips, axis=0) if len(strips) > 1 else strips[0]
+        offset = (y0 // tile) * tile
+        block = rows[y0 - offset:y1 - offset, :(info['width'] // 2) * 2].astype(np.uint16)
+        return ((block[0::2, 0::2] + block[1::2, 0::2] + block[0::2, 1::2] + block[1::2, 1::2] + 2) // 4
+                ).astype(np.uint8)
+
+    return read_rows
+
+
+class RasterStore:
+    """场景仓库, 场景 id 默认取源文件内容哈希, 重复入库直接复用"""
+
+    def __init__(self, root=RASTER_DIR, tile=DEFAULT_TILE):
+        self.root = root
+        self.tile = tile
+        os.makedirs(root, exist_ok=True)
+
+    def scene_path(self, scene_id):
+        return os.path.join(self.root, scene_id)
+
+    def has(self, scene_id):
+        return os.path.exists(os.path.join(self.scene_path(scene_id), 'meta.json'))
+
+    def open(self, scene_id):
+        return RasterScene(self.scene_path(scene_id))
+
+    def ingest_rows(self, scene_id, width, height, bands, read_rows, bounds=None, source=None):
+        """
+        通用入库入口: read_rows(top, bottom) 每次只返回一个切片行高的条带,
+        峰值内存约为 tile * width * bands 字节, 与场景大小无关
+        """
+        if self.has(scene_id):
+            return self.open(scene_id)
+        scene_dir = self.scene_path(scene_id)
+        tmp_dir = f"{scene_dir}.{os.getpid()}.tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        try:
+            levels = [_write_level(os.path.join(tmp_dir, "level_0.tiles"), height, width, bands, self.tile,
+                                   read_rows)]
+            while max(levels[-1]['width'], levels[-1]['height']) > MIN_OVERVIEW_SIDE:
+                prev = levels[-1]
+                reader = _downsample_reader(tmp_dir, prev, len(levels) - 1, bands, self.tile)
+                levels.append(_write_level(os.path.join(tmp_dir, f"level_{len(levels)}.tiles"),
+                                           max(1, prev['height'] // 2), max(1, prev['width'] // 2),
+                                           bands, self.tile, reader))
+
+            meta = {
+                "version": STORE_VERSION,
+                "scene_id": scene_id,
+                "source": source,
+                "tile": self.tile,
+                "bands": bands,
+                "levels": levels,
+                "bounds": list(bounds) if bounds else None,
+            }
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, indent=1)
+            try:
+                os.replace(tmp_dir, scene_dir)
+            except OSError:
+                pass                          # 其他进程已先完成入库
+        finally:
+            # 入库中途失败 (读取异常 / 磁盘写满) 或被其他进程抢先时, 清理临时目录
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return self.open(scene_id)
+
+    def ingest_array(self, scene_id, array, bounds=None, source=None):
+        """从 (H, W, bands) 数组或 np.memmap 入库"""
+        array = array if array.ndim == 3 else array[..., None]
+        height, width, bands = array.shape
+        return self.ingest_rows(scene_id, width, height, bands,
+                                lambda top, bottom: np.asarray(array[top:bottom], dtype=np.uint8),
+                                bounds=bounds, source=source)
+
+    def ingest_file(self, path, bounds=None, scene_id=None):
+        """
+        入库影像文件:
+        - GeoTIFF / JP2 (Sentinel-2) 在安装 rasterio 时按窗口流式读取, 并从仿射变换得到 bounds
+        - 其他格式 (PNG / WebP 截图) 用 PIL 读取, 适用于小图
+        """
+        scene_id = scene_id or _file_hash(path)
+        if self.has(scene_id):
+            return self.open(scene_id)
+
+        if os.path.splitext(path)[1].lower() in ('.tif', '.tiff', '.jp2'):
+            try:
+                import rasterio
+                from rasterio.windows import Window
+            except ImportError:
+                raise ImportError("读取 GeoTIFF/JP2 场景需要 rasterio (pip install rasterio)")
+            with rasterio.open(path) as src:
+                bands = min(src.count, 3)
+
+                def read_rows(top, bottom):
+                    data = src.read(list(range(1, bands + 1)), window=Window(0, top, src.width, bottom - top))
+                    return _to_uint8(np.moveaxis(data, 0, -1))
+
+                b = src.bounds
+                return self.ingest_rows(scene_id, src.width, src.height, bands, read_rows,
+                                        bounds=bounds or (b.left, b.bottom, b.right, b.top),
+                                        source=os.path.basename(path))
+
+        from PIL import Image
+        with Image.open(path) as im:
+            array = np.asarray(im.convert('RGB'))
+        return self.ingest_array(scene_id, array, bounds=bounds, source=os.path.basename(path))
+
+
+_fingerprints = Fingerprints()
+
+
+def _file_hash(path):
+    """分块计算文件内容哈希, mtime/size 不变时不重复读取"""
+    return _fingerprints.get(path)[:24]
+
+
+_default_store = None
+
+
+def open_scene(path, bounds=None):
+    """通过默认仓库打开影像 (首次调用时入库)"""
+    global _default_store
+    if _default_store is None:
+        _default_store = RasterStore()
+    return _default_store.ingest_file(path, bounds=bounds)
+
+
+def _to_uint8(data):
+    """把 Sentinel-2 反射率 (uint16, 0~10000) 等数据线性拉伸到 uint8"""
+    if data.dtype == np.uint8:
+        return data
+    return np.clip(data.astype(np.float32) / 10000.0 * 255.0 * 3.0, 0, 255).astype(np.uint8)
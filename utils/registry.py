@@ -0,0 +1,449 @@
+"""
+公司注册表 (Company Registry)
+扫描 data/ 目录, 维护一个紧凑的磁盘索引:
+公司代码 -> 文件字节偏移/章节, 类型, 定位, E/S 头部评分
+侧边栏与评分只读取索引, supply_chain / key_events / b2b_value 等大章节按需加载
+"""
+
+import json
+import os
+import threading
+import time
+from collections.abc import Mapping
+
+from . import metrics
+from .schema import compile_company, validate
+
+# --- 1. 常量配置 ---
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(BASE_DIR, '.cache')
+
+INDEX_VERSION = 2
+INDEX_PATH = os.path.join(CACHE_DIR, 'company_index.json')
+REFRESH_INTERVAL = 2.0            # refresh() 两次目录扫描的最短间隔 (秒)
+JOURNAL_COMPACT_MIN = 1024        # 变更日志超过 max(此值, 条目数 / 4) 行时合并回快照
+
+MIDSTREAM_TYPE = ("中游加工商", "核心企业")
+UPSTREAM_TYPE = ("上游供应商", "种植商")
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+# --- 2. 索引构建 ---
+
+def _skip_ws(text, i):
+    while i < len(text) and text[i] in _WHITESPACE:
+        i += 1
+    return i
+
+
+def scan_sections(raw):
+    """
+    解析顶层 JSON 对象, 返回 {章节名: [起始字节, 结束字节]} 以及头部字段
+    只对顶层做一次线性扫描, 各章节之后可按偏移单独解码
+    """
+    text = raw.decode('utf-8')
+    i = _skip_ws(text, 0)
+    if i >= len(text) or text[i] != '{':
+        raise ValueError("顶层必须是 JSON 对象 (Top-level value must be an object)")
+    i += 1
+
+    sections = {}
+    values = {}
+    byte_pos = 0      # text[:char_pos] 的 UTF-8 字节长度
+    char_pos = 0
+
+    def to_bytes(idx):
+        nonlocal byte_pos, char_pos
+        byte_pos += len(text[char_pos:idx].encode('utf-8'))
+        char_pos = idx
+        return byte_pos
+
+    def peek(idx):
+        if idx >= len(text):
+            raise ValueError("JSON 不完整 (Unexpected end of JSON): 文件可能被截断或仍在写入")
+        return text[idx]
+
+    i = _skip_ws(text, i)
+    if peek(i) != '}':
+        while True:
+            if peek(i) != '"':
+                raise ValueError(f"JSON 格式错误: 位置 {i} 应为字符串键")
+            key, i = _decoder.raw_decode(text, i)
+            i = _skip_ws(text, i)
+            if peek(i) != ':':
+                raise ValueError(f"JSON 格式错误: 位置 {i} 缺少 ':'")
+            i = _skip_ws(text, i + 1)
+            start = i
+            value, i = _decoder.raw_decode(text, i)
+            # 重复键以最后一次出现为准, 与 json.load 一致
+            sections[key] = [to_bytes(start), to_bytes(i)]
+            values[key] = value
+            i = _skip_ws(text, i)
+            if peek(i) == '}':
+                break
+            if peek(i) != ',':
+                raise ValueError(f"JSON 格式错误: 位置 {i} 缺少 ',' 或 '}}'")
+            i = _skip_ws(text, i + 1)
+    if _skip_ws(text, i + 1) != len(text):
+        raise ValueError(f"JSON 格式错误: 位置 {i + 1} 之后有多余内容")
+
+    return sections, values
+
+
+def classify_company(data):
+    """根据供应链定位推断公司类型, 返回 (类型, 定位)"""
+    supply_chain = data.get('supply_chain')
+    position = str(supply_chain.get('position') or '') if isinstance(supply_chain, Mapping) else ''
+    if '中游' in position or '核心' in position:
+        return MIDSTREAM_TYPE
+    return UPSTREAM_TYPE
+
+
+def _header_score(section):
+    """头部评分; 章节缺失或不是对象时取 50 (validate 已记录问题)"""
+    return section.get('risk_score', 50) if isinstance(section, Mapping) else 50
+
+
+def _try_build(file_path):
+    """返回 (条目, None) 或 (None, 异常)"""
+    try:
+        return build_entry(file_path), None
+    except (OSError, ValueError) as e:
+        return None, e
+
+
+def build_entry(file_path):
+    """为单个公司文件构建索引条目"""
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    stat = os.stat(file_path)
+    sections, values = scan_sections(raw)
+    problems = validate(values)
+    if problems:
+        print(f"⚠️ 数据校验警告 (Schema warnings) {file_path}: {'; '.join(problems)}")
+
+    company_type, position = classify_company(values)
+    return {
+        "file": os.path.basename(file_path),
+        "mtime": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "name": values.get('company', os.path.splitext(os.path.basename(file_path))[0]),
+        "type": company_type,
+        "position": position,
+        "env_score": _header_score(values.get('environment')),
+        "soc_score": _header_score(values.get('social')),
+        "sections": sections,
+        "problems": problems,
+    }
+
+
+# --- 3. 按需加载的公司记录 ---
+
+class CompanyRecord(Mapping):
+    """
+    惰性公司数据: 行为与 json.load 得到的 dict 一致,
+    但每个顶层章节只在第一次访问时按字节偏移读取并解码
+    """
+
+    __slots__ = ('code', '_path', '_sections', '_loaded', '_cache')
+
+    def __init__(self, code, path, sections, cache=None):
+        self.code = code
+        self._path = path
+        self._sections = sections
+        self._loaded = {}
+        self._cache = cache
+
+    def _read(self, key):
+        start, end = self._sections[key]
+        metrics.inc("greenlink_section_loads_total", section=key)
+        with metrics.timer("greenlink_section_load_seconds", section=key):
+            with open(self._path, 'rb') as f:
+                f.seek(start)
+                return json.loads(f.read(end - start).decode('utf-8'))
+
+    def __getitem__(self, key):
+        if key in self._loaded:
+            return self._loaded[key]
+        if key not in self._sections:
+            raise KeyError(key)
+        if self._cache is not None:
+            value = self._cache.get(self._path, key, lambda: self._read(key))
+        else:
+            value = self._read(key)
+        self._loaded[key] = value
+        return value
+
+    def __iter__(self):
+        return iter(self._sections)
+
+    def __len__(self):
+        return len(self._sections)
+
+    def to_dict(self):
+        """一次性加载全部章节"""
+        return {key: self[key] for key in self._sections}
+
+
+# --- 4. 注册表 ---
+
+class CompanyRegistry:
+    """
+    data/ 目录的公司索引
+    索引持久化为 .cache/company_index.json 快照 + 追加写的变更日志 (.journal):
+    单个文件变化只追加一行, 日志过长时才合并重写快照 (索引不放在 data/ 内, 否则写索引本身会改变目录 mtime)
+    refresh() 在 refresh_interval 秒内重复调用时直接返回, 每次重跑 / 请求不再都扫描整个目录;
+    load() 仍逐个比较文件 (mtime, size), 当前选中的公司总是最新的
+    传入 cache (utils.cache.DataCache) 后, 章节读取经由共享缓存并返回只读视图
+    线程安全: 条目写入 / 写索引都在注册表锁内进行 (API 的执行器线程与事件循环线程共用一个注册表)
+    """
+
+    def __init__(self, data_dir, index_path=None, cache=None, refresh_interval=REFRESH_INTERVAL):
+        self.data_dir = data_dir
+        self.index_path = index_path or INDEX_PATH
+        self.journal_path = self.index_path + '.journal'
+        self.cache = cache
+        self.refresh_interval = refresh_interval
+        self.generation = 0               # 每次索引内容变化时递增, 供下游缓存失效
+        self._entries = {}
+        self._profiles = {}               # code -> (mtime, CompanyProfile)
+        self._failed = {}                 # code -> 解析失败时的 (mtime, size), 文件未变时不重复解析
+        self._dirty = set()               # 尚未写入变更日志的代码
+        self._journal_lines = 0
+        self._snapshot_valid = False      # 磁盘快照可用 (版本与目录匹配) 时日志才能追加在其后
+        self._last_refresh = None
+        self._lock = threading.RLock()    # 保护 _entries / _profiles / _failed / generation 与索引文件
+        self._refresh_lock = threading.Lock()   # 同一时间只有一次目录扫描
+        self._load_index()
+        self.refresh(force=True)
+
+    # ---- 索引读写 ----
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        if index.get('version') != INDEX_VERSION or index.get('data_dir') != os.path.abspath(self.data_dir):
+            return
+        entries = index.get('companies', {})
+        self._snapshot_valid = True
+        # 重放变更日志; 最后一行可能是另一进程写到一半的, 解析失败即停止
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        code, entry = json.loads(line)
+                    except ValueError:
+                        break
+                    if entry is None:
+                        entries.pop(code, None)
+                    else:
+                        entries[code] = entry
+                    self._journal_lines += 1
+        except OSError:
+            pass
+        self._entries = dict(sorted(entries.items()))
+
+    def _save_index(self):
+        """
+        持久化变更; 调用方持有 _lock
+        只把 _dirty 中的条目追加到变更日志, 日志过长时重写快照并清空日志
+        多进程各自追加; 合并时丢失的其他进程日志行只会让对方下次按 (mtime, size) 重新索引, 不会读到错误偏移
+        """
+        if not self._dirty:
+            return
+        if (not self._snapshot_valid
+                or self._journal_lines + len(self._dirty) > max(JOURNAL_COMPACT_MIN, len(self._entries) // 4)):
+            self._write_snapshot()
+            return
+        try:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                for code in sorted(self._dirty):
+                    f.write(json.dumps([code, self._entries.get(code)], ensure_ascii=False,
+                                       separators=(',', ':')) + "\n")
+        except OSError:
+            return                        # 只读部署环境下退化为纯内存索引
+        self._journal_lines += len(self._dirty)
+        self._dirty.clear()
+
+    def _write_snapshot(self):
+        """重写完整快照并清空变更日志; 调用方持有 _lock"""
+        index = {
+            "version": INDEX_VERSION,
+            "data_dir": os.path.abspath(self.data_dir),
+            "companies": self._entries,
+        }
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.index_path)
+            open(self.journal_path, 'w').close()
+            self._snapshot_valid = True
+        except OSError:
+            # 只读部署环境下退化为纯内存索引
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._journal_lines = 0
+        self._dirty.clear()
+
+    def _reindex(self, code, file_path):
+        """重建单个条目; 解析失败时移除该条目并返回异常 (成功返回 None); 调用方持有 _lock"""
+        entry, error = _try_build(file_path)
+        self._apply(code, file_path, entry, error)
+        return error
+
+    def _apply(self, code, file_path, entry, error):
+        """写入 _try_build 的结果; 调用方持有 _lock"""
+        self.generation += 1
+        self._dirty.add(code)
+        if error is None:
+            self._entries[code] = entry
+            self._failed.pop(code, None)
+            return
+        print(f"✗ 索引失败 (Indexing failed) {file_path}: {error}")
+        self._entries.pop(code, None)
+        try:
+            stat = os.stat(file_path)
+            self._failed[code] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            pass
+
+    def refresh(self, force=False):
+        """
+        同步索引与 data/ 目录, 返回索引内容是否变化
+        扫描目录并比较各文件的 (mtime, size): 原地编辑 (json.dump / 编辑器保存) 不改变目录 mtime,
+        只看目录会漏掉修改; 一万个文件的开销约为一次 scandir 加一万次 stat,
+        因此距上次扫描不足 refresh_interval 秒时直接返回 False (force=True 强制扫描)
+        扫描与解析在注册表锁外进行, 只有写入结果时持锁, 并发的 codes() / info() 不会等待整次扫描
+        """
+        with self._refresh_lock:
+            now = time.monotonic()
+            if not force and self._last_refresh is not None and now - self._last_refresh < self.refresh_interval:
+                return False
+            self._last_refresh = now
+            if not os.path.isdir(self.data_dir):
+                return False
+
+            seen = set()
+            changed = []
+            with os.scandir(self.data_dir) as it:
+                for entry in it:
+                    if entry.name.startswith('.') or not entry.name.endswith('.json'):
+                        continue
+                    code = entry.name[:-len('.json')]
+                    seen.add(code)
+                    stat = entry.stat()
+                    stamp = (stat.st_mtime_ns, stat.st_size)
+                    known = self._entries.get(code)
+                    if known is not None and (known['mtime'], known['size']) == stamp:
+                        continue
+                    if known is None and self._failed.get(code) == stamp:
+                        continue                  # 上次解析失败且文件未再修改
+                    changed.append((code, entry.path, stamp) + _try_build(entry.path))
+
+            with self._lock:
+                generation = self.generation
+                count = len(self._entries)
+                for code, file_path, stamp, built, error in changed:
+                    current = self._entries.get(code)
+                    if current is not None and (current['mtime'], current['size']) == stamp:
+                        continue                  # 扫描期间 load() 已重建
+                    self._apply(code, file_path, built, error)
+                for code in set(self._entries) - seen:
+                    del self._entries[code]
+                    self._dirty.add(code)
+                    self.generation += 1
+                self._failed = {code: stamp for code, stamp in self._failed.items() if code in seen}
+                if self.generation == generation:
+                    return False
+
+                if len(self._entries) != count or any(code not in seen for code in self._dirty):
+                    # 有新增 / 删除时才重新排序; 原地修改的条目保持原位置
+                    self._entries = dict(sorted(self._entries.items()))
+                self._save_index()
+                return True
+
+    # ---- 查询接口 ----
+
+    def codes(self):
+        with self._lock:
+            return list(self._entries)
+
+    def names(self):
+        """{显示名称: 公司代码}, 供侧边栏选择框使用"""
+        with self._lock:
+            return {entry['name']: code for code, entry in self._entries.items()}
+
+    def __contains__(self, code):
+        return code in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def info(self, code):
+        """返回索引条目 (不读取公司文件)"""
+        entry = self._entries[code]
+        return {
+            "code": code,
+            "filename": entry['file'],
+            "name": entry['name'],
+            "type": entry['type'],
+            "position": entry['position'],
+            "env_score": entry['env_score'],
+            "soc_score": entry['soc_score'],
+        }
+
+    def scores(self):
+        """返回 (代码列表, E 分列表, S 分列表), 用于组合评分"""
+        with self._lock:
+            entries = list(self._entries.items())
+        codes = [code for code, _ in entries]
+        env = [entry['env_score'] for _, entry in entries]
+        soc = [entry['soc_score'] for _, entry in entries]
+        return codes, env, soc
+
+    def stamp(self, code):
+        """索引中记录的 (mtime, size), 下游增量索引据此判断文件是否变化"""
+        entry = self._entries[code]
+        return entry['mtime'], entry['size']
+
+    def path(self, code):
+        return os.path.join(self.data_dir, self._entries[code]['file'])
+
+    def load(self, code):
+        """返回惰性加载的 CompanyRecord; 文件被编辑过则先重建该条目"""
+        file_path = self.path(code)
+        stat = os.stat(file_path)
+        with self._lock:
+            entry = self._entries[code]
+            if entry['mtime'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+                error = self._reindex(code, file_path)
+                self._save_index()
+                if error is not None:
+                    raise ValueError(f"公司数据解析失败 (Failed to parse company file) {file_path}: {error}") from error
+                entry = self._entries[code]
+        return CompanyRecord(code, file_path, entry['sections'], self.cache)
+
+    def profile(self, code):
+        """编译后的 CompanyProfile, 每个文件版本只编译一次"""
+        record = self.load(code)
+        with self._lock:
+            mtime = self._entries[code]['mtime']
+            cached = self._profiles.get(code)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, compile_company(record, code))
+            with self._lock:
+                self._profiles[code] = cached
+        return cached[1]
+
+    def load_section(self, code, section, default=None):
+        """只加载一个顶层章节"""
+        return self.load(code).get(section, default)
@@ -0,0 +1,150 @@
+"""
+报告缓存 (Report Cache)
+公司数据未变化时重复渲染完整报告是浪费: 以
+    规范化公司数据 + 证据影像内容哈希 + 模板版本 + 字体组合
+的 sha256 为键, 把渲染好的 PDF 存放在 .cache/reports/<key>.pdf,
+命中时直接返回文件内容。磁盘占用有上限, 超出后按最近访问时间 (mtime) 淘汰
+封面日期为首次渲染当天, 数据变化时才会重新生成
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections.abc import Mapping
+from io import BytesIO
+
+from .fscache import evict_lru
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPORT_CACHE_DIR = os.path.join(BASE_DIR, '.cache', 'reports')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+# --- 1. 缓存键 ---
+
+def _plain(value):
+    """CompanyRecord / 只读视图 -> 普通 dict/list, 便于规范化序列化"""
+    if isinstance(value, Mapping):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def report_key(data, profile=None):
+    """
+    报告缓存键: 数据按键排序序列化, 影像取内容哈希 (文件被替换也能察觉)
+    给定 profile 时计入其 E / S (生效评分随事件衰减变化, 与 JSON 不同)
+    """
+    from .assets import content_hash
+    from .change_detection import evidence_paths
+    from .pdf_generator import REPORT_VERSION, font_fingerprint
+
+    data = _plain(data)
+    evidence = (data.get('environment') or {}).get('analysis', {}).get('evidence') or {}
+    payload = json.dumps({
+        "version": REPORT_VERSION,
+        "fonts": font_fingerprint(),
+        "images": [content_hash(p) for p in evidence_paths(evidence)],
+        "data": data,
+        "scores": [profile.env_score, profile.soc_score] if profile is not None else None,
+    }, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# --- 2. 磁盘缓存 ---
+
+class ReportCache:
+    """按内容寻址的 PDF 缓存, 多进程共享同一目录"""
+
+    def __init__(self, root=REPORT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.pdf")
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+
+    def get(self, key):
+        """命中返回 PDF 字节并刷新访问时间, 否则返回 None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                pdf = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return pdf
+
+    def put(self, key, pdf):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(pdf)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict()
+
+    def get_or_render(self, data, profile=None, render=None):
+        """
+        返回 (PDF 字节, 是否命中); 未命中时调用 render(data, profile) 渲染并写入缓存
+        未给 profile 时现场编译并换为生效评分, 使缓存键随事件衰减评分变化
+        """
+        if profile is None:
+            from .schema import compile_company
+            from .scoring import effective_profile
+            profile = effective_profile(compile_company(data))
+        key = report_key(data, profile)
+        pdf = self.get(key)
+        if pdf is not None:
+            self._count('hits')
+            return pdf, True
+        self._count('misses')
+        if render is None:
+            from .pdf_generator import generate_pdf_report as render
+        pdf = render(data, profile).getvalue()
+        self.put(key, pdf)
+        return pdf, False
+
+    def _evict(self):
+        """超出预算时按 mtime 从旧到新删除, 多进程通过文件锁串行化"""
+        evicted = evict_lru(self.root, '.pdf', self.max_bytes)
+        if evicted:
+            self._count('evictions', evicted)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        entries = [e for e in os.scandir(self.root) if e.name.endswith('.pdf')]
+        stats['entries'] = len(entries)
+        stats['bytes'] = sum(e.stat().st_size for e in entries)
+        stats['max_bytes'] = self.max_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+_default_cache = None
+
+
+def cached_pdf_report(data, profile=None):
+    """与 generate_pdf_report 相同的返回值 (BytesIO), 但优先从默认缓存读取"""
+    global _default_cache
+    if _default_cache is None:
+        from . import metrics
+        _default_cache = ReportCache()
+        metrics.register_collector("report_cache", metrics.stats_collector(
+            "greenlink_report_cache", _default_cache.stats, "PDF report cache"))
+    pdf, _ = _default_cache.get_or_render(data, profile)
+    return BytesIO(pdf)
@@ -0,0 +1,480 @@
+"""
+两遍排版引擎 (Measure-then-draw Layout)
+pdf_generator 用 y -= ...cm 和 check_page_break 即时排版, 事先不知道页数,
+无法生成目录, 也无法保证事件卡片不被分页切开。这里把报告描述为一串块 (Block):
+    1. 测量: 每个块给出自身高度 (文本经 text_layout 断行), 可拆分的块给出拆分方案
+    2. 分页: 一次扫描把块放入页面, 记录每个锚点所在页码
+    3. 绘制: 逐页绘制, 目录与交叉引用此时已知道目标页码, 无需重新排版
+坐标约定与 pdf_generator 相同: y 为块首行基线, 块高度即绘制后 y 的下移量
+"""
+
+from abc import ABC, abstractmethod
+from collections import deque
+
+from reportlab.lib.colors import HexColor
+from reportlab.lib.units import cm
+
+from . import pdf_generator as pg
+from .text_layout import draw_block, layout_text, line_height_for, text_width
+
+# --- 1. 页面框 ---
+
+FRAME_TOP = pg.Y_START
+FRAME_BOTTOM = 2.2 * cm           # 页脚位于 1~1.5cm
+FRAME_LEFT = pg.MARGIN_LEFT
+FRAME_WIDTH = pg.MARGIN_RIGHT - pg.MARGIN_LEFT
+ZEBRA = HexColor("#f4f6f6")
+
+
+class RenderContext:
+    """分页结果中绘制阶段需要的信息: 锚点页码、当前页码"""
+
+    def __init__(self):
+        self.anchors = {}       # 锚点 -> 页码
+        self.page = 0
+
+    def page_of(self, anchor):
+        return self.anchors.get(anchor)
+
+
+# --- 2. 块 ---
+
+class Block(ABC):
+    """块基类: 子类实现 measure / draw; 默认不可拆分、不与后块绑定"""
+
+    keep_with_next = False
+    anchor = None
+    toc = None                  # (层级, 目录文本), 出现在目录中的块设置
+
+    @abstractmethod
+    def measure(self, width):
+        """块在给定宽度下的高度"""
+
+    def min_height(self, width):
+        """与前一块绑定时, 本块至少需要放在同一页的高度"""
+        return self.measure(width)
+
+    def split(self, available, width):
+        """返回 (放在本页的部分, 剩余部分); 不能拆分返回 None"""
+        return None
+
+    @abstractmethod
+    def draw(self, c, x, y, ctx):
+        """以 y 为首行基线绘制块"""
+
+
+class Spacer(Block):
+    def __init__(self, height):
+        self.height = height
+
+    def measure(self, width):
+        return self.height
+
+    def draw(self, c, x, y, ctx):
+        pass
+
+
+class PageBreak(Block):
+    """强制换页 (当前页为空时忽略)"""
+
+    def measure(self, width):
+        return 0.0
+
+    def draw(self, c, x, y, ctx):
+        pass
+
+
+class SectionHeader(Block):
+    """与 pdf_generator.draw_section_header 相同的章节标题, 总是与下一块同页"""
+
+    keep_with_next = True
+    HEIGHT = 1.8 * cm
+
+    def __init__(self, cn_title, en_title, color, anchor=None, toc_level=None):
+        self.cn_title = cn_title
+        self.en_title = en_title
+        self.color = color
+        self.anchor = anchor
+        self.toc = (toc_level, cn_title) if toc_level is not None else None
+
+    def measure(self, width):
+        return self.HEIGHT
+
+    def draw(self, c, x, y, ctx):
+        if self.anchor:
+            c.bookmarkPage(self.anchor, fit='XYZ', top=y + 0.8 * cm)
+            if self.toc:
+                c.addOutlineEntry(self.cn_title, self.anchor, level=self.toc[0])
+        pg.draw_section_title(c, x, y, self.cn_title, self.en_title, self.color, FRAME_WIDTH)
+
+
+class SubHeading(Block):
+    """双语小标题 (如 "关键风险事件 / Key Risk Events"), 与下一块同页"""
+
+    keep_with_next = True
+
+    def __init__(self, cn_title, en_title):
+        self.cn_title = cn_title
+        self.en_title = en_title
+
+    def measure(self, width):
+        return 1.0 * cm
+
+    def draw(self, c, x, y, ctx):
+        pg.draw_bilingual_label(c, x + 0.5 * cm, y, self.cn_title, self.en_title)
+
+
+class Field(Block):
+    """与 pdf_generator.draw_bilingual_field 相同的双语字段; value 可以是字符串或列表"""
+
+    LABEL_X = 0.5 * cm
+    VALUE_X = 5.5 * cm
+
+    def __init__(self, cn_label, en_label, value, value_color=None, font_size=10):
+        self.cn_label = cn_label
+        self.en_label = en_label
+        self.values = [str(v) for v in value] if isinstance(value, (list, tuple)) else [str(value)]
+        self.value_color = value_color
+        self.font_size = font_size
+        self._measured = None
+
+    def _layout(self, width):
+        if self._measured is None or self._measured[0] != width:
+            blocks = [layout_text(v, pg.FONT_REG, self.font_size, width - self.VALUE_X) for v in self.values]
+            label_height = 0.4 * cm + line_height_for(9)
+            value_height = sum(b.height for b in blocks)
+            self._measured = (width, blocks, max(label_height, value_height) + 0.3 * cm)
+        return self._measured
+
+    def measure(self, width):
+        return self._layout(width)[2]
+
+    def draw(self, c, x, y, ctx):
+        _, blocks, _ = self._layout(FRAME_WIDTH)
+        pg.draw_bilingual_label(c, x + self.LABEL_X, y, self.cn_label, self.en_label)
+        c.setFillColor(self.value_color or pg.COLOR_TEXT)
+        for block in blocks:
+            y = draw_block(c, x + self.VALUE_X, y, block)
+
+
+class Paragraphs(Block):
+    """与 draw_wrapped_block 相同的缩进文本块; 可在行之间拆分"""
+
+    def __init__(self, texts, font_name=None, font_size=10, indent=1.0 * cm, color=None, gap=0.3 * cm, rows=None):
+        self.texts = texts
+        self.font_name = font_name
+        self.font_size = font_size
+        self.indent = indent
+        self.color = color
+        self.gap = gap
+        self._rows = rows           # [(行盒列表, 行高)], 拆分后的片段直接携带
+
+    def rows(self, width):
+        if self._rows is None:
+            font = self.font_name or pg.FONT_REG
+            rows = []
+            for text in self.texts:
+                block = layout_text(text, font, self.font_size, width - self.indent)
+                by_baseline = {}
+                for line in block.lines:
+                    by_baseline.setdefault(line.baseline, []).append(line)
+                rows.extend((lines, block.line_height) for _, lines in sorted(by_baseline.items()))
+            self._rows = rows
+        return self._rows
+
+    def measure(self, width):
+        return sum(h for _, h in self.rows(width)) + self.gap
+
+    def min_height(self, width):
+        rows = self.rows(width)
+        return rows[0][1] if rows else self.gap
+
+    def split(self, available, width):
+        rows = self.rows(width)
+        used, count = 0.0, 0
+        for _, height in rows:
+            if used + height > available:
+                break
+            used += height
+            count += 1
+        if count == 0 or count == len(rows):
+            return None
+        head = Paragraphs(None, self.font_name, self.font_size, self.indent, self.color, 0.0, rows[:count])
+        tail = Paragraphs(None, self.font_name, self.font_size, self.indent, self.color, self.gap, rows[count:])
+        return head, tail
+
+    def draw(self, c, x, y, ctx):
+        c.setFont(self.font_name or pg.FONT_REG, self.font_size)
+        c.setFillColor(self.color or pg.COLOR_TEXT)
+        for lines, height in self.rows(FRAME_WIDTH):
+            for line in lines:
+                if line.text:
+                    c.drawString(x + self.indent + line.x, y, line.text)
+            y -= height
+
+
+class Rule(Block):
+    def __init__(self, height=0.5 * cm, color=None):
+        self.height = height
+        self.color = color
+
+    def measure(self, width):
+        return self.height
+
+    def draw(self, c, x, y, ctx):
+        c.setStrokeColor(self.color or pg.COLOR_SUBTLE)
+        c.setLineWidth(0.5)
+        c.line(x, y + 0.2 * cm, x + FRAME_WIDTH, y + 0.2 * cm)
+
+
+class KeepTogether(Block):
+    """多个块作为整体放在同一页 (如事件卡片); 超过整页高度时才按子块拆分"""
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+
+    def measure(self, width):
+        return sum(b.measure(width) for b in self.blocks)
+
+    def split(self, available, width):
+        if self.measure(width) <= FRAME_TOP - FRAME_BOTTOM:
+            return None
+        used, count = 0.0, 0
+        for block in self.blocks:
+            height = block.measure(width)
+            if used + height > available:
+                break
+            used += height
+            count += 1
+        if count == 0:
+            return None
+        return KeepTogether(self.blocks[:count]), KeepTogether(self.blocks[count:])
+
+    def draw(self, c, x, y, ctx):
+        for block in self.blocks:
+            block.draw(c, x, y, ctx)
+            y -= block.measure(FRAME_WIDTH)
+
+
+# --- 3. 页码引用与表格 ---
+
+class PageRef:
+    """表格单元或文本中的页码引用, 绘制时解析为 "p. N" 并添加页内链接"""
+
+    __slots__ = ('anchor', 'template')
+
+    def __init__(self, anchor, template="p. {page}"):
+        self.anchor = anchor
+        self.template = template
+
+    def resolve(self, ctx):
+        page = ctx.page_of(self.anchor)
+        return self.template.format(page=page) if page is not None else "-"
+
+
+class Table(Block):
+    """
+    单行表格: columns = [(标题, 宽度比例, 对齐 'l'/'r')]
+    单元格可为字符串、(字符串, 颜色) 或 PageRef; 超宽文本截断为省略号
+    按行拆分, 续页重复表头
+    """
+
+    ROW_HEIGHT = 0.6 * cm
+    FONT_SIZE = 9
+
+    def __init__(self, columns, rows, header=True):
+        self.columns = columns
+        self.rows = rows
+        self.header = header
+
+    def _header_height(self):
+        return self.ROW_HEIGHT if self.header else 0.0
+
+    def measure(self, width):
+        return self._header_height() + len(self.rows) * self.ROW_HEIGHT + 0.3 * cm
+
+    def min_height(self, width):
+        return self._header_height() + self.ROW_HEIGHT * min(1, len(self.rows))
+
+    def split(self, available, width):
+        count = int((available - self._header_height()) // self.ROW_HEIGHT)
+        if count <= 0 or count >= len(self.rows):
+            return None
+        return Table(self.columns, self.rows[:count], self.header), Table(self.columns, self.rows[count:], self.header)
+
+    def _widths(self, width):
+        total = sum(w for _, w, _ in self.columns)
+        return [width * w / total for _, w, _ in self.columns]
+
+    def _cell(self, c, value, x, y, col_width, align, ctx, bold=False):
+        color = pg.COLOR_TEXT
+        link = None
+        if isinstance(value, PageRef):
+            link, value, color = value.anchor, value.resolve(ctx), pg.COLOR_PRIMARY
+        elif isinstance(value, tuple):
+            value, color = value
+        font = pg.FONT_BOLD if bold else pg.FONT_REG
+        text = _truncate(str(value), font, self.FONT_SIZE, col_width - 0.3 * cm)
+        c.setFillColor(color)
+        c.setFont(font, self.FONT_SIZE)
+        if align == 'r':
+            c.drawRightString(x + col_width - 0.15 * cm, y, text)
+        else:
+            c.drawString(x + 0.15 * cm, y, text)
+        if link and ctx.page_of(link) is not None:
+            c.linkAbsolute("", link, (x, y - 0.15 * cm, x + col_width, y + self.ROW_HEIGHT - 0.15 * cm))
+
+    def draw(self, c, x, y, ctx):
+        widths = self._widths(FRAME_WIDTH)
+        top = y + self.ROW_HEIGHT - 0.45 * cm
+        if self.header:
+            c.setFillColor(pg.COLOR_TITLE)
+            c.rect(x, top - self.ROW_HEIGHT, FRAME_WIDTH, self.ROW_HEIGHT, fill=True, stroke=False)
+            cx = x
+            for (title, _, align), col_width in zip(self.columns, widths):
+                c.setFillColor(HexColor("#FFFFFF"))
+                c.setFont(pg.FONT_BOLD, self.FONT_SIZE)
+                text = _truncate(title, pg.FONT_BOLD, self.FONT_SIZE, col_width - 0.3 * cm)
+                if align == 'r':
+                    c.drawRightString(cx + col_width - 0.15 * cm, y, text)
+                else:
+                    c.drawString(cx + 0.15 * cm, y, text)
+                cx += col_width
+            y -= self.ROW_HEIGHT
+            top -= self.ROW_HEIGHT
+        for i, row in enumerate(self.rows):
+            if i % 2:
+                c.setFillColor(ZEBRA)
+                c.rect(x, top - self.ROW_HEIGHT, FRAME_WIDTH, self.ROW_HEIGHT, fill=True, stroke=False)
+            cx = x
+            for value, (_, _, align), col_width in zip(row, self.columns, widths):
+                self._cell(c, value, cx, y, col_width, align, ctx)
+                cx += col_width
+            y -= self.ROW_HEIGHT
+            top -= self.ROW_HEIGHT
+
+
+def _truncate(text, font, size, max_width):
+    if text_width(text, font, size) <= max_width:
+        return text
+    while text and text_width(text + "…", font, size) > max_width:
+        text = text[:-1]
+    return text + "…"
+
+
+class TableOfContents(Block):
+    """
+    目录: 条目在分页前即可从块序列中收集, 高度因此事先确定;
+    页码在绘制时从锚点表读取, 整个文档只排版一次
+    """
+
+    ROW_HEIGHT = 0.65 * cm
+
+    def __init__(self, entries=None):
+        self.entries = entries     # [(层级, 文本, 锚点)]
+
+    def measure(self, width):
+        return len(self.entries) * self.ROW_HEIGHT + 0.3 * cm
+
+    def min_height(self, width):
+        return self.ROW_HEIGHT
+
+    def split(self, available, width):
+        count = int(available // self.ROW_HEIGHT)
+        if count <= 0 or count >= len(self.entries):
+            return None
+        return TableOfContents(self.entries[:count]), TableOfContents(self.entries[count:])
+
+    def draw(self, c, x, y, ctx):
+        for level, text, anchor in self.entries:
+            indent = 0.8 * cm * level
+            page = ctx.page_of(anchor)
+            font = pg.FONT_BOLD if level == 0 else pg.FONT_REG
+            size = 11 if level == 0 else 10
+            page_text = str(page) if page is not None else "-"
+            page_width = text_width(page_text, font, size)
+            label = _truncate(text, font, size, FRAME_WIDTH - indent - page_width - 1.5 * cm)
+            c.setFont(font, size)
+            c.setFillColor(pg.COLOR_TITLE if level == 0 else pg.COLOR_TEXT)
+            c.drawString(x + indent, y, label)
+            c.drawRightString(x + FRAME_WIDTH, y, page_text)
+            # 点引导线
+            start = x + indent + text_width(label, font, size) + 0.2 * cm
+            end = x + FRAME_WIDTH - page_width - 0.2 * cm
+            if end > start:
+                c.setFillColor(pg.COLOR_SUBTLE)
+                dots = "." * int((end - start) / text_width(".", pg.FONT_REG, 8))
+                c.setFont(pg.FONT_REG, 8)
+                c.drawRightString(end, y, dots)
+            if page is not None:
+                c.linkAbsolute("", anchor, (x, y - 0.15 * cm, x + FRAME_WIDTH, y + self.ROW_HEIGHT - 0.2 * cm))
+            y -= self.ROW_HEIGHT
+
+
+# --- 4. 分页与绘制 ---
+
+def collect_toc(blocks):
+    """从块序列中收集目录条目 (分页前即可完成)"""
+    return [(b.toc[0], b.toc[1], b.anchor) for b in blocks if b.toc and b.anchor]
+
+
+def paginate(blocks, width=FRAME_WIDTH, top=FRAME_TOP, bottom=FRAME_BOTTOM):
+    """
+    单次扫描分页, 返回 (pages, ctx): pages 为每页的 [(块, y)] 列表, ctx.anchors 记录锚点页码
+    规则: keep_with_next 的块至少带上下一块的 min_height; 放不下时可拆分的块先拆分, 否则换页
+    """
+    ctx = RenderContext()
+    pages = [[]]
+    y = top
+    queue = deque(blocks)
+
+    def new_page():
+        nonlocal y
+        pages.append([])
+        y = top
+
+    while queue:
+        block = queue.popleft()
+        if isinstance(block, PageBreak):
+            if pages[-1]:
+                new_page()
+            continue
+
+        height = block.measure(width)
+        available = y - bottom
+        needed = height
+        if block.keep_with_next and queue:
+            needed += queue[0].min_height(width)
+
+        if needed > available:
+            parts = None if block.keep_with_next else block.split(available, width)
+            if parts is not None:
+                block, rest = parts
+                queue.appendleft(rest)
+                height = block.measure(width)
+            elif pages[-1]:
+                new_page()
+                queue.appendleft(block)
+                continue
+            # 空白页仍放不下且无法拆分: 直接放置 (超出部分由块自身负责)
+
+        if block.anchor and block.anchor not in ctx.anchors:
+            ctx.anchors[block.anchor] = len(pages)
+        pages[-1].append((block, y))
+        y -= height
+
+    if not pages[-1] and len(pages) > 1:
+        pages.pop()
+    return pages, ctx
+
+
+def render(c, pages, ctx, x=FRAME_LEFT, footer=None):
+    """逐页绘制分页结果; footer(c, page_num) 默认使用 pdf_generator.draw_footer"""
+    footer = footer or pg.draw_footer
+    for number, placements in enumerate(pages, 1):
+        ctx.page = number
+        for block, y in placements:
+            block.draw(c, x, y, ctx)
+        footer(c, number)
+        c.showPage()
+    return len(pages)
@@ -0,0 +1,402 @@
+"""
+供应链金融授信引擎 (Supply-chain Finance Credit Engine)
+按供应商 ESG 风险分计算动态授信额度:
+    动态授信 = 基础授信 × 调整系数[风险档位]
+风险档位与调整系数由 CreditPolicy 配置, 档位查找与授信计算全部向量化 (NumPy), 不逐行 apply。
+输入按块读取、结果按块写出, 内存占用只与 chunk_rows 有关, 千万级供应商行也可处理:
+- 数据目录: 每家公司本身 (取 S 分) + 中游企业列出的上游供应商 (risk_status 文本解析为分数)
+- 批量文件: CSV / Parquet (Parquet 需要 pyarrow); 列名可用中文表头或 supplier / buyer / score / base_credit
+写出的授信台账可用 read_page 按页读取, 界面只渲染当前页
+
+命令行:
+    python -m utils.scf_credit -o credit_lines.parquet                      # data/ 下全部供应商
+    python -m utils.scf_credit suppliers.csv -o credit_lines.csv --chunk-rows 1000000
+    python -m utils.scf_credit suppliers.parquet -o out.parquet --low 30 --high 60 --multipliers 1.2,1.0,0.5
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+BOOK_DIR = os.path.join(BASE_DIR, '.cache', 'scf')
+
+DEFAULT_CHUNK_ROWS = 262144
+BOOK_KEEP = 8           # .cache/scf/ 中保留的台账数 (与界面 scf_book 的缓存条目数一致)
+
+# 输出列 (与原授信表一致, 另加核心企业与风险档位)
+COLUMNS = ("核心企业", "供应商", "ESG 风险分", "基础授信(万)", "风险档位", "调整系数", "动态授信(万)")
+# 输入列: 字段 -> 可接受的表头
+INPUT_ALIASES = {
+    "buyer": ("核心企业", "buyer"),
+    "supplier": ("供应商", "supplier", "name"),
+    "score": ("ESG 风险分", "score", "risk_score"),
+    "base": ("基础授信(万)", "base_credit"),
+}
+BAND_NAMES = ("优质", "一般", "高风险")
+
+
+# --- 1. 授信政策 ---
+
+class CreditPolicy:
+    """
+    风险分 < low: 优质档; low <= 风险分 <= high: 一般档; 风险分 > high: 高风险档
+    multipliers 依次为三档的调整系数; 缺少基础授信 / 风险分的行取 base_credit / default_score
+    默认值与原授信模型相同 (>60 减半, <30 上浮 20%, 基础授信 1000 万)
+    """
+
+    __slots__ = ('low', 'high', 'multipliers', 'base_credit', 'default_score')
+
+    def __init__(self, low=30, high=60, multipliers=(1.2, 1.0, 0.5), base_credit=1000, default_score=50):
+        if low > high:
+            raise ValueError(f"档位边界无效 (Invalid bands): low={low} > high={high}")
+        if len(multipliers) != len(BAND_NAMES):
+            raise ValueError(f"调整系数需要 {len(BAND_NAMES)} 个, 实际 {len(multipliers)} 个")
+        self.low = low
+        self.high = high
+        self.multipliers = np.asarray(multipliers, dtype=np.float64)
+        self.base_credit = base_credit
+        self.default_score = default_score
+
+    def key(self):
+        """可哈希的政策摘要, 用作缓存键"""
+        return (self.low, self.high, tuple(self.multipliers.tolist()), self.base_credit, self.default_score)
+
+    def bands(self, scores):
+        """风险档位: 0 优质 / 1 一般 / 2 高风险 (int8 数组)"""
+        scores = np.asarray(scores, dtype=np.float64)
+        return (scores >= self.low).astype(np.int8) + (scores > self.high)
+
+
+def compute_chunk(chunk, policy):
+    """
+    chunk: dict, supplier / buyer / score / base 为等长数组 (score / base 可含 NaN)
+    返回输出列名 -> 数组 的 dict
+    """
+    scores = np.asarray(chunk['score'], dtype=np.float64)
+    scores = np.where(np.isnan(scores), policy.default_score, scores)
+    base = np.asarray(chunk['base'], dtype=np.float64)
+    base = np.where(np.isnan(base), policy.base_credit, base)
+    band = policy.bands(scores)
+    multiplier = policy.multipliers[band]
+    return {
+        "核心企业": chunk['buyer'],
+        "供应商": chunk['supplier'],
+        "ESG 风险分": scores,
+        "基础授信(万)": base,
+        "风险档位": np.asarray(BAND_NAMES, dtype=object)[band],
+        "调整系数": multiplier,
+        "动态授信(万)": (base * multiplier).astype(np.int64),
+        "_band": band,
+    }
+
+
+def credit_frame(chunk, policy):
+    """单块结果 -> DataFrame (小规模输入的便捷接口)"""
+    import pandas as pd
+
+    result = compute_chunk(chunk, policy)
+    return pd.DataFrame({name: result[name] for name in COLUMNS})
+
+
+# --- 2. 输入 ---
+
+def _chunk(buyers, suppliers, scores, bases):
+    return {
+        "buyer": np.asarray(buyers, dtype=object),
+        "supplier": np.asarray(suppliers, dtype=object),
+        "score": np.asarray(scores, dtype=np.float64),
+        "base": np.asarray(bases, dtype=np.float64),
+    }
+
+
+def registry_chunks(registry, chunk_rows=DEFAULT_CHUNK_ROWS, effective=None):
+    """
+    数据目录中的授信对象: 每家公司本身 (生效 S 分) + 中游企业的上游供应商, 按 chunk_rows 分块
+    effective 为 scoring.effective_scores(registry) 的结果, 未给出时现场计算
+    """
+    from .scoring import effective_scores
+
+    codes, _, soc = effective if effective is not None else effective_scores(registry)
+    buyers, suppliers, scores = [], [], []
+    for code, own_score in zip(codes, soc):
+        info = registry.info(code)
+        buyers.append("")
+        suppliers.append(info['name'])
+        scores.append(own_score)
+        # 供应商取编译后的档案 (compile_supplier 已兼容字符串条目与非对象的 upstream)
+        for supplier in registry.profile(code).suppliers:
+            buyers.append(info['name'])
+            suppliers.append(supplier.name)
+            scores.append(np.nan if supplier.risk_score is None else supplier.risk_score)
+        if len(suppliers) >= chunk_rows:
+            yield _chunk(buyers, suppliers, scores, np.full(len(suppliers), np.nan))
+            buyers, suppliers, scores = [], [], []
+    if suppliers:
+        yield _chunk(buyers, suppliers, scores, np.full(len(suppliers), np.nan))
+
+
+def _resolve_columns(header, path):
+    mapping = {}
+    for field, aliases in INPUT_ALIASES.items():
+        mapping[field] = next((a for a in aliases if a in header), None)
+    for field in ("supplier", "score"):
+        if mapping[field] is None:
+            raise ValueError(f"{path} 缺少列 (Missing column): {' / '.join(INPUT_ALIASES[field])}")
+    return mapping
+
+
+def _frame_chunk(columns, mapping, n):
+    """按表头映射取列; 可选列缺失时补空"""
+    def get(field, fill):
+        name = mapping[field]
+        return columns[name] if name is not None else np.full(n, fill, dtype=object if fill == "" else np.float64)
+
+    return _chunk(get('buyer', ""), get('supplier', ""), get('score', np.nan), get('base', np.nan))
+
+
+def file_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """批量 CSV / Parquet 按 chunk_rows 流式读取"""
+    if path.lower().endswith(('.parquet', '.pq')):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("读取 Parquet 需要 pyarrow (pip install pyarrow)")
+        parquet = pq.ParquetFile(path)
+        mapping = _resolve_columns(parquet.schema_arrow.names, path)
+        wanted = [name for name in mapping.values() if name is not None]
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=wanted):
+            columns = {name: batch.column(name).to_numpy(zero_copy_only=False) for name in wanted}
+            yield _frame_chunk(columns, mapping, batch.num_rows)
+        return
+
+    import pandas as pd
+
+    header = pd.read_csv(path, nrows=0).columns
+    mapping = _resolve_columns(set(header), path)
+    wanted = [name for name in mapping.values() if name is not None]
+    dtypes = {mapping['supplier']: object}
+    if mapping['buyer']:
+        dtypes[mapping['buyer']] = object
+    for frame in pd.read_csv(path, usecols=wanted, dtype=dtypes, chunksize=chunk_rows, keep_default_na=False,
+                             na_values={mapping['score']: [""], **({mapping['base']: [""]} if mapping['base'] else {})}):
+        columns = {name: frame[name].to_numpy() for name in wanted}
+        yield _frame_chunk(columns, mapping, len(frame))
+
+
+# --- 3. 输出 ---
+
+def _new_summary(policy):
+    return {"rows": 0, "base_total": 0.0, "credit_total": 0, "band_rows": [0] * len(BAND_NAMES),
+            "band_credit": [0] * len(BAND_NAMES), "policy": policy.key()}
+
+
+def _accumulate(summary, result):
+    band = result['_band']
+    credit = result['动态授信(万)']
+    summary['rows'] += len(band)
+    summary['base_total'] += float(result['基础授信(万)'].sum())
+    summary['credit_total'] += int(credit.sum())
+    counts = np.bincount(band, minlength=len(BAND_NAMES))
+    sums = np.bincount(band, weights=credit, minlength=len(BAND_NAMES))
+    for i in range(len(BAND_NAMES)):
+        summary['band_rows'][i] += int(counts[i])
+        summary['band_credit'][i] += int(sums[i])
+
+
+def iter_credit_frames(chunks, policy=None, summary=None):
+    """逐块计算并产出 DataFrame; 给定 summary (见 _new_summary) 时顺带累计汇总"""
+    import pandas as pd
+
+    policy = policy or CreditPolicy()
+    for chunk in chunks:
+        result = compute_chunk(chunk, policy)
+        if summary is not None:
+            _accumulate(summary, result)
+        yield pd.DataFrame({name: result[name] for name in COLUMNS})
+
+
+def write_credit_lines(chunks, out, policy=None, on_progress=None):
+    """
+    流式写出授信台账: .parquet 按块写入行组, 其余按 CSV 追加
+    先写入临时文件再原子替换, 中途失败不会留下半份台账
+    返回汇总 dict: rows, base_total, credit_total, band_rows, band_credit, bytes, seconds
+    """
+    policy = policy or CreditPolicy()
+    start = time.perf_counter()
+    summary = _new_summary(policy)
+    tmp_path = f"{out}.{os.getpid()}.tmp"
+    parquet = out.lower().endswith(('.parquet', '.pq'))
+    writer = None
+    try:
+        if parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            for frame in iter_credit_frames(chunks, policy, summary):
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, table.schema)
+                writer.write_table(table)
+                if on_progress:
+                    on_progress(summary['rows'])
+            if writer is None:
+                import pandas as pd
+                pd.DataFrame({name: [] for name in COLUMNS}).to_parquet(tmp_path, index=False)
+        else:
+            with open(tmp_path, 'w', encoding='utf-8-sig', newline='') as f:
+                header = True
+                for frame in iter_credit_frames(chunks, policy, summary):
+                    frame.to_csv(f, index=False, header=header)
+                    header = False
+                    if on_progress:
+                        on_progress(summary['rows'])
+                if header:
+                    f.write(",".join(COLUMNS) + "\n")
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if writer is not None:
+        writer.close()
+    os.replace(tmp_path, out)
+    summary['bytes'] = os.path.getsize(out)
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def read_page(path, page, page_size):
+    """
+    读取台账第 page 页 (从 0 开始) 的 DataFrame
+    Parquet 只读取覆盖该页的行组; CSV 需要顺序跳过前面的行, 大台账建议写为 Parquet
+    """
+    import pandas as pd
+
+    start = page * page_size
+    if path.lower().endswith(('.parquet', '.pq')):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        groups, offset, first = [], 0, None
+        for i in range(parquet.num_row_groups):
+            rows = parquet.metadata.row_group(i).num_rows
+            if offset + rows > start and offset < start + page_size:
+                groups.append(i)
+                first = offset if first is None else first
+            offset += rows
+        if not groups:
+            return pd.DataFrame({name: [] for name in COLUMNS})
+        table = pa.concat_tables(parquet.read_row_group(i) for i in groups)
+        return table.slice(start - first, page_size).to_pandas()
+    return pd.read_csv(path, skiprows=range(1, start + 1), nrows=page_size, encoding='utf-8-sig',
+                       keep_default_na=False, na_values={"ESG 风险分": [""]})
+
+
+def _book_digest(registry, policy, chunk_rows, effective):
+    """
+    台账内容键: 政策 + 数据目录 + 每个公司文件的 (mtime, size) 与生效 S 分 (随评估日期衰减);
+    与进程内 generation 无关, 重启后仍可复用
+    """
+    import hashlib
+
+    digest = hashlib.sha1(repr((policy.key(), os.path.abspath(registry.data_dir), chunk_rows)).encode())
+    for code, own_score in zip(effective[0], effective[2]):
+        digest.update(f"{code}\0{registry.stamp(code)}\0{own_score:g}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def _evict_books(book_dir, keep):
+    """只保留最近使用的 keep 本台账 (数据文件与 .json 汇总一起删除)"""
+    books = []
+    with os.scandir(book_dir) as it:
+        for entry in it:
+            if entry.name.startswith('credit_') and entry.name.endswith(('.parquet', '.csv')):
+                try:
+                    books.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+    books.sort(reverse=True)
+    for _, path in books[keep:]:
+        for stale in (path, os.path.splitext(path)[0] + '.json'):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def registry_book(registry, policy=None, book_dir=BOOK_DIR, chunk_rows=DEFAULT_CHUNK_ROWS, keep=BOOK_KEEP):
+    """
+    把数据目录的授信台账写入 .cache/scf/ 并返回汇总 dict (另含 path), 供界面按页读取
+    安装 pyarrow 时写为 Parquet (按行组分页), 否则写为 CSV
+    文件名按内容键命名, 同一数据与政策的台账 (含重启后) 直接复用; 目录中只保留最近使用的 keep 本
+    """
+    import importlib.util
+    import json
+
+    from .scoring import effective_scores
+
+    policy = policy or CreditPolicy()
+    effective = effective_scores(registry)
+    ext = 'parquet' if importlib.util.find_spec('pyarrow') else 'csv'
+    os.makedirs(book_dir, exist_ok=True)
+    stem = os.path.join(book_dir, f"credit_{_book_digest(registry, policy, chunk_rows, effective)}")
+    path, meta_path = f"{stem}.{ext}", f"{stem}.json"
+    summary = None
+    if os.path.exists(path):
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                summary = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            summary = None
+    if summary is None:
+        summary = write_credit_lines(registry_chunks(registry, chunk_rows, effective), path, policy)
+        tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+    summary['path'] = path
+    _evict_books(book_dir, keep)
+    return summary
+
+
+# --- 4. 命令行 ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GreenLink 供应链金融授信台账")
+    parser.add_argument('input', nargs='?', help="供应商 CSV / Parquet (默认读取数据目录)")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('-o', '--output', required=True, help="输出台账 (.csv / .parquet)")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--low', type=float, default=30, help="低于该分数为优质档")
+    parser.add_argument('--high', type=float, default=60, help="高于该分数为高风险档")
+    parser.add_argument('--multipliers', default="1.2,1.0,0.5", help="优质 / 一般 / 高风险档的调整系数")
+    parser.add_argument('--base-credit', type=float, default=1000, help="缺省基础授信 (万元)")
+    parser.add_argument('--default-score', type=float, default=50, help="缺少风险分时的取值")
+    args = parser.parse_args(argv)
+
+    policy = CreditPolicy(args.low, args.high, [float(m) for m in args.multipliers.split(',')],
+                          args.base_credit, args.default_score)
+    if args.input:
+        chunks = file_chunks(args.input, args.chunk_rows)
+    else:
+        from .registry import CompanyRegistry
+        chunks = registry_chunks(CompanyRegistry(args.data_dir), args.chunk_rows)
+
+    summary = write_credit_lines(chunks, args.output, policy,
+                                 on_progress=lambda rows: print(f"\r已处理 {rows:,} 行", end="", flush=True))
+    print(f"\n✓ {summary['rows']:,} 行 -> {args.output} ({summary['bytes'] / 1e6:.1f} MB, "
+          f"{summary['seconds']:.1f} s)")
+    print(f"  基础授信 {summary['base_total']:,.0f} 万 -> 动态授信 {summary['credit_total']:,} 万")
+    for name, rows, credit in zip(BAND_NAMES, summary['band_rows'], summary['band_credit']):
+        print(f"  {name}: {rows:,} 行, {credit:,} 万")
+
+
+if __name__ == '__main__':
+    main()
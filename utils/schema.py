@@ -0,0 +1,305 @@
+"""
+数据规范化 (Schema Normalizer)
+各公司 JSON 结构并不统一:
+- traditional_rating / traditional_esg_rating / social.traditional_rating
+- 事件日期为 date ("2020-09-30" / "2020-09") 或 year / month / day
+- impact 有时是严重程度标签 ("严重"), 有时是影响描述
+- 供应商风险写在文本里: risk_status = "高社会风险（75分）"
+入库时对每个文件校验一次, 编译为带 __slots__ 的紧凑记录,
+严重程度 / 日期 / 评分均为数值, 重复字符串跨公司驻留 (sys.intern)
+"""
+
+import re
+import sys
+from collections.abc import Mapping
+
+# --- 1. 严重程度 ---
+
+SEVERITY_POSITIVE = 0
+SEVERITY_LOW = 1
+SEVERITY_MEDIUM = 2
+SEVERITY_HIGH = 3
+SEVERITY_CRITICAL = 4
+
+SEVERITY_LABELS = ("正面", "低", "中", "高", "严重")
+
+# 按前缀匹配, 顺序即优先级 ("中等（正面进展…）" 应识别为 中)
+_SEVERITY_PREFIXES = (
+    ("严重", SEVERITY_CRITICAL), ("极高", SEVERITY_CRITICAL), ("critical", SEVERITY_CRITICAL),
+    ("高", SEVERITY_HIGH), ("high", SEVERITY_HIGH),
+    ("中", SEVERITY_MEDIUM), ("medium", SEVERITY_MEDIUM),
+    ("低", SEVERITY_LOW), ("low", SEVERITY_LOW),
+    ("正面", SEVERITY_POSITIVE), ("积极", SEVERITY_POSITIVE), ("positive", SEVERITY_POSITIVE),
+)
+_MAX_LABEL_LEN = 12     # 超过该长度的 impact 视为描述而非标签
+
+# 文本风险等级对应的数值评分 (无显式分数时使用)
+LEVEL_SCORES = {SEVERITY_HIGH: 75, SEVERITY_CRITICAL: 90, SEVERITY_MEDIUM: 50,
+                SEVERITY_LOW: 25, SEVERITY_POSITIVE: 10}
+
+_SCORE_RE = re.compile(r'(\d+(?:\.\d+)?)\s*分')
+_DATE_RE = re.compile(r'^\s*(\d{4})(?:[-/.年](\d{1,2}))?(?:[-/.月](\d{1,2}))?')
+_YEAR_RE = re.compile(r'\d{4}')
+_DAY_RE = re.compile(r'\d{1,2}')
+
+
+class SchemaError(ValueError):
+    """公司数据文件不符合最低结构要求"""
+
+
+def _intern(value):
+    return sys.intern(str(value)) if value is not None else None
+
+
+def _mapping(value):
+    """章节不是对象 (缺失 / 列表 / 字符串) 时按空对象处理"""
+    return value if isinstance(value, Mapping) else {}
+
+
+def _items(value):
+    """列表字段不是列表时按空列表处理"""
+    return value if isinstance(value, (list, tuple)) else ()
+
+
+def parse_severity(label):
+    """严重程度标签 -> 0~4, 无法识别返回 None"""
+    if label is None:
+        return None
+    text = str(label).strip().lower()
+    for prefix, level in _SEVERITY_PREFIXES:
+        if text.startswith(prefix):
+            return level
+    return None
+
+
+def parse_risk_status(status):
+    """从 '高社会风险（75分）' / '低风险（备选供应商）' 中提取数值风险, 无法识别返回 None"""
+    status = str(status)
+    match = _SCORE_RE.search(status)
+    if match:
+        return float(match.group(1))
+    level = parse_severity(status)
+    if level is None:
+        # '高社会风险' 之类标签不以等级开头时, 退化为包含匹配
+        for prefix, candidate in _SEVERITY_PREFIXES:
+            if prefix in status.lower():
+                level = candidate
+                break
+    return float(LEVEL_SCORES[level]) if level is not None else None
+
+
+def parse_date(event):
+    """事件日期 -> (year, month, day), 未知部分为 0"""
+    if event.get('date'):
+        match = _DATE_RE.match(str(event['date']))
+        if match:
+            return tuple(int(g) if g else 0 for g in match.groups())
+    year = _date_part(event.get('year'), _YEAR_RE, 9999)
+    if year:
+        return year, _date_part(event.get('month'), _DAY_RE, 12), _date_part(event.get('day'), _DAY_RE, 31)
+    return 0, 0, 0
+
+
+def _date_part(value, pattern, limit):
+    """分列日期字段 ('2019年' / '03' / 3) 取数字; 无法解析或超出范围时为 0 (按未知处理)"""
+    match = pattern.search(str(value)) if value else None
+    number = int(match.group()) if match else 0
+    return number if number <= limit else 0
+
+
+def format_date(year, month, day):
+    if not year:
+        return "N/A"
+    if not month:
+        return f"{year}"
+    if not day:
+        return f"{year}-{month:02d}"
+    return f"{year}-{month:02d}-{day:02d}"
+
+
+# --- 2. 紧凑记录 ---
+
+class EventRecord:
+    """关键事件: date_key 为 YYYYMMDD 整数, 便于排序和区间查询"""
+
+    __slots__ = ('date_key', 'date_label', 'title', 'description', 'severity',
+                 'source', 'url', 'details')
+
+    def __init__(self, date_key, date_label, title, description, severity, source, url, details):
+        self.date_key = date_key
+        self.date_label = date_label
+        self.title = title
+        self.description = description
+        self.severity = severity
+        self.source = source
+        self.url = url
+        self.details = details
+
+    @property
+    def year(self):
+        return self.date_key // 10000
+
+    @property
+    def severity_label(self):
+        return SEVERITY_LABELS[self.severity] if self.severity is not None else "N/A"
+
+    def __repr__(self):
+        return f"EventRecord({self.date_label!r}, {self.title[:20]!r}, severity={self.severity})"
+
+
+class SupplierRecord:
+    """上游供应商"""
+
+    __slots__ = ('name', 'country', 'product', 'risk_score', 'status', 'note')
+
+    def __init__(self, name, country, product, risk_score, status, note):
+        self.name = name
+        self.country = country
+        self.product = product
+        self.risk_score = risk_score
+        self.status = status
+        self.note = note
+
+
+class CompanyProfile:
+    """编译后的公司记录, UI 与 PDF 共用"""
+
+    __slots__ = ('code', 'name', 'env_score', 'soc_score', 'env_level', 'soc_level',
+                 'traditional_rating', 'env_events', 'soc_events', 'suppliers')
+
+    def __init__(self, code, name, env_score, soc_score, env_level, soc_level,
+                 traditional_rating, env_events, soc_events, suppliers):
+        self.code = code
+        self.name = name
+        self.env_score = env_score
+        self.soc_score = soc_score
+        self.env_level = env_level
+        self.soc_level = soc_level
+        self.traditional_rating = traditional_rating
+        self.env_events = env_events
+        self.soc_events = soc_events
+        self.suppliers = suppliers
+
+    def with_scores(self, env_score, soc_score):
+        """E / S 替换为给定评分的副本 (其余字段共享); 评分不变时返回自身"""
+        if (env_score, soc_score) == (self.env_score, self.soc_score):
+            return self
+        return CompanyProfile(self.code, self.name, float(env_score), float(soc_score), self.env_level,
+                              self.soc_level, self.traditional_rating, self.env_events, self.soc_events,
+                              self.suppliers)
+
+    def __repr__(self):
+        return f"CompanyProfile({self.code!r}, E={self.env_score}, S={self.soc_score})"
+
+
+# --- 3. 校验与编译 ---
+
+def _score(section, path, problems):
+    value = section.get('risk_score') if isinstance(section, Mapping) else None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        problems.append(f"{path}.risk_score 缺失或不是数值")
+        return 50.0
+    if not 0 <= value <= 100:
+        problems.append(f"{path}.risk_score 超出 0-100 范围: {value}")
+    return float(value)
+
+
+def _traditional_rating(data):
+    """兼容三种位置与 rating / msci 两种写法"""
+    for trad in (data.get('traditional_rating'), data.get('traditional_esg_rating'),
+                 _mapping(data.get('social')).get('traditional_rating')):
+        if isinstance(trad, Mapping):
+            rating = trad.get('rating') or trad.get('msci')
+            if rating:
+                return _intern(rating)
+        elif isinstance(trad, str) and trad:
+            return _intern(trad)
+    return "N/A"
+
+
+def compile_event(raw):
+    year, month, day = parse_date(raw)
+
+    # impact 较短且能识别为等级时视为标签, 否则为描述
+    impact = raw.get('impact')
+    severity = parse_severity(raw.get('severity'))
+    description = impact
+    if impact is not None and len(str(impact)) <= _MAX_LABEL_LEN and parse_severity(impact) is not None:
+        if severity is None:
+            severity = parse_severity(impact)
+        description = None
+
+    details = raw.get('details') or raw.get('affected_customers') or ()
+    if isinstance(details, str):
+        details = (details,)
+
+    return EventRecord(
+        date_key=year * 10000 + month * 100 + day,
+        date_label=format_date(year, month, day),
+        title=str(raw.get('event', '')),
+        description=str(description) if description else None,
+        severity=severity,
+        source=_intern(raw.get('source')),
+        url=raw.get('url'),
+        details=tuple(str(d) for d in details),
+    )
+
+
+def compile_supplier(raw):
+    if not isinstance(raw, Mapping):
+        raw = {"name": raw}
+    status = raw.get('risk_status')
+    return SupplierRecord(
+        name=_intern(raw.get('name', 'N/A')),
+        country=_intern(raw.get('country')),
+        product=_intern(raw.get('product')),
+        risk_score=parse_risk_status(status) if status else None,
+        status=_intern(status) if status else None,
+        note=raw.get('note'),
+    )
+
+
+def validate(data):
+    """返回问题列表 (空列表表示通过)"""
+    problems = []
+    if not isinstance(data, Mapping):
+        return ["顶层必须是 JSON 对象"]
+    if not data.get('company'):
+        problems.append("company 缺失")
+    for key in ('environment', 'social'):
+        if not isinstance(data.get(key), Mapping):
+            problems.append(f"{key} 缺失或不是对象")
+        else:
+            _score(data[key], key, problems)
+    return problems
+
+
+def compile_company(data, code=None, strict=False):
+    """
+    编译单个公司数据 (dict 或 CompanyRecord) 为 CompanyProfile
+    strict=True 时校验失败抛出 SchemaError, 否则以默认值补齐
+    """
+    problems = validate(data)
+    if strict and problems:
+        raise SchemaError(f"{code or data.get('company')}: " + "; ".join(problems))
+
+    env = _mapping(data.get('environment'))
+    social = _mapping(data.get('social'))
+    upstream = _mapping(_mapping(data.get('supply_chain')).get('upstream'))
+
+    def events(section):
+        compiled = [compile_event(e) for e in _items(section.get('key_events')) if isinstance(e, Mapping)]
+        return tuple(compiled)
+
+    return CompanyProfile(
+        code=_intern(code) if code else None,
+        name=_intern(data.get('company', '未知公司')),
+        env_score=_score(env, 'environment', []),
+        soc_score=_score(social, 'social', []),
+        env_level=_intern(env.get('risk_level', '未知')),
+        soc_level=_intern(social.get('risk_level', '未知')),
+        traditional_rating=_traditional_rating(data),
+        env_events=events(env),
+        soc_events=events(social),
+        suppliers=tuple(compile_supplier(s) for s in _items(upstream.get('suppliers'))),
+    )
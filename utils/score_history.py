@@ -0,0 +1,198 @@
+"""
+评分历史 (Score History Store)
+每次评分运行为每家公司追加一个 E/S 点, 按公司分区、按列存储, 只追加不改写:
+    history/scores/<code>/ts.i8    int64  评分时间 (Unix 秒, 单调不减)
+    history/scores/<code>/env.f4   float32
+    history/scores/<code>/soc.f4   float32
+区间查询对时间列内存映射后二分定位, 不读取区间外的数据;
+多年历史在服务端按 LTTB 或 min-max 降采样到固定点数后再交给图表
+"""
+
+import os
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl, 退化为无锁追加
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_DIR = os.path.join(BASE_DIR, 'history', 'scores')
+
+# --- 1. 列定义 ---
+
+COLUMNS = (("ts", np.int64), ("env", np.float32), ("soc", np.float32))
+DEFAULT_MAX_POINTS = 200
+
+
+def _column_path(root, code, name, dtype):
+    return os.path.join(root, code, f"{name}.{np.dtype(dtype).kind}{np.dtype(dtype).itemsize}")
+
+
+# --- 2. 存储 ---
+
+class ScoreHistory:
+    """按公司分区的只追加列存储"""
+
+    def __init__(self, root=HISTORY_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def codes(self):
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def __len__(self):
+        return len(self.codes())
+
+    def count(self, code):
+        """有效行数; 各列长度取最小值, 忽略写入中断留下的半行"""
+        sizes = []
+        for name, dtype in COLUMNS:
+            path = _column_path(self.root, code, name, dtype)
+            sizes.append(os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0)
+        return min(sizes)
+
+    def _columns(self, code, n):
+        """以只读 memmap 打开前 n 行"""
+        return [np.memmap(_column_path(self.root, code, name, dtype), dtype=dtype, mode='r', shape=(n,))
+                for name, dtype in COLUMNS]
+
+    def append(self, code, env, soc, ts=None):
+        """追加单点; ts 早于已有最后一点时抛出 ValueError (保持时间列有序)"""
+        self.append_many(code, [ts if ts is not None else time.time()], [env], [soc])
+
+    def append_many(self, code, ts, env, soc):
+        """批量追加; 三列长度不同时抛出 ValueError (否则各列文件错位, 之后的读取全部失准)"""
+        ts = np.asarray(ts, dtype=np.float64).astype(np.int64)
+        if not len(ts) == len(env) == len(soc):
+            raise ValueError(f"{code}: 列长度不一致 (Column lengths differ): ts {len(ts)}, env {len(env)}, soc {len(soc)}")
+        if len(ts) > 1 and np.any(np.diff(ts) < 0):
+            raise ValueError("评分时间必须单调不减 (Timestamps must be non-decreasing)")
+        os.makedirs(os.path.join(self.root, code), exist_ok=True)
+
+        with open(os.path.join(self.root, code, '.lock'), 'w') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            n = self.count(code)
+            if n:
+                last = self._columns(code, n)[0][-1]
+                if len(ts) and ts[0] < last:
+                    raise ValueError(f"{code}: 评分时间 {ts[0]} 早于已有记录 {last}")
+            for (name, dtype), values in zip(COLUMNS, (ts, env, soc)):
+                path = _column_path(self.root, code, name, dtype)
+                with open(path, 'ab') as f:
+                    # 截掉上次中断写入的半行, 保证各列对齐
+                    f.truncate(n * np.dtype(dtype).itemsize)
+                    f.write(np.asarray(values, dtype=dtype).tobytes())
+
+    def record_run(self, codes, env, soc, ts=None, skip_unchanged=True):
+        """
+        记录一次评分运行: 每家公司追加一个点
+        skip_unchanged=True 时评分与上一点相同的公司不重复写入 (例如进程重启后重新加载同一份数据)
+        返回实际写入的公司数
+        """
+        ts = int(ts if ts is not None else time.time())
+        written = 0
+        for code, e, s in zip(codes, env, soc):
+            if skip_unchanged:
+                last = self.latest(code, 1)
+                if len(last[0]) and float(last[1][0]) == np.float32(e) and float(last[2][0]) == np.float32(s):
+                    continue
+            self.append(code, e, s, ts)
+            written += 1
+        return written
+
+    # ---- 查询 ----
+
+    def query(self, code, start=None, end=None):
+        """返回 [start, end] 区间的 (ts, env, soc) 数组"""
+        n = self.count(code) if os.path.isdir(os.path.join(self.root, code)) else 0
+        if not n:
+            return tuple(np.empty(0, dtype=dtype) for _, dtype in COLUMNS)
+        ts, env, soc = self._columns(code, n)
+        lo = int(np.searchsorted(ts, start, side='left')) if start is not None else 0
+        hi = int(np.searchsorted(ts, end, side='right')) if end is not None else n
+        return np.array(ts[lo:hi]), np.array(env[lo:hi]), np.array(soc[lo:hi])
+
+    def latest(self, code, n=2):
+        """最后 n 个点"""
+        total = self.count(code) if os.path.isdir(os.path.join(self.root, code)) else 0
+        if not total:
+            return tuple(np.empty(0, dtype=dtype) for _, dtype in COLUMNS)
+        return tuple(np.array(col[max(0, total - n):]) for col in self._columns(code, total))
+
+    def deltas(self, code, current=None):
+        """
+        最近两次评分的变化 (env_delta, soc_delta), 历史不足两点时为 (None, None)
+        current=(E, S) 为界面展示的分数: 与最后一点不同 (不是同一口径, 例如会话调整了衰减政策) 时也返回 (None, None)
+        """
+        _, env, soc = self.latest(code, 2)
+        if len(env) < 2:
+            return None, None
+        if current is not None and (float(env[1]), float(soc[1])) != tuple(float(np.float32(v)) for v in current):
+            return None, None
+        return float(env[1] - env[0]), float(soc[1] - soc[0])
+
+    def series(self, code, start=None, end=None, max_points=DEFAULT_MAX_POINTS, method="lttb"):
+        """区间查询并降采样, 返回 pandas DataFrame (index 为时间, 列 Env / Soc)"""
+        import pandas as pd
+
+        ts, env, soc = self.query(code, start, end)
+        if len(ts) > max_points:
+            per_column = max(3, max_points // 2)
+            idx = np.union1d(downsample(ts, env, per_column, method), downsample(ts, soc, per_column, method))
+            ts, env, soc = ts[idx], env[idx], soc[idx]
+        return pd.DataFrame({"Env": env, "Soc": soc}, index=pd.to_datetime(ts, unit='s'))
+
+
+# --- 3. 降采样 ---
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: 保留首尾点, 中间每个桶选与前一选中点、
+    下一桶均值构成三角形面积最大的点。返回选中点下标
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.floor(np.linspace(1, n - 1, n_out - 1)).astype(np.int64)
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_lo:nxt_hi].mean()
+        avg_y = y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[prev] - avg_x) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (avg_y - y[prev]))
+        prev = lo + int(np.argmax(area))
+        selected[i + 1] = prev
+    return selected
+
+
+def minmax(x, y, n_out):
+    """等分为 n_out / 2 个桶, 每桶保留最小值与最大值点 (保留尖峰)。返回选中点下标"""
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    y = np.asarray(y)
+    starts = np.floor(np.linspace(0, n, n_out // 2, endpoint=False)).astype(np.int64)
+    counts = np.diff(np.append(starts, n))
+    bucket = np.repeat(np.arange(len(starts)), counts)
+    # 桶内排序: 先按桶, 再按值, 首个即最小、末个即最大
+    order = np.lexsort((y, bucket))
+    ends = np.cumsum(counts)
+    return np.unique(np.concatenate([order[ends - counts], order[ends - 1]]))
+
+
+def downsample(x, y, n_out, method="lttb"):
+    if method == "lttb":
+        return lttb(x, y, n_out)
+    if method == "minmax":
+        return minmax(x, y, n_out)
+    raise ValueError(f"未知降采样方法 (Unknown method): {method}")
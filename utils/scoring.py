@@ -0,0 +1,174 @@
+"""
+组合评分引擎 (Portfolio Scoring Engine)
+一次性为整个组合计算 综合分 / 绿色评级 / 利率优惠 / 执行利率 / 年利息节省
+所有输入输出均为 NumPy 数组, 单家公司也按长度为 1 的数组处理
+E / S 的输入统一取生效评分 (effective_score / effective_scores): key_events 的时间衰减评分,
+章节没有事件时回退到 JSON 中的 risk_score; app、API、PDF、组合报告、站点、授信台账与评分历史都经由这里
+"""
+
+import threading
+import weakref
+from datetime import date
+
+import numpy as np
+
+# --- 1. 评级阈值与利率配置 (与 app.py 原有规则一致) ---
+
+DEEP_GREEN_MAX = 30     # total_score <= 30: 深绿
+LIGHT_GREEN_MAX = 50    # total_score <= 50: 浅绿, 否则棕色
+HIGH_EXPOSURE_MIN = 60  # total_score > 60: 财务风险敞口极高
+
+BASE_RATE = 4.35        # 基础利率 (%)
+
+BAND_DEEP_GREEN = 0
+BAND_LIGHT_GREEN = 1
+BAND_BROWN = 2
+
+RATING_LABELS = ("🌿 深绿企业", "🍃 浅绿企业", "🍂 棕色企业")
+RATING_NAMES = ("深绿企业", "浅绿企业", "棕色企业")            # PDF 字体不含 emoji
+RATING_NAMES_EN = ("Deep Green", "Light Green", "Brown")
+RATING_COLORS = ("#00FF41", "#ADFF2F", "#FFA500")
+DISCOUNT_BP = np.array([50, 20, 0], dtype=np.int16)
+
+
+# --- 2. 向量化计算 ---
+
+def total_scores(env_scores, soc_scores):
+    """综合分 = (E + S) / 2"""
+    env = np.asarray(env_scores, dtype=np.float64)
+    soc = np.asarray(soc_scores, dtype=np.float64)
+    return (env + soc) * 0.5
+
+
+def rating_bands(total):
+    """评级档位: 0 深绿 / 1 浅绿 / 2 棕色 (int8 数组)"""
+    total = np.asarray(total, dtype=np.float64)
+    return (total > DEEP_GREEN_MAX).astype(np.int8) + (total > LIGHT_GREEN_MAX)
+
+
+def score_portfolio(env_scores, soc_scores, loan_amounts=0, base_rate=BASE_RATE):
+    """
+    批量评分
+    loan_amounts 可以是标量 (整个组合同一贷款额) 或与评分等长的数组, 单位万元
+    返回 dict, 每个值都是等长 NumPy 数组:
+    total_score, band, discount_bp, final_rate, annual_saving, high_exposure
+    """
+    total = total_scores(env_scores, soc_scores)
+    band = rating_bands(total)
+    discount_bp = DISCOUNT_BP[band]
+    final_rate = base_rate - discount_bp / 100.0
+    annual_saving = np.asarray(loan_amounts, dtype=np.float64) * (discount_bp / 10000.0)
+
+    return {
+        "total_score": total,
+        "band": band,
+        "discount_bp": discount_bp,
+        "final_rate": final_rate,
+        "annual_saving": np.broadcast_to(annual_saving, total.shape),
+        "high_exposure": total > HIGH_EXPOSURE_MIN,
+    }
+
+
+def score_company(env_score, soc_score, loan_amount=0, base_rate=BASE_RATE):
+    """单家公司评分, 返回 Python 标量 (供 UI / PDF 直接使用)"""
+    result = score_portfolio([env_score], [soc_score], loan_amount, base_rate)
+    band = int(result['band'][0])
+    return {
+        "total_score": float(result['total_score'][0]),
+        "band": band,
+        "rating_label": RATING_LABELS[band],
+        "rating_name": RATING_NAMES[band],
+        "rating_name_en": RATING_NAMES_EN[band],
+        "rating_color": RATING_COLORS[band],
+        "discount_bp": int(result['discount_bp'][0]),
+        "final_rate": float(result['final_rate'][0]),
+        "annual_saving": float(result['annual_saving'][0]),
+        "high_exposure": bool(result['high_exposure'][0]),
+    }
+
+
+def portfolio_frame(codes, env_scores, soc_scores, loan_amounts=0, base_rate=BASE_RATE):
+    """组合评分结果转换为 DataFrame, 用于导出 CSV"""
+    import pandas as pd
+
+    result = score_portfolio(env_scores, soc_scores, loan_amounts, base_rate)
+    labels = np.asarray(RATING_LABELS, dtype=object)[result['band']]
+    return pd.DataFrame({
+        "公司代码": codes,
+        "E 风险分": np.asarray(env_scores),
+        "S 风险分": np.asarray(soc_scores),
+        "综合分": result['total_score'],
+        "绿色评级": labels,
+        "ESG 优惠(bp)": result['discount_bp'],
+        "执行利率(%)": np.round(result['final_rate'], 2),
+        "年利息节省(万)": result['annual_saving'],
+    })
+
+
+# --- 4. 生效评分 (事件衰减 + JSON 回退) ---
+
+_scorers = weakref.WeakKeyDictionary()      # CompanyRegistry -> 默认政策的 EventScorer
+_scorers_lock = threading.Lock()
+
+
+def sync_scorer(scorer, registry):
+    """把 EventScorer 同步到今天的评估日期与注册表的当前索引, 返回 scorer"""
+    from .event_score import decimal_year
+
+    today = decimal_year(date.today())
+    if scorer.as_of != today:
+        scorer.set_as_of(today)
+    scorer.update(registry)
+    return scorer
+
+
+def shared_scorer(registry):
+    """注册表在本进程内共享的默认政策 EventScorer (首次调用时构建, 之后随索引版本增量同步)"""
+    from .event_score import EventScorer
+
+    with _scorers_lock:
+        scorer = _scorers.get(registry)
+        if scorer is None:
+            scorer = _scorers[registry] = EventScorer()
+    return sync_scorer(scorer, registry)
+
+
+def _effective(decayed, static):
+    return tuple(round(value) if value is not None else fallback for value, fallback in zip(decayed, static))
+
+
+def effective_score(scorer, code, static):
+    """
+    单家公司的生效 (E, S): scorer 中的衰减评分四舍五入为整数 (与 JSON 评分同一精度);
+    章节没有事件或 scorer 未收录该公司时取 static (JSON 中的 (E, S))
+    """
+    return _effective(scorer.score(code) if code in scorer else (None, None), static)
+
+
+def effective_scores(registry, codes=None, scorer=None):
+    """
+    (代码列表, E 数组, S 数组), 逐项与 effective_score 相同; scorer 默认为 shared_scorer(registry)
+    """
+    scorer = scorer or shared_scorer(registry)
+    codes, env, soc = scorer.scores(registry.codes() if codes is None else codes)
+    static_codes, static_env, static_soc = registry.scores()
+    lookup = dict(zip(static_codes, zip(static_env, static_soc)))
+    static = np.array([lookup.get(code, (np.nan, np.nan)) for code in codes], dtype=np.float64).reshape(-1, 2).T
+    env = np.where(np.isnan(env), static[0], np.round(env))
+    soc = np.where(np.isnan(soc), static[1], np.round(soc))
+    return codes, env, soc
+
+
+def effective_profile(profile, scorer=None):
+    """
+    E / S 换为生效评分的 CompanyProfile (PDF / 组合报告 / 损失模拟使用);
+    不给 scorer 时按默认政策与今天的日期现场评分该公司 (不在注册表中的单个文件)
+    """
+    static = (profile.env_score, profile.soc_score)
+    if scorer is None:
+        from .event_score import score_events
+        result = score_events(profile)
+        env, soc = _effective((result['env_score'], result['soc_score']), static)
+    else:
+        env, soc = effective_score(scorer, profile.code, static)
+    return profile.with_scores(env, soc)
@@ -0,0 +1,665 @@
+"""
+静态站点生成 (Static Site Builder)
+由 data/*.json 渲染 GitHub Pages 站点与 B2C 溯源页, 不再手工维护 HTML:
+    docs/index.html                 产品溯源页 (模板 assets/site/product.html)
+    docs/companies/index.html       企业档案列表 (assets/site/companies.html)
+    docs/companies/<code>.html      每家公司一页 (assets/site/company.html)
+    b2c_page/index.html             消费者溯源页 (assets/site/b2c.html)
+卫星影像经 utils.assets.publish 发布为带内容哈希的多分辨率变体 (docs/img/),
+档案页样式表发布为 docs/static/site-<hash>.css; 影像说明取自 analysis.evidence 的 observation / conclusion。
+
+E / S 均为生效评分 (utils.scoring: 事件衰减评分, 章节没有事件时取 JSON 评分), 与 app / API / PDF 一致。
+
+增量构建: 页面渲染时登记实际用到的输入 (数据文件 / 模板 / 影像 / 供应商名称解析 / 生效评分 / 档案列表摘要),
+依赖图保存在 .cache/site/<站点目录摘要>.json。再次构建时只重新渲染有输入指纹变化的页面:
+文件先比较 (mtime, size), 变化时才计算内容哈希 (touch 过但内容不变不会触发重建);
+输出与磁盘上内容一致时不重写, 已删除公司的页面随之删除
+
+命令行: python -m utils.site_builder [--full] [--data-dir DIR] [--site-dir DIR] [--b2c-dir DIR]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from html import escape
+
+from .fscache import Fingerprints
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+SITE_DIR = os.path.join(BASE_DIR, 'docs')
+B2C_DIR = os.path.join(BASE_DIR, 'b2c_page')
+TEMPLATE_DIR = os.path.join(BASE_DIR, 'assets', 'site')
+MANIFEST_DIR = os.path.join(BASE_DIR, '.cache', 'site')
+
+SITE_VERSION = 1                # 依赖图格式版本; 生成器源码本身也是每个页面的依赖
+PRODUCT_CODE = "COFCO"          # 产品溯源页的加工商
+PRODUCT_BRAND = "福临门品牌"
+FOREST_CHART_CODE = "IOI"       # 模板中森林覆盖率折线图 (静态数据) 所属的供应商标签页
+
+# --- 1. 模板与文本 ---
+
+_PLACEHOLDER_RE = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+_PAREN_RE = re.compile(r'\s*[\(（][^\(\)（）]*[\)）]\s*$')
+_YEAR_RE = re.compile(r'(19|20)\d{2}')
+_CLAUSE_RE = re.compile(r'[，。；,;]')
+
+FRAME_KEYS = (("satellite_image_before", "基准年"), ("satellite_image_mid", "转换期"),
+              ("satellite_image_after", "当前状态"))
+
+
+def render_template(text, context):
+    """替换 {{ name }} 占位符; 值需已转义, 缺少的键直接报错; 换行风格跟随模板 (LF / CRLF)"""
+    newline = '\r\n' if '\r\n' in text else '\n'
+    return _PLACEHOLDER_RE.sub(lambda m: str(context[m.group(1)]).replace('\n', newline), text)
+
+
+def short_name(name):
+    """'中粮集团 (COFCO Corporation)' -> '中粮集团'"""
+    return _PAREN_RE.sub('', str(name)).strip() or str(name)
+
+
+def first_clause(text):
+    return _CLAUSE_RE.split(str(text or ''), 1)[0].strip()
+
+
+def risk_class(score):
+    if score is None:
+        return "risk-medium"
+    return "risk-low" if score <= 30 else "risk-medium" if score <= 60 else "risk-high"
+
+
+def level_badge(level):
+    """'低风险' / '中风险' / '高风险' -> 徽章 class"""
+    level = str(level or '')
+    return "badge danger" if level.startswith(("高", "严重", "极高")) else \
+        "badge warning" if level.startswith("中") else "badge"
+
+
+def _hash_text(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def _write_if_changed(path, text):
+    """内容未变时不重写 (保持 mtime, 避免部署工具重复上传); 返回是否写入"""
+    data = text.encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+# --- 2. 依赖追踪 ---
+
+class SiteBuild:
+    """
+    一次构建: 输入指纹 (本次构建内缓存) + 上次构建的依赖图
+    输入键: "file:<相对路径>" (内容哈希) / "name:<归一化名称>" (解析到的公司代码) /
+    "score:<公司代码>" (生效 E/S, 随评估日期衰减) / "listing" (档案列表摘要)
+    """
+
+    def __init__(self, registry, site_dir=SITE_DIR, b2c_dir=B2C_DIR, manifest_path=None, full=False):
+        self.registry = registry
+        self.site_dir = site_dir
+        self.b2c_dir = b2c_dir
+        digest = _hash_text(f"{os.path.abspath(site_dir)}|{os.path.abspath(b2c_dir)}|{os.path.abspath(registry.data_dir)}")
+        self.manifest_path = manifest_path or os.path.join(MANIFEST_DIR, f"{digest}.json")
+        self.previous = {} if full else self._load_manifest()
+        self.files = dict(self.previous.get('files', {}))      # 相对路径 -> [mtime, size, 内容哈希]
+        self._fingerprints = Fingerprints(self.files)
+        self.inputs = {}
+        self._deps = None
+        self._templates = {}
+        self._published = {}
+        self._names = None
+        self._listing = None
+        self._scorer = None
+        self.stats = {"rendered": 0, "written": 0, "unchanged": 0, "removed": 0}
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return manifest if manifest.get('version') == SITE_VERSION else {}
+
+    # ---- 指纹 ----
+
+    def fingerprint(self, key):
+        value = self.inputs.get(key)
+        if value is None:
+            kind, _, arg = key.partition(':')
+            if kind == "file":
+                value = self._file_hash(arg)
+            elif kind == "name":
+                value = self._name_map().get(arg, "")
+            elif kind == "score":
+                value = "%s/%s" % self.effective(arg) if arg in self.registry else ""
+            else:
+                value = self.listing()[1]
+            self.inputs[key] = value
+        return value
+
+    def _file_hash(self, rel):
+        try:
+            return self._fingerprints.get(os.path.join(BASE_DIR, rel), key=rel)[:16]
+        except OSError:
+            return "missing"
+
+    def use(self, key):
+        """登记当前页面依赖的输入"""
+        if self._deps is not None:
+            self._deps.append(key)
+        return self.fingerprint(key)
+
+    def use_file(self, path):
+        self.use("file:" + os.path.relpath(os.path.abspath(path), BASE_DIR))
+        return path
+
+    # ---- 页面可用的输入 ----
+
+    def template(self, name):
+        path = self.use_file(os.path.join(TEMPLATE_DIR, name))
+        text = self._templates.get(name)
+        if text is None:
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                text = self._templates[name] = f.read()
+        return text
+
+    def company(self, code):
+        """
+        (record, profile, info); 文件被编辑过时 registry.load 会先重建索引条目
+        profile 与 info 中的 E / S 为生效评分
+        """
+        self.use_file(self.registry.path(code))
+        self.use("score:" + code)
+        record = self.registry.load(code)
+        env, soc = self.effective(code)
+        info = dict(self.registry.info(code), env_score=env, soc_score=soc)
+        return record, self.registry.profile(code).with_scores(env, soc), info
+
+    def scorer(self):
+        """注册表共享的默认政策 EventScorer (本次构建内只同步一次)"""
+        if self._scorer is None:
+            from .scoring import shared_scorer
+
+            self._scorer = shared_scorer(self.registry)
+        return self._scorer
+
+    def effective(self, code):
+        """生效 (E, S)"""
+        from .scoring import effective_score
+
+        info = self.registry.info(code)
+        return effective_score(self.scorer(), code, (info['env_score'], info['soc_score']))
+
+    def _name_map(self):
+        if self._names is None:
+            from .supply_graph import normalize_name
+
+            self._names = {}
+            for name, code in self.registry.names().items():
+                self._names.setdefault(normalize_name(name), code)
+                self._names.setdefault(normalize_name(code), code)
+        return self._names
+
+    def resolve(self, name):
+        """供应商名称 -> 已收录公司代码 (None 表示未收录); 公司增删只影响引用了该名称的页面"""
+        from .supply_graph import normalize_name
+
+        return self.use("name:" + normalize_name(name)) or None
+
+    def listing(self):
+        """(档案列表行 HTML, 摘要); 名称等取索引条目, E / S 取生效评分"""
+        if self._listing is None:
+            from .scoring import RATING_NAMES, effective_scores, score_portfolio
+
+            codes, env, soc = effective_scores(self.registry, scorer=self.scorer())
+            result = score_portfolio(env, soc)
+            rows = []
+            for i, code in enumerate(codes):
+                info = self.registry.info(code)
+                rows.append(
+                    f'                    <tr><td><a href="{escape(code)}.html">{escape(info["name"])}</a></td>'
+                    f'<td>{escape(info["type"])}</td><td>{escape(info["position"])}</td>'
+                    f'<td class="num {risk_class(env[i])}">{env[i]:g}</td><td class="num {risk_class(soc[i])}">{soc[i]:g}</td>'
+                    f'<td>{RATING_NAMES[result["band"][i]]}</td></tr>')
+            text = "\n".join(rows)
+            self._listing = (text, _hash_text(text))
+        return self._listing
+
+    def publish_image(self, path, prefix):
+        """发布影像变体, 返回 (<img> 属性文本, 最大变体 URL)"""
+        from .assets import publish, srcset_attrs
+
+        self.use_file(path)
+        published = self._published.get(path)
+        if published is None:
+            published = self._published[path] = publish(path, os.path.join(self.site_dir, 'img'))
+        return srcset_attrs(published, prefix), prefix + published[-1][1]
+
+    def stylesheet(self, prefix):
+        """site.css 发布为 docs/static/site-<hash>.css, 并清理旧版本"""
+        text = self.template('site.css')
+        name = f"site-{_hash_text(text)[:8]}.css"
+        if 'css' not in self._published:
+            static_dir = os.path.join(self.site_dir, 'static')
+            _write_if_changed(os.path.join(static_dir, name), text)
+            for old in os.listdir(static_dir):
+                if old.startswith('site-') and old.endswith('.css') and old != name:
+                    os.remove(os.path.join(static_dir, old))
+            self._published['css'] = name
+        return prefix + name
+
+    # ---- 构建 ----
+
+    def _is_fresh(self, rel, output):
+        deps = self.previous.get('pages', {}).get(rel)
+        if deps is None or not os.path.exists(output):
+            return False
+        known = self.previous.get('inputs', {})
+        return all(key in known and self.fingerprint(key) == known[key] for key in deps)
+
+    def build(self, pages):
+        """pages: [(输出路径, render(build) -> html)], 按顺序检查与渲染"""
+        new_pages = {}
+        for output, render in pages:
+            rel = os.path.relpath(os.path.abspath(output), BASE_DIR)
+            if self._is_fresh(rel, output):
+                new_pages[rel] = self.previous['pages'][rel]
+                self.stats["unchanged"] += 1
+                continue
+            self._deps = []
+            self.use_file(__file__)
+            html = render(self)
+            new_pages[rel] = sorted(set(self._deps))
+            self._deps = None
+            self.stats["rendered"] += 1
+            self.stats["written"] += _write_if_changed(output, html)
+
+        for rel in set(self.previous.get('pages', {})) - set(new_pages):
+            path = os.path.join(BASE_DIR, rel)
+            if os.path.exists(path):
+                os.remove(path)
+                self.stats["removed"] += 1
+
+        used = {key for deps in new_pages.values() for key in deps}
+        manifest = {
+            "version": SITE_VERSION,
+            "inputs": {key: self.fingerprint(key) for key in sorted(used)},
+            "files": {rel: value for rel, value in self.files.items() if "file:" + rel in used},
+            "pages": new_pages,
+        }
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        _write_if_changed(self.manifest_path, json.dumps(manifest, ensure_ascii=False, separators=(',', ':')))
+        return self.stats
+
+
+# --- 3. 页面片段 ---
+
+def satellite_frames(build, code, environment, prefix):
+    """
+    [{"id", "year", "label", "caption", "img", "large"}]: 影像按 before / mid / after 顺序,
+    说明优先取 observation 中以 "<年份>年" 开头的一条, 最近一期回退到 conclusion 的第一句
+    """
+    analysis = (environment or {}).get('analysis') or {}
+    evidence = analysis.get('evidence') or {}
+    observations = evidence.get('observation') or ()
+    if isinstance(observations, str):
+        observations = (observations,)
+    frames = []
+    for key, label in FRAME_KEYS:
+        rel = evidence.get(key)
+        path = os.path.join(BASE_DIR, rel) if rel else None
+        if not path or not os.path.exists(path):
+            continue
+        match = _YEAR_RE.search(os.path.basename(rel))
+        year = match.group(0) if match else ""
+        caption = label
+        for line in observations:
+            if year and str(line).startswith(f"{year}年"):
+                caption = first_clause(re.split(r'[：:]', str(line), 1)[-1]) or label
+                break
+        else:
+            if key == "satellite_image_after" and evidence.get('conclusion'):
+                caption = first_clause(evidence['conclusion']) or label
+        img, large = build.publish_image(path, prefix)
+        frames.append({"id": f"{code.lower()}{year}", "year": year, "label": label, "caption": caption,
+                       "img": img, "large": large})
+    return frames
+
+
+def analysis_points(environment):
+    """结论要点: observation / key_findings / result, 加上 conclusion"""
+    analysis = (environment or {}).get('analysis') or {}
+    evidence = analysis.get('evidence') or {}
+    points = evidence.get('observation') or analysis.get('key_findings') or \
+        ([analysis['result']] if analysis.get('result') else [])
+    if isinstance(points, str):
+        points = [points]
+    points = [str(p) for p in points]
+    if evidence.get('conclusion'):
+        points.append(str(evidence['conclusion']))
+    return points
+
+
+def company_location(record):
+    """产地描述: supply_chain.upstream.location / analysis.location / 总部 / 国家"""
+    upstream = (record.get('supply_chain') or {}).get('upstream') or {}
+    analysis = (record.get('environment') or {}).get('analysis') or {}
+    company_info = record.get('company_info') or {}
+    return (upstream.get('location') if hasattr(upstream, 'get') else None) or analysis.get('location') \
+        or record.get('headquarters') or company_info.get('country') or ""
+
+
+def _product_suppliers(build):
+    """产品页的上游: 加工商供应商中已收录的公司 [(supplier, code)] 与未收录的 [(supplier, None)]"""
+    _, profile, _ = build.company(PRODUCT_CODE)
+    return [(supplier, build.resolve(supplier.name)) for supplier in profile.suppliers]
+
+
+def _supplier_card(build, supplier, code, primary):
+    tag = " (主要)" if primary else ""
+    if code:
+        record, profile, info = build.company(code)
+        title = f"🌱 {escape(record.get('company_english') or info['name'])}{tag}"
+        location = company_location(record)
+        items = [("环境风险", info['env_score']), ("社会风险", info['soc_score'])]
+        governance = (record.get('governance') or {}).get('risk_score')
+        if governance is not None:
+            items.append(("治理风险", governance))
+        lines = [f"📍 {escape(str(location))}" if location else "",
+                 f"🏭 {escape(str(supplier.product or ''))}"]
+    else:
+        title = f"🌾 {escape(supplier.name)}{tag}"
+        items = [("综合风险", supplier.risk_score)] if supplier.risk_score is not None else []
+        lines = [f"📍 {escape(str(supplier.country or ''))}", f"🏭 {escape(str(supplier.product or ''))}"]
+    meter = "".join(
+        f'''
+                    <div class="risk-item">
+                        <div class="risk-label">{label}</div>
+                        <div class="risk-score {risk_class(score)}">{score}</div>
+                    </div>''' for label, score in items)
+    badges = []
+    if supplier.status:
+        score = supplier.risk_score
+        badges.append(f'<span class="badge{" danger" if score and score > 60 else ""}">{escape(supplier.status)}</span>')
+    if supplier.note:
+        badges.append(f'<span class="badge warning">{escape(str(supplier.note))}</span>')
+    return f'''            <div class="supplier-card">
+                <div class="supplier-name">{title}</div>
+                <div class="info-content">
+                    {"<br>".join(line for line in lines if line)}
+                </div>
+                <div class="risk-meter">{meter}
+                </div>
+                <div style="margin-top: 10px;">
+                    {" ".join(badges)}
+                </div>
+            </div>'''
+
+
+def _satellite_tab(build, code, frames, active):
+    record, profile, info = build.company(code)
+    environment = record.get('environment') or {}
+    analysis = environment.get('analysis') or {}
+    tab = code.lower()
+    figures = []
+    for i in range(0, len(frames), 2):
+        pair = frames[i:i + 2]
+        span = ' style="grid-column: 1 / -1;"' if len(pair) == 1 and i else ""
+        margin = ' style="margin-top: 10px;"' if i else ""
+        items = "".join(f'''
+                            <div class="satellite-item" onclick="openModal('{f["id"]}')"{span}>
+                                <img {f["img"]} alt="{escape(code)} {f["year"]}年">
+                                <div class="satellite-label">{f["year"]}年 - {escape(f["label"])}</div>
+                            </div>''' for f in pair)
+        figures.append(f'''                        <div class="satellite-grid"{margin}>{items}
+                        </div>''')
+
+    badges = [f'<span class="{level_badge(environment.get("risk_level"))}">环境{escape(str(environment.get("risk_level") or "N/A"))}</span>']
+    social_level = (record.get('social') or {}).get('risk_level')
+    if social_level:
+        badges.append(f'<span class="{level_badge(social_level)}">社会{escape(str(social_level))}</span>')
+    points = "<br>\n".join(f"                            • {escape(p)}" for p in analysis_points(environment))
+    method = escape(str(analysis.get('method') or '卫星遥感影像分析'))
+    period = f"（{escape(str(analysis['period']))}）" if analysis.get('period') else ""
+    chart = '''
+                    <div class="chart-container">
+                        <canvas id="forestCoverageChart"></canvas>
+                    </div>
+''' if code == FOREST_CHART_CODE else ""
+    return f'''                <div id="{tab}-tab" class="tab-content{" active" if active else ""}">
+                    <div class="info-item">
+                        <div class="info-label">验证方法</div>
+                        <div class="info-content">{method}{period}</div>
+                    </div>
+
+                    <div class="satellite-comparison">
+{chr(10).join(figures)}
+                    </div>
+{chart}
+                    <div class="info-item">
+                        <div class="info-label">分析结论</div>
+                        <div class="info-content">
+                            {" ".join(badges)}<br>
+{points}
+                        </div>
+                    </div>
+                    <div class="info-item"><a href="companies/{escape(code)}.html">查看企业档案 →</a></div>
+                </div>'''
+
+
+def render_product(build):
+    """docs/index.html: 加工商的上游供应商卡片、卫星验证标签页与大图说明均来自公司 JSON"""
+    template = build.template('product.html')
+    suppliers = _product_suppliers(build)
+    cards = [_supplier_card(build, s, code, i == 0) for i, (s, code) in enumerate(suppliers)]
+
+    buttons, tabs, image_data = [], [], {}
+    for supplier, code in suppliers:
+        if not code:
+            continue
+        record, _, _ = build.company(code)
+        frames = satellite_frames(build, code, record.get('environment'), "img/")
+        if not frames:
+            continue
+        active = not tabs
+        buttons.append(f'''                    <button class="tab-button{" active" if active else ""}" onclick="switchTab('{code.lower()}')">{escape(code)}种植园</button>''')
+        tabs.append(_satellite_tab(build, code, frames, active))
+        for f in frames:
+            image_data[f["id"]] = {"src": f["large"], "caption": escape(f"{code}种植园 {f['year']}年 - {f['caption']}")}
+
+    satellite_tabs = f'''                <div class="tab-buttons">
+{chr(10).join(buttons)}
+                </div>
+
+{chr(10).join(tabs)}'''
+    return render_template(template, {
+        "supplier_cards": "\n\n".join(cards),
+        "satellite_tabs": satellite_tabs,
+        "image_data": json.dumps(image_data, ensure_ascii=False).replace("</", "<\\/"),
+    })
+
+
+def render_b2c(build):
+    """b2c_page/index.html: 原料产地取加工商的第一家已收录供应商"""
+    template = build.template('b2c.html')
+    record, _, info = build.company(PRODUCT_CODE)
+    origin = next((code for _, code in _product_suppliers(build) if code), None)
+    env_low, origin_level, location, method = False, "N/A", "", ""
+    if origin:
+        origin_record, _, origin_info = build.company(origin)
+        environment = origin_record.get('environment') or {}
+        env_low = origin_info['env_score'] <= 30
+        origin_level = str(environment.get('risk_level') or "N/A")
+        location = f"{company_location(origin_record)} {origin}种植园"
+        method = str((environment.get('analysis') or {}).get('method') or "")
+
+    badges = ["✅ Sentinel-2卫星验证" if "Sentinel" in method else "✅ 卫星遥感验证"]
+    badges += ["✅ 无非法毁林", "✅ 符合欧盟EUDR法规"] if env_low else ["⚠️ 毁林风险复核中"]
+    items = [f"✅ 绿链ESG风险评估：{origin_level.replace('风险', '')}环境风险", "✅ 供应链透明度认证",
+             "✅ 零毁林承诺验证" if env_low else "⚠️ 零毁林承诺跟踪中"]
+    return render_template(template, {
+        "origin_location": escape(location.strip() or "N/A"),
+        "origin_badges": "\n".join(f'                <span class="badge">{escape(b)}</span>' for b in badges),
+        "processor_name": escape(f"{short_name(info['name'])} - {PRODUCT_BRAND}"),
+        "sustainability_items": "<br>\n".join(f"                {escape(item)}" for item in items),
+    })
+
+
+def render_company(code):
+    def render(build):
+        from .scoring import score_company
+
+        template = build.template('company.html')
+        record, profile, info = build.company(code)
+        score = score_company(info['env_score'], info['soc_score'])
+        cards = "\n".join(
+            f'''                <div class="score"><div class="label">{label}</div><div class="value {risk_class(value)}">{value:g}</div></div>'''
+            for label, value in (("环境风险 (E)", info['env_score']), ("社会风险 (S)", info['soc_score']),
+                                 ("综合分", score['total_score'])))
+        badges = [f'<span class="badge">{escape(score["rating_name"])}</span>']
+        if score['high_exposure']:
+            badges.append('<span class="badge danger">财务风险敞口高</span>')
+        if profile.traditional_rating and profile.traditional_rating != "N/A":
+            badges.append(f'<span class="badge muted">传统评级 {escape(str(profile.traditional_rating))}</span>')
+
+        environment = record.get('environment') or {}
+        frames = satellite_frames(build, code, environment, "../img/")
+        satellite = ""
+        if frames:
+            figures = "\n".join(f'''                <figure><img {f["img"]} alt="{escape(code)} {f["year"]}年"><figcaption>{f["year"]}年 · {escape(f["label"])} — {escape(f["caption"])}</figcaption></figure>'''
+                                for f in frames)
+            points = "".join(f"<li>{escape(p)}</li>" for p in analysis_points(environment))
+            method = escape(str((environment.get('analysis') or {}).get('method') or ''))
+            satellite = f'''
+        <div class="section">
+            <h2>🛰️ 卫星验证</h2>
+            <p style="margin-bottom: 10px; color: #7f8c8d;">{method}</p>
+            <div class="satellite-grid">
+{figures}
+            </div>
+            <ul style="margin: 12px 0 0 18px;">{points}</ul>
+        </div>'''
+
+        events = sorted([(e, "环境") for e in profile.env_events] + [(e, "社会") for e in profile.soc_events],
+                        key=lambda item: item[0].date_key, reverse=True)
+        events_html = ""
+        if events:
+            items = []
+            for event, section in events:
+                level = ' class="high"' if (event.severity or 0) >= 3 else ' class="positive"' if event.severity == 0 else ""
+                source = f" · {escape(str(event.source))}" if event.source else ""
+                desc = event.description or '；'.join(event.details)
+                items.append(f'''                <li{level}><div class="meta">{escape(event.date_label)} · {section} · {event.severity_label}{source}</div>
+                    <div>{escape(event.title)}</div>{f'<div class="desc">{escape(desc)}</div>' if desc else ''}</li>''')
+            events_html = f'''
+        <div class="section">
+            <h2>📢 关键事件</h2>
+            <ul class="events">
+{chr(10).join(items)}
+            </ul>
+        </div>'''
+
+        suppliers_html = ""
+        if profile.suppliers:
+            rows = []
+            for supplier in profile.suppliers:
+                target = build.resolve(supplier.name)
+                name = escape(supplier.name)
+                if target:
+                    name = f'<a href="{escape(target)}.html">{name}</a>'
+                rows.append(f'''                    <tr><td>{name}</td><td>{escape(str(supplier.country or ''))}</td><td>{escape(str(supplier.product or ''))}</td><td>{escape(str(supplier.status or ''))}</td></tr>''')
+            suppliers_html = f'''
+        <div class="section">
+            <h2>🔗 上游供应商</h2>
+            <table>
+                <thead><tr><th>供应商</th><th>国家</th><th>产品</th><th>风险状态</th></tr></thead>
+                <tbody>
+{chr(10).join(rows)}
+                </tbody>
+            </table>
+        </div>'''
+
+        metadata = record.get('metadata') or {}
+        return render_template(template, {
+            "title": escape(info['name']),
+            "subtitle": escape(f"{info['type']} · {info['position']} · {code}"),
+            "stylesheet": build.stylesheet("../static/"),
+            "score_cards": cards,
+            "rating_badges": " ".join(badges),
+            "satellite_section": satellite,
+            "events_section": events_html,
+            "suppliers_section": suppliers_html,
+            "updated": escape(str(record.get('last_updated') or metadata.get('last_updated') or 'N/A')),
+        })
+    return render
+
+
+def render_listing(build):
+    rows, _ = build.listing()
+    build.use("listing")
+    return render_template(build.template('companies.html'), {
+        "stylesheet": build.stylesheet("../static/"),
+        "summary": f"已收录 {len(build.registry)} 家企业 · E/S 分离评分",
+        "rows": rows,
+    })
+
+
+# --- 4. 构建入口 ---
+
+def site_pages(registry, site_dir=SITE_DIR, b2c_dir=B2C_DIR):
+    """全部页面; 档案列表排在公司页之后 (公司页渲染时会刷新被编辑文件的索引条目)"""
+    companies_dir = os.path.join(site_dir, 'companies')
+    pages = [(os.path.join(companies_dir, f"{code}.html"), render_company(code)) for code in registry.codes()]
+    pages.append((os.path.join(companies_dir, 'index.html'), render_listing))
+    if PRODUCT_CODE in registry:
+        pages.append((os.path.join(site_dir, 'index.html'), render_product))
+        pages.append((os.path.join(b2c_dir, 'index.html'), render_b2c))
+    return pages
+
+
+def build_site(registry, site_dir=SITE_DIR, b2c_dir=B2C_DIR, full=False, manifest_path=None):
+    """增量构建, 返回 {"rendered", "written", "unchanged", "removed", "seconds"}"""
+    start = time.perf_counter()
+    registry.refresh(force=True)
+    build = SiteBuild(registry, site_dir, b2c_dir, manifest_path, full)
+    stats = build.build(site_pages(registry, site_dir, b2c_dir))
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    return stats
+
+
+def main(argv=None):
+    from .registry import CompanyRegistry
+
+    parser = argparse.ArgumentParser(description="由公司 JSON 生成 docs/ 站点与 B2C 溯源页")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--site-dir", default=SITE_DIR)
+    parser.add_argument("--b2c-dir", default=B2C_DIR)
+    parser.add_argument("--full", action="store_true", help="忽略依赖图, 重新渲染全部页面")
+    args = parser.parse_args(argv)
+
+    registry = CompanyRegistry(args.data_dir)
+    if PRODUCT_CODE not in registry:
+        print(f"⚠️ 未收录加工商 {PRODUCT_CODE}, 跳过产品溯源页与 B2C 页")
+    stats = build_site(registry, args.site_dir, args.b2c_dir, args.full)
+    print(f"✓ 渲染 {stats['rendered']} 页 (写入 {stats['written']}), 未变化 {stats['unchanged']} 页, "
+          f"删除 {stats['removed']} 页, 用时 {stats['seconds']:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,44 @@
+"""
+静态页面片段 (Static Fragments)
+app.py 每次运行都要发送的 CSS 与大段静态 HTML 存放在 assets/static/ 下,
+进程内首次使用时压缩 (去注释、折叠空白) 一次并缓存, 之后每次运行直接取现成字符串
+"""
+
+import functools
+import os
+import re
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(BASE_DIR, 'assets', 'static')
+
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_PUNCT = re.compile(r'\s*([{};:,>])\s*')
+_HTML_BETWEEN_TAGS = re.compile(r'>\s+<')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def minify_css(text):
+    """去掉注释与多余空白; 选择器中的后代空格保留"""
+    text = _CSS_COMMENT.sub('', text)
+    text = _WHITESPACE.sub(' ', text)
+    text = _CSS_PUNCT.sub(r'\1', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_html(text):
+    """标签之间的空白删除, 文本中的连续空白折叠为一个空格 (单行输出也避免被 Markdown 当作缩进代码块)"""
+    text = _HTML_BETWEEN_TAGS.sub('><', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+@functools.lru_cache(maxsize=None)
+def static_fragment(name, static_dir=STATIC_DIR):
+    """
+    返回可直接交给 st.markdown(..., unsafe_allow_html=True) 的压缩片段
+    .css 文件包裹为 <style> 标签, .html 文件原样压缩
+    """
+    with open(os.path.join(static_dir, name), 'r', encoding='utf-8') as f:
+        text = f.read()
+    if name.endswith('.css'):
+        return f"<style>{minify_css(text)}</style>"
+    return minify_html(text)
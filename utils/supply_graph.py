@@ -0,0 +1,375 @@
+"""
+供应链风险传导图 (Supply Chain Risk Graph)
+从所有公司文件的 supply_chain 章节构建稀疏邻接矩阵:
+- upstream.suppliers      供应商 -> 本公司
+- upstream.subsidiaries   子公司 -> 本公司
+- midstream.name          本公司 -> 中游采购方
+- downstream.major_customers / markets  本公司 -> 客户 / 市场
+风险沿边的方向 (上游 -> 下游) 多跳加权传导:
+    p = s + alpha * W p        (W 按入边归一化, alpha < 1 保证收敛)
+单个节点评分变化时只沿其下游做增量推送, 不重算全图 (update_graph: 拓扑不变时只推送评分变化的公司)
+公司节点的自身风险取生效评分 (utils.scoring, 事件衰减 + JSON 回退) 中 E/S 较高者
+"""
+
+import hashlib
+import json
+import re
+from collections.abc import Mapping
+
+import numpy as np
+
+from .schema import parse_risk_status
+
+# --- 1. 配置 ---
+
+RELATION_WEIGHTS = {
+    "supplier": 1.0,
+    "subsidiary": 0.8,
+    "buyer": 1.0,
+    "customer": 0.6,
+    "market": 0.4,
+}
+DEFAULT_ALPHA = 0.5         # 每跳衰减系数
+DEFAULT_TOL = 1e-6
+DEFAULT_MAX_ITER = 100
+
+_PAREN_RE = re.compile(r'\s*[\(（][^\(\)（）]*[\)）]\s*$')
+_NOTE_RE = re.compile(r'\s*-\s')
+
+
+# --- 2. 名称与风险解析 ---
+
+def display_name(name):
+    """去掉 'Unilever（联合利华）- 2016年曾暂停采购' 中的备注部分"""
+    return _NOTE_RE.split(str(name), 1)[0].strip()
+
+
+def normalize_name(name):
+    """节点名称归一化: 去掉备注与末尾括号, 小写并压缩空白"""
+    name = display_name(name)
+    stripped = _PAREN_RE.sub('', name)
+    while stripped and stripped != name:
+        name, stripped = stripped, _PAREN_RE.sub('', stripped)
+    return ' '.join(name.lower().split())
+
+
+def _names(value):
+    """把 list/str/dict 形式的名称字段统一为字符串列表"""
+    if isinstance(value, str):
+        return [value]
+    names = []
+    for item in value or ():
+        if isinstance(item, Mapping):
+            item = item.get('name') or item.get('region')
+        if item:
+            names.append(str(item))
+    return names
+
+
+# --- 3. 图结构 ---
+
+class SupplyChainGraph:
+    """
+    节点: 公司代码 (已收录公司) 或 外部名称 (未收录的供应商/客户/市场)
+    边以 COO 数组保存, 同时维护按源节点排序的 CSR 便于增量推送
+    """
+
+    def __init__(self, alpha=DEFAULT_ALPHA):
+        self.alpha = alpha
+        self.nodes = []            # 节点显示名称
+        self.codes = []            # 公司代码, 外部节点为 None
+        self._index = {}           # 归一化名称 -> 节点编号
+        self._code_index = {}      # 公司代码 -> 节点编号
+        self._own = []             # 节点自身风险 (列表, freeze 后转数组)
+        self._src, self._dst, self._rel = [], [], []
+        self.topology = {}         # 公司代码 -> (stamp, 拓扑摘要), build_graph 填写
+
+        self.own_risk = None
+        self.propagated = None
+
+    # ---- 构建 ----
+
+    def add_node(self, name, code=None, risk=None, aliases=()):
+        key = normalize_name(name)
+        idx = self._index.get(key)
+        if idx is None:
+            idx = len(self.nodes)
+            self.nodes.append(display_name(name))
+            self.codes.append(code)
+            self._own.append(np.nan)
+            self._index[key] = idx
+        if code is not None:
+            self.codes[idx] = code
+            self.nodes[idx] = str(name)
+            self._code_index[code] = idx
+        if risk is not None and (code is not None or np.isnan(self._own[idx])):
+            self._own[idx] = float(risk)
+        for alias in aliases:
+            if alias:
+                self._index.setdefault(normalize_name(alias), idx)
+        return idx
+
+    def add_edge(self, src, dst, relation):
+        if src != dst:
+            self._src.append(src)
+            self._dst.append(dst)
+            self._rel.append(relation)
+
+    def finalize(self):
+        """冻结为 NumPy 数组并计算入边归一化权重"""
+        n = len(self.nodes)
+        src = np.asarray(self._src, dtype=np.int64)
+        dst = np.asarray(self._dst, dtype=np.int64)
+        weight = np.asarray([RELATION_WEIGHTS.get(r, 0.5) for r in self._rel], dtype=np.float64)
+
+        # 合并重复边
+        if len(src):
+            pair = src * n + dst
+            pair, inverse = np.unique(pair, return_inverse=True)
+            weight = np.bincount(inverse, weights=weight)
+            relation = np.empty(len(pair), dtype=object)
+            relation[inverse] = np.asarray(self._rel, dtype=object)
+            src, dst = pair // n, pair % n
+        else:
+            relation = np.empty(0, dtype=object)
+
+        in_total = np.bincount(dst, weights=weight, minlength=n)
+        self.src, self.dst, self.relation = src, dst, relation
+        self.weight = weight / np.where(in_total[dst] > 0, in_total[dst], 1.0)
+
+        # 按源节点排序的 CSR (出边), 供路径搜索和增量推送
+        order = np.argsort(src, kind='stable')
+        self.out_dst = dst[order]
+        self.out_weight = self.weight[order]
+        self.out_relation = relation[order]
+        self.out_ptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=self.out_ptr[1:])
+
+        # 入边 CSR, 供上游路径回溯
+        order = np.argsort(dst, kind='stable')
+        self.in_src = src[order]
+        self.in_ptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(dst, minlength=n), out=self.in_ptr[1:])
+
+        self.own_risk = np.nan_to_num(np.asarray(self._own, dtype=np.float64), nan=0.0)
+        self.known = ~np.isnan(np.asarray(self._own, dtype=np.float64))
+        self.propagate()
+        return self
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def edge_count(self):
+        return len(self.src)
+
+    # ---- 风险传导 ----
+
+    def _spmv(self, x):
+        """y = W x, 以 COO 形式 bincount 实现的稀疏矩阵乘向量"""
+        return np.bincount(self.dst, weights=self.weight * x[self.src], minlength=len(self.nodes))
+
+    def propagate(self, tol=DEFAULT_TOL, max_iter=DEFAULT_MAX_ITER):
+        """全量迭代 p = s + alpha * W p 直至收敛"""
+        s = self.own_risk
+        p = s.copy()
+        for _ in range(max_iter):
+            p_next = s + self.alpha * self._spmv(p)
+            if np.max(np.abs(p_next - p), initial=0.0) < tol:
+                p = p_next
+                break
+            p = p_next
+        self._raw = p
+        self.propagated = np.minimum(p, 100.0)
+        return self.propagated
+
+    def update_score(self, node, score, tol=DEFAULT_TOL, max_iter=DEFAULT_MAX_ITER):
+        """
+        单节点评分变化: 只把差值沿出边推送到受影响的下游节点
+        返回被更新的节点编号数组
+        """
+        node = self.node_id(node)
+        delta = float(score) - self.own_risk[node]
+        self.own_risk[node] = float(score)
+        self.known[node] = True
+        if delta == 0:
+            return np.asarray([node])
+
+        touched = {node}
+        frontier = np.asarray([node], dtype=np.int64)
+        residual = np.asarray([delta])
+        for _ in range(max_iter):
+            self._raw[frontier] += residual
+            starts, ends = self.out_ptr[frontier], self.out_ptr[frontier + 1]
+            counts = ends - starts
+            if not counts.sum():
+                break
+            edge_idx = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            targets = self.out_dst[edge_idx]
+            pushed = self.alpha * self.out_weight[edge_idx] * np.repeat(residual, counts)
+            frontier, inverse = np.unique(targets, return_inverse=True)
+            residual = np.bincount(inverse, weights=pushed)
+            keep = np.abs(residual) >= tol
+            frontier, residual = frontier[keep], residual[keep]
+            if not len(frontier):
+                break
+            touched.update(frontier.tolist())
+
+        touched = np.fromiter(touched, dtype=np.int64)
+        self.propagated[touched] = np.minimum(self._raw[touched], 100.0)
+        return touched
+
+    # ---- 查询 ----
+
+    def node_id(self, node):
+        """接受节点编号、公司代码或名称"""
+        if isinstance(node, (int, np.integer)):
+            return int(node)
+        if node in self._code_index:
+            return self._code_index[node]
+        return self._index[normalize_name(node)]
+
+    def find(self, name):
+        return self._index.get(normalize_name(name))
+
+    def node_info(self, node):
+        idx = self.node_id(node)
+        return {
+            "id": idx,
+            "name": self.nodes[idx],
+            "code": self.codes[idx],
+            "own_risk": float(self.own_risk[idx]) if self.known[idx] else None,
+            "propagated_risk": float(self.propagated[idx]),
+        }
+
+    def upstream(self, node):
+        idx = self.node_id(node)
+        return self.in_src[self.in_ptr[idx]:self.in_ptr[idx + 1]].tolist()
+
+    def downstream(self, node):
+        idx = self.node_id(node)
+        return self.out_dst[self.out_ptr[idx]:self.out_ptr[idx + 1]].tolist()
+
+    def paths_through(self, node, max_up=2, max_down=2, limit=5):
+        """
+        经过 node 的风险传导路径 (上游 -> node -> 下游), 按路径平均传导风险降序
+        每条路径是节点编号列表; 只做有限深度搜索, 大图上也是常数开销
+        """
+        idx = self.node_id(node)
+        risk = self.propagated
+
+        def walk(start, step, depth):
+            chains = [[start]]
+            for _ in range(depth):
+                grown = []
+                for chain in chains:
+                    nxt = step(chain[-1])
+                    nxt = sorted((n for n in nxt if n not in chain), key=lambda n: -risk[n])[:limit]
+                    grown.extend(chain + [n] for n in nxt)
+                if not grown:
+                    break
+                chains = grown[:limit * limit]
+            return chains
+
+        ups = walk(idx, self.upstream, max_up)
+        downs = walk(idx, self.downstream, max_down)
+        paths = [list(reversed(u)) + d[1:] for u in ups for d in downs]
+        paths.sort(key=lambda p: (-float(np.mean(risk[p])), -len(p)))
+        return paths[:limit]
+
+
+# --- 4. 从注册表构建 ---
+
+def company_risk(env_score, soc_score):
+    """可传导风险: 取 E/S 中较高者"""
+    return max(env_score, soc_score)
+
+
+def company_risks(registry, scorer=None):
+    """公司代码 -> 可传导风险 (生效 E/S 中较高者)"""
+    from .scoring import effective_scores
+
+    codes, env, soc = effective_scores(registry, scorer=scorer)
+    return {code: company_risk(float(e), float(s)) for code, e, s in zip(codes, env, soc)}
+
+
+def _aliases(record, code):
+    company_info = record.get('company_info') or {}
+    return record.get('company_english'), company_info.get('full_name'), code
+
+
+def _topology_key(name, record, code):
+    """决定节点与边的输入 (名称 / 别名 / supply_chain 章节) 的摘要; 不变时文件编辑只影响评分"""
+    payload = json.dumps([name, _aliases(record, code), record.get('supply_chain')],
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def build_graph(registry, alpha=DEFAULT_ALPHA, scorer=None):
+    """
+    遍历注册表中所有公司, 构建并返回已完成传导计算的 SupplyChainGraph
+    graph.topology 记录每家公司的 (stamp, 拓扑摘要), 供 update_graph 判断能否增量更新
+    """
+    graph = SupplyChainGraph(alpha)
+    risks = company_risks(registry, scorer)
+
+    # 先登记所有已收录公司, 使供应商名称能解析到公司代码
+    for code in registry.codes():
+        info = registry.info(code)
+        record = registry.load(code)
+        graph.topology[code] = (registry.stamp(code), _topology_key(info['name'], record, code))
+        graph.add_node(info['name'], code=code, risk=risks[code], aliases=_aliases(record, code))
+
+    for code in registry.codes():
+        me = graph.node_id(code)
+        supply_chain = registry.load_section(code, 'supply_chain') or {}
+        upstream = supply_chain.get('upstream') or {}
+        midstream = supply_chain.get('midstream') or {}
+        downstream = supply_chain.get('downstream') or {}
+
+        for supplier in upstream.get('suppliers') or ():
+            name = supplier.get('name') if isinstance(supplier, Mapping) else supplier
+            if not name:
+                continue
+            risk = parse_risk_status(supplier.get('risk_status', '')) if isinstance(supplier, Mapping) else None
+            graph.add_edge(graph.add_node(name, risk=risk), me, "supplier")
+
+        for name in _names(upstream.get('subsidiaries')):
+            graph.add_edge(graph.add_node(name), me, "subsidiary")
+
+        if isinstance(midstream, Mapping) and midstream.get('name'):
+            graph.add_edge(me, graph.add_node(midstream['name']), "buyer")
+
+        for name in _names(downstream.get('major_customers')):
+            graph.add_edge(me, graph.add_node(name), "customer")
+
+        for name in _names(downstream.get('markets')):
+            graph.add_edge(me, graph.add_node(name), "market")
+
+    return graph.finalize()
+
+
+def update_graph(graph, registry, scorer=None, alpha=DEFAULT_ALPHA):
+    """
+    与注册表同步, 返回 (图, 经 update_score 更新的公司数)
+    graph 为 None、公司增删或某家公司的名称 / 别名 / supply_chain 变化时重建 (更新数为 -1);
+    否则拓扑不变, 只把生效评分变化的公司 (文件中评分被编辑、事件衰减) 经 update_score 沿下游增量推送
+    """
+    if graph is None or set(graph.topology) != set(registry.codes()):
+        return build_graph(registry, alpha, scorer), -1
+    for code, (stamp, key) in list(graph.topology.items()):
+        current = registry.stamp(code)
+        if current == stamp:
+            continue
+        new_key = _topology_key(registry.info(code)['name'], registry.load(code), code)
+        if new_key != key:
+            return build_graph(registry, graph.alpha, scorer), -1
+        graph.topology[code] = (current, key)
+
+    updated = 0
+    for code, risk in company_risks(registry, scorer).items():
+        node = graph.node_id(code)
+        if graph.own_risk[node] != risk:
+            graph.update_score(node, risk)
+            updated += 1
+    return graph, updated